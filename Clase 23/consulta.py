@@ -1,33 +1,59 @@
+import argparse
+import json
+import os
 import sys
-from langchain_huggingface import HuggingFaceEmbeddings
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from langchain_chroma import Chroma
 
-# 1. Definir el modelo y el directorio de la DB (deben ser los mismos)
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Reutilizamos el caché de embeddings de la Clase 24: los vectores ya
+# calculados (por la app o por otro script) se leen del disco. El modelo,
+# el caché y el servicio de embeddings se configuran en su config.py
+# (o con las variables de entorno EMBEDDING_CACHE_PATH y
+# EMBEDDING_SERVER_URL), así todos usan los mismos.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Clase 24"))
+from config import EMBEDDING_MODEL, EMBEDDING_CACHE_PATH, EMBEDDING_SERVER_URL
+from embedding_cache import create_embeddings
+from retrievers import max_marginal_relevance_search, fetch_candidates, mmr_select
+from tracing import percentile
+
+# 1. Definir el directorio de la DB (el mismo que usa ingesta.py)
 PERSIST_DIRECTORY = "db_chroma"
 
-def main(query_text):
-    if not query_text:
-        print("Por favor, proporciona un texto para la consulta.")
-        return
+# Usar MMR (True) o la búsqueda simple por similitud (False)
+USE_MMR = True
 
-    print("Cargando modelo de embeddings y base de datos...")
+# Modo por lotes (--batch): preguntas por cada cálculo de embeddings
+BATCH_SIZE = 64
+
+def load_vectordb():
+    print("Cargando modelo de embeddings y base de datos...", file=sys.stderr)
     
     # 2. Cargar el modelo de Embeddings
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL,
-        model_kwargs={'device': 'cpu'}
+    embeddings = create_embeddings(
+        EMBEDDING_MODEL,
+        device='cpu',
+        cache_path=EMBEDDING_CACHE_PATH,
+        server_url=EMBEDDING_SERVER_URL or None
     )
 
     # 3. Cargar la base de datos vectorial persistente
     # OJO: Esta vez no usamos 'from_documents', sino que cargamos
     # la que ya existe desde el disco.
-    vectordb = Chroma(
+    return Chroma(
         persist_directory=PERSIST_DIRECTORY,
         embedding_function=embeddings
     )
 
-    print(f"Realizando búsqueda MMR para: '{query_text}'\n")
+def main(query_text):
+    if not query_text:
+        print("Por favor, proporciona un texto para la consulta.")
+        return
+
+    vectordb = load_vectordb()
+
+    print(f"Realizando búsqueda {'MMR' if USE_MMR else 'por similitud'} para: '{query_text}'\n")
 
     # 4. Realizar la búsqueda
     # Hay diferentes métodos de búsqueda:
@@ -49,14 +75,20 @@ def main(query_text):
     #   * 0.5 = Balance equilibrado (recomendado)
     #   * 1.0 = Solo importa relevancia (como similarity_search)
     #   * 0.0 = Solo importa diversidad
-    # results = vectordb.max_marginal_relevance_search(
-    #     query_text, 
-    #     k=3,
-    #     fetch_k=20,
-    #     lambda_mult=0.5
-    # )
-
-    results = vectordb.similarity_search(query_text, k=3)
+    #
+    # Usamos la versión de la Clase 24 (retrievers.py): reutiliza los vectores
+    # guardados de los 20 candidatos (una sola consulta a ChromaDB) y hace la
+    # selección con operaciones de matrices de NumPy.
+    if USE_MMR:
+        results = max_marginal_relevance_search(
+            vectordb,
+            query_text,
+            k=3,
+            fetch_k=20,
+            lambda_mult=0.5
+        )
+    else:
+        results = vectordb.similarity_search(query_text, k=3)
 
     if not results:
         print("No se encontraron resultados relevantes.")
@@ -72,10 +104,186 @@ def main(query_text):
         print(doc.page_content)
         print("-" * 30)
 
+# ==============================================================================
+# MODO POR LOTES: muchas preguntas con una sola carga del modelo y la base
+# ==============================================================================
+# Para evaluar cientos de preguntas no conviene lanzar el script una vez por
+# pregunta: cada vez se cargaría el modelo y ChromaDB. En el modo por lotes:
+# 1. Se carga todo UNA vez
+# 2. Los embeddings de las preguntas se calculan de BATCH_SIZE en BATCH_SIZE
+# 3. Las búsquedas se reparten entre varios hilos (--workers)
+# 4. Cada resultado se escribe como una línea JSON (JSONL)
+
+def read_queries(stream):
+    """
+    Lee preguntas: una por línea, en texto plano o JSON
+    ({"query": "...", "id": ...}). Las líneas vacías se ignoran.
+
+    Una línea JSON mal escrita (o sin "query" ni "question") no detiene
+    el lote: se avisa en la pantalla de errores y se devuelve con su error,
+    para que quede registrada en los resultados.
+
+    Yields:
+        tuple: (id, pregunta, error). Si la línea es válida, error es None;
+            si no, pregunta es None y error explica qué falló
+    """
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith("{"):
+            yield number, line, None
+            continue
+
+        query_id = number
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            error = f"JSON inválido ({e.msg})"
+        else:
+            query_id = record.get("id", number)
+            query = record.get("query") or record.get("question")
+            if isinstance(query, str) and query.strip():
+                yield query_id, query, None
+                continue
+            error = 'falta "query" o "question"'
+
+        print(f"❌ Línea {number}: {error}. Se omite.", file=sys.stderr)
+        yield query_id, None, f"línea {number}: {error}"
+
+def search_by_vector(vectordb, query_vector, k=3, fetch_k=20, lambda_mult=0.5):
+    """Búsqueda (MMR o por similitud) con el vector ya calculado: [(doc, score)]."""
+    documents, vectors = fetch_candidates(vectordb, query_vector, max(fetch_k, k) if USE_MMR else k)
+    if not documents:
+        return []
+
+    # Puntuación = similitud coseno entre la pregunta y cada fragmento
+    query = np.asarray(query_vector, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * max(float(np.linalg.norm(query)), 1e-12)
+    scores = (vectors @ query) / np.maximum(norms, 1e-12)
+
+    if USE_MMR:
+        chosen = mmr_select(query_vector, vectors, k, lambda_mult)
+    else:
+        chosen = range(len(documents))
+    return [(documents[i], float(scores[i])) for i in chosen]
+
+def run_batch(vectordb, queries, output, k=3, workers=1, batch_size=BATCH_SIZE):
+    """
+    Responde todas las preguntas y escribe una línea JSON por pregunta.
+    Las líneas inválidas de la entrada se escriben como {'id', 'error'}.
+
+    Returns:
+        tuple: (latencia de cada pregunta en segundos, líneas inválidas)
+    """
+    latencies = []
+    errors = 0
+    queries = iter(queries)
+
+    def search(item):
+        (query_id, query_text, _), vector, embed_share = item
+        start = time.perf_counter()
+        hits = search_by_vector(vectordb, vector, k=k)
+        search_seconds = time.perf_counter() - start
+        return {
+            'id': query_id,
+            'query': query_text,
+            'results': [
+                {
+                    'rank': rank,
+                    'source': doc.metadata.get('source'),
+                    'page': doc.metadata.get('page'),
+                    'score': round(score, 4)
+                }
+                for rank, (doc, score) in enumerate(hits, start=1)
+            ],
+            # Latencia = su parte del cálculo del lote + su búsqueda
+            'latency_ms': round((embed_share + search_seconds) * 1000, 2)
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while True:
+            batch = [item for _, item in zip(range(batch_size), queries)]
+            if not batch:
+                break
+
+            # Todas las preguntas del lote en una sola llamada al modelo.
+            # Con sentence-transformers, embed_documents da el mismo vector
+            # que embed_query para cada texto.
+            valid = [query for query in batch if query[2] is None]
+            vectors, embed_share = [], 0.0
+            if valid:
+                start = time.perf_counter()
+                vectors = vectordb.embeddings.embed_documents([text for _, text, _ in valid])
+                embed_share = (time.perf_counter() - start) / len(valid)
+
+            # map() devuelve los resultados en el mismo orden que las preguntas
+            items = [(query, vector, embed_share) for query, vector in zip(valid, vectors)]
+            results = executor.map(search, items)
+            for query_id, _, error in batch:
+                if error is not None:
+                    record = {'id': query_id, 'error': error}
+                    errors += 1
+                else:
+                    record = next(results)
+                    latencies.append(record['latency_ms'] / 1000)
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+    return latencies, errors
+
+def main_batch(input_path, output_path="-", k=3, workers=1, batch_size=BATCH_SIZE):
+    vectordb = load_vectordb()
+    print(f"Modo por lotes: búsqueda {'MMR' if USE_MMR else 'por similitud'}, "
+          f"{workers} hilo(s)", file=sys.stderr)
+
+    source = sys.stdin if input_path == "-" else open(input_path, encoding="utf-8")
+    output = sys.stdout if output_path == "-" else open(output_path, "w", encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        latencies, errors = run_batch(vectordb, read_queries(source), output,
+                                      k=k, workers=workers, batch_size=batch_size)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    if errors:
+        print(f"⚠️ {errors} línea(s) inválida(s) omitida(s) (ver 'error' en los resultados)",
+              file=sys.stderr)
+    if not latencies:
+        print("No se encontraron preguntas.", file=sys.stderr)
+        return
+    print(f"{len(latencies)} preguntas en {elapsed:.1f} s "
+          f"({len(latencies) / elapsed:.1f} preguntas/s) | "
+          f"latencia p50 {percentile(latencies, 50) * 1000:.1f} ms, "
+          f"p95 {percentile(latencies, 95) * 1000:.1f} ms", file=sys.stderr)
+
 if __name__ == "__main__":
-    # La consulta se pasa como argumento en la terminal
-    if len(sys.argv) > 1:
-        main(" ".join(sys.argv[1:]))
+    parser = argparse.ArgumentParser(
+        description="Busca en la base vectorial creada por ingesta.py",
+        epilog="Ejemplos: python consulta.py '¿Qué es LangChain?'  |  "
+               "python consulta.py --batch preguntas.txt --output resultados.jsonl --workers 4"
+    )
+    parser.add_argument("query", nargs="*", help="Consulta (modo normal)")
+    parser.add_argument("--batch", metavar="ARCHIVO",
+                        help="Archivo de preguntas, una por línea o JSONL ('-' = entrada estándar)")
+    parser.add_argument("--output", default="-", help="Archivo JSONL de resultados ('-' = pantalla)")
+    parser.add_argument("--workers", type=int, default=1, help="Hilos para las búsquedas")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Preguntas por cálculo de embeddings")
+    parser.add_argument("-k", type=int, default=3, help="Resultados por pregunta (modo por lotes)")
+    args = parser.parse_args()
+
+    if args.batch:
+        main_batch(args.batch, args.output, k=args.k, workers=args.workers,
+                   batch_size=args.batch_size)
+    elif args.query:
+        # La consulta se pasa como argumento en la terminal
+        main(" ".join(args.query))
     else:
         print("Error: Debes pasar tu consulta como argumento.")
         print("Ejemplo: python consulta.py '¿Qué es LangChain?'")
\ No newline at end of file
@@ -1,12 +1,31 @@
+import argparse
+import os
 import sys
-from langchain_huggingface import HuggingFaceEmbeddings
+import time
 from langchain_chroma import Chroma
 
-# 1. Definir el modelo y el directorio de la DB (deben ser los mismos)
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Reutilizamos el caché de embeddings de la Clase 24: los vectores ya
+# calculados (por la app o por otro script) se leen del disco. El modelo,
+# el caché y el servicio de embeddings se configuran en su config.py
+# (o con las variables de entorno EMBEDDING_CACHE_PATH y
+# EMBEDDING_SERVER_URL), así todos usan los mismos.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Clase 24"))
+from config import EMBEDDING_MODEL, EMBEDDING_CACHE_PATH, EMBEDDING_SERVER_URL
+from embedding_cache import create_embeddings
+from metadata_index import MetadataIndex
+from retrievers import fetch_candidates
+
+# 1. Definir el directorio de la DB (el mismo que usa ingesta.py)
 PERSIST_DIRECTORY = "db_chroma"
+# Índice de metadatos que mantiene ingesta.py (archivo, página, fecha)
+METADATA_INDEX_PATH = os.path.join(PERSIST_DIRECTORY, "indice_metadatos.json")
+
+def parse_pages(text):
+    # "10-40" → (10, 40); "7" → (7, 7)
+    first, _, last = text.partition("-")
+    return int(first), int(last or first)
 
-def main(query_text, source_filter=None):
+def main(query_text, sources=None, pages=None, since=None, until=None, compare=False):
     if not query_text:
         print("Por favor, proporciona un texto para la consulta.")
         return
@@ -14,9 +33,11 @@ def main(query_text, source_filter=None):
     print("Cargando modelo de embeddings y base de datos...")
     
     # 2. Cargar el modelo de Embeddings
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL,
-        model_kwargs={'device': 'cpu'}
+    embeddings = create_embeddings(
+        EMBEDDING_MODEL,
+        device='cpu',
+        cache_path=EMBEDDING_CACHE_PATH,
+        server_url=EMBEDDING_SERVER_URL or None
     )
 
     # 3. Cargar la base de datos vectorial persistente
@@ -24,28 +45,53 @@ def main(query_text, source_filter=None):
         persist_directory=PERSIST_DIRECTORY,
         embedding_function=embeddings
     )
+    total = vectordb._collection.count()
 
+    # 4. Cargar el índice de metadatos (si no coincide con la base, se
+    # reconstruye leyendo los metadatos una vez)
+    metadata_index = MetadataIndex(METADATA_INDEX_PATH, source_field="source")
+    if len(metadata_index) != total:
+        data = vectordb.get(include=["metadatas"])
+        metadata_index.clear()
+        metadata_index.add(data['ids'], data['metadatas'])
+        metadata_index.save()
+
+    filters = {'sources': sources, 'pages': pages, 'since': since, 'until': until}
     print(f"Realizando búsqueda por similitud para: '{query_text}'")
-    if source_filter:
-        print(f"Filtrando por fuente: {source_filter}\n")
-    else:
-        print()
+    for name, value in filters.items():
+        if value:
+            print(f"Filtro {name}: {value}")
+    print()
+
+    query_vector = embeddings.embed_query(query_text)
 
-    # 4. Realizar la búsqueda por similitud CON FILTRO opcional
-    if source_filter:
-        results = vectordb.similarity_search(
-            query_text, 
-            k=3,
-            filter={"source": source_filter}
-        )
-    else:
-        results = vectordb.similarity_search(query_text, k=3)
+    # 5. Búsqueda CON FILTRO "empujado" antes de la búsqueda vectorial:
+    # el índice calcula qué fragmentos cumplen el filtro y ChromaDB solo
+    # compara la pregunta con esos (ids=...)
+    start = time.perf_counter()
+    ids = metadata_index.select(**filters)
+    results, _ = fetch_candidates(vectordb, query_vector, 3, ids=ids)
+    filtered_ms = (time.perf_counter() - start) * 1000
+    searched = total if ids is None else len(ids)
+    print(f"⏱️ Búsqueda: {filtered_ms:.1f} ms ({searched} de {total} fragmentos comparados)")
+
+    if compare and ids is not None:
+        # Lo que haríamos sin el índice: buscar en TODA la base muchos
+        # candidatos y descartar después los que no cumplen el filtro
+        allowed = set(ids)
+        start = time.perf_counter()
+        everything, _ = fetch_candidates(vectordb, query_vector, min(total, 200))
+        kept = [doc for doc in everything if doc.id in allowed][:3]
+        unfiltered_ms = (time.perf_counter() - start) * 1000
+        print(f"⏱️ Sin índice (buscar en todo y descartar): {unfiltered_ms:.1f} ms, "
+              f"{len(kept)} de 3 resultados encontrados")
+    print()
 
     if not results:
         print("No se encontraron resultados relevantes.")
         return
 
-    # 5. Mostrar los resultados
+    # 6. Mostrar los resultados
     print("Resultados encontrados:\n" + "="*30)
     for i, doc in enumerate(results):
         print(f"Resultado {i+1}:")
@@ -58,11 +104,21 @@ def main(query_text, source_filter=None):
 if __name__ == "__main__":
     # La consulta se pasa como argumento en la terminal
     # Uso: python consulta_filtrada.py "¿Qué es LangChain?" datos.txt
-    if len(sys.argv) > 1:
-        query = sys.argv[1]
-        source = sys.argv[2] if len(sys.argv) > 2 else None
-        main(query, source)
-    else:
-        print("Error: Debes pasar tu consulta como argumento.")
-        print("Ejemplo: python consulta_filtrada.py '¿Qué es LangChain?'")
-        print("O con filtro: python consulta_filtrada.py '¿Qué es LangChain?' datos.txt")
+    parser = argparse.ArgumentParser(
+        description="Búsqueda por similitud con filtros de archivo, página y fecha",
+        epilog="Ejemplo: python consulta_filtrada.py '¿Qué es LangChain?' "
+               "--sources a.pdf b.pdf --pages 10-40 --since 2025-03-01"
+    )
+    parser.add_argument("query", help="Consulta")
+    parser.add_argument("source", nargs="?", help="Un archivo (igual que --sources archivo)")
+    parser.add_argument("--sources", nargs="+", help="Buscar solo en estos archivos")
+    parser.add_argument("--pages", type=parse_pages, help="Rango de páginas, ej: 10-40")
+    parser.add_argument("--since", help="Cargados desde esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--until", help="Cargados hasta esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--compare", action="store_true",
+                        help="Medir también la búsqueda sin índice (buscar en todo y descartar)")
+    args = parser.parse_args()
+
+    sources = (args.sources or []) + ([args.source] if args.source else [])
+    main(args.query, sources=sources or None, pages=args.pages,
+         since=args.since, until=args.until, compare=args.compare)
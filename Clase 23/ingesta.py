@@ -1,62 +1,312 @@
+import argparse
+import glob
+import hashlib
+import json
 import os
+import sys
+import time
 from langchain_community.document_loaders import TextLoader, PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 
-# 1. Definir los nombres de los archivos y el modelo de embeddings
+# Reutilizamos el caché de embeddings de la Clase 24: los vectores ya
+# calculados (por la app o por otro script) se leen del disco. El modelo,
+# el caché y el servicio de embeddings se configuran en su config.py
+# (o con las variables de entorno EMBEDDING_CACHE_PATH y
+# EMBEDDING_SERVER_URL), así todos usan los mismos.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Clase 24"))
+from config import EMBEDDING_MODEL, EMBEDDING_CACHE_PATH, EMBEDDING_SERVER_URL
+from embedding_cache import create_embeddings
+from metadata_index import MetadataIndex
+
+# 1. Definir los archivos por defecto y el directorio de la DB
+# Se pueden pasar otros archivos, carpetas o patrones en la terminal:
+#   python ingesta.py apuntes/ "libros/**/*.pdf" datos.txt
 TXT_SOURCE = "datos.txt"
 PDF_SOURCE = "documento.pdf"
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 PERSIST_DIRECTORY = "db_chroma" # Directorio donde se guardará la DB
 
-def main():
-    print("Iniciando proceso de ingesta...")
-    
-    # 2. Cargar documentos
-    # Cargamos el .txt y el .pdf. Los juntamos en una sola lista.
-    # IMPORTANTE: Especificar encoding='utf-8' para archivos con tildes/ñ
-    loader_txt = TextLoader(TXT_SOURCE, encoding='utf-8')
-    #loader_pdf = PyPDFLoader(PDF_SOURCE)
-    
-    documents = loader_txt.load()
-    #documents.extend(loader_pdf.load())
-    
-    if not documents:
-        print("No se encontraron documentos para procesar.")
-        return
+# Tipos de archivo que sabemos leer (y el "loader" de cada uno)
+LOADERS = {
+    ".txt": lambda path: TextLoader(path, encoding='utf-8'),
+    ".pdf": lambda path: PyPDFLoader(path),
+}
+
+# El manifiesto recuerda qué archivos ya se procesaron (fecha, tamaño,
+# huella e IDs de sus fragmentos). Vive DENTRO de la carpeta de la base:
+# si se borra la base, se borra también el manifiesto.
+MANIFEST_PATH = os.path.join(PERSIST_DIRECTORY, "manifiesto_ingesta.json")
+
+# Índice de metadatos (archivo → fragmentos, página → fragmentos) que usa
+# consulta_filtrada.py para filtrar ANTES de buscar (ver metadata_index.py)
+METADATA_INDEX_PATH = os.path.join(PERSIST_DIRECTORY, "indice_metadatos.json")
+
+# Modo --watch: segundos entre cada revisión de los archivos
+WATCH_INTERVAL = 5
+
+# Fragmentos borrados por llamada: un archivo enorme se elimina por lotes
+DELETE_BATCH_SIZE = 5000
+
+# ==============================================================================
+# 2. Buscar los archivos a procesar
+# ==============================================================================
+
+def expand_paths(patterns):
+    """
+    Convierte archivos, carpetas y patrones ("*.pdf", "docs/**/*.txt")
+    en la lista de archivos que sabemos leer.
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            # Carpeta: todos los archivos soportados, también en subcarpetas
+            for root, _, names in os.walk(pattern):
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        elif glob.has_magic(pattern):
+            files.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            files.append(pattern)
+
+    found = {}
+    for path in files:
+        if os.path.isfile(path) and os.path.splitext(path)[1].lower() in LOADERS:
+            # La clave es la ruta absoluta; 'source' es la ruta tal como se
+            # escribió (es la que luego muestra y filtra consulta_filtrada.py)
+            found.setdefault(os.path.abspath(path), os.path.normpath(path))
+    return found
+
+def hash_file(path, block_size=1024 * 1024):
+    """Huella SHA-256 del contenido del archivo (leído por bloques)."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
 
-    print(f"Total de documentos cargados: {len(documents)}")
+# ==============================================================================
+# 3. El manifiesto: qué había la última vez
+# ==============================================================================
 
-    # 3. Dividir los documentos (Chunking)
-    # ¿Por qué dividimos? Para que quepan en el contexto del modelo y 
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    # Se escribe en un archivo temporal y se renombra: si el programa se
+    # corta a mitad, el manifiesto anterior sigue intacto
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temporary, path)
+
+def plan_changes(found, manifest):
+    """
+    Compara los archivos actuales con el manifiesto.
+
+    Solo se calcula la huella de los archivos cuya fecha o tamaño cambió;
+    si la huella es la misma (por ejemplo, un archivo copiado encima de
+    sí mismo) no hace falta procesarlo de nuevo.
+
+    Returns:
+        tuple: (archivos a procesar [(clave, source, stat, huella)],
+                archivos sin cambios, claves de archivos eliminados,
+                True si se actualizó alguna fecha del manifiesto)
+    """
+    to_ingest, unchanged, touched = [], 0, False
+    for key, source in found.items():
+        stat = os.stat(key)
+        entry = manifest.get(key)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            unchanged += 1
+            continue
+        file_hash = hash_file(key)
+        if entry and entry['sha256'] == file_hash:
+            entry['mtime'], entry['size'] = stat.st_mtime, stat.st_size
+            unchanged += 1
+            touched = True
+            continue
+        to_ingest.append((key, source, stat, file_hash))
+
+    # Un archivo eliminado es el que estaba en el manifiesto y ya no existe
+    removed = [key for key in manifest if not os.path.exists(key)]
+    return to_ingest, unchanged, removed, touched
+
+def open_metadata_index(vectordb):
+    # Si el índice no coincide con la base (por ejemplo, una base creada
+    # con una versión anterior de este script), se reconstruye una vez
+    metadata_index = MetadataIndex(METADATA_INDEX_PATH, source_field="source")
+    if len(metadata_index) != vectordb._collection.count():
+        print("Reconstruyendo el índice de metadatos...")
+        data = vectordb.get(include=["metadatas"])
+        metadata_index.clear()
+        metadata_index.add(data['ids'], data['metadatas'])
+        metadata_index.save()
+    return metadata_index
+
+# ==============================================================================
+# 4. Una pasada de ingesta
+# ==============================================================================
+
+def ingest_file(vectordb, metadata_index, text_splitter, key, source, file_hash):
+    """Carga, divide y guarda un archivo. Devuelve los IDs de sus fragmentos."""
+    documents = LOADERS[os.path.splitext(key)[1].lower()](key).load()
+    ingested_at = time.time()
+    for doc in documents:
+        doc.metadata['source'] = source
+        doc.metadata['ingested_at'] = ingested_at
+
+    # ¿Por qué dividimos? Para que quepan en el contexto del modelo y
     # para encontrar fragmentos más relevantes y específicos.
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=250)
     splits = text_splitter.split_documents(documents)
-    
-    print(f"Total de chunks (fragmentos) creados: {len(splits)}")
+    if not splits:
+        return []
 
-    # 4. Inicializar el modelo de Embeddings
+    # IDs deterministas (archivo + huella + posición): si el programa se
+    # corta y se vuelve a ejecutar, los fragmentos se sobrescriben en vez
+    # de duplicarse
+    ids = [hashlib.sha256(f"{key}\x00{file_hash}\x00{i}".encode('utf-8')).hexdigest()[:32]
+           for i in range(len(splits))]
+
+    # Aquí ocurre la magia: LangChain usa el modelo de embeddings para
+    # convertir los chunks en vectores y los guarda en ChromaDB
+    vectordb.add_documents(splits, ids=ids)
+    metadata_index.add(ids, [split.metadata for split in splits])
+    return ids
+
+def delete_chunks(vectordb, metadata_index, ids):
+    """Borra fragmentos de la base y del índice, de DELETE_BATCH_SIZE en DELETE_BATCH_SIZE."""
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        vectordb.delete(ids=ids[start:start + DELETE_BATCH_SIZE])
+    metadata_index.remove(ids)
+
+def run_cycle(vectordb, metadata_index, text_splitter, patterns, manifest):
+    """
+    Procesa solo lo que cambió desde la última vez.
+
+    Returns:
+        dict: Resumen de la pasada (archivos, fragmentos, segundos, bytes)
+    """
+    start = time.perf_counter()
+    found = expand_paths(patterns)
+    to_ingest, unchanged, removed, touched = plan_changes(found, manifest)
+    stats = {
+        'new': 0, 'changed': 0, 'unchanged': unchanged, 'removed': len(removed),
+        'errors': 0, 'chunks_added': 0, 'chunks_deleted': 0, 'bytes': 0, 'seconds': 0.0
+    }
+
+    for key, source, stat, file_hash in to_ingest:
+        old_ids = manifest.get(key, {}).get('ids', [])
+        try:
+            ids = ingest_file(vectordb, metadata_index, text_splitter, key, source, file_hash)
+        except Exception as e:
+            print(f"❌ Error al procesar {source}: {e}")
+            stats['errors'] += 1
+            continue
+
+        # Los fragmentos de la versión anterior del archivo ya no sirven
+        new_ids = set(ids)
+        obsolete = [chunk_id for chunk_id in old_ids if chunk_id not in new_ids]
+        if obsolete:
+            delete_chunks(vectordb, metadata_index, obsolete)
+        stats['changed' if key in manifest else 'new'] += 1
+        stats['chunks_added'] += len(ids)
+        stats['chunks_deleted'] += len(obsolete)
+        stats['bytes'] += stat.st_size
+        print(f"📄 {source}: {len(ids)} fragmentos")
+
+        manifest[key] = {
+            'source': source,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha256': file_hash,
+            'ids': ids
+        }
+        save_manifest(manifest)
+        metadata_index.save()
+
+    for key in removed:
+        entry = manifest.pop(key)
+        if entry['ids']:
+            delete_chunks(vectordb, metadata_index, entry['ids'])
+        stats['chunks_deleted'] += len(entry['ids'])
+        print(f"🗑️ {entry['source']}: eliminado ({len(entry['ids'])} fragmentos borrados)")
+    if removed or touched:
+        # También se guardan las fechas actualizadas en plan_changes
+        save_manifest(manifest)
+        metadata_index.save()
+
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+def print_stats(stats):
+    seconds = max(stats['seconds'], 1e-9)
+    print(
+        f"📊 {stats['new']} nuevos, {stats['changed']} modificados, "
+        f"{stats['unchanged']} sin cambios, {stats['removed']} eliminados"
+        + (f", {stats['errors']} con error" if stats['errors'] else "")
+    )
+    print(
+        f"   {stats['chunks_added']} fragmentos guardados y {stats['chunks_deleted']} borrados "
+        f"en {stats['seconds']:.1f} s ({stats['chunks_added'] / seconds:.1f} fragmentos/s, "
+        f"{stats['bytes'] / seconds / 1e6:.2f} MB/s)"
+    )
+
+def main(patterns, watch=False, interval=WATCH_INTERVAL):
+    print("Iniciando proceso de ingesta...")
+
+    # 5. Inicializar el modelo de Embeddings (una sola vez, también en --watch)
     # Usamos un modelo open-source de HuggingFace.
     # La primera vez, tardará un poco en descargarlo.
     print("Cargando modelo de embeddings...")
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL,
-        model_kwargs={'device': 'cpu'} # Usar CPU. Si tienen GPU, pueden cambiarlo.
+    # Los vectores se guardan también en el caché compartido.
+    embeddings = create_embeddings(
+        EMBEDDING_MODEL,
+        device='cpu', # Usar CPU. Si tienen GPU, pueden cambiarlo.
+        cache_path=EMBEDDING_CACHE_PATH,
+        server_url=EMBEDDING_SERVER_URL or None
     )
 
-    # 5. Crear y persistir la Base de Datos Vectorial
-    # Aquí ocurre la magia: LangChain toma los chunks, 
-    # usa el modelo de embeddings para convertirlos en vectores
-    # y los guarda en ChromaDB en el directorio especificado.
-    print("Creando y guardando la base de datos vectorial...")
-    vectordb = Chroma.from_documents(
-        documents=splits,
-        embedding=embeddings,
-        persist_directory=PERSIST_DIRECTORY
+    # 6. Abrir (o crear) la Base de Datos Vectorial persistente.
+    # Antes usábamos Chroma.from_documents en cada ejecución, que volvía a
+    # calcular todo y duplicaba los fragmentos. Ahora solo se añade lo nuevo.
+    vectordb = Chroma(
+        persist_directory=PERSIST_DIRECTORY,
+        embedding_function=embeddings
     )
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=250)
+    manifest = load_manifest()
+    metadata_index = open_metadata_index(vectordb)
+
+    stats = run_cycle(vectordb, metadata_index, text_splitter, patterns, manifest)
+    print_stats(stats)
+    print(f"¡Base de datos actualizada en '{PERSIST_DIRECTORY}'!")
 
-    print(f"¡Base de datos creada y guardada en '{PERSIST_DIRECTORY}'!")
+    if not watch:
+        return
+
+    # 7. Modo vigilancia: revisar los archivos cada 'interval' segundos
+    print(f"👀 Vigilando cambios cada {interval} s (Ctrl+C para salir)...")
+    try:
+        while True:
+            time.sleep(interval)
+            stats = run_cycle(vectordb, metadata_index, text_splitter, patterns, manifest)
+            if stats['new'] or stats['changed'] or stats['removed'] or stats['errors']:
+                print_stats(stats)
+    except KeyboardInterrupt:
+        print("\n👋 Vigilancia detenida")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description="Carga archivos .txt y .pdf en la base vectorial (solo lo nuevo o modificado)"
+    )
+    parser.add_argument("paths", nargs="*", default=[TXT_SOURCE, PDF_SOURCE],
+                        help="Archivos, carpetas o patrones (por defecto: datos.txt y documento.pdf)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Seguir vigilando los archivos y cargar los cambios")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL,
+                        help="Segundos entre revisiones en modo --watch")
+    args = parser.parse_args()
+    main(args.paths, watch=args.watch, interval=args.interval)
@@ -0,0 +1,227 @@
+"""
+ann_index.py - Índice de Vecinos Aproximados (IVF)
+==================================================
+
+Con millones de fragmentos, comparar la pregunta contra TODOS los vectores
+(búsqueda exacta o "flat") empieza a ser lento. Un índice IVF (Inverted
+File) reduce el trabajo:
+
+1. ENTRENAMIENTO: k-means agrupa los vectores en 'nlist' grupos (clusters)
+   y guarda el centro (centroide) de cada grupo
+2. INSERCIÓN: cada vector nuevo se asigna al grupo de centroide más cercano
+3. BÚSQUEDA: se buscan los 'nprobe' centroides más cercanos a la pregunta
+   y solo se comparan los vectores de esos grupos
+
+El resultado es "aproximado": a veces el vecino real está en un grupo que
+no se visitó. Subir nprobe mejora la precisión (recall) y baja la velocidad.
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import os
+from array import array
+import numpy as np
+
+# Vectores mínimos por grupo para entrenar (recomendación habitual de FAISS)
+MIN_POINTS_PER_LIST = 39
+
+# Vectores máximos por grupo usados para entrenar k-means
+MAX_POINTS_PER_LIST = 256
+
+# ==============================================================================
+# CLASE: IVFIndex
+# ==============================================================================
+
+class IVFIndex:
+    """
+    Índice IVF con k-means esférico (similitud coseno).
+
+    El índice no guarda vectores: solo los centroides y, para cada grupo,
+    la lista de filas de NumpyVectorStore que le pertenecen. Los vectores
+    se siguen leyendo de la matriz del almacén.
+
+    Atributos:
+        nlist: Número de grupos
+        nprobe: Grupos visitados en cada búsqueda
+        iterations: Iteraciones de k-means
+        centroids: Matriz (nlist, dim) de centroides (None si no está entrenado)
+    """
+
+    def __init__(self, nlist=256, nprobe=8, iterations=20):
+        """
+        Constructor del índice.
+
+        Args:
+            nlist (int): Número de grupos (más grupos = búsquedas más rápidas)
+            nprobe (int): Grupos visitados por búsqueda (más = mejor recall)
+            iterations (int): Iteraciones de k-means durante el entrenamiento
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.centroids = None
+        self._lists = []
+
+    @property
+    def is_trained(self):
+        """True si el índice ya tiene centroides."""
+        return self.centroids is not None
+
+    def can_train(self, count):
+        """
+        Indica si hay suficientes vectores para entrenar nlist grupos.
+
+        Args:
+            count (int): Vectores disponibles
+
+        Returns:
+            bool: True si count >= nlist * MIN_POINTS_PER_LIST
+        """
+        return count >= self.nlist * MIN_POINTS_PER_LIST
+
+    def train(self, vectors, seed=0):
+        """
+        Calcula los centroides con k-means esférico.
+
+        Args:
+            vectors (np.ndarray): Matriz (n, dim) de vectores normalizados
+            seed (int): Semilla aleatoria
+        """
+        rng = np.random.default_rng(seed)
+        vectors = np.asarray(vectors, dtype=np.float32)
+
+        # Entrenar con una muestra basta y es mucho más rápido
+        sample_size = min(len(vectors), self.nlist * MAX_POINTS_PER_LIST)
+        sample = vectors[rng.choice(len(vectors), size=sample_size, replace=False)]
+
+        centroids = sample[rng.choice(sample_size, size=self.nlist, replace=False)].copy()
+
+        for _ in range(self.iterations):
+            # Asignar cada vector al centroide más parecido
+            labels = np.argmax(sample @ centroids.T, axis=1)
+
+            # Recalcular cada centroide como la media (normalizada) de su grupo
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=self.nlist)
+
+            # Los grupos vacíos se reinician con un vector al azar
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        self.centroids = centroids.astype(np.float32)
+        self._lists = [array('q') for _ in range(self.nlist)]
+
+    def assign(self, vectors):
+        """
+        Calcula el grupo (centroide más parecido) de cada vector.
+
+        Args:
+            vectors (np.ndarray): Matriz (n, dim) de vectores normalizados
+
+        Returns:
+            np.ndarray: Número de grupo de cada vector
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def add(self, rows, labels):
+        """
+        Añade filas del almacén a los grupos indicados.
+
+        Args:
+            rows (list | np.ndarray): Número de fila de cada vector
+            labels (list | np.ndarray): Grupo de cada fila (ver assign)
+        """
+        for row, label in zip(rows, labels):
+            self._lists[int(label)].append(int(row))
+
+    def candidates(self, query, nprobe=None):
+        """
+        Filas a comparar para una pregunta: las de los nprobe grupos más cercanos.
+
+        Args:
+            query (np.ndarray): Vector normalizado de la pregunta
+            nprobe (int): Grupos a visitar (None = self.nprobe)
+
+        Returns:
+            np.ndarray: Números de fila candidatos (ordenados)
+        """
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        scores = self.centroids @ np.asarray(query, dtype=np.float32)
+        probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+
+        # np.array copia las filas, así otro hilo puede seguir añadiendo
+        lists = [np.array(self._lists[probe], dtype=np.int64)
+                 for probe in probes if len(self._lists[probe])]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(lists))
+
+    def list_sizes(self):
+        """Número de filas en cada grupo (útil para ver si está equilibrado)."""
+        return [len(rows) for rows in self._lists]
+
+    def save(self, path):
+        """
+        Guarda los centroides en un archivo .npy.
+
+        Las listas de cada grupo no se guardan aquí: el almacén guarda el
+        grupo de cada fila en su tabla SQLite y las reconstruye al abrir.
+
+        Args:
+            path (str): Ruta del archivo
+        """
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, self.centroids)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """
+        Carga los centroides guardados con save().
+
+        Args:
+            path (str): Ruta del archivo
+
+        Returns:
+            bool: True si se cargó un índice compatible con nlist
+        """
+        if not os.path.exists(path):
+            return False
+        centroids = np.load(path)
+        if centroids.shape[0] != self.nlist:
+            # Se cambió IVF_NLIST en config.py: hay que volver a entrenar
+            return False
+        self.centroids = centroids.astype(np.float32)
+        self._lists = [array('q') for _ in range(self.nlist)]
+        return True
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. K-MEANS:
+   - Agrupa puntos en k grupos repitiendo: asignar → recalcular centros
+
+2. BÚSQUEDA APROXIMADA (ANN):
+   - Se sacrifica un poco de precisión a cambio de mucha velocidad
+   - Recall@k: proporción de los k vecinos reales que se encontraron
+
+3. PARÁMETROS:
+   - nlist: cuántos grupos (típico: ~raíz cuadrada del número de vectores)
+   - nprobe: cuántos grupos visitar (compromiso recall/velocidad)
+
+💡 EXPERIMENTO SUGERIDO:
+   Ejecuta "python benchmark.py ann" y observa cómo cambian el recall
+   y las consultas por segundo al subir nprobe.
+"""
@@ -0,0 +1,284 @@
+"""
+answer_cache.py - Caché de Respuestas del Chatbot
+=================================================
+
+En clase se repiten mucho las mismas preguntas ("¿Cuál es el tema
+principal del documento?"). Cada una cuesta una búsqueda y una llamada
+a Gemini de varios segundos. Este caché guarda las respuestas ya dadas:
+
+- COINCIDENCIA EXACTA: la pregunta normalizada (minúsculas, sin acentos,
+  sin signos) es idéntica a una anterior
+- COINCIDENCIA SEMÁNTICA (opcional): el embedding de la pregunta es casi
+  igual (similitud ≥ umbral) al de una anterior, por ejemplo
+  "¿De qué trata el documento?" y "¿de que trata el documento"
+
+Las respuestas caducan (TTL), el caché tiene un tamaño máximo (LRU) y se
+vacía solo cuando cambia la base de conocimiento: cada carga o limpieza
+incrementa DatabaseManager.version, y una respuesta de otra versión ya
+no es válida.
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+# ==============================================================================
+# FUNCIÓN: normalize_question
+# ==============================================================================
+
+def normalize_question(question):
+    """
+    Normaliza una pregunta para compararla con otras.
+
+    Args:
+        question (str): Pregunta original
+
+    Returns:
+        str: Pregunta en minúsculas, sin acentos, sin signos y con
+             espacios simples
+
+    Ejemplo:
+        >>> normalize_question("  ¿Cuál es el TEMA principal?  ")
+        'cual es el tema principal'
+    """
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+# ==============================================================================
+# CLASE: AnswerCache
+# ==============================================================================
+
+class AnswerCache:
+    """
+    Caché en memoria de respuestas, con coincidencia exacta y semántica.
+
+    Atributos:
+        max_entries: Respuestas máximas guardadas (se borran las menos usadas)
+        ttl_seconds: Segundos que una respuesta sigue siendo válida
+        similarity_threshold: Similitud mínima para la coincidencia
+            semántica (0 = desactivada)
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, similarity_threshold=0.95):
+        """
+        Constructor del caché.
+
+        Args:
+            max_entries (int): Respuestas máximas guardadas
+            ttl_seconds (float): Vida de cada respuesta en segundos
+            similarity_threshold (float): Umbral de similitud coseno (0 a 1)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = OrderedDict()   # clave → entrada (orden = uso reciente)
+        self._version = None            # versión de la base de las entradas
+        self._matrix = None             # vectores de las entradas (para búsqueda semántica)
+        self._matrix_keys = []
+        self._matrix_k = None           # k de cada fila de la matriz (ver make_key)
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def semantic_enabled(self):
+        """True si la coincidencia semántica está activada."""
+        return bool(self.similarity_threshold)
+
+    def _check_version(self, version):
+        """Vacía el caché si la base de conocimiento cambió."""
+        if version != self._version:
+            if self._entries:
+                print("🧹 Caché de respuestas vaciado: la base de conocimiento cambió")
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+
+    def get(self, key, version, embed=None):
+        """
+        Busca una respuesta guardada.
+
+        Primero se busca la pregunta exacta; solo si no está se calcula
+        su embedding (con la función 'embed') para la búsqueda semántica.
+
+        Args:
+            key (str): Clave (pregunta normalizada, ver make_key)
+            version (int): Versión actual de la base de conocimiento
+            embed (callable): Función sin argumentos que devuelve el
+                embedding de la pregunta (None = sin búsqueda semántica)
+
+        Returns:
+            tuple: (respuesta, tipo, vector) con tipo 'exact' o 'semantic'.
+                Si no hay respuesta válida: (None, None, vector). El vector
+                (o None) se pasa después a put() para no calcularlo dos veces
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._valid_entry(key)
+            if entry is not None:
+                self.exact_hits += 1
+                self.saved_seconds += entry['seconds']
+                return entry['answer'], 'exact', entry['vector']
+
+        vector = None
+        if embed is not None and self.semantic_enabled:
+            # Fuera del candado: calcular el embedding puede tardar
+            vector = embed()
+
+        with self._lock:
+            # La base pudo cambiar mientras se calculaba el embedding
+            self._check_version(version)
+            if vector is not None:
+                similar_key = self._nearest(vector, key)
+                entry = self._valid_entry(similar_key) if similar_key else None
+                if entry is not None:
+                    self.semantic_hits += 1
+                    self.saved_seconds += entry['seconds']
+                    return entry['answer'], 'semantic', vector
+
+            self.misses += 1
+            return None, None, vector
+
+    def _valid_entry(self, key):
+        """Entrada de la clave si existe y no caducó (y la marca como usada)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry['created'] > self.ttl_seconds:
+            del self._entries[key]
+            self._matrix = None
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, vector, key):
+        """
+        Clave de la entrada cuyo vector es más parecido (si supera el umbral).
+
+        Solo se consideran las entradas con el mismo número de documentos
+        que 'key' (ver make_key): una respuesta generada con k=3 no sirve
+        para una pregunta que pide k=10.
+
+        Returns:
+            str | None: Clave encontrada
+        """
+        if self._matrix is None:
+            self._matrix_keys = [entry_key for entry_key, entry in self._entries.items()
+                                 if entry['vector'] is not None]
+            if not self._matrix_keys:
+                return None
+            self._matrix = np.stack([self._entries[entry_key]['vector']
+                                     for entry_key in self._matrix_keys])
+            self._matrix_k = np.array([entry_key.split("\x00", 1)[0]
+                                       for entry_key in self._matrix_keys])
+
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        similarities = self._matrix @ query
+        similarities[self._matrix_k != key.split("\x00", 1)[0]] = -np.inf
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return self._matrix_keys[best]
+
+    def put(self, key, version, answer, seconds, vector=None):
+        """
+        Guarda una respuesta.
+
+        Args:
+            key (str): Clave (ver make_key)
+            version (int): Versión de la base con la que se generó la respuesta
+            answer (str): Respuesta
+            seconds (float): Lo que tardó generarla (para medir el tiempo ahorrado)
+            vector (list): Embedding de la pregunta (opcional)
+        """
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32)
+            vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+        with self._lock:
+            if self._version is not None and version < self._version:
+                # La base cambió mientras se generaba la respuesta: ya no vale
+                return
+            self._check_version(version)
+            self._entries[key] = {
+                'answer': answer,
+                'seconds': seconds,
+                'vector': vector,
+                'created': time.time()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self):
+        """Vacía el caché (las estadísticas se conservan)."""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    @staticmethod
+    def make_key(question, k):
+        """Clave de una pregunta: texto normalizado + número de documentos."""
+        return f"{k}\x00{normalize_question(question)}"
+
+    def stats(self):
+        """
+        Obtiene estadísticas del caché.
+
+        Returns:
+            dict: Estadísticas del caché
+                {
+                    'entries': int,          # Respuestas guardadas
+                    'exact_hits': int,       # Aciertos por pregunta idéntica
+                    'semantic_hits': int,    # Aciertos por pregunta parecida
+                    'misses': int,           # Preguntas que hubo que responder
+                    'hit_rate': float,       # Proporción de aciertos (0 a 1)
+                    'saved_seconds': float   # Tiempo de respuesta ahorrado
+                }
+        """
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'exact_hits': self.exact_hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'hit_rate': hits / total if total else 0.0,
+            'saved_seconds': self.saved_seconds
+        }
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. TTL (Time To Live):
+   - Cada respuesta guardada tiene fecha de caducidad
+
+2. LRU con OrderedDict:
+   - move_to_end() marca una entrada como usada recientemente
+   - popitem(last=False) borra la que hace más tiempo que no se usa
+
+3. INVALIDACIÓN POR VERSIÓN:
+   - En lugar de avisar al caché de cada cambio, la base tiene un
+     contador que sube con cada cambio; el caché lo compara al leer
+
+💡 EXPERIMENTO SUGERIDO:
+   Haz la misma pregunta dos veces y compara el tiempo de respuesta.
+   Luego escríbela con otras mayúsculas o sin tildes.
+"""
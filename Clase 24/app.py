@@ -158,7 +158,7 @@ def clear_knowledge_base():
     try:
         print("Limpiando base de datos...")
         
-        # Obtener todos los IDs de la colección
+        # Acceder a la colección
         collection = vectordb._collection
         
         # Verificar si hay documentos
@@ -168,11 +168,9 @@ def clear_knowledge_base():
             stats = get_knowledge_base_stats()
             return "La base de datos ya estaba vacía.", stats
         
-        # Obtener todos los IDs y eliminarlos
-        all_ids = collection.get()['ids']
-        if all_ids:
-            collection.delete(ids=all_ids)
-            print(f"Se eliminaron {count} fragmentos de la base de datos.")
+        # Borrar la colección y crear una vacía (sin pedir todos los IDs)
+        vectordb.reset_collection()
+        print(f"Se eliminaron {count} fragmentos de la base de datos.")
         
         stats = get_knowledge_base_stats()
         return f"✅ Base de datos limpiada exitosamente. Se eliminaron {count} fragmentos.", stats
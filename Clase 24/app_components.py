@@ -0,0 +1,156 @@
+"""
+app_components.py - Carga Perezosa de los Componentes de la App
+===============================================================
+
+Crear DatabaseManager y RAGChain es lento: hay que importar LangChain,
+PyTorch y sentence-transformers, cargar el modelo de embeddings, abrir
+ChromaDB y conectar con Gemini. Si todo eso pasa al importar
+app_refactorizado.py, el navegador espera varios segundos antes de ver
+la interfaz (y cada reinicio del servidor también).
+
+Con el arranque rápido (FAST_START en config.py):
+1. La interfaz se construye y se abre sin esperar a los modelos
+2. Un hilo en segundo plano ("calentamiento") importa y carga todo
+3. La interfaz muestra si ya está lista (AppComponents.ready)
+4. Si llega una petición antes de tiempo, espera a que termine la carga
+
+Este módulo solo importa la librería estándar: las importaciones pesadas
+se hacen dentro de load().
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import threading
+import time
+
+# ==============================================================================
+# CLASE: AppComponents
+# ==============================================================================
+
+class AppComponents:
+    """
+    Contenedor de los componentes de la app, creados la primera vez que
+    se necesitan (o antes, con start_warmup).
+
+    Atributos:
+        db_manager: DatabaseManager (None hasta que se cargue)
+        doc_processor: DocumentProcessor (None hasta que se cargue)
+        rag_chain: RAGChain (None hasta que se cargue)
+        load_seconds: Lo que tardó la carga
+        error: Último error de carga (None si no hubo)
+    """
+
+    def __init__(self):
+        self.db_manager = None
+        self.doc_processor = None
+        self.rag_chain = None
+        self.load_seconds = None
+        self.error = None
+
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._created = time.perf_counter()
+
+    @property
+    def ready(self):
+        """True cuando todos los componentes están cargados."""
+        return self._ready.is_set()
+
+    def load(self):
+        """
+        Importa y crea todos los componentes (solo la primera vez).
+
+        Si otro hilo ya está cargando, espera a que termine. Si la carga
+        falla, el error se guarda y la siguiente llamada lo vuelve a intentar.
+
+        Raises:
+            Exception: El error de la carga, si falló
+        """
+        if self._ready.is_set():
+            return
+
+        with self._lock:
+            if self._ready.is_set():
+                return
+
+            start = time.perf_counter()
+            try:
+                # Importaciones pesadas (LangChain, PyTorch...): solo aquí
+                from database_manager import DatabaseManager
+                from document_processor import DocumentProcessor
+                from rag_chain import RAGChain
+
+                db_manager = DatabaseManager()
+                doc_processor = DocumentProcessor()
+                rag_chain = RAGChain(db_manager)
+
+                # Una primera inferencia: la primera llamada al modelo de
+                # embeddings siempre es más lenta (reserva memoria, etc.)
+                db_manager.embeddings.embed_query("calentamiento")
+            except Exception as e:
+                self.error = e
+                print(f"❌ Error al cargar los componentes: {e}")
+                raise
+
+            self.db_manager = db_manager
+            self.doc_processor = doc_processor
+            self.rag_chain = rag_chain
+            self.load_seconds = time.perf_counter() - start
+            self.error = None
+            self._ready.set()
+            print(f"✅ Componentes listos en {self.load_seconds:.1f} s")
+
+    def start_warmup(self):
+        """
+        Empieza a cargar los componentes en un hilo en segundo plano.
+
+        Returns:
+            threading.Thread: El hilo de calentamiento
+        """
+        def warmup():
+            try:
+                self.load()
+            except Exception:
+                # El error queda en self.error; se reintenta en el primer uso
+                pass
+
+        thread = threading.Thread(target=warmup, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status_message(self):
+        """
+        Estado de la carga para mostrar en la interfaz.
+
+        Returns:
+            str: Texto en Markdown
+        """
+        if self.ready:
+            return f"✅ **Listo** (modelos cargados en {self.load_seconds:.1f} s)"
+        if self.error is not None:
+            return f"❌ **Error al cargar los modelos:** {self.error}"
+        waited = time.perf_counter() - self._created
+        return f"⏳ **Cargando modelos...** ({waited:.0f} s) Puedes ir escribiendo tu pregunta."
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. CARGA PEREZOSA (lazy loading):
+   - No crear algo caro hasta que de verdad se necesite
+   - Los "import" dentro de una función también son perezosos
+
+2. CALENTAMIENTO (warm-up):
+   - Cargar en segundo plano lo que seguro se va a necesitar,
+     para que el primer usuario no pague la espera
+
+3. threading.Event:
+   - Una bandera que un hilo levanta y otros consultan (o esperan)
+
+💡 EXPERIMENTO SUGERIDO:
+   Compara "python benchmark.py startup" con FAST_START activado y
+   desactivado: ¿cuánto tarda la interfaz en responder en cada caso?
+"""
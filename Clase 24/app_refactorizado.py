@@ -10,6 +10,8 @@ ARQUITECTURA MODULAR:
 - database_manager.py: Gestión de ChromaDB
 - document_processor.py: Procesamiento de documentos
 - rag_chain.py: Cadena RAG completa
+- ingestion_pipeline.py: Ingesta por lotes en streaming
+- app_components.py: Carga perezosa de los componentes
 - app_refactorizado.py: Integración e interfaz (ESTE ARCHIVO)
 
 ¿POR QUÉ MODULARIZAR?
@@ -22,17 +24,23 @@ Autor: Clase 24 - IA Python para Principiantes
 Fecha: 2025
 """
 
+import asyncio
 import gradio as gr
-from database_manager import DatabaseManager
-from document_processor import DocumentProcessor
-from rag_chain import RAGChain
+from app_components import AppComponents
+from ingestion_pipeline import IngestionPipeline
+from tracing import tracer, start_metrics_server
 from config import (
     APP_TITLE,
     APP_DESCRIPTION,
     CHAT_HEIGHT,
     ALLOWED_FILE_TYPES,
     UI_THEME,
-    MSG_STARTING_UI
+    MSG_STARTING_UI,
+    STREAMING_INGESTION,
+    CHAT_CONCURRENCY_LIMIT,
+    QUEUE_MAX_SIZE,
+    METRICS_PORT,
+    FAST_START
 )
 
 # ==============================================================================
@@ -43,25 +51,49 @@ print("=" * 70)
 print("🚀 INICIANDO CHATBOT RAG - Versión Modular")
 print("=" * 70)
 
-# Inicializar el gestor de base de datos
-# Este componente maneja ChromaDB y los embeddings
-print("\n📦 Inicializando componentes...")
-db_manager = DatabaseManager()
+# Los componentes de la app:
+# - components.db_manager: maneja ChromaDB y los embeddings
+# - components.doc_processor: carga y procesa archivos
+# - components.rag_chain: conecta retriever + LLM
+components = AppComponents()
 
-# Inicializar el procesador de documentos
-# Este componente carga y procesa archivos
-doc_processor = DocumentProcessor()
-
-# Inicializar la cadena RAG
-# Este componente conecta retriever + LLM
-rag_chain = RAGChain(db_manager)
-
-print("✅ Todos los componentes inicializados correctamente\n")
+if FAST_START:
+    # La interfaz se abre ya; los modelos se cargan en segundo plano
+    print("\n⚡ Arranque rápido: los modelos se cargan en segundo plano")
+    components.start_warmup()
+else:
+    print("\n📦 Inicializando componentes...")
+    components.load()
+    print("✅ Todos los componentes inicializados correctamente\n")
 
 # ==============================================================================
 # 2. FUNCIONES DE LA INTERFAZ DE USUARIO
 # ==============================================================================
 
+def get_stats_message(stats=None):
+    """
+    Texto del panel de estadísticas: base de datos + caché de respuestas.
+    
+    Si los modelos todavía se están cargando, se muestra el progreso
+    de la carga (sin esperar a que termine).
+    
+    Args:
+        stats (dict): Resultado de db_manager.get_stats() (None = obtenerlo)
+        
+    Returns:
+        str: Estadísticas en formato Markdown
+    """
+    if not components.ready:
+        return components.status_message()
+    if stats is None:
+        stats = components.db_manager.get_stats()
+    message = stats['message']
+    cache_message = components.rag_chain.cache_stats_message()
+    if cache_message:
+        message += f"\n\n{cache_message}"
+    return message
+
+
 def handle_file_upload(file_list):
     """
     Maneja la carga de archivos desde la interfaz de Gradio.
@@ -72,21 +104,32 @@ def handle_file_upload(file_list):
     3. Añade los fragmentos a la base de datos
     4. Actualiza las estadísticas
     
+    Es un generador: con STREAMING_INGESTION activado va mostrando el
+    progreso en la interfaz mientras los lotes se guardan.
+    
     Args:
         file_list: Lista de archivos subidos por Gradio
                    Cada elemento tiene un atributo .name con la ruta
                    
-    Returns:
+    Yields:
         tuple: (mensaje_estado, estadísticas_actualizadas)
         
     Nota para estudiantes:
         Esta función es el "pegamento" entre la interfaz de Gradio
         y nuestra lógica de negocio en los módulos.
     """
+    # Esperar a los modelos si todavía se están cargando
+    if not components.ready:
+        yield components.status_message(), gr.update()
+    components.load()
+    db_manager = components.db_manager
+    doc_processor = components.doc_processor
+    
     # Validar que se hayan subido archivos
     if not file_list:
         stats = db_manager.get_stats()
-        return "⚠️ Por favor, selecciona al menos un archivo.", stats['message']
+        yield "⚠️ Por favor, selecciona al menos un archivo.", get_stats_message(stats)
+        return
     
     try:
         # Extraer las rutas de los archivos
@@ -96,17 +139,45 @@ def handle_file_upload(file_list):
         print(f"📤 CARGA DE ARCHIVOS INICIADA")
         print(f"{'='*70}")
         
-        # Paso 1: Procesar los archivos (cargar y dividir)
-        result = doc_processor.process_files(file_paths)
-        
-        # Si el procesamiento falló, retornar mensaje de error
-        if not result['success']:
-            stats = db_manager.get_stats()
-            return result['message'], stats['message']
-        
-        # Paso 2: Añadir los fragmentos a la base de datos
-        splits = result['splits']
-        db_manager.add_documents(splits)
+        if STREAMING_INGESTION:
+            # Cargar, dividir y guardar por lotes mostrando el progreso
+            pipeline = IngestionPipeline(db_manager, doc_processor)
+            for progress in pipeline.run(file_paths):
+                if not progress['done']:
+                    yield (
+                        f"⏳ Procesando {progress['files_done']}/{progress['files_total']} "
+                        f"archivo(s)...\n\n"
+                        f"📄 Páginas leídas: {progress['pages']}\n"
+                        f"📊 Fragmentos guardados: {progress['split_count']}",
+                        gr.update()
+                    )
+            
+            split_count = progress['split_count']
+            failed_files = progress['failed_files']
+            sync = progress['sync']
+            parse_seconds_saved = progress['parse_seconds_saved']
+            
+            if len(failed_files) == len(file_paths):
+                stats = db_manager.get_stats()
+                yield "❌ No se pudieron cargar documentos válidos", get_stats_message(stats)
+                return
+        else:
+            # Paso 1: Procesar los archivos (cargar y dividir)
+            result = doc_processor.process_files(file_paths)
+            
+            # Si el procesamiento falló, retornar mensaje de error
+            if not result['success']:
+                stats = db_manager.get_stats()
+                yield result['message'], get_stats_message(stats)
+                return
+            
+            # Paso 2: Añadir los fragmentos a la base de datos
+            # (solo se guardan los fragmentos nuevos o modificados)
+            split_count = result['split_count']
+            failed_files = result['failed_files']
+            parse_seconds_saved = result['parse_seconds_saved']
+            sync = db_manager.add_documents(result['splits'],
+                                            split_settings=doc_processor.split_settings())
         
         # Paso 3: Actualizar estadísticas
         stats = db_manager.get_stats()
@@ -115,39 +186,58 @@ def handle_file_upload(file_list):
         success_message = (
             f"✅ ¡Éxito!\n\n"
             f"📄 Archivos procesados: {len(file_paths)}\n"
-            f"📊 Fragmentos creados: {result['split_count']}\n"
+            f"📊 Fragmentos creados: {split_count}\n"
+            f"🆕 Nuevos: {len(sync['new_files'])} | "
+            f"♻️ Sin cambios: {len(sync['unchanged_files'])} | "
+            f"🔄 Reemplazados: {len(sync['replaced_files'])}\n"
+            f"🧮 Embeddings calculados: {sync['added']} "
+            f"(reutilizados: {sync['skipped']})\n"
             f"💾 Total en base de datos: {stats['count']:,}"
         )
         
-        if result['failed_files']:
-            success_message += f"\n\n⚠️ Archivos con error: {len(result['failed_files'])}"
+        if parse_seconds_saved:
+            success_message += (f"\n♻️ Lectura ahorrada por el caché de texto: "
+                                f"{parse_seconds_saved:.1f} s")
+        
+        if sync['name_conflicts']:
+            success_message += (f"\n\n⚠️ Ya existían con otro contenido y se reemplazaron: "
+                                f"{', '.join(sync['name_conflicts'])}")
+        
+        if failed_files:
+            success_message += f"\n\n⚠️ Archivos con error: {len(failed_files)}"
         
         print(f"\n{'='*70}")
         print(f"✅ CARGA COMPLETADA")
         print(f"{'='*70}\n")
         
-        return success_message, stats['message']
+        yield success_message, get_stats_message(stats)
         
     except Exception as e:
         print(f"\n❌ Error en handle_file_upload: {e}\n")
         stats = db_manager.get_stats()
-        return f"❌ Error al procesar archivos: {str(e)}", stats['message']
+        yield f"❌ Error al procesar archivos: {str(e)}", get_stats_message(stats)
 
 
-def handle_chat_message(message, chat_history):
+async def handle_chat_message(message, chat_history):
     """
     Maneja los mensajes del chat.
     
     Esta función:
     1. Recibe el mensaje del usuario
-    2. Usa la cadena RAG para generar una respuesta
-    3. Actualiza el historial del chat
+    2. Usa la cadena RAG para generar una respuesta en streaming
+    3. Actualiza el historial del chat a medida que llegan los tokens
+    
+    Es un generador: cada 'yield' actualiza la interfaz, así el usuario
+    ve la respuesta escribiéndose en lugar de una caja vacía.
+    
+    Es async: mientras espera a Gemini no ocupa ningún hilo, así el
+    servidor puede atender a muchos usuarios a la vez.
     
     Args:
         message (str): Mensaje/pregunta del usuario
         chat_history (list): Historial de mensajes [(user, bot), ...]
         
-    Returns:
+    Yields:
         tuple: ("", chat_history_actualizado)
                Retornamos "" para limpiar el input
                
@@ -157,27 +247,35 @@ def handle_chat_message(message, chat_history):
     """
     # Validar que el mensaje no esté vacío
     if not message or message.strip() == "":
-        return "", chat_history
+        yield "", chat_history
+        return
     
     try:
+        if not components.ready:
+            # Primera pregunta durante el arranque: avisar y esperar la carga
+            yield "", chat_history + [(message, "⏳ Cargando modelos, un momento...")]
+            await asyncio.to_thread(components.load)
+        
         print(f"\n{'='*70}")
         print(f"💬 NUEVA PREGUNTA")
         print(f"{'='*70}")
         print(f"Usuario: {message[:100]}...")
         
-        # Generar respuesta usando la cadena RAG
-        response = rag_chain.query(message)
-        
-        # Agregar al historial del chat
+        # Agregar la pregunta al historial con una respuesta vacía
         # Formato de Gradio: (mensaje_usuario, respuesta_bot)
-        chat_history.append((message, response))
+        chat_history.append((message, ""))
+        response = ""
+        
+        # Generar respuesta token a token usando la cadena RAG
+        async for token in components.rag_chain.astream_query(message):
+            response += token
+            chat_history[-1] = (message, response)
+            # Retornar input vacío e historial actualizado
+            yield "", chat_history
         
         print(f"Bot: {response[:100]}...")
         print(f"{'='*70}\n")
         
-        # Retornar input vacío y historial actualizado
-        return "", chat_history
-        
     except Exception as e:
         print(f"\n❌ Error en handle_chat_message: {e}\n")
         # En caso de error, mostrar mensaje al usuario
@@ -186,8 +284,11 @@ def handle_chat_message(message, chat_history):
             f"Error: {str(e)}\n\n"
             f"Por favor, intenta de nuevo o contacta al administrador."
         )
-        chat_history.append((message, error_response))
-        return "", chat_history
+        if chat_history and chat_history[-1][0] == message:
+            chat_history[-1] = (message, error_response)
+        else:
+            chat_history.append((message, error_response))
+        yield "", chat_history
 
 
 def handle_clear_database():
@@ -205,6 +306,9 @@ def handle_clear_database():
         Esta operación no se puede deshacer.
         Todos los documentos serán eliminados permanentemente.
     """
+    components.load()
+    db_manager = components.db_manager
+    
     try:
         print(f"\n{'='*70}")
         print(f"🗑️ LIMPIEZA DE BASE DE DATOS")
@@ -219,12 +323,22 @@ def handle_clear_database():
         print(f"{result['message']}")
         print(f"{'='*70}\n")
         
-        return result['message'], stats['message']
+        return result['message'], get_stats_message(stats)
         
     except Exception as e:
         print(f"\n❌ Error en handle_clear_database: {e}\n")
         stats = db_manager.get_stats()
-        return f"❌ Error al limpiar la base de datos: {str(e)}", stats['message']
+        return f"❌ Error al limpiar la base de datos: {str(e)}", get_stats_message(stats)
+
+
+def handle_refresh_latency():
+    """
+    Actualiza el panel de rendimiento por etapa (p50/p95 recientes).
+    
+    Returns:
+        str: Tabla Markdown con las métricas de tracing.py
+    """
+    return tracer.stats_message()
 
 
 def handle_refresh_stats():
@@ -234,8 +348,23 @@ def handle_refresh_stats():
     Returns:
         str: Mensaje con las estadísticas actualizadas
     """
-    stats = db_manager.get_stats()
-    return stats['message']
+    return get_stats_message()
+
+
+async def handle_startup_status():
+    """
+    Muestra el estado de la carga de los modelos al abrir la página.
+    
+    Es un generador async: actualiza el aviso cada segundo hasta que los
+    modelos están listos, y entonces muestra las estadísticas.
+    
+    Yields:
+        tuple: (estado_de_la_carga, estadísticas)
+    """
+    while not components.ready and components.error is None:
+        yield components.status_message(), gr.update()
+        await asyncio.sleep(1)
+    yield components.status_message(), get_stats_message()
 
 
 # ==============================================================================
@@ -250,6 +379,9 @@ with gr.Blocks(theme=gr.themes.Soft(), title=APP_TITLE) as demo:
     # === ENCABEZADO COMPACTO ===
     gr.Markdown(f"# {APP_TITLE}\n{APP_DESCRIPTION}")
     
+    # Aviso de carga de los modelos (ver app_components.py)
+    status_display = gr.Markdown(value=components.status_message())
+    
     # === PESTAÑA 1: CHATBOT ===
     with gr.Tab("💬 Chatbot"):
         # Instrucciones colapsables para ahorrar espacio
@@ -285,15 +417,20 @@ with gr.Blocks(theme=gr.themes.Soft(), title=APP_TITLE) as demo:
         
         # Conectar eventos
         # Enviar mensaje al presionar Enter o botón
+        # (el mismo límite de concurrencia se comparte entre ambos eventos)
         msg_input.submit(
             handle_chat_message,
             inputs=[msg_input, chatbot],
-            outputs=[msg_input, chatbot]
+            outputs=[msg_input, chatbot],
+            concurrency_limit=CHAT_CONCURRENCY_LIMIT,
+            concurrency_id="chat"
         )
         submit_btn.click(
             handle_chat_message,
             inputs=[msg_input, chatbot],
-            outputs=[msg_input, chatbot]
+            outputs=[msg_input, chatbot],
+            concurrency_limit=CHAT_CONCURRENCY_LIMIT,
+            concurrency_id="chat"
         )
     
     # === PESTAÑA 2: GESTIÓN DE DOCUMENTOS ===
@@ -302,7 +439,7 @@ with gr.Blocks(theme=gr.themes.Soft(), title=APP_TITLE) as demo:
         # === SECCIÓN: ESTADÍSTICAS ===
         with gr.Row():
             stats_display = gr.Markdown(
-                value=db_manager.get_stats()['message']
+                value=get_stats_message()
             )
             refresh_btn = gr.Button("🔄 Actualizar", size="sm", scale=0)
         
@@ -336,10 +473,13 @@ with gr.Blocks(theme=gr.themes.Soft(), title=APP_TITLE) as demo:
             )
         
         # Conectar eventos de esta pestaña
+        # Cargar y limpiar modifican la base: una petición por vez
         upload_btn.click(
             handle_file_upload,
             inputs=[file_upload],
-            outputs=[upload_status, stats_display]
+            outputs=[upload_status, stats_display],
+            concurrency_limit=1,
+            concurrency_id="database"
         )
         
         refresh_btn.click(
@@ -351,7 +491,9 @@ with gr.Blocks(theme=gr.themes.Soft(), title=APP_TITLE) as demo:
         clear_db_btn.click(
             handle_clear_database,
             inputs=[],
-            outputs=[clear_status, stats_display]
+            outputs=[clear_status, stats_display],
+            concurrency_limit=1,
+            concurrency_id="database"
         )
     
     # === PESTAÑA 3: INFORMACIÓN ===
@@ -359,6 +501,20 @@ with gr.Blocks(theme=gr.themes.Soft(), title=APP_TITLE) as demo:
         gr.Markdown("# 📚 Chatbot RAG - Información del Proyecto")
         
         # Acordeones colapsables para información compacta
+        # Rendimiento medido en esta sesión (ver tracing.py)
+        with gr.Accordion("📈 Rendimiento por etapa", open=False):
+            gr.Markdown(
+                "Cuánto tarda cada etapa del pipeline: `retrieve` incluye el "
+                "`embed` de la pregunta, y `llm` es la respuesta de Gemini."
+            )
+            latency_display = gr.Markdown(value=tracer.stats_message())
+            latency_btn = gr.Button("🔄 Actualizar", size="sm")
+            latency_btn.click(
+                handle_refresh_latency,
+                inputs=[],
+                outputs=[latency_display]
+            )
+        
         with gr.Accordion("¿Qué es RAG?", open=True):
             gr.Markdown("""
             **RAG** = *Retrieval Augmented Generation* (Generación Aumentada por Recuperación)
@@ -414,20 +570,50 @@ with gr.Blocks(theme=gr.themes.Soft(), title=APP_TITLE) as demo:
         
         gr.Markdown("---")
         gr.Markdown("💡 **Clase 24 - IA Python para Principiantes**")
+    
+    # Al abrir la página: seguir la carga de los modelos hasta que estén listos
+    demo.load(
+        handle_startup_status,
+        inputs=[],
+        outputs=[status_display, stats_display]
+    )
 
 # ==============================================================================
 # 4. LANZAR LA APLICACIÓN
 # ==============================================================================
 
-if __name__ == "__main__":
+def launch(**launch_kwargs):
+    """
+    Configura la cola y las métricas y lanza el servidor de Gradio.
+    
+    Args:
+        **launch_kwargs: Argumentos de demo.launch() (share, server_port...)
+    """
     print("\n" + "="*70)
     print("🎉 APLICACIÓN LISTA")
     print("="*70)
     print("\n🌐 Lanzando servidor web...")
     print("💡 Presiona Ctrl+C para detener el servidor\n")
     
+    # Cola explícita: las peticiones que superan los límites de
+    # concurrencia esperan su turno en lugar de fallar
+    demo.queue(max_size=QUEUE_MAX_SIZE)
+    
+    # Métricas en formato Prometheus (http://localhost:METRICS_PORT/metrics)
+    if METRICS_PORT:
+        try:
+            start_metrics_server(tracer, METRICS_PORT)
+        except OSError as e:
+            # Las métricas son opcionales: sin ellas el chat funciona igual
+            print(f"⚠️ No se pudo abrir el puerto de métricas {METRICS_PORT} ({e}); "
+                  f"la app sigue sin /metrics")
+    
     # Lanzar la interfaz de Gradio
-    demo.launch(
+    return demo.launch(**launch_kwargs)
+
+
+if __name__ == "__main__":
+    launch(
         share=True,  # Crear enlace público temporal (opcional)
         # server_name="0.0.0.0",  # Descomentar para acceso desde otras máquinas
         # server_port=7860,       # Puerto personalizado
@@ -459,6 +645,15 @@ if __name__ == "__main__":
    - chat_history: Gradio lo maneja automáticamente
    - Estadísticas: Se actualizan reactivamente
 
+5. COLA Y CONCURRENCIA:
+   - demo.queue(): las peticiones esperan su turno en una cola
+   - concurrency_limit: cuántas peticiones de un evento se atienden a la vez
+   - Funciones async: esperar a la red no bloquea al resto de usuarios
+
+6. ARRANQUE RÁPIDO (FAST_START):
+   - La interfaz se abre antes de cargar los modelos
+   - demo.load(): una función que se ejecuta al abrir la página
+
 💡 EJERCICIOS SUGERIDOS:
    1. Agrega una pestaña para mostrar las fuentes de cada respuesta
    2. Implementa un botón de "exportar conversación"
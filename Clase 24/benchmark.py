@@ -0,0 +1,1000 @@
+"""
+benchmark.py - Pruebas de Rendimiento del Chatbot RAG
+=====================================================
+
+Script de línea de comandos para medir el rendimiento de los distintos
+componentes del proyecto. Cada prueba es un subcomando:
+
+    python benchmark.py vector-store --chunks 100000 --queries 200
+    python benchmark.py ann --scale 200000 --output reporte_ann.md
+    python benchmark.py quantization --scale 100000 --output reporte_cuantizacion.md
+    python benchmark.py gateway --users 40
+    python benchmark.py chat-load --users 1,10,50
+    python benchmark.py startup --runs 3
+    python benchmark.py filters --chunks 100000
+    python benchmark.py chunking --sizes 500,1000,1500 --overlaps 0,250
+
+Algunas pruebas generan datos al azar (vectores de 384 dimensiones, como
+los de all-MiniLM-L6-v2), así no hace falta descargar ningún modelo. Otras
+usan el corpus de la Clase 23 (documento.pdf y datos.txt) y el modelo de
+embeddings configurado en config.py.
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import numpy as np
+
+# Dimensión de los embeddings de all-MiniLM-L6-v2
+EMBEDDING_DIM = 384
+
+# Corpus de ejemplo del repositorio
+CORPUS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Clase 23")
+CORPUS_FILES = ["documento.pdf", "datos.txt"]
+
+# Preguntas de evaluación: cada una indica un pasaje que debe aparecer
+# en los fragmentos recuperados (ver benchmark_chunking)
+QUESTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "preguntas_evaluacion.json")
+
+# ==============================================================================
+# FUNCIONES AUXILIARES
+# ==============================================================================
+
+def make_vectors(n, dim=EMBEDDING_DIM, clusters=64, seed=0):
+    """
+    Genera vectores aleatorios agrupados en "temas" (clusters).
+
+    Los embeddings reales no están repartidos uniformemente: los textos
+    del mismo tema quedan cerca. Los clusters imitan ese comportamiento.
+
+    Args:
+        n (int): Número de vectores
+        dim (int): Dimensión de cada vector
+        clusters (int): Número de temas
+        seed (int): Semilla (para resultados reproducibles)
+
+    Returns:
+        np.ndarray: Matriz float32 (n, dim) con filas normalizadas
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def percentile_ms(samples, q):
+    """Percentil q (0-100) de una lista de tiempos en segundos, en ms."""
+    return float(np.percentile(np.asarray(samples) * 1000.0, q))
+
+
+def format_table(headers, rows):
+    """Construye una tabla Markdown sencilla."""
+    lines = ["| " + " | ".join(headers) + " |",
+             "|" + "|".join("---" for _ in headers) + "|"]
+    for row in rows:
+        lines.append("| " + " | ".join(str(value) for value in row) + " |")
+    return "\n".join(lines)
+
+
+def print_table(headers, rows):
+    """Imprime una tabla Markdown sencilla."""
+    print(format_table(headers, rows))
+
+
+def write_report(path, title, description, headers, rows):
+    """
+    Guarda un reporte Markdown con una tabla de resultados.
+
+    Args:
+        path (str): Archivo de salida (None = no guardar)
+        title (str): Título del reporte
+        description (str): Párrafo explicativo
+        headers (list): Encabezados de la tabla
+        rows (list): Filas de la tabla
+    """
+    if not path:
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# {title}\n\n{description}\n\n{format_table(headers, rows)}\n")
+    print(f"\n📝 Reporte guardado en {path}")
+
+
+def load_corpus_vectors(scale=0, queries=200, seed=0):
+    """
+    Convierte el corpus del repositorio en vectores de documentos y preguntas.
+
+    Los documentos son los fragmentos de documento.pdf y datos.txt (con
+    CHUNK_SIZE/CHUNK_OVERLAP de config.py). Las preguntas son la primera
+    frase de cada fragmento, convertida con embed_query().
+
+    Si 'scale' es mayor que el número de fragmentos, se generan copias con
+    un poco de ruido hasta llegar a 'scale' vectores, para simular una base
+    de conocimiento grande con la misma distribución que el corpus real.
+
+    Args:
+        scale (int): Número total de vectores deseado (0 = solo el corpus)
+        queries (int): Número de preguntas
+        seed (int): Semilla aleatoria
+
+    Returns:
+        tuple: (vectores_documentos, vectores_preguntas), ambos normalizados
+    """
+    from config import (EMBEDDING_MODEL, DEVICE, EMBEDDING_CACHE_ENABLED,
+                        EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES)
+    from document_processor import DocumentProcessor
+    from embedding_cache import create_embeddings
+
+    paths = [os.path.join(CORPUS_DIRECTORY, name) for name in CORPUS_FILES]
+    splits = DocumentProcessor(parallel_loading=False).process_files(paths)['splits']
+    texts = [split.page_content for split in splits]
+
+    embeddings = create_embeddings(
+        EMBEDDING_MODEL, device=DEVICE,
+        cache_path=EMBEDDING_CACHE_PATH if EMBEDDING_CACHE_ENABLED else None,
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES
+    )
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+
+    # Preguntas: la primera frase de cada fragmento
+    question_texts = []
+    for text in texts:
+        sentence = text.replace("\n", " ").split(". ")[0].strip()
+        question_texts.append(sentence[:200] or text[:200])
+    question_vectors = np.asarray(
+        [embeddings.embed_query(text) for text in question_texts], dtype=np.float32
+    )
+
+    rng = np.random.default_rng(seed)
+    if scale > len(vectors):
+        base = vectors[rng.integers(0, len(vectors), size=scale - len(vectors))]
+        noise = 0.35 * rng.normal(size=base.shape).astype(np.float32) / np.sqrt(base.shape[1])
+        vectors = np.concatenate([vectors, base + noise])
+
+    picked = rng.integers(0, len(question_vectors), size=queries)
+    question_vectors = question_vectors[picked]
+    question_vectors += 0.1 * rng.normal(size=question_vectors.shape).astype(np.float32) \
+        / np.sqrt(question_vectors.shape[1])
+
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    question_vectors /= np.linalg.norm(question_vectors, axis=1, keepdims=True)
+    return vectors, question_vectors
+
+
+def recall_at_k(found, truth):
+    """
+    Recall@k promedio: proporción de los vecinos reales que se encontraron.
+
+    Args:
+        found (list): Por pregunta, lista de (fila, similitud) obtenida
+        truth (list): Por pregunta, lista de (fila, similitud) exacta
+
+    Returns:
+        float: Recall entre 0 y 1
+    """
+    scores = []
+    for got, expected in zip(found, truth):
+        expected_rows = {row for row, _ in expected}
+        if expected_rows:
+            scores.append(len(expected_rows & {row for row, _ in got}) / len(expected_rows))
+    return float(np.mean(scores)) if scores else 0.0
+
+
+def build_store(directory, vectors, **kwargs):
+    """Crea un NumpyVectorStore con los vectores dados (sin modelo de embeddings)."""
+    from vector_store import NumpyVectorStore
+
+    store = NumpyVectorStore(directory, None, **kwargs)
+    for i in range(0, len(vectors), 10_000):
+        batch = vectors[i:i + 10_000]
+        store.add_embeddings([f"fragmento {i + j}" for j in range(len(batch))], batch)
+    return store
+
+# ==============================================================================
+# PRUEBA: vector-store (ChromaDB vs NumpyVectorStore)
+# ==============================================================================
+
+def benchmark_vector_store(args):
+    """
+    Compara ChromaDB con NumpyVectorStore: carga, apertura y búsqueda.
+    """
+    from vector_store import NumpyVectorStore
+
+    vectors = make_vectors(args.chunks)
+    queries = make_vectors(args.queries, seed=1)
+    ids = [f"chunk-{i}" for i in range(args.chunks)]
+    texts = [f"Fragmento de prueba número {i}" for i in range(args.chunks)]
+    metadatas = [{'source': f"doc{i % 50}.pdf", 'page': i % 300} for i in range(args.chunks)]
+
+    workdir = tempfile.mkdtemp(prefix="bench_vs_")
+    rows = []
+
+    try:
+        # --- NumPy ---
+        for dtype in ("float32", "float16"):
+            directory = os.path.join(workdir, f"numpy_{dtype}")
+            start = time.perf_counter()
+            store = NumpyVectorStore(directory, None, dtype=dtype)
+            for i in range(0, args.chunks, 5000):
+                store.add_embeddings(texts[i:i + 5000], vectors[i:i + 5000],
+                                     metadatas[i:i + 5000], ids[i:i + 5000])
+            insert_time = time.perf_counter() - start
+            del store
+
+            start = time.perf_counter()
+            store = NumpyVectorStore(directory, None, dtype=dtype)
+            open_time = time.perf_counter() - start
+
+            latencies = []
+            for query in queries:
+                t0 = time.perf_counter()
+                store.search_by_vectors(query[None, :], k=args.k)
+                latencies.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            store.search_by_vectors(queries, k=args.k)
+            batch_qps = len(queries) / (time.perf_counter() - t0)
+
+            rows.append((
+                f"numpy ({dtype})", f"{insert_time:.2f}", f"{open_time * 1000:.1f}",
+                f"{percentile_ms(latencies, 50):.2f}", f"{percentile_ms(latencies, 95):.2f}",
+                f"{batch_qps:,.0f}"
+            ))
+
+        # --- ChromaDB ---
+        import chromadb
+
+        directory = os.path.join(workdir, "chroma")
+        start = time.perf_counter()
+        client = chromadb.PersistentClient(path=directory)
+        collection = client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+        for i in range(0, args.chunks, 5000):
+            collection.add(ids=ids[i:i + 5000], embeddings=vectors[i:i + 5000],
+                           documents=texts[i:i + 5000], metadatas=metadatas[i:i + 5000])
+        insert_time = time.perf_counter() - start
+        del collection, client
+
+        start = time.perf_counter()
+        client = chromadb.PersistentClient(path=directory)
+        collection = client.get_collection("bench")
+        collection.query(query_embeddings=queries[:1], n_results=args.k)
+        open_time = time.perf_counter() - start
+
+        latencies = []
+        for query in queries:
+            t0 = time.perf_counter()
+            collection.query(query_embeddings=query[None, :], n_results=args.k)
+            latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        collection.query(query_embeddings=queries, n_results=args.k)
+        batch_qps = len(queries) / (time.perf_counter() - t0)
+
+        rows.append((
+            "chroma", f"{insert_time:.2f}", f"{open_time * 1000:.1f}",
+            f"{percentile_ms(latencies, 50):.2f}", f"{percentile_ms(latencies, 95):.2f}",
+            f"{batch_qps:,.0f}"
+        ))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n📊 Almacén vectorial: {args.chunks:,} fragmentos, "
+          f"{args.queries} preguntas, k={args.k}\n")
+    print_table(
+        ["Motor", "Carga (s)", "Apertura (ms)", "p50 (ms)", "p95 (ms)", "Lote (consultas/s)"],
+        rows
+    )
+
+# ==============================================================================
+# PRUEBA: ann (índice IVF: recall@k vs consultas por segundo)
+# ==============================================================================
+
+def benchmark_ann(args):
+    """
+    Mide el compromiso recall@k / velocidad del índice IVF para varios nprobe.
+    """
+    from config import IVF_NLIST
+    from ann_index import MIN_POINTS_PER_LIST
+
+    vectors, queries = load_corpus_vectors(scale=args.scale, queries=args.queries)
+
+    nlist = args.nlist or IVF_NLIST
+    if len(vectors) < nlist * MIN_POINTS_PER_LIST:
+        nlist = max(1, len(vectors) // MIN_POINTS_PER_LIST)
+        print(f"⚠️ Pocos vectores para IVF_NLIST: se usa nlist={nlist} "
+              f"(usa --scale para simular una base más grande)")
+
+    workdir = tempfile.mkdtemp(prefix="bench_ann_")
+    try:
+        start = time.perf_counter()
+        store = build_store(workdir, vectors, index="ivf", nlist=nlist)
+        # Reentrenar con todos los vectores (el entrenamiento automático
+        # ocurre en cuanto hay suficientes, con solo los primeros lotes)
+        store.rebuild_index()
+        build_time = time.perf_counter() - start
+
+        # Resultados exactos (búsqueda completa) como referencia
+        t0 = time.perf_counter()
+        truth = [store.search_by_vectors(query[None, :], k=args.k, exact=True)[0]
+                 for query in queries]
+        flat_qps = len(queries) / (time.perf_counter() - t0)
+        rows = [("flat (exacta)", "-", "1.000", f"{flat_qps:,.0f}", "1.0x")]
+
+        nprobe = 1
+        while nprobe <= nlist:
+            t0 = time.perf_counter()
+            found = store.search_by_vectors(queries, k=args.k, nprobe=nprobe)
+            qps = len(queries) / (time.perf_counter() - t0)
+            rows.append((
+                "ivf", nprobe, f"{recall_at_k(found, truth):.3f}",
+                f"{qps:,.0f}", f"{qps / flat_qps:.1f}x"
+            ))
+            nprobe *= 2
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    headers = ["Índice", "nprobe", f"Recall@{args.k}", "Consultas/s", "Aceleración"]
+    description = (
+        f"Corpus: {', '.join(CORPUS_FILES)} ampliado a {len(vectors):,} vectores; "
+        f"{len(queries)} preguntas; nlist={nlist}; construcción del índice: {build_time:.2f} s."
+    )
+    print(f"\n📊 Índice IVF - {description}\n")
+    print_table(headers, rows)
+    write_report(args.output, "Recall@k vs. consultas por segundo (IVF)", description, headers, rows)
+
+# ==============================================================================
+# PRUEBA: quantization (memoria y recall de int8 / binaria)
+# ==============================================================================
+
+def benchmark_quantization(args):
+    """
+    Mide cuánta memoria ahorra cada cuantización y cuánto recall se pierde.
+
+    La memoria es la de la primera etapa (lo que se recorre entero en cada
+    búsqueda); los vectores completos siguen en disco para el re-ranking.
+    """
+    from config import TOP_K_DOCUMENTS
+
+    k = args.k or TOP_K_DOCUMENTS
+    factors = [int(factor) for factor in args.rerank.split(",")]
+    vectors, queries = load_corpus_vectors(scale=args.scale, queries=args.queries)
+    dim = vectors.shape[1]
+    full_bytes = len(vectors) * dim * 4
+
+    workdir = tempfile.mkdtemp(prefix="bench_quant_")
+    rows = []
+    try:
+        truth = None
+        for mode in ("none", "int8", "binary"):
+            store = build_store(os.path.join(workdir, mode), vectors, quantization=mode)
+            if mode != "none":
+                # Escalas int8 calculadas con todos los vectores, no solo el primer lote
+                store.rebuild_codes()
+            if truth is None:
+                truth = [store.search_by_vectors(query[None, :], k=k)[0] for query in queries]
+
+            code_bytes = full_bytes if mode == "none" else \
+                len(vectors) * store.quantizer.code_size(dim)
+
+            for factor in (factors if mode != "none" else [1]):
+                store.rerank_factor = factor
+                latencies, found = [], []
+                for query in queries:
+                    t0 = time.perf_counter()
+                    found.append(store.search_by_vectors(query[None, :], k=k)[0])
+                    latencies.append(time.perf_counter() - t0)
+
+                rows.append((
+                    mode, factor if mode != "none" else "-",
+                    f"{code_bytes / 2 ** 20:,.1f}", f"{full_bytes / code_bytes:.0f}x",
+                    f"{recall_at_k(found, truth):.3f}",
+                    f"{percentile_ms(latencies, 50):.2f}", f"{percentile_ms(latencies, 95):.2f}"
+                ))
+            del store
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    headers = ["Cuantización", "Re-ranking (x k)", "Memoria 1ª etapa (MB)", "Reducción",
+               f"Recall@{k}", "p50 (ms)", "p95 (ms)"]
+    description = (
+        f"Corpus: {', '.join(CORPUS_FILES)} ampliado a {len(vectors):,} vectores; "
+        f"{len(queries)} preguntas; k={k} (TOP_K_DOCUMENTS). El recall se mide contra "
+        f"la búsqueda exacta con float32."
+    )
+    print(f"\n📊 Cuantización - {description}\n")
+    print_table(headers, rows)
+    write_report(args.output, "Memoria y recall de la cuantización", description, headers, rows)
+
+# ==============================================================================
+# PRUEBA: gateway (coalescencia y límites de la puerta del LLM)
+# ==============================================================================
+
+class FlakyFakeLLM:
+    """
+    LLM falso para pruebas sin internet: tarda 'delay' segundos por
+    respuesta y falla con un 429 en una de cada 'fail_every' llamadas.
+    """
+
+    def __init__(self, delay, fail_every=0):
+        from langchain_core.language_models import FakeListChatModel
+
+        answer = "RAG combina búsqueda y generación."
+        # FakeListChatModel entrega la respuesta letra a letra, con 'sleep' entre letras
+        self.model = FakeListChatModel(responses=[answer], sleep=delay / len(answer))
+        self.fail_every = fail_every
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def stream(self, prompt, config=None):
+        with self._lock:
+            self.calls += 1
+            fail = self.fail_every and self.calls % self.fail_every == 0
+        if fail:
+            raise RuntimeError("429 Resource exhausted (simulado)")
+        return self.model.stream(prompt, config)
+
+
+def benchmark_gateway(args):
+    """
+    Simula una clase entera preguntando a la vez y compara las llamadas
+    reales al LLM con y sin la puerta (llm_gateway.py).
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    from llm_gateway import LLMGateway
+
+    prompt = ChatPromptTemplate.from_template("Pregunta: {question}")
+    # Las preguntas se reparten entre 'distinct' textos distintos
+    questions = [f"¿Qué es RAG? ({i % args.distinct})" for i in range(args.users)]
+
+    def run_users(llm):
+        latencies = [0.0] * args.users
+        errors = []
+        barrier = threading.Barrier(args.users)
+
+        def user(i):
+            barrier.wait()
+            t0 = time.perf_counter()
+            try:
+                "".join(chunk.content for chunk in llm.stream(prompt.invoke({"question": questions[i]})))
+            except Exception as e:
+                errors.append(e)
+            latencies[i] = time.perf_counter() - t0
+
+        threads = [threading.Thread(target=user, args=(i,)) for i in range(args.users)]
+        t0 = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - t0, latencies, errors
+
+    rows = []
+    direct = FlakyFakeLLM(args.delay, args.fail_every)
+    total, latencies, errors = run_users(direct)
+    rows.append(("Sin puerta", args.users, direct.calls, "-", "-", len(errors),
+                 f"{percentile_ms(latencies, 50):.0f}", f"{total:.2f}"))
+
+    fake = FlakyFakeLLM(args.delay, args.fail_every)
+    gateway = LLMGateway(fake, max_concurrency=args.concurrency, requests_per_minute=args.rpm,
+                         base_delay=0.05, max_delay=0.5)
+    total, latencies, errors = run_users(gateway)
+    stats = gateway.stats()
+    rows.append(("Con puerta", args.users, fake.calls, stats['coalesced'], stats['retries'],
+                 len(errors), f"{percentile_ms(latencies, 50):.0f}", f"{total:.2f}"))
+
+    headers = ["Modo", "Peticiones", "Llamadas al LLM", "Coalescidas", "Reintentos",
+               "Errores", "p50 (ms)", "Total (s)"]
+    print(f"\n📊 Puerta del LLM - {args.users} usuarios, {args.distinct} preguntas distintas, "
+          f"LLM falso de {args.delay:.2f} s, un 429 cada {args.fail_every or '∞'} llamadas\n")
+    print_table(headers, rows)
+
+# ==============================================================================
+# PRUEBA: chat-load (usuarios simultáneos en el chat async)
+# ==============================================================================
+
+def benchmark_chat_load(args):
+    """
+    Mide la latencia del chat (RAGChain.astream_query) con 1, 10, 50...
+    usuarios preguntando a la vez, con un LLM falso que tarda --delay
+    segundos (no se gasta cuota de Gemini).
+
+    La base de conocimiento es un InMemoryVectorStore con embeddings
+    deterministas, para medir solo la parte de concurrencia.
+    """
+    from types import SimpleNamespace
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.vectorstores import InMemoryVectorStore
+    from config import LLM_MAX_CONCURRENCY
+    from llm_gateway import LLMGateway
+    from rag_chain import RAGChain
+
+    embeddings = DeterministicFakeEmbedding(size=EMBEDDING_DIM)
+    store = InMemoryVectorStore(embeddings)
+    store.add_documents([
+        Document(page_content=f"Fragmento {i} sobre RAG, embeddings y bases vectoriales.",
+                 metadata={'source': 'sintetico.txt', 'page': i // 10})
+        for i in range(500)
+    ])
+    database = SimpleNamespace(
+        version=0, embeddings=embeddings,
+        get_retriever=lambda k: store.as_retriever(search_kwargs={'k': k})
+    )
+
+    answer = "Según los documentos, RAG combina búsqueda de fragmentos y generación. " * 3
+    llm = FakeListChatModel(responses=[answer], sleep=args.delay / len(answer))
+    llm_concurrency = args.llm_concurrency or LLM_MAX_CONCURRENCY
+
+    gateway = LLMGateway(llm, max_concurrency=llm_concurrency, requests_per_minute=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        rag = RAGChain(database, llm=gateway)
+    # Preguntas distintas: sin caché ni coalescencia, cada una llama al LLM
+    rag.answer_cache = None
+
+    async def user(question):
+        t0 = time.perf_counter()
+        first = None
+        async for _ in rag.astream_query(question):
+            if first is None:
+                first = time.perf_counter() - t0
+        return first, time.perf_counter() - t0
+
+    async def run(users, round_number):
+        questions = [f"¿Qué dice el fragmento {round_number}-{i}?" for i in range(users)]
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(user(question) for question in questions))
+        return results, time.perf_counter() - t0
+
+    rows = []
+    for round_number, users in enumerate(int(n) for n in args.users.split(",")):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, total = asyncio.run(run(users, round_number))
+        first_tokens = [first for first, _ in results]
+        latencies = [latency for _, latency in results]
+        rows.append((
+            users,
+            f"{percentile_ms(first_tokens, 50):.0f}", f"{percentile_ms(first_tokens, 95):.0f}",
+            f"{percentile_ms(latencies, 50):.0f}", f"{percentile_ms(latencies, 95):.0f}",
+            f"{users / total:.1f}"
+        ))
+
+    headers = ["Usuarios", "1er token p50 (ms)", "1er token p95 (ms)",
+               "Total p50 (ms)", "Total p95 (ms)", "Respuestas/s"]
+    description = (
+        f"LLM falso de {args.delay:.2f} s por respuesta; {llm_concurrency} llamadas "
+        f"simultáneas al LLM; preguntas distintas y sin caché."
+    )
+    print(f"\n📊 Chat async - {description}\n")
+    print_table(headers, rows)
+    write_report(args.output, "Latencia del chat con usuarios simultáneos", description, headers, rows)
+
+# ==============================================================================
+# PRUEBA: startup (arranque normal vs arranque rápido)
+# ==============================================================================
+
+# Programa que se ejecuta en un proceso aparte: importa la app, la lanza
+# y escribe sus tiempos en un archivo JSON
+STARTUP_CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+import app_refactorizado as app
+timings = {'import_seconds': time.perf_counter() - start}
+app.launch(share=False, server_port=int(sys.argv[1]), prevent_thread_lock=True)
+app.components.load()
+timings['ready_seconds'] = time.perf_counter() - start
+with open(sys.argv[2] + '.tmp', 'w') as f:
+    json.dump(timings, f)
+os.replace(sys.argv[2] + '.tmp', sys.argv[2])
+time.sleep(3600)
+"""
+
+
+def measure_startup(fast_start, port, timeout=600):
+    """
+    Arranca la app en un proceso nuevo y mide sus tiempos.
+
+    Returns:
+        dict: {'import_seconds', 'first_request_seconds', 'ready_seconds'}
+    """
+    app_directory = os.path.dirname(os.path.abspath(__file__))
+    results_path = os.path.join(tempfile.mkdtemp(prefix="bench_startup_"), "timings.json")
+    env = {**os.environ, "FAST_START": "1" if fast_start else "0"}
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", STARTUP_CHILD, str(port), results_path],
+        cwd=app_directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        # Tiempo hasta que el servidor responde la primera petición
+        first_request = None
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("La aplicación terminó antes de tiempo")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        first_request = time.perf_counter() - start
+                        break
+            except OSError:
+                time.sleep(0.05)
+        if first_request is None:
+            raise TimeoutError("La aplicación no respondió a tiempo")
+
+        # Esperar a que los modelos estén cargados
+        while not os.path.exists(results_path):
+            if process.poll() is not None or time.perf_counter() - start > timeout:
+                raise RuntimeError("La aplicación no terminó de cargar los modelos")
+            time.sleep(0.1)
+        with open(results_path) as f:
+            timings = json.load(f)
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(os.path.dirname(results_path), ignore_errors=True)
+
+    timings['first_request_seconds'] = first_request
+    return timings
+
+
+def benchmark_startup(args):
+    """
+    Compara el arranque normal (FAST_START=0) con el arranque rápido:
+    tiempo de importación de app_refactorizado.py, tiempo hasta que el
+    servidor responde la primera petición y hasta que los modelos están listos.
+    """
+    rows = []
+    for fast_start in (False, True):
+        runs = [measure_startup(fast_start, args.port) for _ in range(args.runs)]
+        rows.append((
+            "Rápido (FAST_START=1)" if fast_start else "Normal (FAST_START=0)",
+            f"{np.median([run['import_seconds'] for run in runs]):.2f}",
+            f"{np.median([run['first_request_seconds'] for run in runs]):.2f}",
+            f"{np.median([run['ready_seconds'] for run in runs]):.2f}"
+        ))
+
+    headers = ["Arranque", "Importación (s)", "Primera petición servida (s)", "Modelos listos (s)"]
+    description = (
+        f"Mediana de {args.runs} arranque(s) en un proceso nuevo; la primera petición "
+        f"es GET / al servidor de Gradio."
+    )
+    print(f"\n📊 Arranque de la aplicación - {description}\n")
+    print_table(headers, rows)
+    write_report(args.output, "Tiempo de arranque de la aplicación", description, headers, rows)
+
+# ==============================================================================
+# PRUEBA: filters (filtro antes de buscar vs buscar en todo y descartar)
+# ==============================================================================
+
+def benchmark_filters(args):
+    """
+    Compara cuatro formas de buscar con un filtro de archivos y páginas:
+    sin filtro, filtrando después, con el filtro 'where' del motor y con
+    el índice de metadatos (los IDs se calculan antes de la búsqueda).
+    """
+    from langchain_chroma import Chroma
+    from vector_store import NumpyVectorStore
+    from metadata_index import MetadataIndex
+    from retrievers import fetch_candidates
+
+    vectors = make_vectors(args.chunks)
+    queries = make_vectors(args.queries, seed=1)
+    ids = [f"chunk-{i}" for i in range(args.chunks)]
+    texts = [f"Fragmento de prueba número {i}" for i in range(args.chunks)]
+    metadatas = [{'source': f"doc{i % args.sources}.pdf", 'page': (i // args.sources) % args.pages}
+                 for i in range(args.chunks)]
+
+    first, last = args.page_range
+    wanted = [f"doc{i}.pdf" for i in range(args.filter_sources)]
+    filters = {'sources': wanted, 'pages': (first, last)}
+    where = {"$and": [{"source": {"$in": wanted}},
+                      {"page": {"$gte": first}}, {"page": {"$lte": last}}]}
+
+    index = MetadataIndex(source_field="source")
+    index.add(ids, metadatas)
+    matching = len(index.select(**filters))
+
+    workdir = tempfile.mkdtemp(prefix="bench_filters_")
+    rows = []
+
+    def measure(engine, method, search, compared):
+        latencies, found = [], []
+        for query in queries:
+            t0 = time.perf_counter()
+            documents = search(query)
+            latencies.append(time.perf_counter() - t0)
+            found.append(len(documents))
+        rows.append((
+            engine, method, f"{compared:,}",
+            f"{percentile_ms(latencies, 50):.2f}", f"{percentile_ms(latencies, 95):.2f}",
+            f"{np.mean(found):.1f} / {args.k}"
+        ))
+
+    try:
+        numpy_store = NumpyVectorStore(os.path.join(workdir, "numpy"), None)
+        chroma_store = Chroma(collection_name="bench", persist_directory=os.path.join(workdir, "chroma"),
+                              collection_metadata={"hnsw:space": "cosine"})
+        for i in range(0, args.chunks, 5000):
+            numpy_store.add_embeddings(texts[i:i + 5000], vectors[i:i + 5000],
+                                       metadatas[i:i + 5000], ids[i:i + 5000])
+            chroma_store._collection.add(ids=ids[i:i + 5000], embeddings=vectors[i:i + 5000],
+                                         documents=texts[i:i + 5000], metadatas=metadatas[i:i + 5000])
+
+        def post_filter(store):
+            # Sin índice: muchos candidatos de toda la base y descartar después
+            def search(query):
+                documents, _ = fetch_candidates(store, query, args.k * args.overfetch)
+                return [doc for doc in documents if doc.metadata['source'] in wanted
+                        and first <= doc.metadata['page'] <= last][:args.k]
+            return search
+
+        for engine, store in (("numpy", numpy_store), ("chroma", chroma_store)):
+            measure(engine, "Sin filtro",
+                    lambda query: fetch_candidates(store, query, args.k)[0], args.chunks)
+            measure(engine, f"Buscar en todo y descartar ({args.overfetch}×k)",
+                    post_filter(store), args.chunks)
+            if engine == "numpy":
+                measure(engine, "Filtro 'where' (recorre los metadatos)",
+                        lambda query: numpy_store.similarity_search_by_vector(
+                            query, k=args.k, filter=where), matching)
+            else:
+                measure(engine, "Filtro 'where' de ChromaDB",
+                        lambda query: chroma_store.similarity_search_by_vector(
+                            query.tolist(), k=args.k, filter=where), matching)
+            measure(engine, "Índice de metadatos (filtro antes)",
+                    lambda query: fetch_candidates(store, query, args.k,
+                                                   ids=index.select(**filters))[0], matching)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    headers = ["Motor", "Método", "Fragmentos comparados", "p50 (ms)", "p95 (ms)", "Resultados"]
+    description = (
+        f"{args.chunks:,} fragmentos en {args.sources} archivos; filtro: "
+        f"{args.filter_sources} archivos, páginas {first}-{last} "
+        f"({matching:,} fragmentos cumplen el filtro); {args.queries} preguntas, k={args.k}."
+    )
+    print(f"\n📊 Búsqueda con filtros - {description}\n")
+    print_table(headers, rows)
+    write_report(args.output, "Búsqueda con filtros de metadatos", description, headers, rows)
+
+# ==============================================================================
+# PRUEBA: chunking (barrido de CHUNK_SIZE / CHUNK_OVERLAP)
+# ==============================================================================
+
+def normalize_text(text):
+    """Minúsculas, sin cortes de palabra con guion y con los espacios unificados."""
+    return " ".join(text.replace("-\n", "").split()).lower()
+
+
+def benchmark_chunking(args):
+    """
+    Prueba varias combinaciones de CHUNK_SIZE y CHUNK_OVERLAP.
+
+    Cada archivo se lee una sola vez y sus páginas se reutilizan en todas
+    las combinaciones. Cada combinación tiene su propio índice (una carpeta
+    aparte), pero el embedding de un texto se calcula una sola vez en todo
+    el barrido: los fragmentos que se repiten entre combinaciones (por
+    ejemplo, páginas cortas que caben enteras) no se vuelven a calcular.
+
+    Recall@k: proporción de preguntas cuyo pasaje esperado aparece en
+    alguno de los k fragmentos recuperados del archivo correcto.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from config import (EMBEDDING_MODEL, DEVICE, EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH,
+                        EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_SERVER_URL,
+                        CHUNK_SIZE, CHUNK_OVERLAP, TOP_K_DOCUMENTS)
+    from document_processor import DocumentProcessor
+    from embedding_cache import create_embeddings
+    from vector_store import NumpyVectorStore
+    from retrievers import fetch_candidates
+
+    sizes = [int(value) for value in args.sizes.split(",")]
+    overlaps = [int(value) for value in args.overlaps.split(",")]
+    k = args.k or TOP_K_DOCUMENTS
+    paths = args.files or [os.path.join(CORPUS_DIRECTORY, name) for name in CORPUS_FILES]
+    with open(args.questions, encoding="utf-8") as f:
+        questions = json.load(f)
+
+    # 1. Leer los archivos UNA sola vez (con el caché de texto, ni eso)
+    start = time.perf_counter()
+    pages, failed_files = DocumentProcessor(parallel_loading=False).load_multiple_files(paths)
+    parse_seconds = time.perf_counter() - start
+    if failed_files:
+        print(f"⚠️ No se pudieron leer: {', '.join(failed_files)}")
+
+    embeddings = create_embeddings(
+        EMBEDDING_MODEL, device=DEVICE,
+        cache_path=EMBEDDING_CACHE_PATH if EMBEDDING_CACHE_ENABLED else None,
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+        server_url=EMBEDDING_SERVER_URL or None
+    )
+    question_vectors = [embeddings.embed_query(item['question']) for item in questions]
+    expected = [normalize_text(item['expected']) for item in questions]
+
+    # Embeddings compartidos por todas las combinaciones: texto → vector
+    vectors_by_text = {}
+    workdir = tempfile.mkdtemp(prefix="bench_chunking_")
+    rows, results = [], []
+
+    try:
+        for size in sizes:
+            for overlap in overlaps:
+                if overlap >= size:
+                    print(f"⚠️ Se omite tamaño {size} / superposición {overlap} "
+                          f"(la superposición debe ser menor que el tamaño)")
+                    continue
+
+                # 2. Dividir, calcular solo los embeddings nuevos y crear el índice
+                start = time.perf_counter()
+                splitter = RecursiveCharacterTextSplitter(chunk_size=size, chunk_overlap=overlap)
+                splits = splitter.split_documents(pages)
+                texts = [split.page_content for split in splits]
+                new_texts = list(dict.fromkeys(text for text in texts
+                                               if text not in vectors_by_text))
+                if new_texts:
+                    vectors_by_text.update(zip(new_texts, embeddings.embed_documents(new_texts)))
+
+                directory = os.path.join(workdir, f"size{size}_overlap{overlap}")
+                store = NumpyVectorStore(directory, embeddings)
+                store.add_embeddings(texts, [vectors_by_text[text] for text in texts],
+                                     [split.metadata for split in splits])
+                ingest_seconds = time.perf_counter() - start
+
+                # Tamaño del índice: vectores guardados + tabla de textos y metadatos
+                dim = len(vectors_by_text[texts[0]]) if texts else 0
+                index_bytes = store.count() * dim * store.dtype.itemsize + sum(
+                    os.path.getsize(os.path.join(directory, name))
+                    for name in os.listdir(directory) if name.startswith("chunks.sqlite3")
+                )
+
+                # 3. Las mismas preguntas en cada combinación
+                latencies, hits = [], 0
+                for item, query, passage in zip(questions, question_vectors, expected):
+                    t0 = time.perf_counter()
+                    documents, _ = fetch_candidates(store, query, k)
+                    latencies.append(time.perf_counter() - t0)
+                    source = item.get('source')
+                    hits += any(
+                        passage in normalize_text(doc.page_content)
+                        and (not source or os.path.basename(doc.metadata['source']) == source)
+                        for doc in documents
+                    )
+                recall = hits / len(questions) if questions else 0.0
+
+                current = " ← actual" if (size, overlap) == (CHUNK_SIZE, CHUNK_OVERLAP) else ""
+                results.append((recall, -len(texts), size, overlap))
+                rows.append((
+                    f"{size}{current}", overlap, f"{len(texts):,}", f"{len(new_texts):,}",
+                    f"{index_bytes / 1024 / 1024:.2f}", f"{ingest_seconds:.2f}",
+                    f"{percentile_ms(latencies, 50):.2f}", f"{percentile_ms(latencies, 95):.2f}",
+                    f"{recall:.2f}"
+                ))
+                print(f"   ✂️ {size}/{overlap}: {len(texts):,} fragmentos, "
+                      f"recall@{k} {recall:.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    headers = ["CHUNK_SIZE", "CHUNK_OVERLAP", "Fragmentos", "Embeddings nuevos",
+               "Índice (MB)", "Ingesta (s)", "p50 (ms)", "p95 (ms)", f"Recall@{k}"]
+    description = (
+        f"{len(paths)} archivo(s), {len(pages)} página(s) leídas una sola vez en "
+        f"{parse_seconds:.2f} s; {len(questions)} preguntas de {os.path.basename(args.questions)}, "
+        f"k={k}. {len(vectors_by_text):,} embeddings calculados en total "
+        f"(cada texto distinto, una sola vez)."
+    )
+    print(f"\n📊 Barrido de chunking - {description}\n")
+    print_table(headers, rows)
+    if results:
+        # Mejor recall; a igual recall, menos fragmentos (índice más pequeño)
+        best = max(results)
+        print(f"\n🏆 Mejor combinación: CHUNK_SIZE = {best[2]}, CHUNK_OVERLAP = {best[3]} "
+              f"(recall@{k} {best[0]:.2f})")
+    write_report(args.output, "Barrido de CHUNK_SIZE / CHUNK_OVERLAP", description, headers, rows)
+
+# ==============================================================================
+# PROGRAMA PRINCIPAL
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Pruebas de rendimiento del chatbot RAG")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    vs = subparsers.add_parser("vector-store", help="ChromaDB vs NumpyVectorStore")
+    vs.add_argument("--chunks", type=int, default=100_000, help="Fragmentos a indexar")
+    vs.add_argument("--queries", type=int, default=200, help="Preguntas a medir")
+    vs.add_argument("--k", type=int, default=5, help="Resultados por pregunta")
+    vs.set_defaults(func=benchmark_vector_store)
+
+    ann = subparsers.add_parser("ann", help="Recall@k vs velocidad del índice IVF")
+    ann.add_argument("--scale", type=int, default=0,
+                     help="Ampliar el corpus hasta N vectores (con ruido)")
+    ann.add_argument("--queries", type=int, default=200, help="Preguntas a medir")
+    ann.add_argument("--k", type=int, default=5, help="Resultados por pregunta")
+    ann.add_argument("--nlist", type=int, default=0, help="Grupos IVF (0 = IVF_NLIST)")
+    ann.add_argument("--output", help="Guardar el reporte en este archivo Markdown")
+    ann.set_defaults(func=benchmark_ann)
+
+    quant = subparsers.add_parser("quantization", help="Memoria y recall de int8 / binaria")
+    quant.add_argument("--scale", type=int, default=0,
+                       help="Ampliar el corpus hasta N vectores (con ruido)")
+    quant.add_argument("--queries", type=int, default=200, help="Preguntas a medir")
+    quant.add_argument("--k", type=int, default=0, help="Resultados por pregunta (0 = TOP_K_DOCUMENTS)")
+    quant.add_argument("--rerank", default="2,10,50",
+                       help="Factores de re-ranking a probar, separados por comas")
+    quant.add_argument("--output", help="Guardar el reporte en este archivo Markdown")
+    quant.set_defaults(func=benchmark_quantization)
+
+    gateway = subparsers.add_parser("gateway", help="Coalescencia y límites de la puerta del LLM")
+    gateway.add_argument("--users", type=int, default=40, help="Usuarios preguntando a la vez")
+    gateway.add_argument("--distinct", type=int, default=3, help="Preguntas distintas entre todos")
+    gateway.add_argument("--delay", type=float, default=0.5, help="Segundos por respuesta del LLM falso")
+    gateway.add_argument("--fail-every", type=int, default=2,
+                         help="El LLM falso responde 429 una de cada N llamadas (0 = nunca)")
+    gateway.add_argument("--concurrency", type=int, default=4, help="Llamadas simultáneas máximas")
+    gateway.add_argument("--rpm", type=float, default=0, help="Llamadas por minuto (0 = sin límite)")
+    gateway.set_defaults(func=benchmark_gateway)
+
+    chat = subparsers.add_parser("chat-load", help="Latencia del chat con usuarios simultáneos")
+    chat.add_argument("--users", default="1,10,50",
+                      help="Usuarios simultáneos a probar, separados por comas")
+    chat.add_argument("--delay", type=float, default=1.0, help="Segundos por respuesta del LLM falso")
+    chat.add_argument("--llm-concurrency", type=int, default=0,
+                      help="Llamadas simultáneas al LLM (0 = LLM_MAX_CONCURRENCY)")
+    chat.add_argument("--output", help="Guardar el reporte en este archivo Markdown")
+    chat.set_defaults(func=benchmark_chat_load)
+
+    startup = subparsers.add_parser("startup", help="Arranque normal vs arranque rápido")
+    startup.add_argument("--runs", type=int, default=3, help="Arranques a medir de cada tipo")
+    startup.add_argument("--port", type=int, default=7861, help="Puerto para la app de prueba")
+    startup.add_argument("--output", help="Guardar el reporte en este archivo Markdown")
+    startup.set_defaults(func=benchmark_startup)
+
+    filters = subparsers.add_parser("filters", help="Filtro antes de buscar vs buscar y descartar")
+    filters.add_argument("--chunks", type=int, default=100_000, help="Fragmentos a indexar")
+    filters.add_argument("--sources", type=int, default=50, help="Archivos distintos")
+    filters.add_argument("--pages", type=int, default=300, help="Páginas por archivo")
+    filters.add_argument("--filter-sources", type=int, default=3, help="Archivos del filtro")
+    filters.add_argument("--page-range", type=lambda text: tuple(map(int, text.split("-"))),
+                         default=(10, 40), help="Páginas del filtro, ej: 10-40")
+    filters.add_argument("--overfetch", type=int, default=20,
+                         help="Candidatos por resultado al filtrar después")
+    filters.add_argument("--queries", type=int, default=200, help="Preguntas a medir")
+    filters.add_argument("--k", type=int, default=5, help="Resultados por pregunta")
+    filters.add_argument("--output", help="Guardar el reporte en este archivo Markdown")
+    filters.set_defaults(func=benchmark_filters)
+
+    chunking = subparsers.add_parser("chunking", help="Barrido de CHUNK_SIZE / CHUNK_OVERLAP")
+    chunking.add_argument("--sizes", default="500,1000,1500,2000",
+                          help="Tamaños de fragmento a probar, separados por comas")
+    chunking.add_argument("--overlaps", default="0,100,250",
+                          help="Superposiciones a probar, separadas por comas")
+    chunking.add_argument("--files", nargs="*",
+                          help="Archivos a cargar (por defecto, el corpus de la Clase 23)")
+    chunking.add_argument("--questions", default=QUESTIONS_PATH,
+                          help="JSON con las preguntas y el pasaje esperado de cada una")
+    chunking.add_argument("--k", type=int, default=0, help="Resultados por pregunta (0 = TOP_K_DOCUMENTS)")
+    chunking.add_argument("--output", help="Guardar el reporte en este archivo Markdown")
+    chunking.set_defaults(func=benchmark_chunking)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
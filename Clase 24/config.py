@@ -29,6 +29,46 @@ load_dotenv()
 # ChromaDB es nuestra base de datos vectorial que almacena los embeddings
 PERSIST_DIRECTORY = "db_chroma"
 
+# Motor de la base de datos vectorial
+# - "chroma": ChromaDB (opción por defecto)
+# - "numpy": matriz NumPy en disco (memory-mapped), ver vector_store.py
+#   Más rápida de abrir y de consultar con cientos de miles de fragmentos
+VECTOR_BACKEND = "chroma"
+
+# Directorio del almacén NumPy (solo si VECTOR_BACKEND = "numpy")
+NUMPY_STORE_DIRECTORY = "db_numpy"
+
+# Precisión de los vectores del almacén NumPy
+# "float32" = precisión completa, "float16" = la mitad de espacio en disco
+# (float16 ahorra espacio, pero cada búsqueda debe convertir a float32)
+NUMPY_STORE_DTYPE = "float32"
+
+# Índice de búsqueda del almacén NumPy (ver ann_index.py)
+# - "flat": búsqueda exacta, compara la pregunta con todos los fragmentos
+# - "ivf": búsqueda aproximada, mucho más rápida con millones de fragmentos
+VECTOR_INDEX = "flat"
+
+# Número de grupos (clusters) del índice IVF
+# Regla práctica: ~ raíz cuadrada del número de fragmentos
+# El índice se entrena solo cuando hay al menos IVF_NLIST * 39 fragmentos
+IVF_NLIST = 256
+
+# Grupos visitados en cada búsqueda IVF
+# Más grupos = resultados más exactos (recall) pero búsquedas más lentas
+IVF_NPROBE = 8
+
+# Cuantización de los vectores del almacén NumPy (ver quantization.py)
+# - "none": la búsqueda usa los vectores completos
+# - "int8": primera etapa con códigos de 1 byte por dimensión (4x menos memoria)
+# - "binary": primera etapa con 1 bit por dimensión (32x menos memoria)
+# Los vectores completos se siguen guardando en disco para el re-ranking
+VECTOR_QUANTIZATION = "none"
+
+# Candidatos de la primera etapa que se re-puntúan con los vectores completos,
+# por cada resultado pedido (candidatos = k * RERANK_FACTOR)
+# La cuantización binaria necesita un factor más alto que int8
+RERANK_FACTOR = 10
+
 # ==============================================================================
 # 3. CONFIGURACIÓN DEL MODELO DE EMBEDDINGS
 # ==============================================================================
@@ -41,6 +81,32 @@ EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 # Para este ejemplo usamos CPU. Si tienes GPU, cambia a 'cuda'
 DEVICE = 'cpu'
 
+# Caché de embeddings en disco
+# Guarda los vectores ya calculados para no repetir el cálculo cuando se
+# vuelve a cargar el mismo texto. Por defecto se guarda en la carpeta del
+# usuario, así lo comparten esta app y los scripts de la Clase 23.
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "iapython", "embeddings.sqlite3")
+)
+
+# Número máximo de vectores en el caché (~1.5 KB cada uno con MiniLM)
+EMBEDDING_CACHE_MAX_ENTRIES = 100_000
+
+# Servicio de embeddings compartido (ver embedding_server.py)
+# Un solo proceso tiene el modelo cargado y lo usan la app y los scripts
+# de la Clase 23. Se arranca con: python embedding_server.py
+# Si no está en marcha, cada proceso carga su propio modelo (como antes).
+# EMBEDDING_SERVER_URL= (vacío) desactiva el servicio.
+EMBEDDING_SERVER_URL = os.getenv("EMBEDDING_SERVER_URL", "http://127.0.0.1:8765")
+
+# Agrupación de peticiones en el servidor (micro-batching): espera hasta
+# EMBEDDING_SERVER_BATCH_WAIT_MS a que lleguen más textos, con un máximo
+# de EMBEDDING_SERVER_MAX_BATCH textos por pasada del modelo
+EMBEDDING_SERVER_MAX_BATCH = 64
+EMBEDDING_SERVER_BATCH_WAIT_MS = 5
+
 # ==============================================================================
 # 4. CONFIGURACIÓN DEL MODELO DE LENGUAJE (LLM)
 # ==============================================================================
@@ -52,6 +118,21 @@ LLM_MODEL = "gemini-2.5-flash"
 # Nombre del proveedor del LLM (para referencia)
 LLM_PROVIDER = "Google Gemini"
 
+# Puerta de acceso al LLM (ver llm_gateway.py)
+# Llamadas simultáneas máximas a Gemini
+LLM_MAX_CONCURRENCY = 4
+
+# Llamadas por minuto permitidas (0 = sin límite)
+# Ajústalo a la cuota de tu API key para evitar errores 429
+LLM_REQUESTS_PER_MINUTE = 60
+
+# Reintentos ante errores 429 (límite de uso) o 5xx (error del servidor)
+LLM_MAX_RETRIES = 4
+
+# Espera del primer reintento y espera máxima entre reintentos (segundos)
+LLM_RETRY_BASE_DELAY = 1.0
+LLM_RETRY_MAX_DELAY = 30.0
+
 # ==============================================================================
 # 5. CONFIGURACIÓN DEL PROCESAMIENTO DE DOCUMENTOS
 # ==============================================================================
@@ -59,12 +140,56 @@ LLM_PROVIDER = "Google Gemini"
 # Tamaño de cada fragmento (chunk) de texto en caracteres
 # Un chunk más grande = más contexto pero menos precisión
 # Un chunk más pequeño = más precisión pero menos contexto
+# Para comparar varios valores sin recargar la base:
+#   python benchmark.py chunking --sizes 500,1000,1500 --overlaps 0,250
 CHUNK_SIZE = 1500
 
 # Superposición entre chunks consecutivos
 # Esto ayuda a mantener el contexto entre fragmentos
 CHUNK_OVERLAP = 250
 
+# Caché del texto extraído de los archivos (ver text_cache.py)
+# Leer un PDF es lento: el texto de cada página se guarda comprimido la
+# primera vez, y volver a cargar el mismo archivo (por ejemplo, después de
+# cambiar CHUNK_SIZE) ya no lo vuelve a leer
+TEXT_CACHE_ENABLED = True
+TEXT_CACHE_DIRECTORY = os.getenv(
+    "TEXT_CACHE_DIRECTORY",
+    os.path.join(os.path.expanduser("~"), ".cache", "iapython", "textos")
+)
+
+# Tamaño máximo del caché de texto en disco (MB)
+TEXT_CACHE_MAX_MB = 500
+
+# Carga de archivos en paralelo
+# Leer PDFs consume mucha CPU. Con esta opción los archivos se reparten entre
+# varios procesos (uno por núcleo) en lugar de cargarse uno detrás de otro.
+PARALLEL_LOADING = True
+
+# Número máximo de procesos para la carga en paralelo
+# None = usar todos los núcleos disponibles (os.cpu_count())
+LOAD_MAX_WORKERS = None
+
+# Ingesta en streaming (cargar → dividir → embeddings → guardar, por lotes)
+# En lugar de tener todas las páginas y fragmentos en memoria a la vez,
+# se procesan en lotes pequeños y la interfaz muestra el progreso.
+# Con varios archivos, su texto se extrae en paralelo (PARALLEL_LOADING)
+# dentro del caché de texto: requiere TEXT_CACHE_ENABLED = True
+STREAMING_INGESTION = True
+
+# Número de fragmentos por lote de embeddings/guardado
+INGEST_BATCH_SIZE = 64
+
+# Lotes máximos esperando a ser guardados (control de memoria)
+# Si la lectura de archivos va más rápido que los embeddings, se detiene
+# hasta que haya sitio. La memoria usada no crece con el tamaño del corpus.
+MAX_IN_FLIGHT_BATCHES = 2
+
+# Fragmentos eliminados por llamada al borrar un archivo
+# Los borrados grandes se parten en lotes de este tamaño para no bloquear
+# la base (ni superar el máximo por llamada de ChromaDB)
+DELETE_BATCH_SIZE = 5000
+
 # ==============================================================================
 # 6. CONFIGURACIÓN DEL RETRIEVER
 # ==============================================================================
@@ -73,6 +198,68 @@ CHUNK_OVERLAP = 250
 # Más documentos = más contexto pero puede incluir información irrelevante
 TOP_K_DOCUMENTS = 5
 
+# Modo de búsqueda (ver retrievers.py)
+# - "vector": solo búsqueda vectorial (por significado)
+# - "hybrid": búsqueda vectorial + búsqueda por palabras (BM25), combinadas
+#   Encuentra mejor códigos, nombres propios y siglas
+# - "mmr": búsqueda vectorial con diversidad (evita fragmentos repetidos)
+RETRIEVER_MODE = "vector"
+
+# Candidatos entre los que MMR elige los TOP_K_DOCUMENTS más diversos
+MMR_FETCH_K = 20
+
+# Balance de MMR: 1.0 = solo relevancia, 0.0 = solo diversidad
+MMR_LAMBDA = 0.5
+
+# Candidatos que aporta cada búsqueda (vectorial y BM25) antes de combinarlas
+HYBRID_FETCH_K = 20
+
+# Presupuesto de tokens del {context} que se envía al LLM (ver context_packer.py)
+# Los fragmentos vecinos se unen sin repetir su solapamiento y se añaden,
+# del más al menos relevante, mientras quepan. 0 = sin límite
+CONTEXT_TOKEN_BUDGET = 2000
+
+# Caracteres por token para estimar el tamaño del contexto (aproximación)
+CHARS_PER_TOKEN = 4
+
+# Constante de Reciprocal Rank Fusion (cuanto menor, más pesan los primeros puestos)
+RRF_K = 60
+
+# Archivo del índice de palabras (BM25), solo si RETRIEVER_MODE = "hybrid"
+# Se mantiene al día en cada carga; si falta, se reconstruye al arrancar
+SPARSE_INDEX_PATH = os.path.join("db_bm25", "bm25.npz")
+
+# Índice de metadatos (archivo → fragmentos, página → fragmentos), usado
+# para filtrar ANTES de buscar (ver metadata_index.py). Se mantiene al día
+# en cada carga; si falta, se reconstruye al arrancar
+METADATA_INDEX_PATH = os.path.join("db_metadatos", "metadatos.json")
+
+# Estadísticas de la base (ver kb_stats.py): se actualizan en cada carga
+# o borrado, así mostrarlas no consulta la base vectorial
+KB_STATS_PATH = os.path.join("db_metadatos", "estadisticas.json")
+
+# Cargas recordadas en el historial de velocidad de los embeddings
+KB_STATS_HISTORY = 20
+
+# Filas de las tablas de estadísticas en la pestaña "📚 Base de Conocimiento"
+STATS_MAX_SOURCES = 10
+STATS_MAX_HISTORY_ROWS = 5
+
+# Caché de respuestas (ver answer_cache.py)
+# Las preguntas repetidas se responden al instante, sin llamar a Gemini.
+# Se vacía automáticamente al cargar documentos o limpiar la base
+ANSWER_CACHE_ENABLED = True
+
+# Respuestas máximas guardadas (se borran las menos usadas)
+ANSWER_CACHE_MAX_ENTRIES = 256
+
+# Segundos que una respuesta guardada sigue siendo válida
+ANSWER_CACHE_TTL_SECONDS = 3600
+
+# Similitud mínima (0 a 1) para reutilizar la respuesta de una pregunta
+# parecida pero no idéntica. 0 = solo preguntas idénticas
+ANSWER_CACHE_SIMILARITY = 0.95
+
 # ==============================================================================
 # 7. PLANTILLA DE PROMPT PARA RAG
 # ==============================================================================
@@ -118,6 +305,19 @@ ALLOWED_FILE_TYPES = [".txt", ".pdf"]
 # Tema de la interfaz (puede ser: Soft, Base, Default, Glass, Monochrome)
 UI_THEME = "soft"
 
+# Preguntas del chat que se atienden a la vez (el resto espera en la cola)
+# El chat es async: esperar a Gemini no ocupa un hilo por usuario, así que
+# el límite real de llamadas simultáneas lo pone LLM_MAX_CONCURRENCY
+CHAT_CONCURRENCY_LIMIT = 50
+
+# Peticiones máximas esperando en la cola de Gradio (None = sin límite)
+QUEUE_MAX_SIZE = 200
+
+# Arranque rápido: la interfaz se abre enseguida y los modelos (embeddings,
+# ChromaDB, Gemini) se cargan en segundo plano (ver app_components.py).
+# Se puede cambiar sin tocar el código: FAST_START=0 python app_refactorizado.py
+FAST_START = os.getenv("FAST_START", "1") != "0"
+
 # ==============================================================================
 # 9. MENSAJES DE LA APLICACIÓN
 # ==============================================================================
@@ -136,6 +336,26 @@ ERROR_NO_API_KEY = "❌ Error: No se encontró la GOOGLE_API_KEY en las variable
 ERROR_MODEL_LOAD = "❌ Error al cargar el modelo"
 ERROR_FILE_PROCESSING = "❌ Error al procesar archivos"
 
+# ==============================================================================
+# 10. TRAZAS Y MÉTRICAS
+# ==============================================================================
+
+# Medir la duración de cada etapa (load, split, embed, upsert, retrieve,
+# prompt, llm); ver tracing.py
+TRACING_ENABLED = True
+
+# Archivo donde se exporta cada span como una línea JSON (None = no exportar)
+TRACE_FILE = os.path.join("trazas", "spans.jsonl")
+
+# Spans recientes por etapa usados para calcular p50/p95
+TRACE_WINDOW = 500
+
+# Puerto del endpoint /metrics en formato Prometheus (0 = desactivado)
+# Se puede cambiar sin tocar el código: METRICS_PORT=9465 (o 0) en el .env.
+# Si el puerto está ocupado (otra instancia de la app), la app arranca igual
+# sin métricas.
+METRICS_PORT = int(os.getenv("METRICS_PORT") or 9464)
+
 # ==============================================================================
 # NOTAS PARA ESTUDIANTES
 # ==============================================================================
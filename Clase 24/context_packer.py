@@ -0,0 +1,202 @@
+"""
+context_packer.py - Armado del Contexto para el LLM
+===================================================
+
+Los fragmentos vecinos de un documento comparten CHUNK_OVERLAP caracteres
+(el final de uno es el principio del siguiente). Si la búsqueda devuelve
+varios vecinos, el {context} del prompt repite ese texto varias veces:
+pagamos esos tokens a Gemini y la respuesta tarda más.
+
+Este módulo arma el contexto en tres pasos:
+1. UNIR: los fragmentos de la misma fuente y página que se solapan se
+   unen en un solo bloque, sin repetir el texto compartido
+2. PRIORIZAR: cada bloque conserva el puesto del mejor fragmento que contiene
+3. EMPAQUETAR: se añaden bloques, del más al menos relevante, mientras
+   quepan en el presupuesto de tokens (CONTEXT_TOKEN_BUDGET)
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import math
+
+# Longitud mínima de un solapamiento para unir dos fragmentos
+# (evita unir textos que solo coinciden en unas pocas letras)
+MIN_OVERLAP_CHARS = 20
+
+# ==============================================================================
+# FUNCIONES
+# ==============================================================================
+
+def estimate_tokens(text, chars_per_token=4):
+    """
+    Estima los tokens de un texto.
+
+    No tenemos el tokenizador de Gemini en local; ~4 caracteres por token
+    es una aproximación habitual para textos en español e inglés.
+
+    Args:
+        text (str): Texto
+        chars_per_token (float): Caracteres por token
+
+    Returns:
+        int: Tokens estimados
+    """
+    return math.ceil(len(text) / chars_per_token)
+
+
+def overlap_length(first, second, max_overlap):
+    """
+    Longitud del mayor final de 'first' que es a la vez principio de 'second'.
+
+    Args:
+        first (str): Texto anterior
+        second (str): Texto siguiente
+        max_overlap (int): Solapamiento máximo a buscar
+
+    Returns:
+        int: Caracteres compartidos (0 si no se solapan)
+
+    Ejemplo:
+        >>> overlap_length("RAG combina búsqueda y generación de texto",
+        ...                "búsqueda y generación de texto con un LLM", 300)
+        30
+    """
+    tail = first[-max_overlap:]
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+
+    # El primer comienzo posible es el solapamiento más largo
+    start = tail.find(probe)
+    while start != -1:
+        if second.startswith(tail[start:]):
+            return len(tail) - start
+        start = tail.find(probe, start + 1)
+    return 0
+
+
+def _merge_group(documents, max_overlap):
+    """
+    Une los fragmentos (de una misma fuente y página) que se solapan.
+
+    Args:
+        documents (list): Lista de (puesto, texto)
+        max_overlap (int): Solapamiento máximo a buscar
+
+    Returns:
+        list: Lista de (mejor_puesto, texto_unido, fragmentos_unidos)
+    """
+    blocks = [(rank, text, 1) for rank, text in documents]
+
+    merged = True
+    while merged and len(blocks) > 1:
+        merged = False
+        for i in range(len(blocks)):
+            for j in range(len(blocks)):
+                if i == j:
+                    continue
+                rank_i, text_i, count_i = blocks[i]
+                rank_j, text_j, count_j = blocks[j]
+                shared = overlap_length(text_i, text_j, max_overlap)
+                if shared:
+                    # text_j continúa a text_i: se une sin repetir lo compartido
+                    blocks[i] = (min(rank_i, rank_j), text_i + text_j[shared:], count_i + count_j)
+                    del blocks[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return blocks
+
+
+def pack_context(documents, token_budget, max_overlap=300, chars_per_token=4,
+                 separator="\n\n"):
+    """
+    Arma el texto del {context} a partir de los documentos recuperados.
+
+    Args:
+        documents (list): Documentos de LangChain, del más al menos relevante
+        token_budget (int): Tokens máximos del contexto (0 = sin límite)
+        max_overlap (int): Solapamiento máximo a buscar (≥ CHUNK_OVERLAP)
+        chars_per_token (float): Caracteres por token (ver estimate_tokens)
+        separator (str): Separador entre bloques
+
+    Returns:
+        tuple: (texto_del_contexto, estadísticas)
+            estadísticas = {
+                'documents': int,       # Documentos recibidos
+                'blocks': int,          # Bloques tras unir solapamientos
+                'blocks_used': int,     # Bloques que cupieron en el presupuesto
+                'tokens_before': int,   # Tokens sin armar (todo concatenado)
+                'tokens_after': int,    # Tokens del contexto final
+                'tokens_saved': int     # Diferencia
+            }
+    """
+    naive = separator.join(doc.page_content for doc in documents)
+
+    # 1. Agrupar por fuente y página, descartando textos repetidos
+    groups = {}
+    seen = set()
+    for rank, doc in enumerate(documents):
+        text = doc.page_content.strip()
+        if not text or text in seen:
+            continue
+        seen.add(text)
+        key = (doc.metadata.get('source'), doc.metadata.get('page'))
+        groups.setdefault(key, []).append((rank, text))
+
+    # 2. Unir solapamientos dentro de cada grupo y ordenar por relevancia
+    blocks = []
+    for group in groups.values():
+        blocks.extend(_merge_group(group, max_overlap))
+    blocks.sort(key=lambda block: block[0])
+
+    # 3. Empaquetar de forma voraz dentro del presupuesto
+    separator_tokens = estimate_tokens(separator, chars_per_token)
+    selected, used = [], 0
+    for _, text, _ in blocks:
+        cost = estimate_tokens(text, chars_per_token) + (separator_tokens if selected else 0)
+        if token_budget and used + cost > token_budget:
+            continue
+        selected.append(text)
+        used += cost
+
+    if not selected and blocks:
+        # Ni el bloque más relevante cabe: se recorta para no dejar el contexto vacío
+        selected.append(blocks[0][1][:int(token_budget * chars_per_token)])
+
+    context = separator.join(selected)
+    tokens_before = estimate_tokens(naive, chars_per_token)
+    tokens_after = estimate_tokens(context, chars_per_token)
+    return context, {
+        'documents': len(documents),
+        'blocks': len(blocks),
+        'blocks_used': len(selected),
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_after,
+        'tokens_saved': tokens_before - tokens_after
+    }
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. TOKENS:
+   - Los LLM cobran y tardan según los tokens del prompt y de la respuesta
+   - Menos tokens repetidos = respuestas más baratas y más rápidas
+
+2. SOLAPAMIENTO (CHUNK_OVERLAP):
+   - Ayuda a que una idea no quede cortada entre dos fragmentos
+   - Pero si se recuperan los dos, el texto compartido aparece dos veces
+
+3. ALGORITMO VORAZ (greedy):
+   - Se toma siempre la mejor opción disponible que cabe
+   - No garantiza la combinación óptima, pero es simple y rápido
+
+💡 EXPERIMENTO SUGERIDO:
+   Baja CONTEXT_TOKEN_BUDGET en config.py y observa en la consola cuántos
+   tokens se ahorran y cuántos bloques dejan de caber.
+"""
@@ -14,16 +14,112 @@ Autor: Clase 24 - IA Python para Principiantes
 Fecha: 2025
 """
 
-from langchain_huggingface import HuggingFaceEmbeddings
+import hashlib
+import os
+import time
 from langchain_chroma import Chroma
+from embedding_cache import create_embeddings, TracedEmbeddings
+from vector_store import NumpyVectorStore
+from sparse_index import BM25Index
+from metadata_index import MetadataIndex
+from kb_stats import KnowledgeBaseStats
+from retrievers import HybridRetriever, MMRRetriever, FilteredRetriever
+from tracing import tracer
 from config import (
     PERSIST_DIRECTORY,
+    VECTOR_BACKEND,
+    NUMPY_STORE_DIRECTORY,
+    NUMPY_STORE_DTYPE,
+    VECTOR_INDEX,
+    IVF_NLIST,
+    IVF_NPROBE,
+    VECTOR_QUANTIZATION,
+    RERANK_FACTOR,
+    RETRIEVER_MODE,
+    HYBRID_FETCH_K,
+    RRF_K,
+    MMR_FETCH_K,
+    MMR_LAMBDA,
+    DELETE_BATCH_SIZE,
+    SPARSE_INDEX_PATH,
+    METADATA_INDEX_PATH,
+    KB_STATS_PATH,
+    KB_STATS_HISTORY,
+    STATS_MAX_SOURCES,
+    STATS_MAX_HISTORY_ROWS,
     EMBEDDING_MODEL,
     DEVICE,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_SERVER_URL,
+    TRACING_ENABLED,
     MSG_LOADING_MODELS,
     MSG_MODELS_LOADED
 )
 
+# ==============================================================================
+# FUNCIONES AUXILIARES: huellas digitales (hashes) de archivos y fragmentos
+# ==============================================================================
+
+def _hash_text(text):
+    """
+    Calcula la huella SHA-256 de un texto.
+    
+    Dos textos idénticos siempre producen la misma huella, y un cambio
+    mínimo produce una huella completamente distinta.
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _hash_file(file_path, block_size=1024 * 1024):
+    """
+    Calcula la huella SHA-256 del contenido de un archivo.
+    
+    Se lee por bloques para no cargar archivos grandes completos en memoria.
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _source_key(source):
+    """
+    Obtiene la clave que identifica a un archivo entre distintas cargas.
+    
+    Gradio guarda cada subida en una carpeta temporal distinta, así que
+    usamos el nombre del archivo (sin la carpeta) para reconocer que
+    "documento.pdf" es el mismo documento aunque se suba otra vez.
+    
+    La contrapartida: dos documentos distintos con el mismo nombre (de
+    carpetas distintas) comparten clave y el segundo reemplaza al primero.
+    begin_source lo avisa (ver 'name_conflicts' en el resumen de la carga).
+    """
+    return os.path.basename(str(source))
+
+
+def _format_bytes(size):
+    """
+    Convierte un número de bytes en texto legible ("3.2 MB").
+    """
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _chunk_id(source_key, chunk_hash, occurrence):
+    """
+    Genera un ID determinista para un fragmento.
+    
+    El mismo texto del mismo archivo siempre recibe el mismo ID, por lo que
+    volver a cargarlo no crea duplicados. 'occurrence' distingue fragmentos
+    con texto idéntico dentro del mismo archivo.
+    """
+    return _hash_text(f"{source_key}\x00{chunk_hash}\x00{occurrence}")[:32]
+
 # ==============================================================================
 # CLASE: DatabaseManager
 # ==============================================================================
@@ -38,6 +134,8 @@ class DatabaseManager:
     Atributos:
         embeddings: Modelo que convierte texto en vectores numéricos
         vectordb: Cliente de ChromaDB para almacenar y buscar vectores
+        version: Contador que sube cada vez que cambia el contenido
+            (lo usa el caché de respuestas para saber si sigue siendo válido)
     """
     
     def __init__(self):
@@ -57,6 +155,21 @@ class DatabaseManager:
         # Inicializar la base de datos vectorial ChromaDB
         self.vectordb = self._initialize_database()
         
+        # Índice de palabras (BM25) para la búsqueda híbrida (None si no se usa)
+        self.sparse_index = self._initialize_sparse_index()
+        
+        # Índice de archivo/página/fecha de cada fragmento (para los filtros)
+        self.metadata_index = self._initialize_metadata_index()
+        
+        # Contadores de la base (fragmentos, archivos, páginas, bytes...)
+        self.kb_stats = self._initialize_kb_stats()
+        
+        # ¿Hay cambios en los índices que aún no se guardaron? (ver save_indexes)
+        self._indexes_dirty = False
+        
+        # Versión del contenido: sube con cada carga o limpieza
+        self.version = 0
+        
         print(MSG_MODELS_LOADED)
     
     def _initialize_embeddings(self):
@@ -66,16 +179,30 @@ class DatabaseManager:
         Los embeddings son representaciones numéricas del texto que capturan
         su significado semántico. Textos similares tienen embeddings similares.
         
+        Si EMBEDDING_CACHE_ENABLED está activado, el modelo se envuelve en
+        un caché en disco (ver embedding_cache.py): los textos ya vistos no
+        se vuelven a calcular.
+        
+        Si el servicio de embeddings (EMBEDDING_SERVER_URL) está en marcha,
+        el modelo no se carga en este proceso: se le piden los vectores
+        al servicio (ver embedding_server.py).
+        
         Returns:
-            HuggingFaceEmbeddings: Modelo de embeddings listo para usar
+            Embeddings: Modelo de embeddings listo para usar
             
         Nota para estudiantes:
             El prefijo '_' indica que es un método "privado" (para uso interno)
         """
-        embeddings = HuggingFaceEmbeddings(
-            model_name=EMBEDDING_MODEL,  # Modelo de Hugging Face a usar
-            model_kwargs={'device': DEVICE}  # Usar CPU o GPU
+        embeddings = create_embeddings(
+            EMBEDDING_MODEL,  # Modelo de Hugging Face a usar
+            device=DEVICE,    # Usar CPU o GPU
+            cache_path=EMBEDDING_CACHE_PATH if EMBEDDING_CACHE_ENABLED else None,
+            max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+            server_url=EMBEDDING_SERVER_URL or None
         )
+        if TRACING_ENABLED:
+            # Cada cálculo de embeddings queda medido como un span "embed"
+            embeddings = TracedEmbeddings(embeddings, tracer)
         return embeddings
     
     def _initialize_database(self):
@@ -87,64 +214,734 @@ class DatabaseManager:
         - Permite buscar documentos similares rápidamente
         - Persiste los datos en disco para no perderlos
         
+        Si en config.py se elige VECTOR_BACKEND = "numpy", se usa en su lugar
+        NumpyVectorStore (ver vector_store.py): una matriz NumPy en disco.
+        
         Returns:
-            Chroma: Cliente de ChromaDB inicializado
+            Chroma | NumpyVectorStore: Base de datos vectorial inicializada
         """
+        if VECTOR_BACKEND == "numpy":
+            return NumpyVectorStore(
+                NUMPY_STORE_DIRECTORY,       # Carpeta donde se guardan los datos
+                self.embeddings,             # Función para crear embeddings
+                dtype=NUMPY_STORE_DTYPE,     # float32 o float16
+                index=VECTOR_INDEX,          # Búsqueda exacta o aproximada (IVF)
+                nlist=IVF_NLIST,
+                nprobe=IVF_NPROBE,
+                quantization=VECTOR_QUANTIZATION,  # Primera etapa con códigos int8/binarios
+                rerank_factor=RERANK_FACTOR
+            )
+        
         vectordb = Chroma(
             persist_directory=PERSIST_DIRECTORY,  # Carpeta donde se guardan los datos
             embedding_function=self.embeddings     # Función para crear embeddings
         )
         return vectordb
     
-    def add_documents(self, documents):
+    def _initialize_sparse_index(self):
+        """
+        Abre el índice BM25 si RETRIEVER_MODE = "hybrid".
+        
+        Si el índice no coincide con la base vectorial (no existía, o se
+        cargaron documentos con la búsqueda híbrida desactivada), se
+        reconstruye a partir de los textos guardados.
+        
+        Returns:
+            BM25Index | None: Índice de palabras, o None si no se usa
+        """
+        if RETRIEVER_MODE != "hybrid":
+            return None
+        
+        sparse_index = BM25Index(SPARSE_INDEX_PATH)
+        collection = self._get_collection()
+        
+        if len(sparse_index) != collection.count():
+            print("🔤 Reconstruyendo el índice de palabras (BM25)...")
+            data = collection.get(include=["documents"])
+            sparse_index.clear()
+            sparse_index.add(data['ids'], data['documents'])
+            sparse_index.save()
+        
+        print(f"🔤 Índice BM25: {len(sparse_index):,} fragmentos, "
+              f"{sparse_index.vocabulary_size:,} palabras")
+        return sparse_index
+    
+    def _initialize_metadata_index(self):
+        """
+        Abre el índice de metadatos (archivo, página y fecha de carga).
+        
+        Igual que el índice BM25, si no coincide con la base vectorial se
+        reconstruye a partir de los metadatos guardados.
+        
+        Returns:
+            MetadataIndex: Índice para filtrar antes de buscar
+        """
+        metadata_index = MetadataIndex(METADATA_INDEX_PATH)
+        collection = self._get_collection()
+        
+        if len(metadata_index) != collection.count():
+            print("🗂️ Reconstruyendo el índice de metadatos...")
+            data = collection.get(include=["metadatas"])
+            metadata_index.clear()
+            metadata_index.add(data['ids'], data['metadatas'])
+            metadata_index.save()
+        
+        return metadata_index
+    
+    def _initialize_kb_stats(self):
+        """
+        Abre las estadísticas de la base (ver kb_stats.py).
+        
+        Se comparan con el índice de metadatos, que ya se comprobó contra
+        la base: si no coinciden, se recuentan una vez a partir de los
+        textos guardados.
+        
+        Returns:
+            KnowledgeBaseStats: Contadores de la base
+        """
+        kb_stats = KnowledgeBaseStats(KB_STATS_PATH, history_size=KB_STATS_HISTORY)
+        
+        if len(kb_stats) != len(self.metadata_index):
+            print("📊 Recontando las estadísticas de la base...")
+            collection = self._get_collection()
+            data = collection.get(include=["documents", "metadatas"])
+            vector_bytes = 0
+            if data['ids']:
+                # Tamaño de un embedding: se lee uno solo
+                probe = collection.get(ids=data['ids'][:1], include=["embeddings"])
+                vector_bytes = self._vector_bytes(len(probe['embeddings'][0]))
+            kb_stats.clear()
+            kb_stats.add(data['ids'], data['documents'], data['metadatas'], vector_bytes)
+            kb_stats.save()
+        
+        return kb_stats
+    
+    def _vector_bytes(self, dimensions):
         """
-        Añade documentos a la base de datos vectorial.
+        Bytes que ocupa en disco un embedding de 'dimensions' números.
+        
+        ChromaDB guarda float32 (4 bytes); el almacén NumPy usa su dtype.
+        """
+        if isinstance(self.vectordb, NumpyVectorStore):
+            return dimensions * self.vectordb.dtype.itemsize
+        return dimensions * 4
+    
+    def _get_collection(self):
+        """
+        Obtiene el objeto "colección" de la base de datos vectorial.
+        
+        Con ChromaDB es la colección interna; NumpyVectorStore ofrece los
+        mismos métodos (get, update, delete, count) directamente.
+        
+        Returns:
+            Collection | NumpyVectorStore: Objeto con get/update/delete/count
+        """
+        if isinstance(self.vectordb, NumpyVectorStore):
+            return self.vectordb
+        return self.vectordb._collection
+    
+    def add_documents(self, documents, split_settings=None):
+        """
+        Añade documentos a la base de datos vectorial de forma incremental.
         
         Proceso:
-        1. Los documentos se convierten en embeddings
-        2. Los embeddings se almacenan en ChromaDB
-        3. Se pueden buscar más tarde usando similaridad vectorial
+        1. Se agrupan los fragmentos por archivo de origen ('source')
+        2. Se calcula la huella (hash) del archivo y de cada fragmento
+        3. Si el archivo no cambió desde la última carga, se salta por completo
+        4. Si cambió, solo se crean embeddings de los fragmentos nuevos y se
+           eliminan los que ya no existen
+        5. Los embeddings se almacenan en ChromaDB con IDs deterministas
+        
+        Así, volver a subir el mismo archivo no duplica nada ni gasta CPU
+        calculando embeddings que ya tenemos.
         
         Args:
             documents (list): Lista de documentos procesados por LangChain
+            split_settings (str): Parámetros con que se dividieron
+                (ver DocumentProcessor.split_settings). Si cambian, los
+                archivos se vuelven a procesar aunque no hayan cambiado
             
         Returns:
-            int: Número de documentos añadidos
+            dict: Resumen de la carga
+                {
+                    'added': int,            # Fragmentos nuevos guardados
+                    'deleted': int,          # Fragmentos obsoletos eliminados
+                    'skipped': int,          # Fragmentos que ya existían
+                    'new_files': list,       # Archivos cargados por primera vez
+                    'unchanged_files': list, # Archivos sin cambios (saltados)
+                    'replaced_files': list,  # Archivos con contenido nuevo
+                    'name_conflicts': list   # Reemplazados desde otra carpeta
+                }
             
         Ejemplo:
             >>> db_manager = DatabaseManager()
-            >>> db_manager.add_documents([doc1, doc2, doc3])
+            >>> db_manager.add_documents([doc1, doc2, doc3])['added']
             3
+            >>> db_manager.add_documents([doc1, doc2, doc3])['added']  # Otra vez
+            0
         """
+        result = self.new_sync_result()
+        start = time.perf_counter()
+        
         try:
-            # Añadir los documentos a ChromaDB
-            # ChromaDB automáticamente crea los embeddings usando self.embeddings
-            self.vectordb.add_documents(documents)
+            # Agrupar los fragmentos por archivo, manteniendo el orden
+            groups = {}
+            for doc in documents:
+                source = doc.metadata.get('source', '')
+                groups.setdefault(_source_key(source), []).append(doc)
+            
+            for key, docs in groups.items():
+                file_hash = self._compute_file_hash(docs)
+                status = self._sync_source(key, file_hash, docs, result, split_settings)
+                result[f"{status}_files"].append(key)
             
-            # Retornar el número de documentos añadidos
-            return len(documents)
+            self.record_ingest(result, time.perf_counter() - start)
+            print(
+                f"💾 Carga incremental: {result['added']} fragmentos nuevos, "
+                f"{result['skipped']} sin cambios, {result['deleted']} eliminados"
+            )
+            return result
             
         except Exception as e:
+            # Guardar lo que sí se sincronizó antes del error
+            self.save_indexes()
             print(f"❌ Error al añadir documentos: {e}")
             raise
     
-    def get_retriever(self, k=5):
+    def new_sync_result(self):
+        """
+        Crea el diccionario vacío con el resumen de una carga incremental.
+        
+        Returns:
+            dict: Contadores a cero (ver add_documents)
+        """
+        return {
+            'added': 0,
+            'deleted': 0,
+            'skipped': 0,
+            'embed_seconds': 0.0,
+            'new_files': [],
+            'unchanged_files': [],
+            'replaced_files': [],
+            'name_conflicts': []
+        }
+    
+    def record_ingest(self, result, seconds):
+        """
+        Anota una carga terminada en el historial de estadísticas.
+        
+        También guarda los índices: durante la carga solo cambian en
+        memoria, y se escriben en disco una vez al final (no una vez por
+        archivo).
+        
+        Args:
+            result (dict): Resumen de la carga (ver new_sync_result)
+            seconds (float): Duración total de la carga
+        """
+        files = (len(result['new_files']) + len(result['unchanged_files'])
+                 + len(result['replaced_files']))
+        self.kb_stats.record_ingest(
+            seconds,
+            files=files,
+            chunks=result['added'] + result['skipped'],
+            embedded=result['added'],
+            embed_seconds=result['embed_seconds']
+        )
+        self.save_indexes()
+    
+    def save_indexes(self):
+        """
+        Guarda en disco los índices y las estadísticas de la base.
+        
+        Se llama una vez al terminar cada carga o borrado, y solo reescribe
+        los índices si algo cambió (una carga sin cambios solo guarda el
+        historial). Si el programa se cierra antes, al arrancar se detecta
+        que no coinciden con la base vectorial y se reconstruyen (ver
+        _initialize_metadata_index).
+        """
+        if self._indexes_dirty:
+            if self.sparse_index is not None:
+                self.sparse_index.save()
+            self.metadata_index.save()
+            self._indexes_dirty = False
+        self.kb_stats.save()
+    
+    def compute_source_hash(self, file_path):
+        """
+        Calcula la clave y la huella de un archivo que todavía no se ha leído.
+        
+        Args:
+            file_path (str): Ruta al archivo en disco
+            
+        Returns:
+            tuple: (clave_del_archivo, huella_del_archivo)
+        """
+        return _source_key(file_path), _hash_file(file_path)
+    
+    def _compute_file_hash(self, documents):
+        """
+        Calcula la huella de un archivo a partir de sus fragmentos.
+        
+        Si el archivo original sigue en disco se usa su contenido binario;
+        si no, se usa el texto de los fragmentos.
+        
+        Args:
+            documents (list): Fragmentos de un mismo archivo
+            
+        Returns:
+            str: Huella SHA-256 del archivo
+        """
+        sources = []
+        for doc in documents:
+            source = doc.metadata.get('source', '')
+            if source not in sources:
+                sources.append(source)
+        
+        if all(source and os.path.isfile(source) for source in sources):
+            hashes = [_hash_file(source) for source in sources]
+        else:
+            hashes = [_hash_text(doc.page_content) for doc in documents]
+        
+        return hashes[0] if len(hashes) == 1 else _hash_text("".join(hashes))
+    
+    def _sync_source(self, key, file_hash, documents, result, split_settings=None):
+        """
+        Sincroniza en la base de datos los fragmentos de un archivo.
+        
+        Args:
+            key (str): Clave del archivo (ver _source_key)
+            file_hash (str): Huella actual del archivo
+            documents (list): Fragmentos actuales del archivo
+            result (dict): Resumen de add_documents (se actualiza aquí)
+            split_settings (str): Parámetros de la división (ver add_documents)
+            
+        Returns:
+            str: 'new', 'unchanged' o 'replaced'
+        """
+        source = documents[0].metadata.get('source') if documents else None
+        session = self.begin_source(key, file_hash, result,
+                                    split_settings=split_settings, source=source)
+        if session['status'] != 'unchanged':
+            self.write_source_batch(session, documents, result)
+        return self.end_source(session, result)
+    
+    def begin_source(self, key, file_hash, result, split_settings=None, source=None):
+        """
+        Empieza la sincronización de un archivo (paso 1 de 3).
+        
+        Consulta qué fragmentos del archivo ya están guardados y decide si
+        el archivo cambió. Si no cambió, no hace falta ni siquiera leerlo.
+        
+        "Sin cambios" exige la misma huella del archivo, los mismos
+        parámetros de división (otro CHUNK_SIZE produce otros fragmentos)
+        y el mismo modelo de embeddings. Con otro modelo, además, ningún
+        embedding guardado se puede reutilizar.
+        
+        Los pasos begin_source → write_source_batch → end_source permiten
+        guardar un archivo por lotes, sin tener todos sus fragmentos en memoria
+        (ver ingestion_pipeline.py).
+        
+        Args:
+            key (str): Clave del archivo (ver _source_key)
+            file_hash (str): Huella actual del archivo
+            result (dict): Resumen de la carga (se actualiza aquí)
+            split_settings (str): Parámetros de la división (ver add_documents)
+            source (str): Ruta actual del archivo (para detectar nombres repetidos)
+            
+        Returns:
+            dict: Estado de la sincronización, para los pasos siguientes
+        """
+        collection = self._get_collection()
+        
+        # ¿Qué fragmentos de este archivo tenemos ya guardados?
+        # El índice de metadatos responde sin recorrer la colección;
+        # después solo se leen los metadatos de esos IDs
+        existing_ids = self.metadata_index.select(sources=key)
+        existing = {'ids': [], 'metadatas': []}
+        if existing_ids:
+            existing = collection.get(ids=existing_ids, include=["metadatas"])
+        existing_ids = existing['ids']
+        metadatas = existing['metadatas']
+        
+        fingerprint = {
+            'file_hash': file_hash,
+            'split_settings': split_settings or "",
+            'embedding_model': EMBEDDING_MODEL
+        }
+        if existing_ids and all(
+            all(metadata.get(field) == value for field, value in fingerprint.items())
+            for metadata in metadatas
+        ):
+            # El archivo es idéntico al que ya está guardado: no hay nada que hacer
+            status = 'unchanged'
+            result['skipped'] += len(existing_ids)
+        else:
+            status = 'replaced' if existing_ids else 'new'
+        
+        if status == 'replaced' and source:
+            # ¿Otro documento con el mismo nombre, desde otra carpeta?
+            old_sources = {metadata.get('source') for metadata in metadatas}
+            old_hashes = {metadata.get('file_hash') for metadata in metadatas}
+            folder = os.path.dirname(os.path.abspath(source))
+            if file_hash not in old_hashes and all(
+                old and os.path.dirname(os.path.abspath(old)) != folder
+                for old in old_sources
+            ):
+                print(f"⚠️ Ya había un '{key}' con otro contenido "
+                      f"(de {', '.join(sorted(old_sources))}): se reemplaza. "
+                      f"Si es otro documento, cámbiale el nombre.")
+                result['name_conflicts'].append(key)
+        
+        # Los embeddings guardados solo sirven si los calculó el mismo modelo
+        reusable = {chunk_id for chunk_id, metadata in zip(existing_ids, metadatas)
+                    if metadata.get('embedding_model') == EMBEDDING_MODEL}
+        
+        return {
+            'key': key,
+            'fingerprint': fingerprint,
+            'ingested_at': time.time(),
+            'status': status,
+            'existing_ids': existing_ids,
+            'existing_metadatas': metadatas,
+            'existing_set': set(existing_ids),
+            'reusable': reusable,
+            'new_ids': set(),
+            'occurrences': {}
+        }
+    
+    def write_source_batch(self, session, documents, result):
+        """
+        Guarda un lote de fragmentos de un archivo (paso 2 de 3).
+        
+        Solo se calculan embeddings de los fragmentos realmente nuevos;
+        los que ya existían conservan su embedding.
+        
+        Args:
+            session (dict): Estado devuelto por begin_source
+            documents (list): Lote de fragmentos del archivo (en orden)
+            result (dict): Resumen de la carga (se actualiza aquí)
+        """
+        collection = self._get_collection()
+        key = session['key']
+        occurrences = session['occurrences']
+        
+        # Calcular IDs deterministas y completar los metadatos
+        batch_ids = []
+        for doc in documents:
+            chunk_hash = _hash_text(doc.page_content)
+            occurrence = occurrences.get(chunk_hash, 0)
+            occurrences[chunk_hash] = occurrence + 1
+            
+            doc.metadata = {
+                **doc.metadata,
+                **session['fingerprint'],
+                'source_name': key,
+                'chunk_hash': chunk_hash,
+                'ingested_at': session['ingested_at']
+            }
+            batch_ids.append(_chunk_id(key, chunk_hash, occurrence))
+        
+        session['new_ids'].update(batch_ids)
+        reusable = session['reusable']
+        self._indexes_dirty = True
+        
+        # Los fragmentos que no cambiaron conservan su embedding:
+        # solo actualizamos sus metadatos con la nueva huella del archivo
+        kept = [(chunk_id, doc) for chunk_id, doc in zip(batch_ids, documents)
+                if chunk_id in reusable]
+        if kept:
+            collection.update(
+                ids=[chunk_id for chunk_id, _ in kept],
+                metadatas=[doc.metadata for _, doc in kept]
+            )
+            self.metadata_index.add(
+                [chunk_id for chunk_id, _ in kept], [doc.metadata for _, doc in kept]
+            )
+            result['skipped'] += len(kept)
+        
+        # Solo calculamos embeddings de los fragmentos realmente nuevos
+        to_add = [(chunk_id, doc) for chunk_id, doc in zip(batch_ids, documents)
+                  if chunk_id not in reusable]
+        if to_add:
+            # Embeddings y escritura por separado, para medir cada etapa
+            texts = [doc.page_content for _, doc in to_add]
+            embed_start = time.perf_counter()
+            vectors = self.embeddings.embed_documents(texts)
+            result['embed_seconds'] += time.perf_counter() - embed_start
+            with tracer.span("upsert", chunks=len(to_add)):
+                self._write_vectors(
+                    [chunk_id for chunk_id, _ in to_add], texts,
+                    [doc.metadata for _, doc in to_add], vectors
+                )
+            
+            self.metadata_index.add(
+                [chunk_id for chunk_id, _ in to_add], [doc.metadata for _, doc in to_add]
+            )
+            self.kb_stats.add(
+                [chunk_id for chunk_id, _ in to_add], texts,
+                [doc.metadata for _, doc in to_add], self._vector_bytes(len(vectors[0]))
+            )
+            result['added'] += len(to_add)
+            
+            # Mantener al día el índice de palabras de la búsqueda híbrida
+            if self.sparse_index is not None:
+                self.sparse_index.add(
+                    [chunk_id for chunk_id, _ in to_add],
+                    [doc.page_content for _, doc in to_add]
+                )
+    
+    def _write_vectors(self, ids, texts, metadatas, vectors):
+        """
+        Guarda fragmentos cuyos embeddings ya están calculados.
+        
+        Args:
+            ids (list): IDs de los fragmentos
+            texts (list): Textos
+            metadatas (list): Metadatos de cada fragmento
+            vectors (list): Un embedding por fragmento
+        """
+        if isinstance(self.vectordb, NumpyVectorStore):
+            self.vectordb.add_embeddings(texts, vectors, metadatas=metadatas, ids=ids)
+        else:
+            # Lo mismo que hace Chroma.add_documents después de calcular los embeddings
+            self.vectordb._collection.upsert(
+                ids=ids, documents=texts, metadatas=metadatas, embeddings=vectors
+            )
+    
+    def end_source(self, session, result):
+        """
+        Termina la sincronización de un archivo (paso 3 de 3).
+        
+        Elimina los fragmentos que estaban guardados pero ya no aparecen
+        en la nueva versión del archivo.
+        
+        Args:
+            session (dict): Estado devuelto por begin_source
+            result (dict): Resumen de la carga (se actualiza aquí)
+            
+        Returns:
+            str: 'new', 'unchanged' o 'replaced'
+        """
+        if session['status'] != 'unchanged':
+            obsolete_ids = [chunk_id for chunk_id in session['existing_ids']
+                            if chunk_id not in session['new_ids']]
+            result['deleted'] += self._delete_ids(obsolete_ids)
+            
+            # El contenido cambió: las respuestas guardadas ya no son válidas
+            self.version += 1
+        
+        return session['status']
+    
+    def abort_source(self, session, result):
+        """
+        Deshace la sincronización de un archivo que falló a mitad de camino.
+        
+        Si la lectura falla después de guardar algunos lotes, la base
+        quedaría con una mezcla de la versión vieja y la nueva. Aquí se
+        eliminan los fragmentos nuevos ya guardados y los que se
+        conservaron recuperan sus metadatos anteriores (con la huella
+        vieja, para que la próxima carga vuelva a procesar el archivo).
+        
+        Args:
+            session (dict): Estado devuelto por begin_source
+            result (dict): Resumen de la carga (se actualiza aquí)
+            
+        Returns:
+            int: Número de fragmentos nuevos eliminados
+        """
+        if session['status'] == 'unchanged':
+            return 0
+        
+        added_ids = session['new_ids'] - session['reusable']
+        removed = self._delete_ids(added_ids)
+        result['added'] -= removed
+        
+        restored = [(chunk_id, metadata) for chunk_id, metadata
+                    in zip(session['existing_ids'], session['existing_metadatas'])
+                    if chunk_id in session['new_ids'] and chunk_id in session['reusable']]
+        if restored:
+            self._get_collection().update(
+                ids=[chunk_id for chunk_id, _ in restored],
+                metadatas=[metadata for _, metadata in restored]
+            )
+            self.metadata_index.add(
+                [chunk_id for chunk_id, _ in restored], [metadata for _, metadata in restored]
+            )
+            self._indexes_dirty = True
+            result['skipped'] -= len(restored)
+        
+        if removed or restored:
+            self.version += 1
+        return removed
+    
+    def _delete_ids(self, ids):
+        """
+        Elimina fragmentos de la base y de los índices, por lotes.
+        
+        Cada llamada a delete borra como mucho DELETE_BATCH_SIZE fragmentos:
+        un archivo enorme no bloquea la base en una sola operación gigante.
+        
+        Los índices solo se actualizan en memoria; quien llama los guarda
+        con save_indexes() al terminar.
+        
+        Args:
+            ids (list): IDs de los fragmentos a eliminar
+        
+        Returns:
+            int: Número de fragmentos eliminados
+        """
+        ids = list(ids)
+        if not ids:
+            return 0
+        
+        collection = self._get_collection()
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            collection.delete(ids=ids[start:start + DELETE_BATCH_SIZE])
+        
+        self._indexes_dirty = True
+        if self.sparse_index is not None:
+            self.sparse_index.remove(ids)
+        self.metadata_index.remove(ids)
+        self.kb_stats.remove(ids)
+        return len(ids)
+    
+    def delete_source(self, path):
+        """
+        Elimina todos los fragmentos de un archivo.
+        
+        Los IDs salen del índice de metadatos (archivo → IDs), así que no
+        hace falta recorrer la colección para encontrarlos.
+        
+        Args:
+            path (str): Ruta o nombre del archivo (ver _source_key)
+        
+        Returns:
+            dict: Resultado de la operación
+                {
+                    'success': bool,      # True si se eliminó correctamente
+                    'deleted_count': int, # Número de fragmentos eliminados
+                    'message': str        # Mensaje descriptivo
+                }
+        """
+        key = _source_key(path)
+        try:
+            ids = self.metadata_index.select(sources=key)
+            if not ids:
+                return {
+                    'success': True,
+                    'deleted_count': 0,
+                    'message': f"El archivo '{key}' no estaba en la base de conocimiento."
+                }
+            
+            deleted = self._delete_ids(ids)
+            self.save_indexes()
+            self.version += 1
+            
+            return {
+                'success': True,
+                'deleted_count': deleted,
+                'message': f"✅ Se eliminó '{key}' ({deleted} fragmentos)."
+            }
+        
+        except Exception as e:
+            return {
+                'success': False,
+                'deleted_count': 0,
+                'message': f"❌ Error al eliminar '{key}': {e}"
+            }
+    
+    def replace_source(self, path, documents, split_settings=None):
+        """
+        Reemplaza el contenido de un archivo por los fragmentos indicados.
+        
+        Es una carga incremental de un solo archivo: los fragmentos que no
+        cambiaron conservan su embedding, los nuevos se calculan y los que
+        ya no aparecen se eliminan (por lotes, ver _delete_ids).
+        
+        Args:
+            path (str): Ruta o nombre del archivo (ver _source_key)
+            documents (list): Nuevos fragmentos del archivo (lista vacía =
+                eliminar el archivo)
+            split_settings (str): Parámetros de la división (ver add_documents)
+        
+        Returns:
+            dict: Resumen de la carga (ver add_documents)
+        """
+        key = _source_key(path)
+        result = self.new_sync_result()
+        
+        if not documents:
+            result['deleted'] = self.delete_source(path)['deleted_count']
+            return result
+        
+        start = time.perf_counter()
+        status = self._sync_source(key, self._compute_file_hash(documents), documents,
+                                   result, split_settings)
+        result[f"{status}_files"].append(key)
+        self.record_ingest(result, time.perf_counter() - start)
+        return result
+    
+    def get_retriever(self, k=5, filters=None):
         """
         Crea un 'retriever' para buscar documentos relevantes.
         
         Un retriever es un objeto que busca los documentos más similares
         a una pregunta dada, usando búsqueda vectorial.
         
+        Con RETRIEVER_MODE = "hybrid" se devuelve un HybridRetriever, que
+        combina la búsqueda vectorial con la búsqueda por palabras (BM25),
+        y con "mmr" un MMRRetriever, que evita fragmentos repetidos.
+        
+        Con 'filters' se devuelve un FilteredRetriever: el índice de
+        metadatos elige primero los fragmentos que cumplen el filtro y
+        la búsqueda (del mismo modo) solo compara esos.
+        
         Args:
             k (int): Número de documentos a recuperar (default: 5)
+            filters (dict): Filtro opcional (ver MetadataIndex.select), ej:
+                {"sources": ["a.pdf", "b.pdf"], "pages": (10, 40),
+                 "since": "2025-03-01", "until": "2025-03-31"}
             
         Returns:
-            VectorStoreRetriever: Objeto que busca documentos similares
+            BaseRetriever: Objeto que busca documentos similares
             
         Nota para estudiantes:
             Este retriever se usa en la cadena RAG para encontrar contexto
             relevante antes de generar una respuesta.
         """
+        if filters:
+            mode = "hybrid" if self.sparse_index is not None else RETRIEVER_MODE
+            return FilteredRetriever(
+                vectorstore=self.vectordb,
+                metadata_index=self.metadata_index,
+                filters=filters,
+                mode=mode,
+                k=k,
+                fetch_k=max(HYBRID_FETCH_K if mode == "hybrid" else MMR_FETCH_K, k),
+                lambda_mult=MMR_LAMBDA,
+                sparse_index=self.sparse_index,
+                collection=self._get_collection(),
+                rrf_k=RRF_K
+            )
+        
+        if self.sparse_index is not None:
+            return HybridRetriever(
+                vectorstore=self.vectordb,
+                collection=self._get_collection(),
+                sparse_index=self.sparse_index,
+                k=k,
+                fetch_k=max(HYBRID_FETCH_K, k),
+                rrf_k=RRF_K
+            )
+        
+        if RETRIEVER_MODE == "mmr":
+            return MMRRetriever(
+                vectorstore=self.vectordb,
+                k=k,
+                fetch_k=max(MMR_FETCH_K, k),
+                lambda_mult=MMR_LAMBDA
+            )
+        
         retriever = self.vectordb.as_retriever(
             search_kwargs={"k": k}  # Recuperar los k documentos más similares
         )
@@ -159,20 +956,25 @@ class DatabaseManager:
         - Depurar problemas
         - Monitorear el uso de la base de datos
         
+        Los números salen de los contadores de kb_stats.py, que se
+        actualizan en cada carga y borrado: no se consulta la base.
+        
         Returns:
             dict: Diccionario con estadísticas de la base de datos
                 {
                     'count': int,      # Número total de fragmentos
                     'status': str,     # Estado de la base de datos
-                    'message': str     # Mensaje formateado para mostrar
+                    'message': str,    # Mensaje formateado para mostrar
+                    'summary': dict,   # Totales (ver KnowledgeBaseStats.summary)
+                    'sources': list,   # Desglose por archivo
+                    'history': list    # Últimas cargas y velocidad de embeddings
                 }
         """
         try:
-            # Acceder a la colección interna de ChromaDB
-            collection = self.vectordb._collection
-            
-            # Contar cuántos documentos hay almacenados
-            count = collection.count()
+            summary = self.kb_stats.summary()
+            sources = self.kb_stats.sources()
+            history = self.kb_stats.history()
+            count = summary['chunks']
             
             # Crear el mensaje de estado
             if count == 0:
@@ -183,13 +985,72 @@ class DatabaseManager:
                 message = (
                     f"📊 **Estado:** Base de conocimiento activa\n\n"
                     f"✅ **Total de fragmentos:** {count:,}\n\n"
+                    f"📂 **Archivos:** {summary['sources']:,} | "
+                    f"📄 **Páginas:** {summary['pages']:,}\n\n"
+                    f"🔡 **Caracteres:** {summary['chars']:,} | "
+                    f"💾 **Espacio:** {_format_bytes(summary['bytes'])}\n\n"
                     f"💡 Puedes hacer preguntas sobre el contenido cargado."
                 )
             
+            last = history[-1] if history else None
+            if last is not None:
+                message += (
+                    f"\n\n⏱️ **Última carga:** {last['seconds']:.1f} s, "
+                    f"{last['embedded']:,} embeddings ({last['throughput']:.1f} fragmentos/s)"
+                )
+            
+            if sources:
+                # Desglose por archivo (los más grandes primero)
+                message += (
+                    "\n\n#### 📂 Por archivo\n\n"
+                    "| Archivo | Fragmentos | Páginas | Caracteres | Espacio |\n"
+                    "|---|---:|---:|---:|---:|\n"
+                )
+                for row in sources[:STATS_MAX_SOURCES]:
+                    message += (
+                        f"| {row['source']} | {row['chunks']:,} | {row['pages']:,} | "
+                        f"{row['chars']:,} | {_format_bytes(row['bytes'])} |\n"
+                    )
+                if len(sources) > STATS_MAX_SOURCES:
+                    message += f"\n... y {len(sources) - STATS_MAX_SOURCES} archivo(s) más\n"
+            
+            if history:
+                # Velocidad de los embeddings en las últimas cargas
+                message += (
+                    "\n\n#### ⚡ Últimas cargas\n\n"
+                    "| Fecha | Archivos | Fragmentos | Embeddings | Duración | Velocidad |\n"
+                    "|---|---:|---:|---:|---:|---:|\n"
+                )
+                for record in reversed(history[-STATS_MAX_HISTORY_ROWS:]):
+                    moment = time.strftime("%Y-%m-%d %H:%M", time.localtime(record['at']))
+                    message += (
+                        f"| {moment} | {record['files']} | {record['chunks']:,} | "
+                        f"{record['embedded']:,} | {record['seconds']:.1f} s | "
+                        f"{record['throughput']:.1f} frag/s |\n"
+                    )
+            
+            # Añadir los aciertos del caché de embeddings, si está activado
+            if hasattr(self.embeddings, 'stats'):
+                cache = self.embeddings.stats()
+                message += (
+                    f"\n\n🧠 **Caché de embeddings:** {cache['entries']:,} vectores, "
+                    f"{cache['hits']:,} aciertos / {cache['misses']:,} fallos "
+                    f"({cache['hit_rate']:.0%})"
+                )
+            
+            if self.sparse_index is not None:
+                message += (
+                    f"\n\n🔤 **Índice BM25:** {self.sparse_index.vocabulary_size:,} palabras "
+                    f"distintas (búsqueda híbrida activa)"
+                )
+            
             return {
                 'count': count,
                 'status': status,
-                'message': message
+                'message': message,
+                'summary': summary,
+                'sources': sources,
+                'history': history
             }
             
         except Exception as e:
@@ -197,7 +1058,10 @@ class DatabaseManager:
             return {
                 'count': 0,
                 'status': 'error',
-                'message': f"⚠️ Error al obtener estadísticas: {e}"
+                'message': f"⚠️ Error al obtener estadísticas: {e}",
+                'summary': {},
+                'sources': [],
+                'history': []
             }
     
     def clear_all_documents(self):
@@ -216,11 +1080,8 @@ class DatabaseManager:
                 }
         """
         try:
-            # Acceder a la colección de ChromaDB
-            collection = self.vectordb._collection
-            
-            # Obtener el número de documentos antes de borrar
-            count = collection.count()
+            # Número de fragmentos antes de borrar (de los contadores)
+            count = len(self.kb_stats)
             
             # Si ya está vacía, no hacer nada
             if count == 0:
@@ -230,12 +1091,21 @@ class DatabaseManager:
                     'message': "La base de datos ya estaba vacía."
                 }
             
-            # Obtener todos los IDs de los documentos
-            all_ids = collection.get()['ids']
+            # Vaciar la colección de una vez, sin pedir la lista de IDs:
+            # ChromaDB borra la colección y crea una vacía; el almacén
+            # NumPy borra sus archivos (el costo no depende del tamaño)
+            if isinstance(self.vectordb, NumpyVectorStore):
+                self.vectordb.reset()
+            else:
+                self.vectordb.reset_collection()
+            
+            if self.sparse_index is not None:
+                self.sparse_index.clear()
+            self.metadata_index.clear()
+            self.kb_stats.clear()
             
-            # Eliminar todos los documentos por sus IDs
-            if all_ids:
-                collection.delete(ids=all_ids)
+            # Las respuestas guardadas en el caché ya no son válidas
+            self.version += 1
             
             # Retornar resultado exitoso
             return {
@@ -15,9 +15,102 @@ Autor: Clase 24 - IA Python para Principiantes
 Fecha: 2025
 """
 
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from langchain_community.document_loaders import TextLoader, PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from tracing import tracer
+from text_cache import TextCache
+from config import (
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    PARALLEL_LOADING,
+    LOAD_MAX_WORKERS,
+    TEXT_CACHE_ENABLED,
+    TEXT_CACHE_DIRECTORY,
+    TEXT_CACHE_MAX_MB
+)
+
+
+# ==============================================================================
+# FUNCIÓN AUXILIAR: carga de un archivo dentro de un proceso del pool
+# ==============================================================================
+
+def _load_file_worker(file_path, settings):
+    """
+    Carga un archivo y mide cuánto tarda. Se ejecuta dentro de un proceso hijo.
+    
+    Debe estar definida a nivel de módulo (no dentro de la clase) para que
+    ProcessPoolExecutor pueda enviarla a otros procesos (pickle).
+    
+    Args:
+        file_path (str): Ruta al archivo a cargar
+        settings (dict): Configuración del procesador que hace la carga
+            (ver DocumentProcessor._worker_settings), para que el proceso
+            hijo use el mismo caché de texto y los mismos parámetros
+        
+    Returns:
+        dict: Resultado de la carga
+            {
+                'file_path': str,    # Archivo procesado
+                'documents': list,   # Documentos cargados ([] si falló)
+                'pages': int,        # Número de páginas/documentos
+                'seconds': float,    # Tiempo de carga
+                'cached': bool,      # True si el texto salió del caché
+                'seconds_saved': float, # Tiempo de lectura ahorrado por el caché
+                'error': str|None    # Mensaje de error, si lo hubo
+            }
+    """
+    start = time.perf_counter()
+    processor = DocumentProcessor(parallel_loading=False, **settings)
+    try:
+        documents = processor.load_file(file_path)
+        error = None
+    except Exception as e:
+        documents = []
+        error = str(e)
+    
+    return {
+        'file_path': file_path,
+        'documents': documents,
+        'pages': len(documents),
+        'seconds': time.perf_counter() - start,
+        'cached': processor.last_cache_info['cached'],
+        'seconds_saved': processor.last_cache_info['seconds_saved'],
+        'error': error
+    }
+
+
+def _extract_text_worker(file_path, text_cache_directory):
+    """
+    Extrae el texto de un archivo y lo deja en el caché de texto.
+    Se ejecuta dentro de un proceso hijo (ver prefetch_text).
+    
+    No devuelve las páginas: el proceso principal las lee del caché
+    cuando le toca el turno al archivo, así que en memoria nunca hay
+    más de un archivo por proceso.
+    
+    Args:
+        file_path (str): Ruta al archivo
+        text_cache_directory (str): Carpeta del caché de texto
+        
+    Returns:
+        dict: Estadísticas del caché en este proceso (ver TextCache.stats)
+            más 'error' (str|None)
+    """
+    processor = DocumentProcessor(parallel_loading=False,
+                                  text_cache_directory=text_cache_directory)
+    try:
+        for _ in processor.iter_pages(file_path):
+            pass
+        error = None
+    except Exception as e:
+        # El proceso principal volverá a intentarlo y mostrará el error
+        error = str(e)
+    return {**processor.text_cache.stats(), 'error': error}
 
 # ==============================================================================
 # CLASE: DocumentProcessor
@@ -36,13 +129,19 @@ class DocumentProcessor:
     cada clase tiene una única responsabilidad bien definida.
     """
     
-    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+                 parallel_loading=PARALLEL_LOADING, max_workers=LOAD_MAX_WORKERS,
+                 text_cache_directory=TEXT_CACHE_DIRECTORY if TEXT_CACHE_ENABLED else None):
         """
         Constructor del procesador de documentos.
         
         Args:
             chunk_size (int): Tamaño de cada fragmento en caracteres
             chunk_overlap (int): Superposición entre fragmentos consecutivos
+            parallel_loading (bool): Cargar los archivos en varios procesos
+            max_workers (int): Procesos máximos (None = todos los núcleos)
+            text_cache_directory (str): Carpeta del caché de texto extraído
+                (None = leer siempre los archivos, ver text_cache.py)
             
         Nota para estudiantes:
             La superposición ayuda a mantener el contexto entre chunks.
@@ -51,6 +150,23 @@ class DocumentProcessor:
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.parallel_loading = parallel_loading
+        self.max_workers = max_workers
+        
+        # Tiempos por archivo de la última carga (ver load_multiple_files)
+        self.last_load_timings = []
+        
+        # Caché del texto extraído: volver a cargar un archivo no lo vuelve a leer
+        self.text_cache = None
+        if text_cache_directory:
+            self.text_cache = TextCache(text_cache_directory,
+                                        max_bytes=TEXT_CACHE_MAX_MB * 1024 * 1024)
+        
+        # ¿Salió del caché el último archivo de load_file?
+        self.last_cache_info = {'cached': False, 'seconds_saved': 0.0}
+        
+        # Archivos cuyo texto acaba de extraer prefetch_text
+        self._prefetched = set()
         
         # Inicializar el divisor de texto
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -58,6 +174,33 @@ class DocumentProcessor:
             chunk_overlap=self.chunk_overlap
         )
     
+    def split_settings(self):
+        """
+        Describe cómo se dividen los documentos.
+        
+        Se guarda con cada fragmento: si cambia (otro CHUNK_SIZE u otro
+        CHUNK_OVERLAP), DatabaseManager vuelve a procesar los archivos
+        aunque su contenido sea el mismo.
+        
+        Returns:
+            str: Ej. "chunk_size=1500;chunk_overlap=250"
+        """
+        return f"chunk_size={self.chunk_size};chunk_overlap={self.chunk_overlap}"
+    
+    def _worker_settings(self):
+        """
+        Parámetros para crear un procesador igual a este en otro proceso
+        (ver _load_file_worker).
+        
+        Returns:
+            dict: {'chunk_size', 'chunk_overlap', 'text_cache_directory'}
+        """
+        return {
+            'chunk_size': self.chunk_size,
+            'chunk_overlap': self.chunk_overlap,
+            'text_cache_directory': self.text_cache.directory if self.text_cache else None
+        }
+    
     def load_file(self, file_path):
         """
         Carga un archivo y retorna su contenido como documento de LangChain.
@@ -66,6 +209,9 @@ class DocumentProcessor:
         - Archivos TXT (texto plano)
         - Archivos PDF (documentos)
         
+        Si el archivo ya se leyó antes (mismo contenido y misma versión del
+        lector), el texto sale del caché y el PDF no se vuelve a procesar.
+        
         Args:
             file_path (str): Ruta al archivo a cargar
             
@@ -81,30 +227,29 @@ class DocumentProcessor:
             >>> docs = processor.load_file("documento.pdf")
             >>> print(f"Cargadas {len(docs)} páginas")
         """
+        self.last_cache_info = {'cached': False, 'seconds_saved': 0.0}
         try:
-            # Determinar el tipo de archivo por su extensión
-            if file_path.endswith(".pdf"):
-                # Usar PyPDFLoader para archivos PDF
-                # Este loader extrae el texto de cada página del PDF
-                loader = PyPDFLoader(file_path)
-                print(f"📄 Cargando PDF: {file_path}")
-                
-            elif file_path.endswith(".txt"):
-                # Usar TextLoader para archivos de texto
-                # Importante: especificar encoding para evitar errores
-                loader = TextLoader(file_path, encoding='utf-8')
-                print(f"📝 Cargando TXT: {file_path}")
-                
-            else:
-                # Tipo de archivo no soportado
-                raise ValueError(
-                    f"Tipo de archivo no soportado: {file_path}\n"
-                    f"Solo se aceptan archivos .txt y .pdf"
-                )
+            # ¿Ya tenemos el texto de este archivo?
+            key = self.text_cache.key_for(file_path) if self.text_cache else None
+            if key is not None:
+                cached = self.text_cache.get(key, file_path)
+                if cached is not None:
+                    documents, seconds_saved = cached
+                    self.last_cache_info = {'cached': True, 'seconds_saved': seconds_saved}
+                    print(f"♻️ Texto en caché: {file_path} ({len(documents)} documento(s), "
+                          f"{seconds_saved:.2f} s ahorrados)")
+                    return documents
+            
+            # Elegir el loader apropiado según la extensión
+            loader = self._create_loader(file_path)
             
             # Cargar el documento usando el loader apropiado
+            start = time.perf_counter()
             documents = loader.load()
             
+            if key is not None:
+                self.text_cache.put(key, documents, time.perf_counter() - start)
+            
             print(f"✅ Archivo cargado: {len(documents)} documento(s)")
             return documents
             
@@ -112,12 +257,202 @@ class DocumentProcessor:
             print(f"❌ Error al cargar {file_path}: {e}")
             raise
     
+    def _create_loader(self, file_path):
+        """
+        Crea el loader de LangChain adecuado para un archivo.
+        
+        Args:
+            file_path (str): Ruta al archivo a cargar
+            
+        Returns:
+            BaseLoader: PyPDFLoader o TextLoader
+            
+        Raises:
+            ValueError: Si el tipo de archivo no es soportado
+        """
+        # Determinar el tipo de archivo por su extensión
+        if file_path.endswith(".pdf"):
+            # Usar PyPDFLoader para archivos PDF
+            # Este loader extrae el texto de cada página del PDF
+            print(f"📄 Cargando PDF: {file_path}")
+            return PyPDFLoader(file_path)
+            
+        elif file_path.endswith(".txt"):
+            # Usar TextLoader para archivos de texto
+            # Importante: especificar encoding para evitar errores
+            print(f"📝 Cargando TXT: {file_path}")
+            return TextLoader(file_path, encoding='utf-8')
+        
+        # Tipo de archivo no soportado
+        raise ValueError(
+            f"Tipo de archivo no soportado: {file_path}\n"
+            f"Solo se aceptan archivos .txt y .pdf"
+        )
+    
+    def iter_pages(self, file_path):
+        """
+        Lee un archivo página a página (carga "perezosa").
+        
+        A diferencia de load_file(), no carga todo el archivo en memoria:
+        cada página se lee recién cuando se necesita. Es un generador,
+        por eso usa 'yield' en lugar de 'return'.
+        
+        Args:
+            file_path (str): Ruta al archivo a cargar
+            
+        Con el caché de texto activado, las páginas de un archivo ya leído
+        salen del caché (también de a una); si no, se leen y se van
+        guardando en él a medida que se leen.
+        
+        Yields:
+            Document: Una página (PDF) o el archivo completo (TXT)
+        """
+        key = self.text_cache.key_for(file_path) if self.text_cache else None
+        if key is not None:
+            # Lo que extrajo prefetch_text no es un ahorro: ya se contó allí
+            prefetched = file_path in self._prefetched
+            self._prefetched.discard(file_path)
+            cached_pages = self.text_cache.iter_pages(key, file_path, record=not prefetched)
+            if cached_pages is not None:
+                yield from cached_pages
+                return
+        
+        loader = self._create_loader(file_path)
+        if key is None:
+            yield from loader.lazy_load()
+            return
+        
+        # Cada página se guarda en el caché en cuanto se lee; si la lectura
+        # no termina, la entrada a medio escribir se descarta
+        with self.text_cache.writer(key) as writer:
+            # Medir solo el tiempo de lectura (no el de quien consume las páginas)
+            seconds = 0.0
+            page_iterator = loader.lazy_load()
+            while True:
+                start = time.perf_counter()
+                page = next(page_iterator, None)
+                seconds += time.perf_counter() - start
+                if page is None:
+                    break
+                writer.add(page)
+                yield page
+            writer.commit(seconds)
+    
+    @contextmanager
+    def prefetch_text(self, file_paths):
+        """
+        Extrae en paralelo el texto de varios archivos, por adelantado.
+        
+        Cada archivo se lee en un proceso del pool y su texto queda en el
+        caché de texto; después iter_splits lo encuentra ya extraído.
+        Así la ingesta en streaming, que divide y guarda los archivos de
+        a uno, también aprovecha todos los núcleos para leer los PDFs.
+        
+        Sin caché de texto (o con un solo archivo) no hace nada.
+        
+        Args:
+            file_paths (list): Archivos que se van a procesar
+            
+        Yields:
+            callable: wait(file_path), espera a que el texto de ese
+                archivo esté extraído
+                
+        Ejemplo:
+            >>> with processor.prefetch_text(files) as wait:
+            ...     for file_path in files:
+            ...         wait(file_path)
+            ...         splits = list(processor.iter_splits(file_path))
+        """
+        workers = self._get_worker_count(len(file_paths)) if self.text_cache else 1
+        if workers <= 1:
+            yield lambda file_path: None
+            return
+        
+        print(f"📚 Extrayendo el texto de {len(file_paths)} archivo(s) "
+              f"en paralelo ({workers} procesos)...")
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                file_path: executor.submit(_extract_text_worker, file_path,
+                                           self.text_cache.directory)
+                for file_path in file_paths
+            }
+            
+            def wait(file_path):
+                # Los errores se ignoran aquí: iter_splits volverá a leer el
+                # archivo y el error se informará en el lugar de siempre
+                future = futures.pop(file_path, None)
+                if future is None:
+                    return
+                stats = future.result()
+                if stats['error'] is None:
+                    self._prefetched.add(file_path)
+                # Los aciertos cuentan donde ocurrieron: en el proceso hijo
+                self.text_cache.hits += stats['hits']
+                self.text_cache.misses += stats['misses']
+                self.text_cache.seconds_saved += stats['seconds_saved']
+            
+            yield wait
+        finally:
+            # Si la ingesta se detiene antes de tiempo, no leer el resto
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._prefetched.clear()
+    
+    def iter_splits(self, file_path):
+        """
+        Lee y divide un archivo en fragmentos, página a página.
+        
+        Produce exactamente los mismos fragmentos que
+        split_documents(load_file(file_path)), pero sin juntar el texto
+        de todas las páginas: se extrae (o sale del caché de texto) una
+        página, se divide y se pasa a la siguiente. Lo que sí queda en
+        memoria es lo que el lector necesita para el archivo abierto
+        (pypdf mantiene el PDF abierto) y, en un TXT, el archivo entero,
+        que es una sola "página".
+        
+        Como la lectura y la división se intercalan, sus tiempos se suman
+        por separado y se registran al final como spans "load" y "split".
+        
+        Args:
+            file_path (str): Ruta al archivo a procesar
+            
+        Yields:
+            tuple: (numero_de_pagina, fragmento)
+        """
+        load_seconds = split_seconds = 0.0
+        pages = chunks = 0
+        page_iterator = self.iter_pages(file_path)
+        
+        while True:
+            start = time.perf_counter()
+            page = next(page_iterator, None)
+            load_seconds += time.perf_counter() - start
+            if page is None:
+                break
+            
+            start = time.perf_counter()
+            splits = self.text_splitter.split_documents([page])
+            split_seconds += time.perf_counter() - start
+            
+            for split in splits:
+                yield pages, split
+            pages += 1
+            chunks += len(splits)
+        
+        tracer.record("load", load_seconds, file=os.path.basename(file_path), pages=pages)
+        tracer.record("split", split_seconds, documents=pages, chunks=chunks)
+    
     def load_multiple_files(self, file_paths):
         """
-        Carga múltiples archivos de forma secuencial.
+        Carga múltiples archivos, en paralelo o de forma secuencial.
         
         Esta función procesa una lista de archivos y combina todos
-        los documentos en una sola lista.
+        los documentos en una sola lista. Si la carga en paralelo está
+        activada, cada archivo se procesa en un proceso distinto del pool,
+        aprovechando todos los núcleos de la CPU (leer PDFs es muy costoso).
+        
+        El orden de los documentos es siempre el mismo que el de file_paths.
+        Los tiempos de cada archivo quedan en self.last_load_timings.
         
         Args:
             file_paths (list): Lista de rutas a archivos
@@ -136,28 +471,82 @@ class DocumentProcessor:
         all_documents = []
         failed_files = []
         
-        print(f"\n📚 Procesando {len(file_paths)} archivo(s)...\n")
+        workers = self._get_worker_count(len(file_paths))
+        modo = f"en paralelo ({workers} procesos)" if workers > 1 else "secuencial"
+        print(f"\n📚 Procesando {len(file_paths)} archivo(s) - modo {modo}...\n")
         
-        # Procesar cada archivo individualmente
-        for file_path in file_paths:
-            try:
-                # Intentar cargar el archivo
-                documents = self.load_file(file_path)
-                all_documents.extend(documents)
-                
-            except Exception as e:
+        start = time.perf_counter()
+        
+        # Cada carga usa la configuración de ESTE procesador, no la de config.py
+        load = functools.partial(_load_file_worker, settings=self._worker_settings())
+        
+        if workers > 1:
+            # Repartir los archivos entre los procesos del pool
+            # map() devuelve los resultados en el mismo orden que la entrada
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(load, file_paths))
+        else:
+            # Procesar cada archivo individualmente en este mismo proceso
+            results = [load(file_path) for file_path in file_paths]
+        
+        elapsed = time.perf_counter() - start
+        
+        for result in results:
+            # Un span "load" por archivo, con el tiempo medido en su proceso
+            tracer.record("load", result['seconds'], error=result['error'],
+                          file=os.path.basename(result['file_path']), pages=result['pages'],
+                          cached=result['cached'])
+            if result['error'] is None:
+                all_documents.extend(result['documents'])
+                origin = " (caché)" if result['cached'] else ""
+                print(f"   ⏱️ {result['file_path']}: {result['pages']} página(s) "
+                      f"en {result['seconds']:.2f} s{origin}")
+            else:
                 # Si falla, agregar a la lista de errores
-                print(f"⚠️ Saltando archivo con error: {file_path}")
-                failed_files.append(file_path)
+                print(f"⚠️ Saltando archivo con error: {result['file_path']}")
+                failed_files.append(result['file_path'])
+        
+        # Guardar los tiempos (sin los documentos) para consultarlos después
+        self.last_load_timings = [
+            {key: value for key, value in result.items() if key != 'documents'}
+            for result in results
+        ]
+        
+        pages_per_second = len(all_documents) / elapsed if elapsed > 0 else 0.0
+        cached_files = sum(1 for result in results if result['cached'])
+        seconds_saved = sum(result['seconds_saved'] for result in results)
         
         # Mostrar resumen
         print(f"\n📊 Resumen de carga:")
         print(f"   ✅ Exitosos: {len(file_paths) - len(failed_files)}")
         print(f"   ❌ Con errores: {len(failed_files)}")
-        print(f"   📄 Total documentos: {len(all_documents)}\n")
+        print(f"   📄 Total documentos: {len(all_documents)}")
+        if cached_files:
+            print(f"   ♻️ Desde el caché de texto: {cached_files} archivo(s), "
+                  f"{seconds_saved:.2f} s de lectura ahorrados")
+        print(f"   ⚡ Velocidad: {pages_per_second:.1f} páginas/s ({elapsed:.2f} s)\n")
         
         return all_documents, failed_files
     
+    def _get_worker_count(self, file_count):
+        """
+        Calcula cuántos procesos usar para cargar file_count archivos.
+        
+        No tiene sentido arrancar más procesos que archivos, y con un
+        solo archivo el costo de crear el pool no compensa.
+        
+        Args:
+            file_count (int): Número de archivos a cargar
+            
+        Returns:
+            int: Número de procesos (1 = carga secuencial)
+        """
+        if not self.parallel_loading or file_count < 2:
+            return 1
+        
+        max_workers = self.max_workers or os.cpu_count() or 1
+        return max(1, min(max_workers, file_count))
+    
     def split_documents(self, documents):
         """
         Divide documentos en fragmentos (chunks) más pequeños.
@@ -194,7 +583,9 @@ class DocumentProcessor:
         print(f"   🔗 Superposición: {self.chunk_overlap} caracteres")
         
         # Dividir los documentos usando el text splitter
-        splits = self.text_splitter.split_documents(documents)
+        with tracer.span("split", documents=len(documents)) as span:
+            splits = self.text_splitter.split_documents(documents)
+            span.set(chunks=len(splits))
         
         print(f"✅ Creados {len(splits)} fragmentos\n")
         
@@ -220,6 +611,9 @@ class DocumentProcessor:
                     'document_count': int,  # Número de documentos originales
                     'split_count': int,     # Número de fragmentos creados
                     'failed_files': list,   # Archivos que fallaron
+                    'load_timings': list,   # Tiempo de carga de cada archivo
+                    'cached_files': int,    # Archivos leídos del caché de texto
+                    'parse_seconds_saved': float, # Lectura ahorrada por el caché
                     'message': str          # Mensaje descriptivo
                 }
                 
@@ -269,6 +663,14 @@ class DocumentProcessor:
                 'message': "❌ Los documentos están vacíos o no se pudieron dividir"
             }
         
+        # Tiempo de lectura que ahorró el caché de texto
+        cached_files = sum(1 for timing in self.last_load_timings if timing['cached'])
+        seconds_saved = sum(timing['seconds_saved'] for timing in self.last_load_timings)
+        message = f"✅ Procesados {len(splits)} fragmentos de {len(documents)} documento(s)"
+        if cached_files:
+            message += (f" (♻️ {cached_files} archivo(s) desde el caché, "
+                        f"{seconds_saved:.1f} s de lectura ahorrados)")
+        
         # Éxito: retornar resultado completo
         return {
             'success': True,
@@ -276,7 +678,10 @@ class DocumentProcessor:
             'document_count': len(documents),
             'split_count': len(splits),
             'failed_files': failed_files,
-            'message': f"✅ Procesados {len(splits)} fragmentos de {len(documents)} documento(s)"
+            'load_timings': self.last_load_timings,
+            'cached_files': cached_files,
+            'parse_seconds_saved': seconds_saved,
+            'message': message
         }
 
 # ==============================================================================
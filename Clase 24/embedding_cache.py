@@ -0,0 +1,458 @@
+"""
+embedding_cache.py - Caché Persistente de Embeddings
+====================================================
+
+Este módulo guarda en disco los embeddings ya calculados, para no tener
+que volver a calcularlos nunca más para el mismo texto y el mismo modelo.
+
+¿POR QUÉ UN CACHÉ?
+- Calcular embeddings en CPU es lento
+- Al limpiar la base de datos y volver a cargar los mismos archivos,
+  o al probar otro CHUNK_SIZE, muchos textos se repiten exactamente
+- Leer un vector de disco es miles de veces más rápido que calcularlo
+
+¿CÓMO FUNCIONA?
+- La clave es (modelo, tipo, huella SHA-256 del texto)
+- Los vectores se guardan como float32 en una base SQLite
+- SQLite permite que varios procesos (la app de Gradio y los scripts
+  de la Clase 23) usen el mismo archivo a la vez de forma segura
+- Si el caché supera su tamaño máximo, se borran los vectores que
+  hace más tiempo que no se usan (LRU)
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from langchain_core.embeddings import Embeddings
+
+# Máximo de variables por consulta SQL (límite de SQLite)
+_SQL_BATCH = 500
+
+# Las marcas de "usado recientemente" (last_used) de los aciertos se
+# guardan de a muchas: cuando se juntan tantas o pasan tantos segundos
+_TOUCH_BATCH = 1000
+_TOUCH_INTERVAL = 30.0
+
+# ==============================================================================
+# CLASE: CachedEmbeddings
+# ==============================================================================
+
+class CachedEmbeddings(Embeddings):
+    """
+    Envoltorio (wrapper) que añade un caché en disco a cualquier modelo
+    de embeddings de LangChain.
+
+    Se usa exactamente igual que el modelo original: tiene los métodos
+    embed_documents() y embed_query(). Por eso ChromaDB y el resto del
+    código no notan la diferencia.
+
+    Atributos:
+        base: Modelo de embeddings real (ej: HuggingFaceEmbeddings)
+        model_name: Nombre del modelo (forma parte de la clave del caché)
+        path: Archivo SQLite donde se guardan los vectores
+        max_entries: Número máximo de vectores guardados
+        hits: Textos encontrados en el caché (en este proceso)
+        misses: Textos que hubo que calcular (en este proceso)
+        entries: Vectores guardados (contados al abrir y llevados al día
+            en cada escritura, sin volver a contar la tabla)
+    """
+
+    def __init__(self, base, model_name, path, max_entries=100_000):
+        """
+        Constructor del caché.
+
+        Args:
+            base (Embeddings): Modelo de embeddings real
+            model_name (str): Nombre del modelo (ej: EMBEDDING_MODEL)
+            path (str): Ruta del archivo SQLite del caché
+            max_entries (int): Vectores máximos antes de borrar los más viejos
+        """
+        self.base = base
+        self.model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        # Cada hilo necesita su propia conexión a SQLite
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        # Aciertos pendientes de marcar en disco: {(tipo, huella): instante}
+        self._touched = {}
+        self._last_flush = time.monotonic()
+        atexit.register(self._flush_at_exit)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        connection = self._connect()
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, kind, text_hash)
+            )
+            """
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        connection.commit()
+
+        # Se cuenta una sola vez; después se suma o resta en cada escritura.
+        # Si otro proceso usa el mismo archivo, es una aproximación
+        self.entries = connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _connect(self):
+        """
+        Obtiene la conexión SQLite del hilo actual (la crea si no existe).
+
+        El modo WAL permite lecturas mientras otro proceso escribe, y el
+        timeout hace que un proceso espere en lugar de fallar si la base
+        está ocupada.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def embed_documents(self, texts):
+        """
+        Calcula (o recupera del caché) los embeddings de varios textos.
+
+        Args:
+            texts (list): Lista de textos
+
+        Returns:
+            list: Lista de vectores (uno por texto, en el mismo orden)
+        """
+        return self._embed(list(texts), 'document')
+
+    def embed_query(self, text):
+        """
+        Calcula (o recupera del caché) el embedding de una pregunta.
+
+        Args:
+            text (str): Texto de la pregunta
+
+        Returns:
+            list: Vector de la pregunta
+        """
+        return self._embed([text], 'query')[0]
+
+    def _embed(self, texts, kind):
+        """
+        Busca los textos en el caché y calcula solo los que faltan.
+
+        Args:
+            texts (list): Textos a convertir en vectores
+            kind (str): 'document' o 'query' (algunos modelos los tratan distinto)
+
+        Returns:
+            list: Lista de vectores en el mismo orden que texts
+        """
+        if not texts:
+            return []
+
+        hashes = [_text_hash(text) for text in texts]
+        found = self._lookup(kind, set(hashes))
+
+        # Textos que no están en el caché (sin repetir)
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in found and text_hash not in missing:
+                missing[text_hash] = text
+
+        if missing:
+            if kind == 'query':
+                vectors = [self.base.embed_query(text) for text in missing.values()]
+            else:
+                vectors = self.base.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), vectors))
+            self._store(kind, new_vectors)
+            found.update(new_vectors)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+
+        return [list(found[text_hash]) for text_hash in hashes]
+
+    def _lookup(self, kind, hashes):
+        """
+        Lee del caché los vectores de las huellas indicadas.
+
+        Returns:
+            dict: {huella: vector} de los textos encontrados
+        """
+        connection = self._connect()
+        found = {}
+        hashes = list(hashes)
+
+        for i in range(0, len(hashes), _SQL_BATCH):
+            batch = hashes[i:i + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = connection.execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE model = ? AND kind = ? AND text_hash IN ({placeholders})",
+                [self.model_name, kind, *batch]
+            ).fetchall()
+            for text_hash, blob in rows:
+                vector = array('f')
+                vector.frombytes(blob)
+                found[text_hash] = vector
+
+        if found:
+            # Marcar como usados recientemente (para la expulsión LRU).
+            # Solo se anota en memoria: escribir y confirmar (commit) en
+            # cada acierto haría que leer del caché costara una escritura
+            now = time.time()
+            with self._lock:
+                for text_hash in found:
+                    self._touched[(kind, text_hash)] = now
+                due = (len(self._touched) >= _TOUCH_BATCH
+                       or time.monotonic() - self._last_flush >= _TOUCH_INTERVAL)
+            if due:
+                self.flush()
+
+        return found
+
+    def flush(self):
+        """
+        Guarda en disco, en una sola transacción, las marcas de uso
+        pendientes de los aciertos (ver _lookup).
+
+        Se llama sola cada _TOUCH_BATCH aciertos o _TOUCH_INTERVAL
+        segundos, antes de expulsar vectores y al terminar el proceso. Si
+        el proceso muere sin llamarla, solo se pierde la fecha de los
+        últimos usos: el LRU es un poco menos exacto, pero ningún vector
+        se pierde.
+        """
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time.monotonic()
+        if not touched:
+            return
+        connection = self._connect()
+        connection.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE model = ? AND kind = ? AND text_hash = ?",
+            [(now, self.model_name, kind, text_hash)
+             for (kind, text_hash), now in touched.items()]
+        )
+        connection.commit()
+
+    def _flush_at_exit(self):
+        """Guarda las marcas pendientes al terminar el proceso (si se puede)."""
+        try:
+            self.flush()
+        except sqlite3.Error:
+            pass
+
+    def _store(self, kind, vectors):
+        """
+        Guarda vectores nuevos en el caché y aplica el límite de tamaño.
+
+        Args:
+            kind (str): 'document' o 'query'
+            vectors (dict): {huella: vector}
+        """
+        connection = self._connect()
+        now = time.time()
+        connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, kind, text_hash, vector, last_used) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (self.model_name, kind, text_hash, array('f', vector).tobytes(), now)
+                for text_hash, vector in vectors.items()
+            ]
+        )
+        connection.commit()
+        with self._lock:
+            # Eran textos que no estaban en el caché: filas nuevas
+            self.entries += len(vectors)
+        self._evict()
+
+    def _evict(self):
+        """
+        Si el caché supera max_entries, borra los vectores menos usados.
+
+        Se borra hasta quedar en el 90% del máximo, para no tener que
+        repetir la limpieza en cada inserción. Por debajo del máximo basta
+        con mirar self.entries; la tabla solo se cuenta al pasarlo (por si
+        otro proceso escribió o borró en el mismo archivo).
+        """
+        if self.entries <= self.max_entries:
+            return
+
+        connection = self._connect()
+        count = connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.max_entries:
+            with self._lock:
+                self.entries = count
+            return
+
+        # Que los últimos aciertos cuenten antes de elegir qué borrar
+        self.flush()
+
+        to_delete = count - int(self.max_entries * 0.9)
+        connection.execute(
+            "DELETE FROM embeddings WHERE rowid IN ("
+            "SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (to_delete,)
+        )
+        connection.commit()
+        with self._lock:
+            self.entries = count - to_delete
+        print(f"🧹 Caché de embeddings: eliminados {to_delete} vectores antiguos")
+
+    def stats(self):
+        """
+        Obtiene estadísticas del caché.
+
+        Returns:
+            dict: Estadísticas del caché
+                {
+                    'hits': int,        # Textos encontrados en el caché
+                    'misses': int,      # Textos que hubo que calcular
+                    'hit_rate': float,  # Proporción de aciertos (0 a 1)
+                    'entries': int,     # Vectores guardados en disco
+                    'path': str         # Archivo del caché
+                }
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': self.entries,
+            'path': self.path
+        }
+
+
+def _text_hash(text):
+    """Calcula la huella SHA-256 de un texto."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+# ==============================================================================
+# CLASE: TracedEmbeddings
+# ==============================================================================
+
+class TracedEmbeddings(Embeddings):
+    """
+    Envoltorio que mide cada llamada al modelo de embeddings como un
+    span "embed". Se usa igual que el modelo original.
+    """
+
+    def __init__(self, base, tracer):
+        """
+        Args:
+            base (Embeddings): Modelo de embeddings real (o con caché)
+            tracer (Tracer): Donde se registran los spans (ver tracing.py)
+        """
+        self.base = base
+        self.tracer = tracer
+
+    def embed_documents(self, texts):
+        """Embeddings de varios textos (span 'embed' con kind='document')."""
+        texts = list(texts)
+        with self.tracer.span("embed", kind="document", texts=len(texts)):
+            return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        """Embedding de una pregunta (span 'embed' con kind='query')."""
+        with self.tracer.span("embed", kind="query", texts=1):
+            return self.base.embed_query(text)
+
+    def __getattr__(self, name):
+        # stats(), model_name... del modelo envuelto siguen disponibles
+        if name == "base":
+            raise AttributeError(name)
+        return getattr(self.base, name)
+
+# ==============================================================================
+# FUNCIÓN: create_embeddings
+# ==============================================================================
+
+def create_embeddings(model_name, device='cpu', cache_path=None, max_entries=100_000,
+                      server_url=None):
+    """
+    Crea el modelo de embeddings de Hugging Face, con caché opcional.
+
+    Esta función es compartida por la app de la Clase 24 y los scripts de
+    la Clase 23, para que todos usen el mismo caché en disco (y, si está
+    en marcha, el mismo servicio de embeddings).
+
+    Args:
+        model_name (str): Modelo de Hugging Face
+        device (str): 'cpu' o 'cuda'
+        cache_path (str): Archivo del caché (None = sin caché)
+        max_entries (int): Vectores máximos en el caché
+        server_url (str): Servicio de embeddings (ver embedding_server.py).
+            Si no responde, el modelo se carga en este proceso.
+            None = cargar siempre el modelo aquí
+
+    Returns:
+        Embeddings: Modelo listo para usar
+
+    Ejemplo:
+        >>> embeddings = create_embeddings(
+        ...     "sentence-transformers/all-MiniLM-L6-v2",
+        ...     cache_path="embeddings.sqlite3"
+        ... )
+        >>> vector = embeddings.embed_query("¿Qué es Python?")
+    """
+    def load_model():
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(
+            model_name=model_name,  # Modelo de Hugging Face a usar
+            model_kwargs={'device': device}  # Usar CPU o GPU
+        )
+
+    if server_url:
+        from embedding_server import EmbeddingServiceClient
+        embeddings = EmbeddingServiceClient(server_url, model_name, fallback=load_model)
+    else:
+        embeddings = load_model()
+
+    if cache_path:
+        embeddings = CachedEmbeddings(embeddings, model_name, cache_path, max_entries)
+
+    return embeddings
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. CACHÉ:
+   - Guardar resultados costosos para reutilizarlos
+   - "Hit" = el dato estaba en el caché; "miss" = hubo que calcularlo
+
+2. HASH (huella digital):
+   - Convierte un texto de cualquier tamaño en una clave corta y única
+   - Textos iguales → misma huella
+
+3. LRU (Least Recently Used):
+   - Cuando el caché se llena, se borra lo que hace más tiempo no se usa
+
+💡 EXPERIMENTO SUGERIDO:
+   Carga un documento, limpia la base de datos y vuelve a cargarlo.
+   ¡La segunda vez los embeddings salen del caché y es mucho más rápido!
+"""
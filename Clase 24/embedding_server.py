@@ -0,0 +1,514 @@
+"""
+embedding_server.py - Servicio de Embeddings Compartido
+=======================================================
+
+Cada script de la Clase 23 (ingesta.py, consulta.py, consulta_filtrada.py)
+y cada proceso de la app carga su propia copia del modelo de embeddings:
+varios segundos de arranque y cientos de MB de memoria cada vez.
+
+Este módulo permite cargar el modelo UNA sola vez:
+
+- EmbeddingServer: un pequeño servidor HTTP en localhost con el modelo
+  cargado. Junta las peticiones que llegan casi a la vez (micro-batching)
+  y las calcula en una sola pasada del modelo
+- EmbeddingServiceClient: un modelo de embeddings de LangChain que, en
+  vez de calcular, pregunta al servidor. Si el servidor no está en marcha
+  (o deja de responder), carga el modelo en el propio proceso
+
+Uso:
+    python embedding_server.py              # arranca el servicio
+    python "../Clase 23/consulta.py" "..."  # ya no carga el modelo
+
+Solo usa la librería estándar (http.server, urllib, json).
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_core.embeddings import Embeddings
+
+# Segundos de espera al comprobar si el servidor está en marcha
+_PROBE_TIMEOUT = 0.5
+
+# Segundos antes de volver a probar el servicio tras no poder conectar
+_RETRY_INTERVAL = 30.0
+
+# ==============================================================================
+# CLASE: EmbeddingServer
+# ==============================================================================
+
+class _Job:
+    """Una petición pendiente: textos a calcular y dónde dejar el resultado."""
+
+    def __init__(self, texts, kind):
+        self.texts = texts
+        self.kind = kind
+        self.vectors = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class EmbeddingServer:
+    """
+    Calcula embeddings para varios clientes con un único modelo cargado.
+
+    Un solo hilo ("batcher") usa el modelo. Las peticiones se dejan en una
+    cola; el hilo toma la primera, espera unos milisegundos a que lleguen
+    más y las calcula todas juntas con una sola llamada a embed_documents.
+
+    Atributos:
+        model: Modelo de embeddings real (ej: HuggingFaceEmbeddings)
+        model_name: Nombre del modelo (los clientes lo comprueban)
+        max_batch: Textos máximos por pasada del modelo
+        batch_wait: Segundos que se espera a que lleguen más peticiones
+    """
+
+    def __init__(self, model, model_name, max_batch=64, batch_wait=0.005):
+        """
+        Constructor del servidor (no abre ningún puerto, ver serve()).
+
+        Args:
+            model (Embeddings): Modelo de embeddings
+            model_name (str): Nombre del modelo
+            max_batch (int): Textos máximos por pasada
+            batch_wait (float): Espera máxima para juntar peticiones (segundos)
+        """
+        self.model = model
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self.model_seconds = 0.0
+
+        threading.Thread(target=self._batch_loop, name="embedding-batcher", daemon=True).start()
+
+    def embed(self, texts, kind="document"):
+        """
+        Calcula embeddings (espera a que el hilo del modelo los calcule).
+
+        Args:
+            texts (list): Textos
+            kind (str): 'document' o 'query'
+
+        Returns:
+            list: Un vector por texto
+        """
+        job = _Job(list(texts), kind)
+        if not job.texts:
+            return []
+        self._queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.vectors
+
+    def _batch_loop(self):
+        """Junta peticiones de la cola y las calcula en una sola pasada."""
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = time.perf_counter() + self.batch_wait
+
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(job)
+                size += len(job.texts)
+
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # Un error inesperado no puede detener el único hilo del
+                # modelo: las peticiones de este lote reciben el error y
+                # las siguientes se atienden con normalidad
+                for job in batch:
+                    if not job.done.is_set():
+                        job.error = e
+                        job.done.set()
+
+    def _run_batch(self, batch):
+        """Calcula los vectores de un lote de peticiones y los reparte."""
+        for kind in ("document", "query"):
+            jobs = [job for job in batch if job.kind == kind]
+            if not jobs:
+                continue
+            texts = [text for job in jobs for text in job.texts]
+
+            start = time.perf_counter()
+            try:
+                if kind == "query" and len(texts) == 1:
+                    vectors = [self.model.embed_query(texts[0])]
+                else:
+                    # Con sentence-transformers, embed_query(t) da el mismo
+                    # vector que embed_documents([t]): varias preguntas
+                    # también se calculan en una sola pasada
+                    vectors = self.model.embed_documents(texts)
+            except Exception as e:
+                for job in jobs:
+                    job.error = e
+                    job.done.set()
+                continue
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.requests += len(jobs)
+                self.batches += 1
+                self.texts += len(texts)
+                self.model_seconds += elapsed
+
+            position = 0
+            for job in jobs:
+                job.vectors = [list(map(float, vector))
+                               for vector in vectors[position:position + len(job.texts)]]
+                position += len(job.texts)
+                job.done.set()
+
+    def stats(self):
+        """
+        Obtiene estadísticas del servidor.
+
+        Returns:
+            dict: Estadísticas del servidor
+                {
+                    'model': str,             # Modelo cargado
+                    'requests': int,          # Peticiones atendidas
+                    'batches': int,           # Pasadas del modelo
+                    'texts': int,             # Textos calculados
+                    'mean_batch': float,      # Peticiones por pasada (media)
+                    'model_seconds': float    # Tiempo total dentro del modelo
+                }
+        """
+        with self._lock:
+            return {
+                'model': self.model_name,
+                'requests': self.requests,
+                'batches': self.batches,
+                'texts': self.texts,
+                'mean_batch': self.requests / self.batches if self.batches else 0.0,
+                'model_seconds': self.model_seconds
+            }
+
+    def serve(self, host="127.0.0.1", port=8765):
+        """
+        Atiende peticiones HTTP en un hilo aparte.
+
+        - GET  /health → estadísticas (y nombre del modelo)
+        - POST /embed  → {"texts": [...], "kind": "document"} → {"vectors": [...]}
+
+        Args:
+            host (str): Interfaz de red (solo localhost por defecto)
+            port (int): Puerto
+
+        Returns:
+            ThreadingHTTPServer: El servidor (server.shutdown() lo detiene)
+        """
+        service = self
+
+        class EmbeddingHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/health":
+                    self.send_error(404)
+                    return
+                self._send_json(200, service.stats())
+
+            def do_POST(self):
+                if self.path.split("?")[0] != "/embed":
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    request = json.loads(self.rfile.read(length))
+                    texts = request["texts"]
+                    kind = request.get("kind", "document")
+                    if kind not in ("document", "query"):
+                        raise ValueError(f"tipo desconocido: {kind}")
+                except (KeyError, ValueError) as e:
+                    self._send_json(400, {'error': str(e)})
+                    return
+                try:
+                    vectors = service.embed(texts, kind)
+                except Exception as e:
+                    self._send_json(500, {'error': str(e)})
+                    return
+                self._send_json(200, {'vectors': vectors})
+
+            def _send_json(self, status, data):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Sin una línea en la consola por cada petición
+                pass
+
+        server = ThreadingHTTPServer((host, port), EmbeddingHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]   # con port=0, el puerto elegido
+        print(f"🧮 Servicio de embeddings ({self.model_name}) en http://{host}:{port}")
+        return server
+
+# ==============================================================================
+# CLASE: EmbeddingServiceClient
+# ==============================================================================
+
+class EmbeddingServiceError(RuntimeError):
+    """
+    El servicio respondió con un error (petición inválida o fallo del modelo).
+
+    Atributos:
+        status_code: Código HTTP de la respuesta
+    """
+
+    def __init__(self, status_code, message):
+        super().__init__(f"El servicio de embeddings respondió {status_code}: {message}")
+        self.status_code = status_code
+
+
+class EmbeddingServiceClient(Embeddings):
+    """
+    Modelo de embeddings de LangChain que usa el servicio compartido.
+
+    Se usa igual que HuggingFaceEmbeddings (embed_documents / embed_query),
+    así que ChromaDB, CachedEmbeddings y el resto del código no notan la
+    diferencia. Si no se puede conectar con el servicio, o tiene cargado
+    otro modelo, se usa el modelo local (creado con la función 'fallback')
+    y cada retry_interval segundos se vuelve a probar el servicio.
+
+    Los errores que responde el servicio (4xx: petición inválida; 5xx: falló
+    el cálculo) no se esconden cargando el modelo local: se lanzan como
+    EmbeddingServiceError.
+
+    Atributos:
+        url: Dirección del servicio (ej: "http://127.0.0.1:8765")
+        model_name: Modelo que se espera que tenga cargado el servicio
+        remote: True mientras se use el servicio
+    """
+
+    def __init__(self, url, model_name, fallback, timeout=60, retry_interval=_RETRY_INTERVAL):
+        """
+        Constructor del cliente. Comprueba enseguida si el servicio está
+        en marcha; si no, carga el modelo local.
+
+        Args:
+            url (str): Dirección del servicio
+            model_name (str): Nombre del modelo
+            fallback (callable): Función sin argumentos que crea el modelo
+                local (solo se llama si hace falta)
+            timeout (float): Segundos máximos por petición al servicio
+            retry_interval (float): Segundos entre pruebas del servicio
+                mientras se usa el modelo local
+        """
+        self.url = url.rstrip("/")
+        self.model_name = model_name
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._fallback = fallback
+        self._local = None
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+
+        self.remote = self._probe()
+        if self.remote:
+            print(f"🧮 Usando el servicio de embeddings en {self.url}")
+        else:
+            self._go_local()
+            self._load_local()
+
+    def _probe(self):
+        """True si el servicio responde y tiene cargado el mismo modelo."""
+        try:
+            with urllib.request.urlopen(self.url + "/health", timeout=_PROBE_TIMEOUT) as response:
+                health = json.loads(response.read())
+        except (OSError, ValueError):
+            return False
+        if health.get('model') != self.model_name:
+            print(f"⚠️ El servicio de embeddings usa otro modelo ({health.get('model')})")
+            return False
+        return True
+
+    def _go_local(self):
+        """Deja de usar el servicio hasta la próxima prueba."""
+        with self._lock:
+            self.remote = False
+            self._retry_at = time.monotonic() + self.retry_interval
+
+    def _check_service(self):
+        """
+        Mientras se usa el modelo local, vuelve a probar el servicio cada
+        retry_interval segundos (por si se arrancó o reinició).
+        """
+        with self._lock:
+            if self.remote or time.monotonic() < self._retry_at:
+                return
+            self._retry_at = time.monotonic() + self.retry_interval
+        if self._probe():
+            with self._lock:
+                self.remote = True
+            print(f"🧮 El servicio de embeddings vuelve a responder en {self.url}")
+
+    def _load_local(self):
+        """Carga el modelo en este proceso (solo la primera vez)."""
+        with self._lock:
+            if self._local is None:
+                self._local = self._fallback()
+        return self._local
+
+    def _post(self, texts, kind):
+        """
+        Pide los vectores al servicio.
+
+        Raises:
+            EmbeddingServiceError: El servicio respondió con un error
+            OSError: No se pudo conectar (o no respondió a tiempo)
+        """
+        body = json.dumps({'texts': texts, 'kind': kind}).encode("utf-8")
+        request = urllib.request.Request(
+            self.url + "/embed", data=body,
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())['vectors']
+        except urllib.error.HTTPError as e:
+            # HTTPError también es un OSError: se distingue antes
+            try:
+                message = json.loads(e.read())['error']
+            except (OSError, ValueError, KeyError):
+                message = e.reason
+            raise EmbeddingServiceError(e.code, message) from None
+
+    def _embed(self, texts, kind):
+        """
+        Calcula con el servicio o, si no se puede conectar, con el modelo local
+        (solo esta vez: la próxima prueba del servicio es en retry_interval).
+        """
+        self._check_service()
+        if self.remote:
+            try:
+                return self._post(texts, kind)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ El servicio de embeddings no responde ({e}); usando el modelo local "
+                      f"(se volverá a probar en {self.retry_interval:.0f} s)")
+                self._go_local()
+        local = self._load_local()
+        if kind == "query":
+            return [local.embed_query(texts[0])]
+        return local.embed_documents(texts)
+
+    def embed_documents(self, texts):
+        """
+        Calcula los embeddings de varios textos.
+
+        Args:
+            texts (list): Textos
+
+        Returns:
+            list: Un vector por texto
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        return self._embed(texts, "document")
+
+    def embed_query(self, text):
+        """
+        Calcula el embedding de una pregunta.
+
+        Args:
+            text (str): Pregunta
+
+        Returns:
+            list: Vector de la pregunta
+        """
+        return self._embed([text], "query")[0]
+
+# ==============================================================================
+# PROGRAMA PRINCIPAL
+# ==============================================================================
+
+def main():
+    """Carga el modelo una vez y atiende peticiones hasta Ctrl+C."""
+    from urllib.parse import urlparse
+    from config import (EMBEDDING_MODEL, DEVICE, EMBEDDING_SERVER_URL,
+                        EMBEDDING_SERVER_MAX_BATCH, EMBEDDING_SERVER_BATCH_WAIT_MS)
+    from embedding_cache import create_embeddings
+
+    default = urlparse(EMBEDDING_SERVER_URL or "http://127.0.0.1:8765")
+    parser = argparse.ArgumentParser(description="Servicio de embeddings compartido")
+    parser.add_argument("--host", default=default.hostname)
+    parser.add_argument("--port", type=int, default=default.port or 8765)
+    parser.add_argument("--max-batch", type=int, default=EMBEDDING_SERVER_MAX_BATCH,
+                        help="Textos máximos por pasada del modelo")
+    parser.add_argument("--wait-ms", type=float, default=EMBEDDING_SERVER_BATCH_WAIT_MS,
+                        help="Milisegundos de espera para juntar peticiones")
+    args = parser.parse_args()
+
+    print(f"🔄 Cargando el modelo {EMBEDDING_MODEL}...")
+    # Sin caché ni servicio: el caché en disco ya lo tienen los clientes
+    model = create_embeddings(EMBEDDING_MODEL, device=DEVICE)
+
+    service = EmbeddingServer(model, EMBEDDING_MODEL, max_batch=args.max_batch,
+                              batch_wait=args.wait_ms / 1000)
+    server = service.serve(args.host, args.port)
+    try:
+        while True:
+            time.sleep(60)
+            stats = service.stats()
+            print(f"📊 {stats['requests']} peticiones en {stats['batches']} pasadas "
+                  f"({stats['mean_batch']:.1f} por pasada)")
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\n👋 Servicio de embeddings detenido")
+
+
+if __name__ == "__main__":
+    main()
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. SERVICIO COMPARTIDO:
+   - Un proceso tiene el recurso caro (el modelo) y los demás se lo piden
+   - Los clientes arrancan al instante y casi no usan memoria
+
+2. MICRO-BATCHING:
+   - Calcular 20 textos juntos es mucho más rápido que 20 veces uno solo
+   - Esperar unos milisegundos para juntar peticiones sale a cuenta
+
+3. PLAN B (fallback):
+   - Si el servicio no está, el cliente carga el modelo él mismo:
+     los scripts funcionan igual, solo que más lentos al arrancar
+   - Cada cierto tiempo se vuelve a probar el servicio: si se arranca
+     más tarde, los clientes vuelven a usarlo solos
+   - Un error del servicio (petición inválida) no es "servicio caído":
+     se informa, no se esconde
+
+💡 EXPERIMENTO SUGERIDO:
+   Mide "time python consulta.py ..." en la Clase 23 con y sin
+   "python embedding_server.py" en marcha en otra terminal.
+"""
@@ -0,0 +1,335 @@
+"""
+ingestion_pipeline.py - Ingesta de Documentos en Streaming
+==========================================================
+
+Este módulo implementa una "tubería" (pipeline) de ingesta que procesa
+los archivos por lotes, en lugar de cargarlo todo en memoria de golpe:
+
+    cargar página → dividir → agrupar en lotes → embeddings → guardar
+
+¿POR QUÉ EN STREAMING?
+- Un lote grande de PDFs puede ocupar muchísima memoria si se cargan
+  todas las páginas y todos los fragmentos antes de guardarlos
+- Con lotes de tamaño fijo la memoria usada se mantiene constante,
+  sin importar cuántos documentos haya
+- La interfaz puede mostrar el progreso mientras se procesa
+
+La lectura de archivos ocurre en un hilo (productor) y los embeddings en
+otro (consumidor). Se comunican con una cola de tamaño limitado: si el
+productor va más rápido, espera hasta que haya sitio (backpressure).
+Todo lo que toca la base (y el resumen de la carga) lo hace el consumidor.
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import queue
+import threading
+import time
+from config import INGEST_BATCH_SIZE, MAX_IN_FLIGHT_BATCHES
+
+# Marcas que viajan por la cola junto con los lotes
+_BEGIN = "begin"
+_BATCH = "batch"
+_END = "end"
+_ERROR = "error"
+_DONE = "done"
+
+# ==============================================================================
+# CLASE: IngestionPipeline
+# ==============================================================================
+
+class IngestionPipeline:
+    """
+    Pipeline de ingesta por lotes con memoria acotada.
+    
+    Usa DocumentProcessor para leer y dividir los archivos página a página,
+    y DatabaseManager para guardar cada lote de forma incremental
+    (los archivos sin cambios se saltan sin leerlos).
+    
+    Atributos:
+        db_manager: Gestor de la base de datos vectorial
+        processor: Procesador de documentos
+        batch_size: Fragmentos por lote
+        max_in_flight: Lotes máximos esperando en la cola
+    """
+    
+    def __init__(self, db_manager, processor,
+                 batch_size=INGEST_BATCH_SIZE, max_in_flight=MAX_IN_FLIGHT_BATCHES):
+        """
+        Constructor del pipeline.
+        
+        Args:
+            db_manager (DatabaseManager): Dónde se guardan los fragmentos
+            processor (DocumentProcessor): Cómo se leen y dividen los archivos
+            batch_size (int): Número de fragmentos por lote
+            max_in_flight (int): Lotes máximos en la cola (mínimo 1)
+        """
+        self.db_manager = db_manager
+        self.processor = processor
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+    
+    def run(self, file_paths):
+        """
+        Procesa los archivos y va informando del progreso.
+        
+        Es un generador: cada vez que se guarda un lote produce un
+        diccionario de progreso. El último diccionario tiene 'done': True
+        e incluye el resumen completo de la carga.
+        
+        Args:
+            file_paths (list): Lista de rutas a archivos
+            
+        Yields:
+            dict: Progreso de la ingesta
+                {
+                    'done': bool,            # True en el último mensaje
+                    'files_total': int,      # Archivos a procesar
+                    'files_done': int,       # Archivos terminados
+                    'current_file': str,     # Archivo en curso
+                    'pages': int,            # Páginas leídas
+                    'split_count': int,      # Fragmentos procesados
+                    'failed_files': list,    # Archivos con error
+                    'seconds': float,        # Tiempo transcurrido
+                    'parse_seconds_saved': float, # Lectura ahorrada por el caché de texto
+                    'sync': dict             # Resumen de add_documents
+                }
+                
+        Ejemplo:
+            >>> pipeline = IngestionPipeline(db_manager, doc_processor)
+            >>> for progress in pipeline.run(["manual.pdf"]):
+            ...     print(progress['split_count'])
+        """
+        # La cola acota cuántos lotes pueden existir a la vez en memoria
+        work_queue = queue.Queue(maxsize=self.max_in_flight)
+        stop_event = threading.Event()
+        
+        sync = self.db_manager.new_sync_result()
+        progress = {
+            'done': False,
+            'files_total': len(file_paths),
+            'files_done': 0,
+            'current_file': "",
+            'pages': 0,
+            'split_count': 0,
+            'failed_files': [],
+            'seconds': 0.0,
+            'parse_seconds_saved': 0.0,
+            'sync': sync
+        }
+        text_cache = self.processor.text_cache
+        saved_before = text_cache.seconds_saved if text_cache else 0.0
+        
+        start = time.perf_counter()
+        producer = threading.Thread(
+            target=self._produce,
+            args=(file_paths, work_queue, stop_event),
+            daemon=True
+        )
+        producer.start()
+        
+        sessions = {}
+        finished = False
+        try:
+            while True:
+                kind, file_path, payload = work_queue.get()
+                
+                if kind == _DONE:
+                    finished = True
+                    break
+                
+                progress['current_file'] = file_path
+                
+                if kind == _BEGIN:
+                    # La sesión se abre aquí, en el mismo hilo que escribe:
+                    # así ve todo lo guardado antes (incluido un archivo
+                    # anterior con el mismo nombre en esta misma carga)
+                    try:
+                        session = self.db_manager.begin_source(
+                            payload['key'], payload['file_hash'], sync,
+                            split_settings=self.processor.split_settings(), source=file_path
+                        )
+                    except Exception as e:
+                        payload['status'] = 'error'
+                        payload['decided'].set()
+                        print(f"⚠️ Saltando archivo con error: {file_path} ({e})")
+                        progress['failed_files'].append(file_path)
+                        progress['files_done'] += 1
+                        progress['seconds'] = time.perf_counter() - start
+                        yield dict(progress)
+                        continue
+                    sessions[file_path] = session
+                    # El productor espera esta respuesta para saber si leer el archivo
+                    payload['status'] = session['status']
+                    payload['decided'].set()
+                
+                elif kind == _BATCH:
+                    pages, splits = payload
+                    # Un solo cálculo de embeddings por lote
+                    self.db_manager.write_source_batch(sessions[file_path], splits, sync)
+                    progress['pages'] += pages
+                    progress['split_count'] += len(splits)
+                
+                elif kind == _END:
+                    session = sessions.pop(file_path)
+                    status = self.db_manager.end_source(session, sync)
+                    sync[f"{status}_files"].append(session['key'])
+                    progress['files_done'] += 1
+                
+                elif kind == _ERROR:
+                    session = sessions.pop(file_path, None)
+                    if session is not None:
+                        # No dejar a medias los lotes ya guardados de este archivo
+                        self.db_manager.abort_source(session, sync)
+                    print(f"⚠️ Saltando archivo con error: {file_path} ({payload})")
+                    progress['failed_files'].append(file_path)
+                    progress['files_done'] += 1
+                
+                progress['seconds'] = time.perf_counter() - start
+                yield dict(progress)
+        finally:
+            # Si el consumidor se detiene (error o cancelación), avisar al productor
+            stop_event.set()
+            producer.join(timeout=1)
+            # ...y deshacer los archivos que quedaron a medio guardar
+            for session in sessions.values():
+                self.db_manager.abort_source(session, sync)
+            if not finished:
+                # Si terminó bien, los índices se guardan en record_ingest
+                self.db_manager.save_indexes()
+        
+        progress['done'] = True
+        progress['current_file'] = ""
+        progress['seconds'] = time.perf_counter() - start
+        if text_cache:
+            progress['parse_seconds_saved'] = text_cache.seconds_saved - saved_before
+        self.db_manager.record_ingest(sync, progress['seconds'])
+        
+        rate = progress['split_count'] / progress['seconds'] if progress['seconds'] > 0 else 0.0
+        print(f"\n📊 Ingesta en streaming: {progress['pages']} página(s), "
+              f"{progress['split_count']} fragmentos en {progress['seconds']:.2f} s "
+              f"({rate:.1f} fragmentos/s)")
+        
+        yield progress
+    
+    def _produce(self, file_paths, work_queue, stop_event):
+        """
+        Hilo productor: lee y divide los archivos y encola los lotes.
+        
+        Los archivos se dividen y encolan de a uno, en orden, pero su
+        texto se extrae en paralelo en el pool de procesos del
+        DocumentProcessor (ver prefetch_text): mientras se guardan los
+        lotes de un PDF, los siguientes ya se están leyendo en otros núcleos.
+        
+        Args:
+            file_paths (list): Archivos a procesar
+            work_queue (queue.Queue): Cola hacia el consumidor
+            stop_event (threading.Event): Señal para detenerse antes de tiempo
+        """
+        try:
+            with self.processor.prefetch_text(file_paths) as wait_for_text:
+                for file_path in file_paths:
+                    if stop_event.is_set():
+                        return
+                    self._produce_file(file_path, work_queue, stop_event, wait_for_text)
+        finally:
+            self._put(work_queue, stop_event, (_DONE, "", None))
+    
+    def _produce_file(self, file_path, work_queue, stop_event, wait_for_text):
+        """
+        Encola los lotes de un archivo: begin, batch..., end (o error).
+        
+        El productor solo calcula la huella; la sesión (begin_source) la
+        abre el consumidor cuando le llega el turno al archivo, y el
+        productor espera su respuesta para saber si hace falta leerlo.
+        """
+        try:
+            key, file_hash = self.db_manager.compute_source_hash(file_path)
+            request = {'key': key, 'file_hash': file_hash,
+                       'status': None, 'decided': threading.Event()}
+            if not self._put(work_queue, stop_event, (_BEGIN, file_path, request)):
+                return
+            while not request['decided'].wait(timeout=0.1):
+                if stop_event.is_set():
+                    return
+            
+            if request['status'] == 'error':
+                # El consumidor ya lo contó como fallido
+                return
+            if request['status'] == 'unchanged':
+                # El archivo no cambió: ni siquiera hace falta leerlo
+                print(f"♻️ Sin cambios, se omite: {file_path}")
+                self._put(work_queue, stop_event, (_END, file_path, None))
+                return
+            
+            # Esperar a que otro proceso termine de extraer su texto
+            wait_for_text(file_path)
+            
+            batch = []
+            new_pages = 0       # Páginas empezadas desde el último lote
+            last_page = -1
+            for page_number, split in self.processor.iter_splits(file_path):
+                if page_number != last_page:
+                    new_pages += 1
+                    last_page = page_number
+                batch.append(split)
+                
+                if len(batch) >= self.batch_size:
+                    if not self._put(work_queue, stop_event,
+                                     (_BATCH, file_path, (new_pages, batch))):
+                        return
+                    batch = []
+                    new_pages = 0
+            
+            if batch or new_pages:
+                self._put(work_queue, stop_event,
+                          (_BATCH, file_path, (new_pages, batch)))
+            
+            self._put(work_queue, stop_event, (_END, file_path, None))
+            
+        except Exception as e:
+            self._put(work_queue, stop_event, (_ERROR, file_path, str(e)))
+    
+    def _put(self, work_queue, stop_event, item):
+        """
+        Encola un elemento esperando si la cola está llena (backpressure).
+        
+        Returns:
+            bool: False si se pidió detener el pipeline mientras esperaba
+        """
+        while not stop_event.is_set():
+            try:
+                work_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. GENERADORES (yield):
+   - Producen valores de a uno, cuando se necesitan
+   - Permiten procesar datos enormes sin tenerlos todos en memoria
+   
+2. PRODUCTOR / CONSUMIDOR:
+   - Un hilo produce trabajo (leer archivos) y otro lo consume (embeddings)
+   - Se comunican con una cola (queue.Queue)
+   - Solo el consumidor escribe en la base: así dos hilos nunca
+     modifican los mismos datos a la vez
+   - La extracción del texto se reparte además entre varios procesos:
+     el streaming no renuncia a usar todos los núcleos
+   
+3. BACKPRESSURE (contrapresión):
+   - La cola tiene un tamaño máximo
+   - Si el consumidor es lento, el productor espera
+   - Así la memoria usada tiene un límite
+
+💡 EXPERIMENTO SUGERIDO:
+   Cambia INGEST_BATCH_SIZE en config.py (16, 64, 256) y mide cuánto
+   tarda la carga de un PDF grande y cuánta memoria usa el proceso.
+"""
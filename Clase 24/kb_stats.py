@@ -0,0 +1,279 @@
+"""
+kb_stats.py - Estadísticas de la Base de Conocimiento
+=====================================================
+
+Preguntarle a la base "¿cuántos fragmentos tienes?" después de cada
+carga, limpieza o refresco de la interfaz obliga a consultarla una y
+otra vez, y solo devuelve un número.
+
+Este módulo lleva las cuentas AL ESCRIBIR (mantenimiento incremental):
+cada fragmento que entra suma y cada fragmento que sale resta.
+
+    fragmentos, archivos, páginas, caracteres y bytes guardados
+    desglose por archivo
+    historial de cargas: duración y velocidad de los embeddings
+
+Mostrar las estadísticas es entonces leer unos contadores en memoria:
+ninguna consulta recorre la colección.
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import collections
+import json
+import os
+import threading
+import time
+
+# ==============================================================================
+# CLASE: KnowledgeBaseStats
+# ==============================================================================
+
+class KnowledgeBaseStats:
+    """
+    Contadores de la base de conocimiento, actualizados en cada escritura.
+
+    Atributos:
+        path: Archivo JSON donde se guardan (None = solo en memoria)
+        source_field: Metadato que identifica el archivo
+        history_size: Número de cargas que se recuerdan
+    """
+
+    def __init__(self, path=None, source_field="source_name", history_size=20):
+        """
+        Abre (o crea) las estadísticas.
+
+        Args:
+            path (str): Archivo JSON de las estadísticas
+            source_field (str): Metadato con el nombre del archivo
+            history_size (int): Cargas guardadas en el historial
+        """
+        self.path = path
+        self.source_field = source_field
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._history = collections.deque(maxlen=history_size)
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        """Pone los contadores a cero (el historial de cargas se conserva)."""
+        self._chunks = {}     # ID → (archivo, página, caracteres, bytes)
+        self._sources = {}    # archivo → {'chunks', 'chars', 'bytes', 'pages': {página: n}}
+        self._totals = {'chunks': 0, 'chars': 0, 'bytes': 0, 'pages': 0}
+
+    def __len__(self):
+        """Número de fragmentos contados."""
+        return len(self._chunks)
+
+    # --------------------------------------------------------------------------
+    # Escritura
+    # --------------------------------------------------------------------------
+
+    def add(self, ids, texts, metadatas, vector_bytes=0):
+        """
+        Cuenta fragmentos nuevos (si un ID ya existía, se reemplaza).
+
+        Args:
+            ids (list): IDs de los fragmentos
+            texts (list): Texto de cada fragmento
+            metadatas (list): Metadatos de cada fragmento
+            vector_bytes (int): Bytes que ocupa cada embedding
+        """
+        with self._lock:
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                self._remove_one(chunk_id)
+                metadata = metadata or {}
+                source = metadata.get(self.source_field)
+                page = metadata.get('page')
+                if not isinstance(page, int):
+                    page = None
+                self._add_one(chunk_id, source, page, len(text),
+                              len(text.encode('utf-8')) + vector_bytes)
+
+    def _add_one(self, chunk_id, source, page, chars, size):
+        """Cuenta un fragmento (sin tomar el candado)."""
+        self._chunks[chunk_id] = (source, page, chars, size)
+        entry = self._sources.setdefault(
+            source, {'chunks': 0, 'chars': 0, 'bytes': 0, 'pages': {}}
+        )
+        entry['chunks'] += 1
+        entry['chars'] += chars
+        entry['bytes'] += size
+        if page is not None:
+            if page not in entry['pages']:
+                self._totals['pages'] += 1
+            entry['pages'][page] = entry['pages'].get(page, 0) + 1
+
+        self._totals['chunks'] += 1
+        self._totals['chars'] += chars
+        self._totals['bytes'] += size
+
+    def remove(self, ids):
+        """Descuenta fragmentos (los IDs desconocidos se ignoran)."""
+        with self._lock:
+            for chunk_id in ids:
+                self._remove_one(chunk_id)
+
+    def _remove_one(self, chunk_id):
+        """Descuenta un fragmento (sin tomar el candado)."""
+        record = self._chunks.pop(chunk_id, None)
+        if record is None:
+            return
+        source, page, chars, size = record
+        entry = self._sources[source]
+        entry['chunks'] -= 1
+        entry['chars'] -= chars
+        entry['bytes'] -= size
+        if page is not None:
+            entry['pages'][page] -= 1
+            if not entry['pages'][page]:
+                del entry['pages'][page]
+                self._totals['pages'] -= 1
+        if not entry['chunks']:
+            del self._sources[source]
+
+        self._totals['chunks'] -= 1
+        self._totals['chars'] -= chars
+        self._totals['bytes'] -= size
+
+    def clear(self):
+        """Pone los contadores a cero (y guarda)."""
+        with self._lock:
+            self._reset()
+        self.save()
+
+    def record_ingest(self, seconds, files, chunks, embedded, embed_seconds):
+        """
+        Añade una carga al historial.
+
+        Args:
+            seconds (float): Duración total de la carga
+            files (int): Archivos procesados
+            chunks (int): Fragmentos procesados (nuevos + sin cambios)
+            embedded (int): Fragmentos a los que se calculó el embedding
+            embed_seconds (float): Tiempo dedicado a calcular embeddings
+        """
+        with self._lock:
+            self._history.append({
+                'at': time.time(),
+                'seconds': seconds,
+                'files': files,
+                'chunks': chunks,
+                'embedded': embedded,
+                'embed_seconds': embed_seconds
+            })
+
+    # --------------------------------------------------------------------------
+    # Consultas
+    # --------------------------------------------------------------------------
+
+    def summary(self):
+        """
+        Totales de la base y datos de la última carga.
+
+        Returns:
+            dict: {'chunks', 'sources', 'pages', 'chars', 'bytes',
+                   'last_ingest': dict | None}
+        """
+        with self._lock:
+            return {
+                **self._totals,
+                'sources': len(self._sources),
+                'last_ingest': dict(self._history[-1]) if self._history else None
+            }
+
+    def sources(self):
+        """
+        Desglose por archivo, de más a menos fragmentos.
+
+        Returns:
+            list: [{'source', 'chunks', 'pages', 'chars', 'bytes'}, ...]
+        """
+        with self._lock:
+            rows = [
+                {'source': source, 'chunks': entry['chunks'], 'pages': len(entry['pages']),
+                 'chars': entry['chars'], 'bytes': entry['bytes']}
+                for source, entry in self._sources.items()
+            ]
+        rows.sort(key=lambda row: row['chunks'], reverse=True)
+        return rows
+
+    def history(self):
+        """
+        Historial de cargas (la más reciente al final) con la velocidad
+        de los embeddings en fragmentos por segundo.
+
+        Returns:
+            list: [{'at', 'seconds', 'files', 'chunks', 'embedded',
+                    'embed_seconds', 'throughput'}, ...]
+        """
+        with self._lock:
+            records = [dict(record) for record in self._history]
+        for record in records:
+            record['throughput'] = (record['embedded'] / record['embed_seconds']
+                                    if record['embed_seconds'] > 0 else 0.0)
+        return records
+
+    # --------------------------------------------------------------------------
+    # Persistencia
+    # --------------------------------------------------------------------------
+
+    def save(self):
+        """Guarda las estadísticas en disco (si tienen archivo)."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                'source_field': self.source_field,
+                'chunks': self._chunks,
+                'history': list(self._history)
+            }
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def _load(self):
+        """
+        Carga lo guardado con save(). Solo se guarda el registro de cada
+        fragmento; los totales se vuelven a sumar al abrir.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self._history.extend(data.get('history', []))
+        if data.get('source_field') != self.source_field:
+            return
+
+        for chunk_id, (source, page, chars, size) in data['chunks'].items():
+            self._add_one(chunk_id, source, page, chars, size)
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. MANTENIMIENTO INCREMENTAL:
+   - En lugar de recalcular un total recorriendo todos los datos,
+     se actualiza con cada cambio: +1 al añadir, -1 al borrar
+   - Leer el total cuesta lo mismo con 10 fragmentos que con 1 millón
+
+2. POR QUÉ GUARDAR CADA FRAGMENTO:
+   - Para descontar un fragmento borrado hay que saber cuánto sumó
+     (archivo, página, caracteres, bytes)
+
+3. VELOCIDAD (THROUGHPUT):
+   - Fragmentos con embedding nuevo / segundos calculando embeddings
+   - Si baja de una carga a otra, algo va peor (CPU ocupada, modelo
+     distinto, servicio de embeddings caído...)
+
+💡 EXPERIMENTO SUGERIDO:
+   Carga el mismo PDF dos veces y compara las dos filas del historial:
+   la segunda casi no calcula embeddings (se reutilizan).
+"""
@@ -0,0 +1,570 @@
+"""
+llm_gateway.py - Puerta de Acceso al LLM
+========================================
+
+Cuando 40 estudiantes hacen la misma pregunta a la vez, la app haría 40
+llamadas idénticas a Gemini y el proveedor empezaría a rechazarlas por
+límite de uso (error 429). Este módulo pone una "puerta" delante del LLM:
+
+1. COALESCENCIA ("singleflight"): si llega un prompt idéntico a otro que
+   ya se está generando, no se hace otra llamada: se comparte la misma
+   respuesta (también en streaming)
+2. CONCURRENCIA MÁXIMA: un semáforo limita cuántas llamadas hay en curso
+3. LÍMITE DE RITMO: un "token bucket" limita las llamadas por minuto
+4. REINTENTOS: ante errores 429 o 5xx se reintenta esperando cada vez
+   más (backoff exponencial) con una parte al azar (jitter), para que
+   todos los clientes no reintenten en el mismo instante
+
+LLMGateway es un Runnable de LangChain: se usa en la cadena igual que
+el LLM original (prompt | gateway | StrOutputParser()), tanto con
+invoke/stream como con ainvoke/astream (async). Para probarlo sin
+internet basta con envolver un modelo falso (FakeListChatModel).
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from collections import deque
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+
+# ==============================================================================
+# CLASE: TokenBucket
+# ==============================================================================
+
+class TokenBucket:
+    """
+    Limitador de ritmo: el cubo se rellena a 'rate' fichas por segundo
+    hasta 'capacity' fichas. Cada llamada gasta una ficha; si no hay,
+    espera a que se rellene.
+    """
+
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate (float): Fichas por segundo (0 = sin límite)
+            capacity (int): Fichas máximas (ráfaga permitida)
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_take(self):
+        """
+        Intenta tomar una ficha sin esperar.
+
+        Returns:
+            float: 0 si se tomó la ficha; si no, segundos hasta la siguiente
+        """
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """
+        Toma una ficha, esperando si hace falta.
+
+        Returns:
+            float: Segundos que hubo que esperar
+        """
+        waited = 0.0
+        delay = self._try_take()
+        while delay:
+            time.sleep(delay)
+            waited += delay
+            delay = self._try_take()
+        return waited
+
+    async def aacquire(self):
+        """Igual que acquire(), pero espera sin bloquear el bucle de asyncio."""
+        waited = 0.0
+        delay = self._try_take()
+        while delay:
+            await asyncio.sleep(delay)
+            waited += delay
+            delay = self._try_take()
+        return waited
+
+# ==============================================================================
+# CLASE: FairSemaphore
+# ==============================================================================
+
+class FairSemaphore:
+    """
+    Semáforo que pueden esperar tanto hilos como tareas de asyncio, y que
+    reparte los permisos por orden de llegada (FIFO).
+
+    Un semáforo de threading no sirve para las tareas async (esperar
+    bloquearía el bucle) y uno de asyncio no sirve para los hilos. Aquí
+    cada espera es un threading.Event (hilos) o un Future de su bucle
+    (tareas), y release() le pasa el permiso directamente al primero de
+    la fila: nadie consulta una y otra vez si ya hay sitio.
+    """
+
+    def __init__(self, value):
+        """
+        Args:
+            value (int): Permisos disponibles (llamadas simultáneas)
+        """
+        self._free = value
+        self._waiters = deque()   # threading.Event o (bucle, Future)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Toma un permiso, esperando (el hilo) si no hay."""
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        # release() nos pasa su permiso al despertarnos
+        event.wait()
+
+    async def aacquire(self):
+        """Toma un permiso, esperando sin bloquear el bucle de asyncio."""
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        future = waiter[1]
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+            if not queued and future.done() and not future.cancelled():
+                # El permiso llegó justo antes de la cancelación: devolverlo
+                self.release()
+            raise
+
+    def release(self):
+        """Devuelve un permiso (o se lo pasa al primero que espera)."""
+        with self._lock:
+            if not self._waiters:
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            loop.call_soon_threadsafe(self._hand_over, future)
+
+    def _hand_over(self, future):
+        """Entrega el permiso a una tarea (en su bucle); si se canceló, al siguiente."""
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+# ==============================================================================
+# CLASE: _Flight (una llamada en curso, compartida)
+# ==============================================================================
+
+class _Flight:
+    """
+    Resultado de una llamada al LLM que pueden leer varios clientes a la vez.
+
+    Quien hace la llamada (un hilo o una tarea de asyncio) publica cada
+    fragmento; cada cliente los lee en orden, esperando a los que todavía
+    no llegaron. Los clientes normales esperan con una Condition y los
+    async con un asyncio.Event de su propio bucle.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+        self.task = None           # Tarea de asyncio que hace la llamada (si es async)
+        self._async_waiters = []   # (bucle, evento) de los lectores async
+
+    def _notify(self):
+        """Despierta a todos los lectores (se llama con la Condition tomada)."""
+        self.condition.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+        self._async_waiters.clear()
+
+    def publish(self, chunk):
+        """Añade un fragmento de la respuesta y despierta a los lectores."""
+        with self.condition:
+            self.chunks.append(chunk)
+            self._notify()
+
+    def finish(self, error=None):
+        """Marca la llamada como terminada (con o sin error)."""
+        with self.condition:
+            self.done = True
+            self.error = error
+            self._notify()
+
+    def follow(self):
+        """
+        Recorre los fragmentos de la respuesta a medida que llegan.
+
+        Yields:
+            Fragmentos de la respuesta, en orden
+
+        Raises:
+            Exception: El error de la llamada, si falló
+        """
+        index = 0
+        while True:
+            with self.condition:
+                while index >= len(self.chunks) and not self.done:
+                    self.condition.wait()
+                if index < len(self.chunks):
+                    chunk = self.chunks[index]
+                    index += 1
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            yield chunk
+
+    async def afollow(self):
+        """Igual que follow(), pero espera sin bloquear el bucle de asyncio."""
+        loop = asyncio.get_running_loop()
+        index = 0
+        while True:
+            event = None
+            with self.condition:
+                if index < len(self.chunks):
+                    chunk = self.chunks[index]
+                    index += 1
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    event = asyncio.Event()
+                    self._async_waiters.append((loop, event))
+            if event is not None:
+                await event.wait()
+            else:
+                yield chunk
+
+# ==============================================================================
+# FUNCIÓN: is_retryable
+# ==============================================================================
+
+def _status_code(error):
+    """
+    Código HTTP de un error del proveedor, si se puede averiguar.
+
+    Cada librería guarda el código en un atributo distinto; como último
+    recurso se busca en el mensaje ("429 Resource exhausted").
+    """
+    for attribute in ("status_code", "code", "http_status"):
+        value = getattr(error, attribute, None)
+        value = getattr(value, "value", value)  # enums de gRPC/HTTP
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    if isinstance(value, int):
+        return value
+
+    match = re.search(r"\b(429|5\d\d)\b", str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_retryable(error):
+    """
+    Indica si vale la pena reintentar tras un error.
+
+    Se reintenta ante 429 (demasiadas peticiones) y 5xx (error del servidor).
+    Los demás errores (API key inválida, prompt rechazado...) no mejoran
+    reintentando.
+
+    Args:
+        error (Exception): Error de la llamada
+
+    Returns:
+        bool: True si se debe reintentar
+    """
+    code = _status_code(error)
+    return code is not None and (code == 429 or 500 <= code < 600)
+
+# ==============================================================================
+# CLASE: LLMGateway
+# ==============================================================================
+
+class LLMGateway(Runnable):
+    """
+    Envoltorio de un LLM con coalescencia, límites y reintentos.
+
+    Atributos:
+        llm: Modelo de lenguaje real (o uno falso para pruebas)
+        max_retries: Reintentos ante errores 429/5xx
+        base_delay: Espera del primer reintento (segundos)
+        max_delay: Espera máxima entre reintentos (segundos)
+        calls: Llamadas reales hechas al LLM
+        coalesced: Peticiones que compartieron una llamada en curso
+        retries: Reintentos hechos
+        throttled_seconds: Tiempo total de espera por el límite de ritmo
+    """
+
+    def __init__(self, llm, max_concurrency=4, requests_per_minute=60,
+                 max_retries=4, base_delay=1.0, max_delay=30.0):
+        """
+        Constructor de la puerta.
+
+        Args:
+            llm (Runnable): Modelo de lenguaje a envolver
+            max_concurrency (int): Llamadas simultáneas máximas
+            requests_per_minute (float): Llamadas por minuto (0 = sin límite)
+            max_retries (int): Reintentos ante errores 429/5xx
+            base_delay (float): Espera base de los reintentos (segundos)
+            max_delay (float): Espera máxima entre reintentos (segundos)
+        """
+        self.llm = llm
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._semaphore = FairSemaphore(max(1, max_concurrency))
+        self._bucket = TokenBucket(requests_per_minute / 60.0, capacity=max(1, max_concurrency))
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+
+    @staticmethod
+    def _key(prompt):
+        """Clave de coalescencia: el texto completo del prompt."""
+        return prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+
+    def stream(self, input, config=None, **kwargs):
+        """
+        Genera la respuesta por partes (mismo contrato que llm.stream).
+
+        Si ya hay una llamada en curso con el mismo prompt, se leen sus
+        fragmentos en lugar de hacer otra.
+
+        Args:
+            input: Prompt (PromptValue, lista de mensajes o texto)
+            config (dict): Configuración de LangChain (opcional)
+
+        Yields:
+            Fragmentos de la respuesta (AIMessageChunk)
+        """
+        key = self._key(input)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                # La llamada se hace en su propio hilo: si el primer cliente
+                # deja de leer, los demás siguen recibiendo la respuesta
+                threading.Thread(
+                    target=self._run, args=(key, flight, input, config), daemon=True
+                ).start()
+            else:
+                self.coalesced += 1
+
+        yield from flight.follow()
+
+    async def astream(self, input, config=None, **kwargs):
+        """
+        Versión async de stream(): la llamada usa llm.astream() en una
+        tarea de asyncio, así una respuesta lenta no ocupa ningún hilo.
+
+        Las peticiones async y las normales comparten las mismas llamadas
+        en curso, el mismo límite de concurrencia y el mismo ritmo.
+
+        Yields:
+            Fragmentos de la respuesta (AIMessageChunk)
+        """
+        key = self._key(input)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                # Tarea propia: si el primer cliente se desconecta (y se
+                # cancela su petición), la llamada sigue para los demás
+                flight.task = asyncio.get_running_loop().create_task(
+                    self._arun(key, flight, input, config)
+                )
+            else:
+                self.coalesced += 1
+
+        async for chunk in flight.afollow():
+            yield chunk
+
+    def invoke(self, input, config=None, **kwargs):
+        """
+        Genera la respuesta completa (mismo contrato que llm.invoke).
+
+        Returns:
+            AIMessage | str: Respuesta del LLM
+        """
+        return self._join(list(self.stream(input, config, **kwargs)))
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        """Versión async de invoke()."""
+        return self._join([chunk async for chunk in self.astream(input, config, **kwargs)])
+
+    @staticmethod
+    def _join(chunks):
+        """Une los fragmentos de una respuesta en un solo mensaje."""
+        if not chunks:
+            return AIMessage(content="")
+        if all(isinstance(chunk, str) for chunk in chunks):
+            return "".join(chunks)
+        message = chunks[0]
+        for chunk in chunks[1:]:
+            message = message + chunk
+        return message
+
+    def _run(self, key, flight, prompt, config):
+        """
+        Hace la llamada real al LLM (en un hilo aparte) y publica la respuesta.
+        """
+        error = None
+        try:
+            with self._semaphore:
+                for attempt in range(self.max_retries + 1):
+                    waited = self._bucket.acquire()
+                    with self._lock:
+                        self.throttled_seconds += waited
+                        self.calls += 1
+                    try:
+                        for chunk in self.llm.stream(prompt, config):
+                            flight.publish(chunk)
+                        break
+                    except Exception as e:
+                        time.sleep(self._retry_delay(flight, attempt, e))
+        except Exception as e:
+            error = e
+        finally:
+            # Las siguientes peticiones iguales harán una llamada nueva
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.finish(error)
+
+    async def _arun(self, key, flight, prompt, config):
+        """
+        Versión async de _run(): hace la llamada con llm.astream().
+        """
+        error = None
+        acquired = False
+        try:
+            # Mismo semáforo que las llamadas normales, y la misma fila
+            await self._semaphore.aacquire()
+            acquired = True
+            for attempt in range(self.max_retries + 1):
+                waited = await self._bucket.aacquire()
+                with self._lock:
+                    self.throttled_seconds += waited
+                    self.calls += 1
+                try:
+                    async for chunk in self.llm.astream(prompt, config):
+                        flight.publish(chunk)
+                    break
+                except Exception as e:
+                    await asyncio.sleep(self._retry_delay(flight, attempt, e))
+        except Exception as e:
+            error = e
+        except asyncio.CancelledError as e:
+            # El bucle se está cerrando: los lectores reciben la cancelación
+            error = e
+            raise
+        finally:
+            if acquired:
+                self._semaphore.release()
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.finish(error)
+
+    def _retry_delay(self, flight, attempt, error):
+        """
+        Decide si reintentar tras un error y cuánto esperar.
+
+        Returns:
+            float: Segundos a esperar antes del reintento
+
+        Raises:
+            Exception: El mismo error, si no se debe reintentar
+        """
+        # Solo se reintenta si todavía no se entregó nada
+        if flight.chunks or attempt == self.max_retries or not is_retryable(error):
+            raise error
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        with self._lock:
+            self.retries += 1
+        print(f"⏳ LLM ocupado ({error.__class__.__name__}), "
+              f"reintento {attempt + 1} en {delay:.1f} s")
+        return delay
+
+    def stats(self):
+        """
+        Obtiene estadísticas de la puerta.
+
+        Returns:
+            dict: {'calls', 'coalesced', 'retries', 'throttled_seconds', 'in_flight'}
+        """
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'retries': self.retries,
+            'throttled_seconds': self.throttled_seconds,
+            'in_flight': len(self._flights)
+        }
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. SEMÁFORO:
+   - Un contador de "permisos": si no quedan, el hilo espera su turno
+   - "Justo" (FIFO): los permisos se reparten por orden de llegada
+
+2. TOKEN BUCKET:
+   - Permite ráfagas cortas pero limita el ritmo medio de llamadas
+
+3. BACKOFF EXPONENCIAL CON JITTER:
+   - Esperar 1 s, 2 s, 4 s... (al azar entre 0 y ese valor)
+   - Sin el azar, todos los clientes reintentarían a la vez
+
+4. SINGLEFLIGHT:
+   - "Una sola llamada en vuelo" por cada petición idéntica
+
+💡 EXPERIMENTO SUGERIDO:
+   Ejecuta "python benchmark.py gateway --users 40" y compara las
+   llamadas reales al LLM con las peticiones recibidas.
+"""
@@ -0,0 +1,296 @@
+"""
+metadata_index.py - Índice de Metadatos para Filtrar Búsquedas
+==============================================================
+
+Para responder "solo con estos 3 PDFs, páginas 10 a 40" lo ingenuo es
+buscar en TODA la base y después descartar lo que no cumple el filtro:
+se calculan similitudes que no sirven para nada y, si el filtro es muy
+estricto, a veces no queda ningún resultado.
+
+Este índice guarda, para cada fragmento, su archivo, su página y la
+fecha en que se cargó:
+
+    archivo → IDs de sus fragmentos
+    página  → IDs de sus fragmentos
+    archivo → fecha de carga
+
+Con él, el filtro se resuelve ANTES de la búsqueda vectorial (en inglés
+"filter pushdown"): primero se calculan los IDs que cumplen el filtro
+(operaciones de conjuntos) y después solo se comparan esos vectores.
+
+El índice se actualiza en cada carga y se guarda como JSON; si no
+coincide con la base vectorial, se reconstruye al arrancar.
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import datetime
+import json
+import os
+import threading
+
+# ==============================================================================
+# FUNCIÓN: to_timestamp
+# ==============================================================================
+
+def to_timestamp(value, end_of_day=False):
+    """
+    Convierte una fecha en segundos desde 1970 (como time.time()).
+
+    Args:
+        value: None, número, datetime, date o texto ISO ("2025-03-01",
+            "2025-03-01T10:30")
+        end_of_day (bool): Si es una fecha sin hora, devolver el final del
+            día (para que "hasta el 2025-03-01" incluya ese día)
+
+    Returns:
+        float | None: Segundos, o None si value es None
+
+    Ejemplo:
+        >>> to_timestamp("2025-03-01") < to_timestamp("2025-03-01", end_of_day=True)
+        True
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = (datetime.date.fromisoformat(value) if len(value) == 10
+                 else datetime.datetime.fromisoformat(value))
+    if not isinstance(value, datetime.datetime):
+        # Fecha sin hora: medianoche (o la medianoche siguiente)
+        value = datetime.datetime.combine(value, datetime.time())
+        if end_of_day:
+            value += datetime.timedelta(days=1)
+    return value.timestamp()
+
+# ==============================================================================
+# CLASE: MetadataIndex
+# ==============================================================================
+
+class MetadataIndex:
+    """
+    Índice en memoria de archivo, página y fecha de carga de cada fragmento.
+
+    Atributos:
+        path: Archivo JSON donde se guarda (None = solo en memoria)
+        source_field: Metadato que identifica el archivo ('source_name'
+            en la app, 'source' en los scripts de la Clase 23)
+    """
+
+    def __init__(self, path=None, source_field="source_name"):
+        """
+        Abre (o crea) el índice.
+
+        Args:
+            path (str): Archivo JSON del índice
+            source_field (str): Metadato con el nombre del archivo
+        """
+        self.path = path
+        self.source_field = source_field
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        """Deja el índice vacío (en memoria)."""
+        self._chunks = {}        # ID → (archivo, página)
+        self._by_source = {}     # archivo → conjunto de IDs
+        self._by_page = {}       # página → conjunto de IDs
+        self._loaded_at = {}     # archivo → fecha de carga (segundos)
+
+    def __len__(self):
+        """Número de fragmentos indexados."""
+        return len(self._chunks)
+
+    # --------------------------------------------------------------------------
+    # Escritura
+    # --------------------------------------------------------------------------
+
+    def add(self, ids, metadatas):
+        """
+        Indexa fragmentos (si un ID ya existía, se reemplaza).
+
+        Args:
+            ids (list): IDs de los fragmentos
+            metadatas (list): Metadatos de cada fragmento
+        """
+        with self._lock:
+            for chunk_id, metadata in zip(ids, metadatas):
+                self._remove_one(chunk_id)
+                metadata = metadata or {}
+                source = metadata.get(self.source_field)
+                page = metadata.get('page')
+                if not isinstance(page, int):
+                    page = None
+
+                self._chunks[chunk_id] = (source, page)
+                self._by_source.setdefault(source, set()).add(chunk_id)
+                if page is not None:
+                    self._by_page.setdefault(page, set()).add(chunk_id)
+                if metadata.get('ingested_at') is not None:
+                    self._loaded_at[source] = max(self._loaded_at.get(source, 0.0),
+                                                  float(metadata['ingested_at']))
+
+    def remove(self, ids):
+        """Quita fragmentos del índice (los IDs desconocidos se ignoran)."""
+        with self._lock:
+            for chunk_id in ids:
+                self._remove_one(chunk_id)
+
+    def _remove_one(self, chunk_id):
+        """Quita un fragmento (sin tomar el candado)."""
+        entry = self._chunks.pop(chunk_id, None)
+        if entry is None:
+            return
+        source, page = entry
+        self._discard(self._by_source, source, chunk_id)
+        if source not in self._by_source:
+            self._loaded_at.pop(source, None)
+        if page is not None:
+            self._discard(self._by_page, page, chunk_id)
+
+    @staticmethod
+    def _discard(mapping, key, chunk_id):
+        """Quita un ID de mapping[key] y borra la clave si queda vacía."""
+        ids = mapping.get(key)
+        if ids is not None:
+            ids.discard(chunk_id)
+            if not ids:
+                del mapping[key]
+
+    def clear(self):
+        """Vacía el índice (y su archivo)."""
+        with self._lock:
+            self._reset()
+        self.save()
+
+    # --------------------------------------------------------------------------
+    # Consultas
+    # --------------------------------------------------------------------------
+
+    def sources(self):
+        """
+        Archivos indexados y cuántos fragmentos tiene cada uno.
+
+        Returns:
+            dict: {archivo: número de fragmentos}
+        """
+        with self._lock:
+            return {source: len(ids) for source, ids in self._by_source.items()}
+
+    def select(self, sources=None, pages=None, since=None, until=None):
+        """
+        IDs de los fragmentos que cumplen TODOS los filtros indicados.
+
+        Args:
+            sources (str | list): Archivo o archivos permitidos
+            pages (tuple | int): (primera, última) página, ambas incluidas,
+                o una sola página.
+                Los fragmentos sin página (archivos .txt) no cumplen este filtro
+            since: Cargados desde esta fecha (ver to_timestamp)
+            until: Cargados hasta esta fecha, incluida
+
+        Returns:
+            list | None: IDs que cumplen los filtros, o None si no se
+                indicó ningún filtro (= toda la base)
+
+        Ejemplo:
+            >>> index.select(sources=["a.pdf", "b.pdf"], pages=(10, 40))
+        """
+        start, end = to_timestamp(since), to_timestamp(until, end_of_day=True)
+        if not sources and pages is None and start is None and end is None:
+            return None
+
+        with self._lock:
+            groups = []
+            if sources:
+                if isinstance(sources, str):
+                    sources = [sources]
+                groups.append(self._union(self._by_source, sources))
+            if pages is not None:
+                first, last = (pages, pages) if isinstance(pages, int) else pages
+                groups.append(self._union(
+                    self._by_page, [page for page in self._by_page if first <= page <= last]))
+            if start is not None or end is not None:
+                loaded = [source for source, moment in self._loaded_at.items()
+                          if (start is None or moment >= start)
+                          and (end is None or moment < end)]
+                groups.append(self._union(self._by_source, loaded))
+
+            # Intersección empezando por el conjunto más pequeño
+            groups.sort(key=len)
+            selected = set(groups[0])
+            for group in groups[1:]:
+                selected &= group
+            return list(selected)
+
+    @staticmethod
+    def _union(mapping, keys):
+        """Unión de los conjuntos mapping[key] de las claves dadas."""
+        result = set()
+        for key in keys:
+            result |= mapping.get(key, set())
+        return result
+
+    # --------------------------------------------------------------------------
+    # Persistencia
+    # --------------------------------------------------------------------------
+
+    def save(self):
+        """Guarda el índice en disco (si tiene archivo)."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                'source_field': self.source_field,
+                'chunks': self._chunks,
+                'loaded_at': {source or "": moment for source, moment in self._loaded_at.items()}
+            }
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def _load(self):
+        """Carga el índice guardado con save() (si existe)."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get('source_field') != self.source_field:
+            return
+
+        for chunk_id, (source, page) in data['chunks'].items():
+            self._chunks[chunk_id] = (source, page)
+            self._by_source.setdefault(source, set()).add(chunk_id)
+            if page is not None:
+                self._by_page.setdefault(page, set()).add(chunk_id)
+        self._loaded_at = {source: moment for source, moment in data['loaded_at'].items()
+                           if source in self._by_source}
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. FILTRAR ANTES DE BUSCAR (filter pushdown):
+   - Filtrar después: se compara la pregunta con TODOS los vectores y
+     luego se tira casi todo
+   - Filtrar antes: se eligen los IDs permitidos y solo se comparan esos
+
+2. OPERACIONES DE CONJUNTOS:
+   - Varios archivos → unión (|); archivo Y páginas → intersección (&)
+   - Intersecar empezando por el conjunto más pequeño es más rápido
+
+3. ÍNDICE SECUNDARIO:
+   - Además de "ID → datos", guardamos "valor → IDs" para buscar por valor
+
+💡 EXPERIMENTO SUGERIDO:
+   Ejecuta "python benchmark.py filters" y compara la latencia de buscar
+   en toda la base con la de buscar solo en unos pocos archivos.
+"""
@@ -0,0 +1,222 @@
+"""
+quantization.py - Cuantización de Embeddings
+============================================
+
+Un embedding de all-MiniLM-L6-v2 tiene 384 números float32: 1536 bytes.
+Con cientos de miles de fragmentos eso son cientos de MB. La cuantización
+guarda una versión "comprimida" de cada vector:
+
+- INT8 (escalar): cada número pasa a un entero de -127 a 127 → 384 bytes (4x menos)
+- BINARIA: cada número pasa a un solo bit (positivo o no) → 48 bytes (32x menos)
+
+La búsqueda se hace en dos etapas:
+1. Se compara la pregunta con los códigos comprimidos (rápido, poca memoria)
+2. Los mejores candidatos se vuelven a puntuar con los vectores completos
+   guardados en disco (re-ranking), para recuperar la precisión
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import os
+import numpy as np
+
+# Tabla con el número de bits a 1 de cada byte (0 a 255), para la distancia de Hamming
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def _count_bits(bits):
+    """
+    Cuenta los bits a 1 de cada fila.
+
+    NumPy 2 tiene np.bitwise_count (usa la instrucción POPCNT del
+    procesador); en versiones anteriores se usa la tabla _POPCOUNT.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[bits.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+# ==============================================================================
+# CLASE: ScalarQuantizer (int8)
+# ==============================================================================
+
+class ScalarQuantizer:
+    """
+    Cuantización escalar a int8, con una escala por dimensión.
+
+    Cada componente x se guarda como round(x / escala * 127). La similitud
+    se aproxima con un producto escalar entre la pregunta (re-escalada)
+    y los códigos int8.
+    """
+
+    name = "int8"
+    dtype = np.int8
+
+    def __init__(self):
+        self.scale = None
+
+    @property
+    def is_trained(self):
+        """True si ya se calcularon las escalas."""
+        return self.scale is not None
+
+    def code_size(self, dim):
+        """Bytes por vector."""
+        return dim
+
+    def train(self, vectors):
+        """
+        Calcula la escala de cada dimensión a partir de una muestra.
+
+        La escala es el mayor valor absoluto observado, con un mínimo de
+        3/sqrt(dim) (tres desviaciones típicas para vectores normalizados),
+        para que una muestra pequeña no deje escalas demasiado ajustadas.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        floor = 3.0 / np.sqrt(vectors.shape[1])
+        self.scale = np.maximum(np.abs(vectors).max(axis=0), floor).astype(np.float32)
+
+    def encode(self, vectors):
+        """
+        Convierte vectores float32 en códigos int8.
+
+        Args:
+            vectors (np.ndarray): Matriz (n, dim) de vectores normalizados
+
+        Returns:
+            np.ndarray: Matriz (n, dim) int8
+        """
+        scaled = np.asarray(vectors, dtype=np.float32) / self.scale * 127.0
+        return np.clip(np.rint(scaled), -127, 127).astype(np.int8)
+
+    def scores(self, queries, codes):
+        """
+        Similitud aproximada entre preguntas y códigos (mayor = más parecido).
+
+        Args:
+            queries (np.ndarray): Matriz (n_preguntas, dim) normalizada
+            codes (np.ndarray): Matriz (n, dim) int8
+
+        Returns:
+            np.ndarray: Matriz (n_preguntas, n) de similitudes aproximadas
+        """
+        weighted = queries * (self.scale / 127.0)
+        return weighted @ np.asarray(codes, dtype=np.float32).T
+
+    def save(self, path):
+        """Guarda las escalas."""
+        np.save(path, self.scale)
+
+    def load(self, path):
+        """Carga las escalas guardadas con save()."""
+        if not os.path.exists(path):
+            return False
+        self.scale = np.load(path).astype(np.float32)
+        return True
+
+# ==============================================================================
+# CLASE: BinaryQuantizer (1 bit)
+# ==============================================================================
+
+class BinaryQuantizer:
+    """
+    Cuantización binaria: un bit por dimensión (1 si el valor es positivo).
+
+    Los bits se empaquetan de 8 en 8 (np.packbits). La distancia entre dos
+    códigos es la distancia de Hamming: cuántos bits son distintos.
+    """
+
+    name = "binary"
+    dtype = np.uint8
+
+    @property
+    def is_trained(self):
+        """La cuantización binaria no necesita entrenamiento."""
+        return True
+
+    def code_size(self, dim):
+        """Bytes por vector."""
+        return (dim + 7) // 8
+
+    def train(self, vectors):
+        """No hace nada (se mantiene por compatibilidad con ScalarQuantizer)."""
+
+    def encode(self, vectors):
+        """
+        Convierte vectores en bits empaquetados.
+
+        Args:
+            vectors (np.ndarray): Matriz (n, dim)
+
+        Returns:
+            np.ndarray: Matriz (n, dim/8) uint8
+        """
+        return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+    def scores(self, queries, codes):
+        """
+        Similitud aproximada: menos bits distintos = más parecido.
+
+        Se devuelve el negativo de la distancia de Hamming para que, igual
+        que con int8, "mayor" signifique "más parecido".
+        """
+        query_codes = self.encode(queries)
+        codes = np.ascontiguousarray(codes)
+        if codes.shape[1] % 8 == 0:
+            # Comparar de 64 en 64 bits es mucho más rápido que byte a byte
+            codes = codes.view(np.uint64)
+            query_codes = query_codes.view(np.uint64)
+
+        result = np.empty((len(query_codes), len(codes)), dtype=np.float32)
+        for i, query_code in enumerate(query_codes):
+            result[i] = -_count_bits(np.bitwise_xor(codes, query_code))
+        return result
+
+    def save(self, path):
+        """No hay parámetros que guardar."""
+
+    def load(self, path):
+        """No hay parámetros que cargar."""
+        return True
+
+
+def create_quantizer(name):
+    """
+    Crea el cuantizador indicado.
+
+    Args:
+        name (str): "none", "int8" o "binary"
+
+    Returns:
+        ScalarQuantizer | BinaryQuantizer | None
+    """
+    if name == "int8":
+        return ScalarQuantizer()
+    if name == "binary":
+        return BinaryQuantizer()
+    if name in (None, "", "none"):
+        return None
+    raise ValueError(f"Cuantización no soportada: {name} (usa 'none', 'int8' o 'binary')")
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. CUANTIZACIÓN:
+   - Representar números con menos bits, aceptando un pequeño error
+   - Es la misma idea que comprimir una foto en JPEG
+
+2. BÚSQUEDA EN DOS ETAPAS:
+   - Etapa rápida y aproximada sobre muchos candidatos
+   - Etapa exacta (re-ranking) sobre pocos candidatos
+
+3. DISTANCIA DE HAMMING:
+   - Número de posiciones en las que dos secuencias de bits difieren
+   - Se calcula con XOR y contando los bits a 1
+
+💡 EXPERIMENTO SUGERIDO:
+   Ejecuta "python benchmark.py quantization" y compara el recall y la
+   memoria de cada modo.
+"""
@@ -16,13 +16,31 @@ Autor: Clase 24 - IA Python para Principiantes
 Fecha: 2025
 """
 
+import asyncio
+import time
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
+from context_packer import pack_context, estimate_tokens
+from answer_cache import AnswerCache
+from llm_gateway import LLMGateway
+from tracing import tracer
 from config import (
     LLM_MODEL,
+    LLM_MAX_CONCURRENCY,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
     TOP_K_DOCUMENTS,
+    CHUNK_OVERLAP,
+    CONTEXT_TOKEN_BUDGET,
+    CHARS_PER_TOKEN,
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_SIMILARITY,
     RAG_PROMPT_TEMPLATE,
     ERROR_NO_API_KEY,
     ERROR_MODEL_LOAD
@@ -45,25 +63,66 @@ class RAGChain:
     documentos específicos en lugar de solo su conocimiento interno.
     """
     
-    def __init__(self, database_manager):
+    def __init__(self, database_manager, llm=None):
         """
         Constructor de la cadena RAG.
         
         Args:
             database_manager (DatabaseManager): Instancia del gestor de base de datos
                 que contiene los documentos y el retriever
+            llm: Modelo de lenguaje a usar (opcional). Si no se indica se
+                usa Gemini; sirve para probar la app con un modelo falso.
+                Si ya es un LLMGateway se usa tal cual (con sus límites)
                 
         Raises:
             Exception: Si no se puede inicializar el LLM
         """
         self.database_manager = database_manager
         
-        # Inicializar el modelo de lenguaje (LLM)
-        self.llm = self._initialize_llm()
+        # Inicializar el modelo de lenguaje (LLM) detrás de la puerta de
+        # acceso: coalescencia de preguntas idénticas, límites y reintentos
+        if llm is None:
+            llm = self._initialize_llm()
+        if not isinstance(llm, LLMGateway):
+            llm = LLMGateway(
+                llm,
+                max_concurrency=LLM_MAX_CONCURRENCY,
+                requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                max_retries=LLM_MAX_RETRIES,
+                base_delay=LLM_RETRY_BASE_DELAY,
+                max_delay=LLM_RETRY_MAX_DELAY
+            )
+        self.llm = llm
         
         # Crear el prompt template
         self.prompt = ChatPromptTemplate.from_template(RAG_PROMPT_TEMPLATE)
         
+        # Cadena de generación: {context, question} → prompt → LLM → texto
+        # No depende de k, así que se construye una sola vez
+        self.answer_chain = self.prompt | self.llm | StrOutputParser()
+        
+        # Retrievers y cadenas ya construidos, uno por cada valor de k
+        # (se vuelven a crear si cambia la versión de la base: al vaciarla,
+        # ChromaDB crea una colección nueva y los viejos apuntarían a la borrada)
+        self._retrievers = {}
+        self._chains = {}
+        self._built_for_version = database_manager.version
+        
+        # Tiempos de la última respuesta en streaming (ver stream_query)
+        self.last_timings = {}
+        
+        # Tokens del último contexto armado (ver _format_docs)
+        self.last_context_stats = {}
+        
+        # Caché de respuestas a preguntas repetidas (None si está desactivado)
+        self.answer_cache = None
+        if ANSWER_CACHE_ENABLED:
+            self.answer_cache = AnswerCache(
+                max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                similarity_threshold=ANSWER_CACHE_SIMILARITY
+            )
+        
         print("✅ Cadena RAG inicializada correctamente")
     
     def _initialize_llm(self):
@@ -92,6 +151,9 @@ class RAGChain:
             # Crear instancia del LLM de Google Gemini
             llm = ChatGoogleGenerativeAI(
                 model=LLM_MODEL,
+                # Los reintentos los hace LLMGateway (con backoff y jitter);
+                # si el cliente también reintentara, se multiplicarían
+                max_retries=0,
                 # Puedes agregar más parámetros aquí:
                 # temperature=0.7,  # Creatividad (0=determinista, 1=creativo)
                 # max_tokens=1000,  # Longitud máxima de respuesta
@@ -129,6 +191,9 @@ class RAGChain:
         3. prompt → llm (respuesta generada)
         4. llm → output_parser (texto limpio)
         
+        La cadena se construye una sola vez por cada valor de k y se
+        reutiliza en las siguientes preguntas.
+        
         Args:
             k (int): Número de documentos a recuperar
             
@@ -144,40 +209,185 @@ class RAGChain:
             Esta es la parte más importante del sistema RAG.
             Estudia cuidadosamente cómo se conectan los componentes.
         """
+        self._drop_stale_chains()
+        if k in self._chains:
+            return self._chains[k]
+        
         # Obtener el retriever de la base de datos
-        retriever = self.database_manager.get_retriever(k=k)
+        retriever = self._get_retriever(k)
         
         # Construir la cadena usando LCEL (LangChain Expression Language)
         rag_chain = (
             # Paso 1: Preparar inputs
             # - "context": retriever busca docs similares a la pregunta
+            #   y los convierte en un solo texto
             # - "question": pasa la pregunta original sin modificar
             {
-                "context": retriever,      # Retriever busca y retorna documentos
+                "context": retriever | RunnableLambda(self._format_docs),
                 "question": RunnablePassthrough()  # Pregunta pasa sin cambios
             }
-            # Paso 2: Formatear el prompt
-            # El prompt recibe {context} y {question} y crea el mensaje para el LLM
-            | self.prompt
-            # Paso 3: Generar respuesta
-            # El LLM recibe el prompt formateado y genera la respuesta
-            | self.llm
-            # Paso 4: Parsear la salida
-            # Convierte la respuesta del LLM en un string simple
-            | StrOutputParser()
+            # Pasos 2 a 4: prompt → LLM → texto (ver self.answer_chain)
+            | self.answer_chain
         )
         
+        self._chains[k] = rag_chain
         return rag_chain
     
+    def _get_retriever(self, k, filters=None):
+        """
+        Obtiene el retriever para k documentos (se crea una sola vez).
+        
+        Args:
+            k (int): Número de documentos a recuperar
+            filters (dict): Filtro de metadatos (ver DatabaseManager.get_retriever).
+                Los retrievers con filtro no se guardan: cada pregunta trae el suyo
+            
+        Returns:
+            VectorStoreRetriever: Retriever de la base de datos
+        """
+        if filters:
+            return self.database_manager.get_retriever(k=k, filters=filters)
+        self._drop_stale_chains()
+        if k not in self._retrievers:
+            self._retrievers[k] = self.database_manager.get_retriever(k=k)
+        return self._retrievers[k]
+    
+    def _drop_stale_chains(self):
+        """
+        Descarta los retrievers y cadenas guardados si la base cambió.
+        
+        Crearlos de nuevo es barato (no recalcula nada), y así nunca se
+        usa una colección que ya fue eliminada.
+        """
+        version = self.database_manager.version
+        if version != self._built_for_version:
+            self._retrievers.clear()
+            self._chains.clear()
+            self._built_for_version = version
+    
+    def retrieve(self, question, k=TOP_K_DOCUMENTS, filters=None):
+        """
+        Busca los documentos relevantes para una pregunta (una sola vez).
+        
+        Args:
+            question (str): Pregunta del usuario
+            k (int): Número de documentos a recuperar
+            filters (dict): Buscar solo en ciertos archivos, páginas o
+                fechas (ver DatabaseManager.get_retriever)
+            
+        Returns:
+            list: Documentos recuperados, del más al menos relevante
+        """
+        with tracer.span("retrieve", k=k, filtered=bool(filters)) as span:
+            documents = self._get_retriever(k, filters).invoke(question)
+            span.set(documents=len(documents))
+        return documents
+    
+    def _format_docs(self, documents):
+        """
+        Convierte los documentos recuperados en el texto del {context}.
+        
+        Los fragmentos vecinos de la misma fuente y página se unen sin
+        repetir su solapamiento, y el resultado se ajusta al presupuesto
+        CONTEXT_TOKEN_BUDGET (ver context_packer.py).
+        
+        Args:
+            documents (list): Documentos de LangChain
+            
+        Returns:
+            str: Contenido de los documentos separado por líneas en blanco
+        """
+        with tracer.span("prompt") as span:
+            context, stats = pack_context(
+                documents,
+                token_budget=CONTEXT_TOKEN_BUDGET,
+                max_overlap=CHUNK_OVERLAP + 50,  # Margen por los cortes en espacios
+                chars_per_token=CHARS_PER_TOKEN
+            )
+            span.set(**stats)
+        self.last_context_stats = stats
+        print(
+            f"📦 Contexto: {stats['documents']} fragmentos → {stats['blocks_used']} bloques, "
+            f"{stats['tokens_before']} → {stats['tokens_after']} tokens "
+            f"({stats['tokens_saved']} ahorrados)"
+        )
+        return context
+    
+    def _answer_inputs(self, question, documents):
+        """
+        Prepara la entrada de self.answer_chain a partir de documentos
+        ya recuperados.
+        """
+        return {"context": self._format_docs(documents), "question": question}
+    
+    def _llm_span(self, inputs):
+        """
+        Abre el span "llm" de una llamada con la entrada de answer_chain,
+        con los tokens estimados del prompt completo.
+        """
+        prompt_text = RAG_PROMPT_TEMPLATE + inputs["context"] + inputs["question"]
+        return tracer.span("llm", prompt_tokens=estimate_tokens(prompt_text, CHARS_PER_TOKEN))
+    
+    def _cache_lookup(self, question, k):
+        """
+        Busca la respuesta a una pregunta en el caché de respuestas.
+        
+        Args:
+            question (str): Pregunta del usuario
+            k (int): Número de documentos a recuperar
+            
+        Returns:
+            tuple: (respuesta guardada o None, datos para guardar la
+                    respuesta nueva con _cache_store)
+        """
+        if self.answer_cache is None:
+            return None, None
+        
+        key = AnswerCache.make_key(question, k)
+        version = self.database_manager.version
+        answer, kind, vector = self.answer_cache.get(
+            key, version,
+            embed=lambda: self.database_manager.embeddings.embed_query(question)
+        )
+        if answer is not None:
+            label = "idéntica" if kind == 'exact' else "parecida"
+            print(f"♻️ Respuesta desde el caché (pregunta {label})")
+        return answer, (key, version, vector)
+    
+    def _cache_store(self, lookup, answer, seconds):
+        """Guarda una respuesta recién generada en el caché de respuestas."""
+        if lookup is not None:
+            key, version, vector = lookup
+            self.answer_cache.put(key, version, answer, seconds, vector)
+    
+    def cache_stats_message(self):
+        """
+        Resumen del caché de respuestas para el panel de estadísticas.
+        
+        Returns:
+            str: Texto en Markdown (vacío si el caché está desactivado)
+        """
+        if self.answer_cache is None:
+            return ""
+        stats = self.answer_cache.stats()
+        return (
+            f"💬 **Caché de respuestas:** {stats['entries']} guardadas, "
+            f"{stats['exact_hits'] + stats['semantic_hits']:,} aciertos "
+            f"({stats['semantic_hits']:,} por pregunta parecida) / {stats['misses']:,} fallos "
+            f"({stats['hit_rate']:.0%}), {stats['saved_seconds']:.1f} s ahorrados"
+        )
+    
     def query(self, question, k=TOP_K_DOCUMENTS):
         """
         Realiza una consulta completa al sistema RAG.
         
         Este es el método principal que usarás para hacer preguntas.
         Internamente:
-        1. Crea la cadena RAG
-        2. Busca documentos relevantes
-        3. Genera una respuesta basada en esos documentos
+        1. Busca documentos relevantes (una sola búsqueda)
+        2. Genera una respuesta basada en esos documentos
+        
+        Si la pregunta (o una casi igual) ya se respondió con el contenido
+        actual de la base, se devuelve la respuesta guardada en el caché.
         
         Args:
             question (str): Pregunta del usuario
@@ -195,25 +405,238 @@ class RAGChain:
             >>> print(respuesta)
             "Machine learning es una rama de la inteligencia artificial..."
         """
-        try:
-            print(f"\n🔍 Procesando pregunta: {question[:100]}...")
+        with tracer.span("query", k=k, mode="sync") as query_span:
+            try:
+                print(f"\n🔍 Procesando pregunta: {question[:100]}...")
+                start = time.perf_counter()
+                
+                # ¿Ya respondimos esta pregunta?
+                cached, lookup = self._cache_lookup(question, k)
+                query_span.set(cached=cached is not None)
+                if cached is not None:
+                    return cached
+                
+                # Buscar los documentos relevantes
+                documents = self.retrieve(question, k=k)
+                
+                # Generar la respuesta con esos documentos como contexto
+                inputs = self._answer_inputs(question, documents)
+                with self._llm_span(inputs) as span:
+                    response = self.answer_chain.invoke(inputs)
+                    span.set(output_tokens=estimate_tokens(response, CHARS_PER_TOKEN))
+                
+                print(f"✅ Respuesta generada ({len(response)} caracteres)")
+                self._cache_store(lookup, response, time.perf_counter() - start)
+                
+                return response
+                
+            except Exception as e:
+                query_span.error = e.__class__.__name__
+                error_msg = f"❌ Error al generar respuesta: {e}"
+                print(error_msg)
+                # En lugar de fallar, retornar un mensaje de error al usuario
+                return f"Lo siento, ocurrió un error al procesar tu pregunta: {str(e)}"
+    
+    def stream_query(self, question, k=TOP_K_DOCUMENTS):
+        """
+        Realiza una consulta y produce la respuesta token a token (streaming).
+        
+        En lugar de esperar a que Gemini termine toda la respuesta, cada
+        fragmento de texto se entrega en cuanto llega. Así el usuario empieza
+        a leer casi de inmediato: la latencia que percibe es el tiempo hasta
+        el primer token, no el tiempo total.
+        
+        Args:
+            question (str): Pregunta del usuario
+            k (int): Número de documentos a recuperar (default: TOP_K_DOCUMENTS)
             
-            # Crear la cadena RAG
-            rag_chain = self.create_chain(k=k)
+        Yields:
+            str: Fragmentos de la respuesta, en orden
             
-            # Invocar la cadena con la pregunta
-            # Esto ejecuta todo el flujo: retrieval → prompt → LLM → parse
-            response = rag_chain.invoke(question)
+        Ejemplo:
+            >>> rag = RAGChain(db_manager)
+            >>> for token in rag.stream_query("¿Qué es machine learning?"):
+            ...     print(token, end="", flush=True)
+        """
+        with tracer.span("query", k=k, mode="stream") as query_span:
+            try:
+                print(f"\n🔍 Procesando pregunta (streaming): {question[:100]}...")
+                start = time.perf_counter()
+                first_token = None
+                chunks = []
+                
+                # ¿Ya respondimos esta pregunta? Se entrega entera de una vez
+                cached, lookup = self._cache_lookup(question, k)
+                query_span.set(cached=cached is not None)
+                if cached is not None:
+                    yield cached
+                    return
+                
+                # Buscar los documentos relevantes
+                documents = self.retrieve(question, k=k)
+                
+                # stream() ejecuta el mismo flujo que invoke(), pero entrega
+                # la respuesta del LLM por partes a medida que se genera
+                inputs = self._answer_inputs(question, documents)
+                with self._llm_span(inputs) as span:
+                    llm_start = time.perf_counter()
+                    for chunk in self.answer_chain.stream(inputs):
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                            span.set(time_to_first_token=time.perf_counter() - llm_start)
+                            print(f"⚡ Primer token en {first_token:.2f} s")
+                        chunks.append(chunk)
+                        yield chunk
+                    span.set(output_tokens=estimate_tokens("".join(chunks), CHARS_PER_TOKEN))
+                
+                self._finish_stream(lookup, chunks, start, first_token)
+                
+            except Exception as e:
+                query_span.error = e.__class__.__name__
+                error_msg = f"❌ Error al generar respuesta: {e}"
+                print(error_msg)
+                # En lugar de fallar, entregar un mensaje de error al usuario
+                yield f"Lo siento, ocurrió un error al procesar tu pregunta: {str(e)}"
+    
+    def _finish_stream(self, lookup, chunks, start, first_token):
+        """
+        Registra los tiempos de una respuesta en streaming ya terminada
+        y la guarda en el caché.
+        """
+        total = time.perf_counter() - start
+        if first_token is None:
+            first_token = total
+        
+        # Guardar los tiempos: primer token, generación y total
+        self.last_timings = {
+            'time_to_first_token': first_token,
+            'generation_time': total - first_token,
+            'total_time': total
+        }
+        response = "".join(chunks)
+        self._cache_store(lookup, response, total)
+        print(
+            f"✅ Respuesta generada ({len(response)} caracteres) - "
+            f"primer token: {first_token:.2f} s, "
+            f"generación: {total - first_token:.2f} s, total: {total:.2f} s"
+        )
+    
+    # ==========================================================================
+    # VERSIÓN ASYNC (para atender a muchos usuarios a la vez)
+    # ==========================================================================
+    
+    async def aretrieve(self, question, k=TOP_K_DOCUMENTS, filters=None):
+        """
+        Versión async de retrieve().
+        
+        Args:
+            question (str): Pregunta del usuario
+            k (int): Número de documentos a recuperar
+            filters (dict): Filtro de metadatos (ver retrieve)
             
-            print(f"✅ Respuesta generada ({len(response)} caracteres)")
+        Returns:
+            list: Documentos recuperados, del más al menos relevante
+        """
+        with tracer.span("retrieve", k=k, filtered=bool(filters)) as span:
+            documents = await self._get_retriever(k, filters).ainvoke(question)
+            span.set(documents=len(documents))
+        return documents
+    
+    async def aquery(self, question, k=TOP_K_DOCUMENTS):
+        """
+        Versión async de query().
+        
+        Mientras espera a la base de datos o a Gemini, esta función "suelta"
+        el bucle de asyncio y el servidor puede atender otras preguntas.
+        Con la versión normal, cada pregunta ocupa un hilo hasta terminar.
+        
+        Args:
+            question (str): Pregunta del usuario
+            k (int): Número de documentos a recuperar (default: TOP_K_DOCUMENTS)
             
-            return response
+        Returns:
+            str: Respuesta generada por el LLM
             
-        except Exception as e:
-            error_msg = f"❌ Error al generar respuesta: {e}"
-            print(error_msg)
-            # En lugar de fallar, retornar un mensaje de error al usuario
-            return f"Lo siento, ocurrió un error al procesar tu pregunta: {str(e)}"
+        Ejemplo:
+            >>> respuesta = await rag.aquery("¿Qué es machine learning?")
+        """
+        with tracer.span("query", k=k, mode="async") as query_span:
+            try:
+                print(f"\n🔍 Procesando pregunta (async): {question[:100]}...")
+                start = time.perf_counter()
+                
+                # El caché puede calcular un embedding: se hace en un hilo aparte
+                cached, lookup = await asyncio.to_thread(self._cache_lookup, question, k)
+                query_span.set(cached=cached is not None)
+                if cached is not None:
+                    return cached
+                
+                documents = await self.aretrieve(question, k=k)
+                inputs = self._answer_inputs(question, documents)
+                with self._llm_span(inputs) as span:
+                    response = await self.answer_chain.ainvoke(inputs)
+                    span.set(output_tokens=estimate_tokens(response, CHARS_PER_TOKEN))
+                
+                print(f"✅ Respuesta generada ({len(response)} caracteres)")
+                self._cache_store(lookup, response, time.perf_counter() - start)
+                
+                return response
+                
+            except Exception as e:
+                query_span.error = e.__class__.__name__
+                error_msg = f"❌ Error al generar respuesta: {e}"
+                print(error_msg)
+                return f"Lo siento, ocurrió un error al procesar tu pregunta: {str(e)}"
+    
+    async def astream_query(self, question, k=TOP_K_DOCUMENTS):
+        """
+        Versión async de stream_query(): entrega la respuesta por partes.
+        
+        Args:
+            question (str): Pregunta del usuario
+            k (int): Número de documentos a recuperar (default: TOP_K_DOCUMENTS)
+            
+        Yields:
+            str: Fragmentos de la respuesta, en orden
+            
+        Ejemplo:
+            >>> async for token in rag.astream_query("¿Qué es machine learning?"):
+            ...     print(token, end="", flush=True)
+        """
+        with tracer.span("query", k=k, mode="async_stream") as query_span:
+            try:
+                print(f"\n🔍 Procesando pregunta (streaming async): {question[:100]}...")
+                start = time.perf_counter()
+                first_token = None
+                chunks = []
+                
+                cached, lookup = await asyncio.to_thread(self._cache_lookup, question, k)
+                query_span.set(cached=cached is not None)
+                if cached is not None:
+                    yield cached
+                    return
+                
+                documents = await self.aretrieve(question, k=k)
+                
+                inputs = self._answer_inputs(question, documents)
+                with self._llm_span(inputs) as span:
+                    llm_start = time.perf_counter()
+                    async for chunk in self.answer_chain.astream(inputs):
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                            span.set(time_to_first_token=time.perf_counter() - llm_start)
+                            print(f"⚡ Primer token en {first_token:.2f} s")
+                        chunks.append(chunk)
+                        yield chunk
+                    span.set(output_tokens=estimate_tokens("".join(chunks), CHARS_PER_TOKEN))
+                
+                self._finish_stream(lookup, chunks, start, first_token)
+                
+            except Exception as e:
+                query_span.error = e.__class__.__name__
+                error_msg = f"❌ Error al generar respuesta: {e}"
+                print(error_msg)
+                yield f"Lo siento, ocurrió un error al procesar tu pregunta: {str(e)}"
     
     def query_with_sources(self, question, k=TOP_K_DOCUMENTS):
         """
@@ -224,6 +647,9 @@ class RAGChain:
         - Debugging: verificar qué documentos se recuperaron
         - Citación: dar crédito a las fuentes
         
+        Los documentos se buscan una sola vez: los mismos que recibe el LLM
+        como contexto son los que se devuelven como fuentes.
+        
         Args:
             question (str): Pregunta del usuario
             k (int): Número de documentos a recuperar
@@ -243,29 +669,34 @@ class RAGChain:
             >>> for i, doc in enumerate(result['sources']):
             ...     print(f"Fuente {i+1}: {doc.page_content[:100]}...")
         """
-        try:
-            # Obtener el retriever
-            retriever = self.database_manager.get_retriever(k=k)
-            
-            # Buscar documentos relevantes
-            source_docs = retriever.get_relevant_documents(question)
-            
-            # Generar la respuesta
-            response = self.query(question, k=k)
-            
-            return {
-                'answer': response,
-                'sources': source_docs,
-                'source_count': len(source_docs)
-            }
-            
-        except Exception as e:
-            print(f"❌ Error en query_with_sources: {e}")
-            return {
-                'answer': f"Error al procesar la pregunta: {str(e)}",
-                'sources': [],
-                'source_count': 0
-            }
+        with tracer.span("query", k=k, mode="sources") as query_span:
+            try:
+                print(f"\n🔍 Procesando pregunta con fuentes: {question[:100]}...")
+                
+                # Buscar documentos relevantes (una sola vez)
+                source_docs = self.retrieve(question, k=k)
+                
+                # Generar la respuesta con exactamente esos documentos
+                inputs = self._answer_inputs(question, source_docs)
+                with self._llm_span(inputs) as span:
+                    response = self.answer_chain.invoke(inputs)
+                    span.set(output_tokens=estimate_tokens(response, CHARS_PER_TOKEN))
+                print(f"✅ Respuesta generada ({len(response)} caracteres)")
+                
+                return {
+                    'answer': response,
+                    'sources': source_docs,
+                    'source_count': len(source_docs)
+                }
+                
+            except Exception as e:
+                query_span.error = e.__class__.__name__
+                print(f"❌ Error en query_with_sources: {e}")
+                return {
+                    'answer': f"Error al procesar la pregunta: {str(e)}",
+                    'sources': [],
+                    'source_count': 0
+                }
 
 # ==============================================================================
 # NOTAS PARA ESTUDIANTES
@@ -297,6 +728,10 @@ class RAGChain:
    - 0.7: Balanceado (recomendado)
    - 1.0+: Muy creativo, puede divagar
 
+6. ASYNC (aquery / astream_query):
+   - Mientras una pregunta espera a Gemini, el servidor atiende otras
+   - Un solo hilo puede tener cientos de preguntas "en espera"
+
 💡 EXPERIMENTOS SUGERIDOS:
    1. Cambia k de 5 a 3 y observa cómo afecta las respuestas
    2. Modifica el prompt template para cambiar el tono de las respuestas
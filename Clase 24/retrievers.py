@@ -0,0 +1,369 @@
+"""
+retrievers.py - Retrievers Personalizados
+=========================================
+
+Un "retriever" de LangChain es cualquier objeto que, dada una pregunta,
+devuelve una lista de documentos. Este módulo define retrievers propios
+que se eligen con RETRIEVER_MODE en config.py:
+
+- "vector": búsqueda vectorial normal (la de vectordb.as_retriever())
+- "hybrid": búsqueda vectorial + búsqueda por palabras (BM25) combinadas
+- "mmr": búsqueda vectorial con diversidad (Maximal Marginal Relevance)
+
+FilteredRetriever hace cualquiera de las tres búsquedas solo entre los
+fragmentos que cumplen un filtro (archivos, páginas, fechas), calculado
+antes con el índice de metadatos (ver metadata_index.py).
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+from typing import Any
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# ==============================================================================
+# FUNCIÓN: reciprocal_rank_fusion
+# ==============================================================================
+
+def reciprocal_rank_fusion(rankings, rrf_k=60):
+    """
+    Combina varias listas de resultados con Reciprocal Rank Fusion (RRF).
+
+    Cada resultado suma 1 / (rrf_k + posición) por cada lista en la que
+    aparece. Solo importa la posición, no la puntuación, así que se pueden
+    mezclar puntuaciones de escalas distintas (coseno y BM25).
+
+    Args:
+        rankings (list): Listas de IDs, cada una de la mejor a la peor
+        rrf_k (int): Constante de suavizado (60 es el valor habitual)
+
+    Returns:
+        list: Lista de (ID, puntuación RRF), de mayor a menor
+
+    Ejemplo:
+        >>> reciprocal_rank_fusion([["a", "b"], ["b", "c"]])
+        [('b', 0.0325...), ('a', 0.0163...), ('c', 0.0161...)]
+    """
+    scores = {}
+    for ranking in rankings:
+        for position, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (rrf_k + position)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+
+# ==============================================================================
+# CLASE: HybridRetriever
+# ==============================================================================
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever híbrido: búsqueda vectorial + BM25 combinadas con RRF.
+
+    1. La base vectorial devuelve los fetch_k fragmentos más parecidos
+    2. El índice BM25 devuelve los fetch_k con más palabras en común
+    3. Las dos listas se combinan con reciprocal_rank_fusion y se
+       devuelven los k primeros
+
+    Atributos:
+        vectorstore: Base vectorial (Chroma o NumpyVectorStore)
+        collection: Objeto con get(ids=...) para leer los fragmentos de BM25
+        sparse_index: Índice BM25 (ver sparse_index.py)
+        k: Documentos devueltos
+        fetch_k: Candidatos pedidos a cada búsqueda
+        rrf_k: Constante de RRF
+    """
+
+    vectorstore: Any
+    collection: Any
+    sparse_index: Any
+    k: int = 5
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        """
+        Busca los documentos relevantes para una pregunta.
+
+        Args:
+            query (str): Pregunta del usuario
+
+        Returns:
+            list: Documentos, del más al menos relevante
+        """
+        dense = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        sparse = self.sparse_index.search(query, k=self.fetch_k)
+        return fuse_results(dense, sparse, self.collection, self.k, self.rrf_k)
+
+
+def fuse_results(dense, sparse, collection, k, rrf_k=60):
+    """
+    Combina los resultados vectoriales y BM25 con RRF (ver HybridRetriever).
+
+    Args:
+        dense (list): Documentos de la búsqueda vectorial, en orden
+        sparse (list): (ID, puntuación) de la búsqueda BM25, en orden
+        collection: Objeto con get(ids=...) para leer los fragmentos de BM25
+        k (int): Documentos a devolver
+        rrf_k (int): Constante de RRF
+
+    Returns:
+        list: Documentos, del más al menos relevante
+    """
+    # Los documentos de la búsqueda vectorial ya vienen completos
+    documents = {}
+    for doc in dense:
+        documents.setdefault(doc.id or doc.page_content, doc)
+
+    fused = reciprocal_rank_fusion(
+        [list(documents), [chunk_id for chunk_id, _ in sparse]], rrf_k
+    )[:k]
+
+    # Leer de la base solo los fragmentos que encontró únicamente BM25
+    missing = [chunk_id for chunk_id, _ in fused if chunk_id not in documents]
+    if missing:
+        data = collection.get(ids=missing, include=["documents", "metadatas"])
+        for chunk_id, text, metadata in zip(data['ids'], data['documents'], data['metadatas']):
+            documents[chunk_id] = Document(id=chunk_id, page_content=text,
+                                           metadata=metadata or {})
+
+    return [documents[chunk_id] for chunk_id, _ in fused if chunk_id in documents]
+
+# ==============================================================================
+# MMR (Maximal Marginal Relevance)
+# ==============================================================================
+
+def mmr_select(query_vector, candidate_vectors, k, lambda_mult=0.5):
+    """
+    Elige k candidatos relevantes y distintos entre sí (selección voraz).
+
+    En cada paso se elige el candidato con mayor
+        lambda * similitud(pregunta) - (1 - lambda) * máx. similitud(ya elegidos)
+
+    Todas las similitudes se calculan de una vez (una matriz candidatos x
+    candidatos) y cada paso solo actualiza un vector con np.maximum, en
+    lugar de comparar pares de documentos uno a uno.
+
+    Args:
+        query_vector (list | np.ndarray): Vector de la pregunta
+        candidate_vectors (np.ndarray): Matriz (n, dim) de los candidatos
+        k (int): Número de candidatos a elegir
+        lambda_mult (float): 1.0 = solo relevancia, 0.0 = solo diversidad
+
+    Returns:
+        list: Posiciones de los candidatos elegidos, en orden de elección
+    """
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    if candidates.ndim != 2 or len(candidates) == 0 or k <= 0:
+        return []
+
+    # Normalizar para que el producto escalar sea la similitud coseno
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    max_similarity = similarity[first].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[first] = False
+
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return selected
+
+
+def fetch_candidates(vectorstore, query_vector, fetch_k, ids=None):
+    """
+    Busca los fetch_k fragmentos más parecidos junto con sus vectores
+    guardados, en una sola llamada (sin volver a calcular embeddings).
+
+    Args:
+        vectorstore: Chroma o NumpyVectorStore
+        query_vector (list): Vector de la pregunta
+        fetch_k (int): Número de candidatos
+        ids (list): Buscar solo entre estos fragmentos (None = en todos).
+            El filtro se aplica ANTES de comparar vectores
+
+    Returns:
+        tuple: (lista de Document, matriz (n, dim) de sus vectores)
+    """
+    if ids is not None and not ids:
+        return [], np.zeros((0, 0), dtype=np.float32)
+
+    if hasattr(vectorstore, 'search_by_vectors'):
+        # NumpyVectorStore: los vectores se leen de la matriz en disco
+        # (con 'ids', solo las filas de esos fragmentos)
+        rows = None if ids is None else vectorstore.rows_for_ids(ids)
+        hits = vectorstore.search_by_vectors(np.asarray([query_vector]), k=fetch_k, rows=rows)[0]
+        data = vectorstore.get_rows(
+            [row for row, _ in hits], include=["metadatas", "documents", "embeddings"]
+        )
+        ids, texts, metadatas = data['ids'], data['documents'], data['metadatas']
+        vectors = data['embeddings']
+    else:
+        # ChromaDB: la consulta puede devolver los embeddings guardados
+        # (con 'ids', Chroma solo compara los vectores de esos fragmentos)
+        restriction = {} if ids is None else {'ids': list(ids)}
+        result = vectorstore._collection.query(
+            query_embeddings=[query_vector],
+            n_results=fetch_k if ids is None else min(fetch_k, len(ids)),
+            include=["documents", "metadatas", "embeddings"],
+            **restriction
+        )
+        ids, texts, metadatas = result['ids'][0], result['documents'][0], result['metadatas'][0]
+        vectors = np.asarray(result['embeddings'][0], dtype=np.float32)
+
+    documents = [
+        Document(id=chunk_id, page_content=text, metadata=metadata or {})
+        for chunk_id, text, metadata in zip(ids, texts, metadatas)
+    ]
+    return documents, vectors
+
+
+def max_marginal_relevance_search(vectorstore, query, k=4, fetch_k=20, lambda_mult=0.5):
+    """
+    Búsqueda MMR: los k documentos más relevantes y a la vez distintos.
+
+    Equivale a vectorstore.max_marginal_relevance_search(), pero reutiliza
+    los vectores guardados de los candidatos y hace la selección con
+    operaciones de matrices de NumPy.
+
+    Args:
+        vectorstore: Chroma o NumpyVectorStore
+        query (str): Pregunta
+        k (int): Documentos a devolver
+        fetch_k (int): Candidatos entre los que elegir
+        lambda_mult (float): Balance relevancia (1.0) / diversidad (0.0)
+
+    Returns:
+        list: Documentos elegidos
+
+    Ejemplo:
+        >>> docs = max_marginal_relevance_search(vectordb, "¿Qué es RAG?", k=3)
+    """
+    query_vector = vectorstore.embeddings.embed_query(query)
+    documents, vectors = fetch_candidates(vectorstore, query_vector, max(fetch_k, k))
+    return [documents[i] for i in mmr_select(query_vector, vectors, k, lambda_mult)]
+
+
+class MMRRetriever(BaseRetriever):
+    """
+    Retriever que usa max_marginal_relevance_search.
+
+    Evita que varios fragmentos casi iguales (por ejemplo, fragmentos
+    vecinos que comparten CHUNK_OVERLAP caracteres) ocupen el contexto.
+
+    Atributos:
+        vectorstore: Base vectorial (Chroma o NumpyVectorStore)
+        k: Documentos devueltos
+        fetch_k: Candidatos entre los que elegir
+        lambda_mult: Balance relevancia / diversidad
+    """
+
+    vectorstore: Any
+    k: int = 5
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        """Busca los documentos relevantes y diversos para una pregunta."""
+        return max_marginal_relevance_search(
+            self.vectorstore, query, k=self.k, fetch_k=self.fetch_k,
+            lambda_mult=self.lambda_mult
+        )
+
+# ==============================================================================
+# CLASE: FilteredRetriever
+# ==============================================================================
+
+class FilteredRetriever(BaseRetriever):
+    """
+    Retriever que busca solo entre los fragmentos que cumplen un filtro.
+
+    1. El índice de metadatos calcula los IDs permitidos (sin tocar vectores)
+    2. La búsqueda vectorial solo compara la pregunta con esos fragmentos
+    3. Según 'mode', se eligen con MMR o se combinan con BM25 (también
+       restringido a los IDs permitidos)
+
+    Atributos:
+        vectorstore: Base vectorial (Chroma o NumpyVectorStore)
+        metadata_index: Índice de metadatos (ver metadata_index.py)
+        filters: Filtro, con las claves de MetadataIndex.select():
+            {"sources": [...], "pages": (10, 40), "since": ..., "until": ...}
+        mode: "vector", "mmr" o "hybrid" (como RETRIEVER_MODE)
+        k: Documentos devueltos
+        fetch_k: Candidatos para MMR o para la combinación híbrida
+        lambda_mult: Balance relevancia / diversidad (modo "mmr")
+        sparse_index: Índice BM25 (modo "hybrid")
+        collection: Objeto con get(ids=...) (modo "hybrid")
+        rrf_k: Constante de RRF (modo "hybrid")
+    """
+
+    vectorstore: Any
+    metadata_index: Any
+    filters: dict
+    mode: str = "vector"
+    k: int = 5
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+    sparse_index: Any = None
+    collection: Any = None
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        """Busca los documentos relevantes que cumplen el filtro."""
+        ids = self.metadata_index.select(**self.filters)
+        if ids is not None and not ids:
+            # Ningún fragmento cumple el filtro: ni siquiera hace falta el embedding
+            return []
+
+        query_vector = self.vectorstore.embeddings.embed_query(query)
+        fetch_k = self.k if self.mode == "vector" else max(self.fetch_k, self.k)
+        documents, vectors = fetch_candidates(self.vectorstore, query_vector, fetch_k, ids=ids)
+
+        if self.mode == "mmr":
+            return [documents[i] for i in mmr_select(query_vector, vectors, self.k, self.lambda_mult)]
+
+        if self.mode == "hybrid" and self.sparse_index is not None:
+            sparse = self.sparse_index.search(query, k=fetch_k, ids=ids)
+            return fuse_results(documents, sparse, self.collection, self.k, self.rrf_k)
+
+        return documents[:self.k]
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. BÚSQUEDA HÍBRIDA:
+   - Vectorial: encuentra textos con el mismo significado
+   - BM25: encuentra textos con las mismas palabras
+   - Juntas cubren los puntos débiles de cada una
+
+2. RECIPROCAL RANK FUSION:
+   - Combina listas usando solo la posición de cada resultado
+   - No hace falta "calibrar" puntuaciones de escalas distintas
+
+3. MMR:
+   - Relevancia sin diversidad = resultados repetidos
+   - Diversidad sin relevancia = resultados que no responden la pregunta
+
+4. FILTRAR ANTES DE BUSCAR:
+   - FilteredRetriever solo compara la pregunta con los fragmentos que
+     cumplen el filtro (en lugar de buscar en todo y descartar)
+
+💡 EXPERIMENTO SUGERIDO:
+   Cambia RRF_K en config.py (10, 60, 200) y observa cómo cambia el
+   peso de los primeros puestos de cada lista.
+"""
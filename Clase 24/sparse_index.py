@@ -0,0 +1,420 @@
+"""
+sparse_index.py - Índice Invertido con BM25 (búsqueda por palabras)
+===================================================================
+
+La búsqueda vectorial entiende el SIGNIFICADO, pero a veces falla con
+palabras exactas: códigos de curso ("PY-101"), nombres de productos o
+siglas ("ONU", "IVA"). La búsqueda clásica por palabras (la de los
+buscadores de siempre) es justo lo contrario. Combinando las dos
+obtenemos una búsqueda "híbrida".
+
+¿CÓMO FUNCIONA UN ÍNDICE INVERTIDO?
+- Cada texto se parte en palabras (tokens) normalizadas
+- Para cada palabra se guarda la lista de fragmentos donde aparece
+  ("postings") y cuántas veces aparece en cada uno
+- Para buscar, solo se recorren las listas de las palabras de la pregunta:
+  el costo depende de cuántas veces aparecen esas palabras, no del
+  número total de fragmentos
+
+¿QUÉ ES BM25?
+La fórmula de puntuación estándar de la búsqueda por palabras:
+- Las palabras raras (IDF alto) valen más que las comunes
+- Repetir una palabra ayuda, pero cada vez menos (parámetro k1)
+- Los fragmentos largos se penalizan un poco (parámetro b)
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+import numpy as np
+
+# Palabras muy frecuentes en español que no ayudan a buscar
+SPANISH_STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuando de del desde
+donde durante e el ella ellas ellos en entre era es esa esas ese eso esos esta
+estas este esto estos fue ha hay la las le les lo los mas me mi muy no nos o
+otra otro para pero por porque que quien se sea segun ser si sin sobre su sus
+tambien tiene todo tu un una uno unos y ya yo
+""".split())
+
+# Palabras: letras y números (tras quitar los acentos)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9ñ]+")
+
+# Vocales acentuadas → sin acento (la ñ se conserva)
+_ACCENTS = str.maketrans("áéíóúüàèìòùâêîôûäëïö", "aeiouuaeiouaeiouaeio")
+
+# ==============================================================================
+# FUNCIÓN: tokenize
+# ==============================================================================
+
+def tokenize(text):
+    """
+    Convierte un texto en la lista de palabras que se indexan.
+
+    Pasos (pensados para español):
+    1. Minúsculas y sin acentos: "Información" → "informacion"
+    2. Se separan las palabras y se quitan las muy frecuentes ("de", "la"...)
+    3. Raíz aproximada: se quita una "s" final y luego una vocal final,
+       así "clase", "clases" → "clas" y "redes", "red" → "red"
+
+    Las palabras con números (códigos como "py101") no se modifican.
+
+    Args:
+        text (str): Texto a tokenizar
+
+    Returns:
+        list: Palabras normalizadas
+
+    Ejemplo:
+        >>> tokenize("Las clases de Python del módulo PY101")
+        ['clas', 'python', 'modul', 'py101']
+    """
+    # NFC une las letras y sus acentos en un solo carácter ("a" + "´" → "á")
+    text = unicodedata.normalize("NFC", text.lower()).translate(_ACCENTS)
+
+    tokens = []
+    for word in _TOKEN_PATTERN.findall(text):
+        if word in SPANISH_STOPWORDS:
+            continue
+        if len(word) >= 4 and word.isalpha():
+            if word.endswith("s"):
+                word = word[:-1]
+            if word[-1] in "aeo" and len(word) > 3:
+                word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+# ==============================================================================
+# CLASE: BM25Index
+# ==============================================================================
+
+class BM25Index:
+    """
+    Índice invertido con puntuación BM25, guardado en un archivo .npz.
+
+    Los fragmentos se identifican con el mismo ID que tienen en la base
+    vectorial, así los resultados de las dos búsquedas se pueden combinar.
+
+    Internamente cada fragmento recibe un número (0, 1, 2...). Las listas
+    de cada palabra son arrays compactos de esos números (4 bytes cada
+    uno) y de sus frecuencias (2 bytes). Los fragmentos eliminados solo
+    se marcan y se limpian de las listas al guardar.
+
+    Atributos:
+        path: Archivo donde se guarda el índice
+        k1: Saturación de la frecuencia de las palabras
+        b: Penalización por longitud del fragmento
+    """
+
+    def __init__(self, path, k1=1.2, b=0.75):
+        """
+        Abre (o crea) el índice.
+
+        Args:
+            path (str): Archivo .npz del índice
+            k1 (float): Parámetro k1 de BM25 (típico: 1.2)
+            b (float): Parámetro b de BM25 (típico: 0.75)
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        """Deja el índice vacío (en memoria)."""
+        self._ids = []                # número interno → ID del fragmento
+        self._doc_of = {}             # ID del fragmento → número interno (solo vivos)
+        self._lengths = array('I')    # palabras de cada fragmento
+        self._alive = bytearray()     # 1 = vivo, 0 = eliminado
+        self._postings = {}           # palabra → (array de fragmentos, array de frecuencias)
+        self._total_length = 0        # suma de longitudes de los fragmentos vivos
+        self._invalidate()
+
+    def _invalidate(self):
+        """
+        Descarta los pesos precalculados (cambió el contenido).
+
+        Es barato: solo se vacía el diccionario. Cada palabra recalcula su
+        peso la próxima vez que se busca, recorriendo solo su lista.
+        """
+        self._weights = {}            # palabra → (fragmentos, peso BM25) ya calculados
+
+    def __len__(self):
+        """Número de fragmentos indexados (sin contar los eliminados)."""
+        return len(self._doc_of)
+
+    @property
+    def vocabulary_size(self):
+        """Número de palabras distintas del índice."""
+        return len(self._postings)
+
+    # --------------------------------------------------------------------------
+    # Escritura
+    # --------------------------------------------------------------------------
+
+    def add(self, ids, texts):
+        """
+        Indexa fragmentos (si un ID ya existía, se reemplaza).
+
+        Args:
+            ids (list): ID de cada fragmento
+            texts (list): Texto de cada fragmento
+        """
+        with self._lock:
+            for chunk_id, text in zip(ids, texts):
+                self._remove_one(chunk_id)
+
+                counts = Counter(tokenize(text))
+                doc = len(self._ids)
+                length = sum(counts.values())
+
+                self._ids.append(chunk_id)
+                self._doc_of[chunk_id] = doc
+                self._lengths.append(length)
+                self._alive.append(1)
+                self._total_length += length
+
+                for term, frequency in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array('I'), array('H'))
+                    postings[0].append(doc)
+                    postings[1].append(min(frequency, 65_535))
+
+            self._invalidate()
+
+    def remove(self, ids):
+        """
+        Elimina fragmentos del índice.
+
+        Args:
+            ids (list): IDs de los fragmentos a eliminar
+
+        Returns:
+            int: Fragmentos eliminados
+        """
+        with self._lock:
+            removed = sum(self._remove_one(chunk_id) for chunk_id in ids)
+            if removed:
+                self._invalidate()
+            return removed
+
+    def _remove_one(self, chunk_id):
+        """Marca un fragmento como eliminado. Devuelve 1 si existía."""
+        doc = self._doc_of.pop(chunk_id, None)
+        if doc is None:
+            return 0
+        self._alive[doc] = 0
+        self._total_length -= self._lengths[doc]
+        return 1
+
+    def clear(self):
+        """Vacía el índice y borra su archivo."""
+        with self._lock:
+            self._reset()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    # --------------------------------------------------------------------------
+    # Búsqueda
+    # --------------------------------------------------------------------------
+
+    def _term_weights(self, term):
+        """
+        Peso BM25 de una palabra en cada fragmento donde aparece.
+
+        Solo se leen las posiciones de su lista (vivo/eliminado y longitud
+        de esos fragmentos), nunca arrays del tamaño de todo el índice.
+        El IDF y los pesos se calculan la primera vez que se busca la
+        palabra y se reutilizan hasta que el índice cambie.
+
+        Returns:
+            tuple: (números de fragmento, pesos) como arrays de NumPy
+        """
+        cached = self._weights.get(term)
+        if cached is not None:
+            return cached
+
+        docs = np.frombuffer(self._postings[term][0], dtype=np.uint32).astype(np.int64)
+        frequencies = np.frombuffer(self._postings[term][1], dtype=np.uint16).astype(np.float32)
+
+        alive = np.frombuffer(self._alive, dtype=np.uint8)[docs].astype(bool)
+        docs, frequencies = docs[alive], frequencies[alive]
+
+        # IDF: las palabras que aparecen en pocos fragmentos valen más
+        n_docs = len(self._doc_of)
+        df = len(docs)
+        idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+        # Normalización por longitud: k1 * (1 - b + b * longitud / longitud_media)
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)[docs].astype(np.float32)
+        average = self._total_length / max(n_docs, 1)
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / max(average, 1.0))
+
+        weights = idf * frequencies * (self.k1 + 1) / (frequencies + length_norm)
+        cached = (docs, weights.astype(np.float32))
+        self._weights[term] = cached
+        return cached
+
+    def search(self, query, k=20, ids=None):
+        """
+        Busca los k fragmentos con mayor puntuación BM25.
+
+        Las listas de las palabras de la pregunta se juntan y se ordenan
+        por fragmento; np.add.reduceat suma los pesos de cada fragmento.
+        Así solo se tocan los fragmentos que contienen alguna palabra.
+
+        Args:
+            query (str): Pregunta
+            k (int): Número de resultados
+            ids (list): Buscar solo entre estos fragmentos (None = en todos)
+
+        Returns:
+            list: Lista de (ID del fragmento, puntuación), de mayor a menor
+        """
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self._postings]
+        if not terms or k <= 0:
+            return []
+
+        with self._lock:
+            postings = [self._term_weights(term) for term in terms]
+            docs = np.concatenate([term_docs for term_docs, _ in postings])
+            weights = np.concatenate([term_weights for _, term_weights in postings])
+            if not len(docs):
+                # Todas las listas son de fragmentos borrados (hasta el
+                # próximo save() siguen en _postings, sin puntuar)
+                return []
+
+            # Agrupar por fragmento (orden estable: los pesos se suman en el
+            # orden de las palabras) y sumar cada grupo
+            order = np.argsort(docs, kind="stable")
+            docs, weights = docs[order], weights[order]
+            starts = np.flatnonzero(np.concatenate(([True], docs[1:] != docs[:-1])))
+            candidates = docs[starts]
+            scores = np.add.reduceat(weights, starts)
+
+            if ids is not None:
+                allowed = [self._doc_of[chunk_id] for chunk_id in ids if chunk_id in self._doc_of]
+                keep = np.isin(candidates, np.asarray(allowed, dtype=np.int64))
+                candidates, scores = candidates[keep], scores[keep]
+                if not len(candidates):
+                    return []
+            if len(candidates) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                candidates, scores = candidates[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+            return [(self._ids[candidates[i]], float(scores[i])) for i in order]
+
+    # --------------------------------------------------------------------------
+    # Persistencia
+    # --------------------------------------------------------------------------
+
+    def save(self):
+        """
+        Guarda el índice en disco (formato CSR: todas las listas seguidas).
+
+        Antes de guardar se eliminan de las listas los fragmentos borrados
+        y se renumeran los vivos, así el archivo no crece con basura.
+        """
+        with self._lock:
+            self._compact()
+
+            terms = list(self._postings)
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(self._postings[term][0]) for term in terms])
+            docs = np.frombuffer(
+                b"".join(self._postings[term][0].tobytes() for term in terms), dtype=np.uint32)
+            frequencies = np.frombuffer(
+                b"".join(self._postings[term][1].tobytes() for term in terms), dtype=np.uint16)
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp.npz"
+            np.savez(
+                tmp_path,
+                ids=np.array(self._ids, dtype=str),
+                lengths=np.frombuffer(self._lengths, dtype=np.uint32),
+                terms=np.array(terms, dtype=str),
+                offsets=offsets,
+                docs=docs,
+                frequencies=frequencies
+            )
+            os.replace(tmp_path, self.path)
+
+    def _compact(self):
+        """Quita de las listas los fragmentos eliminados y renumera los vivos."""
+        if len(self._doc_of) == len(self._ids):
+            return
+
+        alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+        new_number = np.cumsum(alive) - 1
+
+        postings = {}
+        for term, (docs, frequencies) in self._postings.items():
+            docs = np.frombuffer(docs, dtype=np.uint32)
+            keep = alive[docs]
+            if keep.any():
+                postings[term] = (
+                    array('I', new_number[docs[keep]].astype(np.uint32).tobytes()),
+                    array('H', np.frombuffer(frequencies, dtype=np.uint16)[keep].tobytes())
+                )
+
+        self._ids = [chunk_id for chunk_id, keep in zip(self._ids, alive) if keep]
+        self._doc_of = {chunk_id: doc for doc, chunk_id in enumerate(self._ids)}
+        self._lengths = array('I', np.frombuffer(self._lengths, dtype=np.uint32)[alive].tobytes())
+        self._alive = bytearray(b"\x01" * len(self._ids))
+        self._postings = postings
+        self._invalidate()
+
+    def _load(self):
+        """Carga el índice guardado con save() (si existe)."""
+        if not os.path.exists(self.path):
+            return
+
+        data = np.load(self.path)
+        self._ids = [str(chunk_id) for chunk_id in data['ids']]
+        self._doc_of = {chunk_id: doc for doc, chunk_id in enumerate(self._ids)}
+        self._lengths = array('I', data['lengths'].astype(np.uint32).tobytes())
+        self._alive = bytearray(b"\x01" * len(self._ids))
+        self._total_length = int(data['lengths'].sum())
+
+        offsets, docs, frequencies = data['offsets'], data['docs'], data['frequencies']
+        self._postings = {
+            str(term): (
+                array('I', docs[offsets[i]:offsets[i + 1]].tobytes()),
+                array('H', frequencies[offsets[i]:offsets[i + 1]].tobytes())
+            )
+            for i, term in enumerate(data['terms'])
+        }
+        self._invalidate()
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. ÍNDICE INVERTIDO:
+   - En lugar de "fragmento → palabras", guarda "palabra → fragmentos"
+   - Es la estructura que usan todos los buscadores de texto
+
+2. IDF (Inverse Document Frequency):
+   - log(1 + (N - df + 0.5) / (df + 0.5)), donde df = fragmentos con la palabra
+   - "Python" en un curso de Python vale poco; "PY101" vale mucho
+
+3. TOKENIZACIÓN:
+   - Normalizar bien las palabras es tan importante como la fórmula
+   - Sin quitar acentos, "información" e "informacion" serían distintas
+
+💡 EXPERIMENTO SUGERIDO:
+   Busca un código o una sigla que aparezca en tus documentos con
+   RETRIEVER_MODE = "vector" y luego con "hybrid". ¿Cuál la encuentra?
+"""
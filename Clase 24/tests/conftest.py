@@ -0,0 +1,11 @@
+"""
+Configuración de pytest para las pruebas de la Clase 24.
+
+Los módulos de la clase se importan por su nombre (como hace app.py),
+así que la carpeta de la clase se añade a sys.path.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,43 @@
+"""
+Pruebas de AnswerCache (respuestas guardadas, exactas y semánticas).
+"""
+
+from answer_cache import AnswerCache
+
+
+def test_exact_and_semantic_hits():
+    cache = AnswerCache(similarity_threshold=0.9)
+    key = AnswerCache.make_key("¿De qué trata el documento?", 5)
+    cache.put(key, 1, "De Python", 2.0, vector=[1.0, 0.0])
+
+    assert cache.get(AnswerCache.make_key("de que trata el DOCUMENTO", 5), 1)[:2] == (
+        "De Python", 'exact')
+    similar = AnswerCache.make_key("¿Cuál es el tema del documento?", 5)
+    assert cache.get(similar, 1, embed=lambda: [0.99, 0.05])[:2] == ("De Python", 'semantic')
+    assert cache.get(similar, 1, embed=lambda: [0.0, 1.0])[:2] == (None, None)
+
+
+def test_semantic_hit_requires_same_k():
+    cache = AnswerCache(similarity_threshold=0.9)
+    cache.put(AnswerCache.make_key("pregunta", 3), 1, "con 3 documentos", 1.0, vector=[1.0, 0.0])
+
+    other_k = AnswerCache.make_key("pregunta parecida", 10)
+    assert cache.get(other_k, 1, embed=lambda: [1.0, 0.0])[:2] == (None, None)
+    same_k = AnswerCache.make_key("pregunta parecida", 3)
+    assert cache.get(same_k, 1, embed=lambda: [1.0, 0.0])[:2] == ("con 3 documentos", 'semantic')
+
+
+def test_version_change_while_embedding():
+    cache = AnswerCache(similarity_threshold=0.9)
+    stale = AnswerCache.make_key("vieja", 5)
+
+    def embed():
+        # Mientras se calcula el embedding, una petición que todavía
+        # veía la base anterior (versión 1) guarda su respuesta
+        cache.get(stale, 1)
+        cache.put(stale, 1, "respuesta vieja", 1.0, vector=[1.0, 0.0])
+        return [1.0, 0.0]
+
+    # Con la base en la versión 2, la respuesta de la versión 1 no se entrega
+    assert cache.get(AnswerCache.make_key("parecida", 5), 2, embed=embed)[:2] == (None, None)
+    assert cache.stats()['entries'] == 0
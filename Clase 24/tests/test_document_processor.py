@@ -0,0 +1,46 @@
+"""
+Pruebas de DocumentProcessor (carga de archivos en paralelo).
+"""
+
+import os
+from document_processor import DocumentProcessor
+
+
+def _write_files(tmp_path, n=3):
+    paths = []
+    for i in range(n):
+        path = tmp_path / f"archivo{i}.txt"
+        path.write_text(f"Contenido del archivo {i}. " * 20, encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def _cache_entries(directory):
+    return [name for _, _, names in os.walk(directory) for name in names
+            if name.endswith(".jsonl.gz")]
+
+
+def test_parallel_load_uses_the_callers_text_cache(tmp_path):
+    paths = _write_files(tmp_path)
+    cache_directory = str(tmp_path / "cache_texto")
+    processor = DocumentProcessor(parallel_loading=True, max_workers=2,
+                                  text_cache_directory=cache_directory)
+
+    documents, failed = processor.load_multiple_files(paths)
+    assert failed == []
+    assert [doc.metadata['source'] for doc in documents] == paths
+    # Los procesos hijos escribieron en el caché de ESTE procesador
+    assert len(_cache_entries(cache_directory)) == 3
+
+    documents, _ = processor.load_multiple_files(paths)
+    assert all(timing['cached'] for timing in processor.last_load_timings)
+
+
+def test_parallel_load_without_text_cache(tmp_path):
+    paths = _write_files(tmp_path)
+    processor = DocumentProcessor(parallel_loading=True, max_workers=2,
+                                  text_cache_directory=None)
+
+    documents, failed = processor.load_multiple_files(paths)
+    assert len(documents) == 3 and failed == []
+    assert not any(timing['cached'] for timing in processor.last_load_timings)
@@ -0,0 +1,48 @@
+"""
+Pruebas de CachedEmbeddings (caché de embeddings en SQLite).
+"""
+
+import sqlite3
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from embedding_cache import CachedEmbeddings, _text_hash
+
+
+def _cache(tmp_path, max_entries=100):
+    return CachedEmbeddings(DeterministicFakeEmbedding(size=8), "modelo",
+                            str(tmp_path / "embeddings.sqlite3"), max_entries)
+
+
+def test_hits_do_not_write(tmp_path):
+    cache = _cache(tmp_path)
+    texts = [f"texto {i}" for i in range(20)]
+    first = cache.embed_documents(texts)
+    query = cache.embed_query(texts[0])
+
+    statements = []
+    cache._connect().set_trace_callback(statements.append)
+    assert cache.embed_documents(texts) == [pytest.approx(vector, rel=1e-6) for vector in first]
+    assert cache.embed_query(texts[0]) == pytest.approx(query, rel=1e-6)
+
+    # Los aciertos solo se anotan; se escriben todos juntos en flush()
+    assert not [s for s in statements if s.startswith(("UPDATE", "COMMIT"))]
+    cache.flush()
+    assert statements.count("COMMIT") == 1
+    assert cache.stats()['hits'] == 21
+
+
+def test_eviction_keeps_recently_used(tmp_path):
+    cache = _cache(tmp_path, max_entries=50)
+    cache.embed_documents([f"viejo {i}" for i in range(40)])
+
+    statements = []
+    cache._connect().set_trace_callback(statements.append)
+    cache.embed_documents(["viejo 0"])                   # acierto (sin escribir)
+    cache.embed_documents([f"nuevo {i}" for i in range(5)])
+    assert not [s for s in statements if "COUNT" in s]   # bajo el máximo no se cuenta
+
+    cache.embed_documents([f"más {i}" for i in range(10)])
+    rows = sqlite3.connect(cache.path).execute("SELECT text_hash FROM embeddings").fetchall()
+    assert cache.entries == len(rows) == 45
+    assert (_text_hash("viejo 0"),) in rows
+    assert (_text_hash("viejo 1"),) not in rows
@@ -0,0 +1,105 @@
+"""
+Pruebas del servicio de embeddings (servidor en localhost con un modelo
+falso, cliente y plan B).
+"""
+
+import threading
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from embedding_server import EmbeddingServer, EmbeddingServiceClient, EmbeddingServiceError
+
+
+class FakeModel(DeterministicFakeEmbedding):
+    """Modelo falso: "explota" hace fallar al modelo y "roto" devuelve basura."""
+
+    def embed_documents(self, texts):
+        if "explota" in texts:
+            raise RuntimeError("el modelo falló")
+        vectors = super().embed_documents(texts)
+        return [["no es un número"] if text == "roto" else vector
+                for text, vector in zip(texts, vectors)]
+
+
+@pytest.fixture
+def service():
+    server = EmbeddingServer(FakeModel(size=8), "falso", batch_wait=0.05)
+    http = server.serve(port=0)
+    server.url = f"http://127.0.0.1:{http.server_address[1]}"
+    yield server
+    http.shutdown()
+    http.server_close()
+
+
+def _client(url, local_loads, retry_interval=30.0):
+    def fallback():
+        local_loads.append(1)
+        return DeterministicFakeEmbedding(size=8)
+    return EmbeddingServiceClient(url, "falso", fallback=fallback, timeout=5,
+                                  retry_interval=retry_interval)
+
+
+def test_remote_embeddings_and_micro_batching(service):
+    local_loads = []
+    client = _client(service.url, local_loads)
+    expected = DeterministicFakeEmbedding(size=8)
+    assert client.remote
+    for vector, local in zip(client.embed_documents(["hola", "adiós"]),
+                             expected.embed_documents(["hola", "adiós"])):
+        assert vector == pytest.approx(local)
+    assert client.embed_query("hola") == pytest.approx(expected.embed_query("hola"))
+
+    # Peticiones casi simultáneas se calculan en menos pasadas del modelo
+    before = service.stats()['batches']
+    threads = [threading.Thread(target=client.embed_documents, args=([f"texto {i}"],))
+               for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert service.stats()['batches'] - before < 10
+    assert local_loads == []
+
+
+def test_service_errors_are_raised_not_hidden(service):
+    local_loads = []
+    client = _client(service.url, local_loads)
+
+    with pytest.raises(EmbeddingServiceError) as error:
+        client._embed(["hola"], "otro")            # petición inválida
+    assert error.value.status_code == 400
+    with pytest.raises(EmbeddingServiceError) as error:
+        client.embed_documents(["explota"])        # falla el modelo
+    assert error.value.status_code == 500
+
+    # El cliente sigue usando el servicio (no cargó el modelo local)
+    assert client.remote and local_loads == []
+    assert len(client.embed_query("hola")) == 8
+
+
+def test_batcher_survives_a_broken_batch(service):
+    with pytest.raises(ValueError):
+        service.embed(["roto"])
+    # El hilo del modelo sigue vivo: la siguiente petición se atiende
+    assert len(service.embed(["hola"])[0]) == 8
+
+
+def test_fallback_per_call_and_reconnect(service):
+    local_loads = []
+    client = _client(service.url, local_loads, retry_interval=0)
+
+    other = EmbeddingServer(FakeModel(size=8), "falso")
+    http = other.serve(port=0)
+    client.url = f"http://127.0.0.1:{http.server_address[1]}"
+    http.shutdown()
+    http.server_close()
+
+    # No se puede conectar: esta petición usa el modelo local
+    assert len(client.embed_query("hola")) == 8
+    assert not client.remote and local_loads == [1]
+
+    # El servicio vuelve: en la siguiente prueba se usa otra vez
+    client.url = service.url
+    before = service.stats()['requests']
+    client.embed_query("hola")
+    assert client.remote
+    assert service.stats()['requests'] == before + 1
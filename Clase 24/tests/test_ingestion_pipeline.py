@@ -0,0 +1,78 @@
+"""
+Pruebas de IngestionPipeline (ingesta en streaming) con un modelo de
+embeddings falso.
+"""
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from database_manager import DatabaseManager
+from document_processor import DocumentProcessor
+from ingestion_pipeline import IngestionPipeline
+from kb_stats import KnowledgeBaseStats
+from metadata_index import MetadataIndex
+from sparse_index import BM25Index
+from vector_store import NumpyVectorStore
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    # Sin __init__: no se carga el modelo real ni se lee config.py
+    manager = DatabaseManager.__new__(DatabaseManager)
+    manager.embeddings = DeterministicFakeEmbedding(size=16)
+    manager.vectordb = NumpyVectorStore(str(tmp_path / "vectores"), manager.embeddings)
+    manager.sparse_index = BM25Index(str(tmp_path / "bm25.npz"))
+    manager.metadata_index = MetadataIndex(str(tmp_path / "indice.json"))
+    manager.kb_stats = KnowledgeBaseStats(str(tmp_path / "estadisticas.json"))
+    manager._indexes_dirty = False
+    manager.version = 0
+    return manager
+
+
+def _write(path, paragraphs, tag=""):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n\n".join(f"párrafo {i} {tag} " + "x" * 80 for i in range(paragraphs)),
+                    encoding="utf-8")
+    return str(path)
+
+
+def _run(db_manager, tmp_path, file_paths):
+    processor = DocumentProcessor(chunk_size=120, chunk_overlap=0,
+                                  text_cache_directory=str(tmp_path / "cache_texto"))
+    pipeline = IngestionPipeline(db_manager, processor, batch_size=8, max_in_flight=2)
+    return list(pipeline.run(file_paths))[-1]['sync']
+
+
+def _sources(db_manager):
+    return sorted({metadata['source'] for metadata in db_manager.vectordb.get()['metadatas']})
+
+
+def test_unchanged_and_replaced_file(db_manager, tmp_path):
+    path = _write(tmp_path / "a.txt", 30)
+    sync = _run(db_manager, tmp_path, [path])
+    assert (sync['new_files'], sync['added']) == (["a.txt"], 30)
+
+    sync = _run(db_manager, tmp_path, [path])
+    assert (sync['unchanged_files'], sync['added'], sync['skipped']) == (["a.txt"], 0, 30)
+
+    # 20 párrafos iguales y 5 nuevos: solo se calculan los nuevos
+    _write(tmp_path / "a.txt", 20)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n\n" + "\n\n".join(f"nuevo {i} " + "y" * 80 for i in range(5)))
+    sync = _run(db_manager, tmp_path, [path])
+    assert sync['replaced_files'] == ["a.txt"]
+    assert (sync['added'], sync['skipped'], sync['deleted']) == (5, 20, 10)
+    assert db_manager.vectordb.count() == len(db_manager.metadata_index) == 25
+
+
+def test_same_name_in_one_run(db_manager, tmp_path):
+    first = _write(tmp_path / "uno" / "notas.txt", 10, "uno")
+    second = _write(tmp_path / "dos" / "notas.txt", 12, "dos")
+    sync = _run(db_manager, tmp_path, [first, second])
+
+    # El segundo reemplaza al primero (y se avisa): no quedan las dos versiones
+    assert sync['new_files'] == ["notas.txt"]
+    assert sync['replaced_files'] == ["notas.txt"]
+    assert sync['name_conflicts'] == ["notas.txt"]
+    assert sync['deleted'] == 10
+    assert _sources(db_manager) == [second]
+    assert db_manager.vectordb.count() == db_manager.metadata_index.sources()["notas.txt"] == 12
@@ -0,0 +1,46 @@
+"""
+Pruebas de KnowledgeBaseStats (contadores incrementales).
+"""
+
+from kb_stats import KnowledgeBaseStats
+
+
+def test_add_remove_and_replace():
+    stats = KnowledgeBaseStats()
+    stats.add(["a1", "a2", "b1"], ["uno", "dos", "añó"],
+              [{'source_name': "a.pdf", 'page': 1}, {'source_name': "a.pdf", 'page': 2},
+               {'source_name': "b.txt"}],
+              vector_bytes=10)
+
+    summary = stats.summary()
+    assert (summary['chunks'], summary['sources'], summary['pages']) == (3, 2, 2)
+    assert summary['chars'] == 9
+    assert summary['bytes'] == 3 + 3 + 5 + 30        # "añó" ocupa 5 bytes en UTF-8
+    assert summary['last_ingest'] is None
+
+    # Reemplazar un ID descuenta su versión anterior
+    stats.add(["a2"], ["otro texto"], [{'source_name': "a.pdf", 'page': 1}])
+    assert stats.summary()['pages'] == 1
+    assert stats.sources()[0] == {'source': "a.pdf", 'chunks': 2, 'pages': 1,
+                                  'chars': 13, 'bytes': 3 + 10 + 10}
+
+    stats.remove(["a1", "a2", "desconocido"])
+    assert stats.summary()['chunks'] == 1
+    assert [row['source'] for row in stats.sources()] == ["b.txt"]
+
+
+def test_history_and_persistence(tmp_path):
+    path = str(tmp_path / "estadisticas.json")
+    stats = KnowledgeBaseStats(path, history_size=2)
+    stats.add(["x"], ["texto"], [{'source_name': "x.pdf", 'page': 0}])
+    for embedded in (10, 20, 30):
+        stats.record_ingest(seconds=2.0, files=1, chunks=40, embedded=embedded, embed_seconds=1.0)
+    stats.record_ingest(seconds=0.1, files=1, chunks=40, embedded=0, embed_seconds=0.0)
+    stats.save()
+
+    reopened = KnowledgeBaseStats(path, history_size=2)
+    assert reopened.summary() == stats.summary()
+    assert [record['throughput'] for record in reopened.history()] == [30.0, 0.0]
+
+    reopened.clear()
+    assert len(KnowledgeBaseStats(path)) == 0
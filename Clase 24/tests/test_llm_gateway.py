@@ -0,0 +1,232 @@
+"""
+Pruebas de LLMGateway (coalescencia, límites y reintentos) con modelos
+falsos: ninguna prueba llama a un LLM real.
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.runnables import Runnable
+from llm_gateway import FairSemaphore, LLMGateway, TokenBucket, is_retryable
+
+
+class SlowLLM(Runnable):
+    """LLM falso que tarda 'delay' segundos y cuenta las llamadas simultáneas."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, input, config=None, **kwargs):
+        return next(self.stream(input, config))
+
+    def stream(self, input, config=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            yield AIMessageChunk(content=f"respuesta a {input}")
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class FailingLLM(Runnable):
+    """LLM falso que falla las primeras 'failures' veces con un código HTTP."""
+
+    def __init__(self, status_code, failures):
+        self.status_code = status_code
+        self.failures = failures
+        self.calls = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        raise NotImplementedError
+
+    def stream(self, input, config=None, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            error = RuntimeError(f"error {self.status_code}")
+            error.status_code = self.status_code
+            raise error
+        yield AIMessageChunk(content="ok")
+
+
+def _run_threads(target, prompts):
+    results = [None] * len(prompts)
+
+    def worker(i):
+        results[i] = target(prompts[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(prompts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_fake_chat_model_through_gateway():
+    gateway = LLMGateway(FakeListChatModel(responses=["hola", "adiós"]), requests_per_minute=0)
+    assert gateway.invoke("pregunta 1").content == "hola"
+    assert "".join(chunk.content for chunk in gateway.stream("pregunta 2")) == "adiós"
+    assert asyncio.run(gateway.ainvoke("pregunta 3")).content == "hola"
+    assert gateway.stats()['calls'] == 3
+
+
+def test_identical_prompts_are_coalesced():
+    llm = SlowLLM()
+    gateway = LLMGateway(llm, max_concurrency=10, requests_per_minute=0)
+    results = _run_threads(gateway.invoke, ["misma pregunta"] * 10)
+
+    assert llm.calls == 1
+    assert gateway.stats()['coalesced'] == 9
+    assert {result.content for result in results} == {"respuesta a misma pregunta"}
+    assert gateway.stats()['in_flight'] == 0
+
+
+def test_async_and_sync_share_the_flight():
+    llm = SlowLLM()
+    gateway = LLMGateway(llm, requests_per_minute=0)
+    sync_result = []
+    thread = threading.Thread(target=lambda: sync_result.append(gateway.invoke("pregunta")))
+    thread.start()
+    time.sleep(0.05)
+
+    async def main():
+        return await asyncio.gather(*(gateway.ainvoke("pregunta") for _ in range(5)))
+
+    results = asyncio.run(main())
+    thread.join()
+    assert llm.calls == 1
+    assert gateway.stats()['coalesced'] == 5
+    assert [result.content for result in results + sync_result] == ["respuesta a pregunta"] * 6
+
+
+def test_semaphore_limits_concurrency():
+    llm = SlowLLM(delay=0.1)
+    gateway = LLMGateway(llm, max_concurrency=2, requests_per_minute=0)
+    _run_threads(gateway.invoke, [f"pregunta {i}" for i in range(6)])
+
+    assert llm.calls == 6
+    assert llm.max_active == 2
+
+
+def test_async_calls_share_the_limit_with_sync_calls():
+    llm = SlowLLM(delay=0.1)
+    gateway = LLMGateway(llm, max_concurrency=2, requests_per_minute=0)
+    threads = [threading.Thread(target=gateway.invoke, args=(f"hilo {i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+
+    async def main():
+        await asyncio.gather(*(gateway.ainvoke(f"tarea {i}") for i in range(3)))
+
+    asyncio.run(main())
+    for thread in threads:
+        thread.join()
+    assert llm.calls == 6
+    assert llm.max_active == 2
+
+
+def test_fair_semaphore_is_fifo_for_threads_and_tasks():
+    semaphore = FairSemaphore(1)
+    semaphore.acquire()
+    order = []
+
+    def thread_waiter(name):
+        with semaphore:
+            order.append(name)
+
+    async def main():
+        async def task_waiter(name):
+            await semaphore.aacquire()
+            order.append(name)
+            semaphore.release()
+
+        first = threading.Thread(target=thread_waiter, args=("hilo 1",))
+        first.start()
+        await asyncio.sleep(0.05)
+        task = asyncio.create_task(task_waiter("tarea"))
+        await asyncio.sleep(0.05)
+        second = threading.Thread(target=thread_waiter, args=("hilo 2",))
+        second.start()
+        await asyncio.sleep(0.05)
+
+        # Una tarea cancelada mientras espera no se queda con el permiso
+        cancelled = asyncio.create_task(semaphore.aacquire())
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+
+        semaphore.release()
+        await task
+        await asyncio.to_thread(first.join)
+        await asyncio.to_thread(second.join)
+
+    asyncio.run(main())
+    assert order == ["hilo 1", "tarea", "hilo 2"]
+    # El permiso volvió: se puede tomar sin esperar
+    semaphore.acquire()
+
+
+def test_token_bucket_waits():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(4)]
+    elapsed = time.monotonic() - start
+
+    # La ráfaga (2 fichas) pasa sin esperar; las otras, 1/20 s cada una
+    assert waits[:2] == [0.0, 0.0]
+    assert all(wait > 0 for wait in waits[2:])
+    assert elapsed >= 0.09
+    assert TokenBucket(rate=0, capacity=1).acquire() == 0.0
+
+
+def test_rate_limit_is_counted():
+    gateway = LLMGateway(SlowLLM(delay=0), max_concurrency=1, requests_per_minute=1200)
+    for i in range(3):
+        gateway.invoke(f"pregunta {i}")
+    assert gateway.stats()['throttled_seconds'] > 0
+
+
+def test_retries_on_429():
+    # base_delay=0: el backoff no espera de verdad en las pruebas
+    llm = FailingLLM(status_code=429, failures=2)
+    gateway = LLMGateway(llm, requests_per_minute=0, max_retries=3, base_delay=0)
+
+    assert gateway.invoke("pregunta").content == "ok"
+    assert llm.calls == 3
+    assert gateway.stats()['retries'] == 2
+
+
+def test_no_retry_on_400():
+    llm = FailingLLM(status_code=400, failures=1)
+    gateway = LLMGateway(llm, requests_per_minute=0, max_retries=3, base_delay=0)
+
+    with pytest.raises(RuntimeError, match="400"):
+        gateway.invoke("pregunta")
+    assert llm.calls == 1
+    assert gateway.stats()['retries'] == 0
+
+
+def test_gives_up_after_max_retries():
+    llm = FailingLLM(status_code=503, failures=10)
+    gateway = LLMGateway(llm, requests_per_minute=0, max_retries=2, base_delay=0)
+
+    with pytest.raises(RuntimeError, match="503"):
+        gateway.invoke("pregunta")
+    assert llm.calls == 3
+
+
+def test_is_retryable():
+    assert is_retryable(RuntimeError("429 Resource exhausted"))
+    assert is_retryable(RuntimeError("502 Bad Gateway"))
+    assert not is_retryable(RuntimeError("400 Invalid argument"))
+    assert not is_retryable(ValueError("sin código"))
@@ -0,0 +1,73 @@
+"""
+Pruebas de MetadataIndex y FilteredRetriever (filtrar antes de buscar).
+"""
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from metadata_index import MetadataIndex, to_timestamp
+from retrievers import FilteredRetriever
+from vector_store import NumpyVectorStore
+
+
+def _metadatas():
+    # a.pdf: páginas 1-4 (cargado en marzo); b.pdf: páginas 1-2 (abril); c.txt sin página
+    march, april = to_timestamp("2025-03-01"), to_timestamp("2025-04-01")
+    ids, metadatas = [], []
+    for source, pages, moment in (("a.pdf", 4, march), ("b.pdf", 2, april)):
+        for page in range(1, pages + 1):
+            ids.append(f"{source}-{page}")
+            metadatas.append({'source_name': source, 'page': page, 'ingested_at': moment})
+    ids.append("c.txt-0")
+    metadatas.append({'source_name': "c.txt", 'ingested_at': april})
+    return ids, metadatas
+
+
+def test_select(tmp_path):
+    index = MetadataIndex(str(tmp_path / "indice.json"))
+    index.add(*_metadatas())
+
+    assert index.select() is None
+    assert sorted(index.select(sources="b.pdf")) == ["b.pdf-1", "b.pdf-2"]
+    assert sorted(index.select(sources=["a.pdf", "b.pdf"], pages=(2, 3))) == [
+        "a.pdf-2", "a.pdf-3", "b.pdf-2"]
+    assert sorted(index.select(pages=4)) == ["a.pdf-4"]
+    assert sorted(index.select(since="2025-04-01")) == ["b.pdf-1", "b.pdf-2", "c.txt-0"]
+    assert sorted(index.select(until="2025-03-01")) == [f"a.pdf-{page}" for page in range(1, 5)]
+    assert index.select(sources="c.txt", pages=(1, 10)) == []
+
+
+def test_remove_and_persistence(tmp_path):
+    path = str(tmp_path / "indice.json")
+    index = MetadataIndex(path)
+    index.add(*_metadatas())
+    index.remove(["b.pdf-1", "b.pdf-2", "desconocido"])
+    index.save()
+
+    reopened = MetadataIndex(path)
+    assert reopened.sources() == {"a.pdf": 4, "c.txt": 1}
+    assert reopened.select(sources="b.pdf") == []
+    # Sin fragmentos de b.pdf, su fecha de carga ya no cuenta
+    assert reopened.select(since="2025-04-01") == ["c.txt-0"]
+
+    # Otro campo de archivo: el índice guardado no sirve y empieza vacío
+    assert len(MetadataIndex(path, source_field="source")) == 0
+
+
+def test_filtered_retriever_searches_only_allowed_ids(tmp_path):
+    ids, metadatas = _metadatas()
+    store = NumpyVectorStore(str(tmp_path / "vectores"), DeterministicFakeEmbedding(size=16))
+    store.add_texts([f"texto de {chunk_id}" for chunk_id in ids], metadatas=metadatas, ids=ids)
+    index = MetadataIndex()
+    index.add(ids, metadatas)
+
+    retriever = FilteredRetriever(vectorstore=store, metadata_index=index,
+                                  filters={'sources': ["a.pdf"], 'pages': (3, 4)}, k=5)
+    found = retriever.invoke("texto de b.pdf-1")
+    assert sorted((doc.metadata['source_name'], doc.metadata['page']) for doc in found) == [
+        ("a.pdf", 3), ("a.pdf", 4)]
+
+    # Un filtro que nada cumple no busca (ni calcula el embedding)
+    retriever.filters = {'sources': ["z.pdf"]}
+    assert retriever.invoke("lo que sea") == []
+
+    retriever.filters, retriever.mode = {}, "mmr"
+    assert len(retriever.invoke("texto de a.pdf-1")) == 5
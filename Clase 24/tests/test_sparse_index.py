@@ -0,0 +1,80 @@
+"""
+Pruebas de BM25Index (búsqueda por palabras).
+"""
+
+import math
+import random
+import pytest
+from sparse_index import BM25Index, tokenize
+
+
+def _bm25_reference(index, texts, query):
+    """BM25 calculado "a mano", fragmento por fragmento."""
+    docs = {chunk_id: tokenize(text) for chunk_id, text in texts.items()}
+    average = sum(len(tokens) for tokens in docs.values()) / len(docs)
+    scores = {}
+    for term in set(tokenize(query)):
+        df = sum(term in tokens for tokens in docs.values())
+        if not df:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for chunk_id, tokens in docs.items():
+            tf = tokens.count(term)
+            if tf:
+                norm = index.k1 * (1 - index.b + index.b * len(tokens) / average)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (index.k1 + 1) / (tf + norm)
+    return scores
+
+
+def test_tokenize():
+    assert tokenize("Las clases de Python del módulo PY101") == ['clas', 'python', 'modul', 'py101']
+
+
+def test_scores_match_reference(tmp_path):
+    rng = random.Random(0)
+    words = [f"palabra{i}" for i in range(40)]
+    texts = {f"id{i}": " ".join(rng.choices(words, k=rng.randint(3, 30))) for i in range(300)}
+    index = BM25Index(str(tmp_path / "bm25.npz"))
+    index.add(list(texts), list(texts.values()))
+
+    # Borrar y volver a añadir también debe dar las puntuaciones exactas
+    removed = [f"id{i}" for i in range(0, 300, 7)]
+    index.remove(removed)
+    for chunk_id in removed:
+        del texts[chunk_id]
+
+    for query in ("palabra1 palabra2", "palabra7", "palabra3 palabra3 palabra30 otra"):
+        expected = _bm25_reference(index, texts, query)
+        found = dict(index.search(query, k=len(texts)))
+        assert found.keys() == expected.keys()
+        for chunk_id, score in expected.items():
+            assert found[chunk_id] == pytest.approx(score, rel=1e-4)
+
+        top = index.search(query, k=5)
+        assert [score for _, score in top] == sorted((score for _, score in top), reverse=True)
+        assert top[0][1] == pytest.approx(max(expected.values()), rel=1e-4)
+
+
+def test_ids_filter_and_persistence(tmp_path):
+    path = str(tmp_path / "bm25.npz")
+    index = BM25Index(path)
+    index.add(["a", "b", "c"], ["código PY101", "curso de Python PY101", "nada que ver"])
+    assert [chunk_id for chunk_id, _ in index.search("PY101", ids=["b", "c"])] == ["b"]
+    assert index.search("inexistente") == []
+
+    index.remove(["a"])
+    index.save()
+    reopened = BM25Index(path)
+    assert len(reopened) == 2
+    assert reopened.search("PY101") == index.search("PY101")
+
+
+def test_search_when_every_posting_was_removed(tmp_path):
+    # Regresión: sin save(), las listas de 'python' solo tienen
+    # fragmentos borrados y la búsqueda lanzaba IndexError
+    index = BM25Index(str(tmp_path / "bm25.npz"))
+    index.add(["a", "b"], ["python redes", "java clases"])
+    index.remove(["a"])
+    assert index.search("python") == []
+    assert [chunk_id for chunk_id, _ in index.search("python redes java")] == ["b"]
+    assert index.search("java", ids=["a"]) == []
@@ -0,0 +1,96 @@
+"""
+Pruebas de NumpyVectorStore (almacén vectorial con NumPy).
+"""
+
+import threading
+import numpy as np
+from vector_store import NumpyVectorStore
+
+DIM = 16
+
+
+def _vectors(n, seed):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def test_add_search_and_delete(tmp_path):
+    store = NumpyVectorStore(str(tmp_path), embedding_function=None)
+    vectors = _vectors(50, seed=0)
+    ids = store.add_embeddings([f"texto {i}" for i in range(50)], vectors,
+                               metadatas=[{'i': i} for i in range(50)],
+                               ids=[f"id{i}" for i in range(50)])
+    assert store.count() == 50
+
+    # Cada vector es su propio vecino más cercano
+    hits = store.search_by_vectors(vectors[:5], k=3)
+    assert [query_hits[0][0] for query_hits in hits] == [0, 1, 2, 3, 4]
+
+    # Los eliminados no vuelven a aparecer
+    store.delete(["id0"])
+    assert store.count() == 49
+    assert all(row != 0 for row, _ in store.search_by_vectors(vectors[:1], k=10)[0])
+
+    # Upsert: el mismo ID reemplaza la versión anterior
+    store.add_embeddings(["nuevo"], vectors[1:2], ids=[ids[1]])
+    assert store.count() == 49
+    assert store.get(ids=[ids[1]])['documents'] == ["nuevo"]
+
+
+def test_repeated_id_in_one_batch(tmp_path):
+    store = NumpyVectorStore(str(tmp_path), embedding_function=None)
+    vectors = _vectors(4, seed=4)
+    ids = store.add_embeddings(["x viejo", "x nuevo", "y", "z"], vectors, ids=["x", "x", "y", "z"])
+
+    # Gana la última aparición de "x", como en un upsert
+    assert ids == ["x", "y", "z"]
+    assert store.count() == 3
+    assert store.get()['ids'] == ["x", "y", "z"]
+    assert store.get(ids=["x"])['documents'] == ["x nuevo"]
+    hits = store.search_by_vectors(vectors[:1], k=3)[0]
+    assert "x viejo" not in store.get_rows([row for row, _ in hits])['documents']
+
+
+def test_reopen_keeps_data(tmp_path):
+    store = NumpyVectorStore(str(tmp_path), embedding_function=None)
+    store.add_embeddings(["a", "b"], _vectors(2, seed=1), ids=["a", "b"])
+    store.delete(["a"])
+
+    reopened = NumpyVectorStore(str(tmp_path), embedding_function=None)
+    assert reopened.count() == 1
+    assert reopened.get()['ids'] == ["b"]
+
+
+def test_search_while_writing(tmp_path):
+    """
+    Regresión: las búsquedas concurrentes con escrituras (y con reset)
+    no deben ver un estado a medio actualizar (IndexError, matriz None).
+    """
+    store = NumpyVectorStore(str(tmp_path), embedding_function=None)
+    store.add_embeddings(["inicial"], _vectors(1, seed=2))
+    queries = _vectors(4, seed=3)
+    errors = []
+    done = threading.Event()
+
+    def reader():
+        try:
+            while not done.is_set():
+                store.search_by_vectors(queries, k=5)
+                store.get(include=())
+        except Exception as error:
+            errors.append(error)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    try:
+        for batch in range(200):
+            store.add_embeddings([f"t{batch}-{i}" for i in range(8)],
+                                 _vectors(8, seed=10 + batch))
+            if batch % 50 == 49:
+                store.reset()
+    finally:
+        done.set()
+        for thread in readers:
+            thread.join()
+
+    assert errors == []
@@ -0,0 +1,386 @@
+"""
+text_cache.py - Caché del Texto Extraído de los Archivos
+========================================================
+
+Leer un PDF (extraer el texto de cada página) es la parte más lenta de
+la carga, y casi siempre se repite con el mismo archivo: al probar otro
+CHUNK_SIZE, al limpiar la base y volver a cargar, al subir otra vez el
+mismo manual...
+
+Este caché guarda el texto y los metadatos de cada página, comprimidos
+en disco, la primera vez que se lee un archivo. Las siguientes veces se
+leen de ahí y no se vuelve a procesar el PDF.
+
+¿CÓMO FUNCIONA?
+- La clave es (huella SHA-256 del archivo, versión del lector).
+  Si el archivo cambia, cambia la huella; si se actualiza pypdf (que
+  podría extraer el texto de otra forma), cambia la versión
+- Cada entrada es un archivo .jsonl.gz (texto comprimido con gzip) con
+  una línea por página: se escribe y se lee de a una página, así que
+  ni siquiera un PDF enorme tiene que caber entero en memoria
+- Si el caché supera su tamaño máximo, se borran las entradas que hace
+  más tiempo que no se usan (LRU)
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from importlib import metadata
+from langchain_core.documents import Document
+
+# Sube este número si cambia el formato de las entradas guardadas
+CACHE_FORMAT = 2
+
+# Lector usado para cada extensión y paquete del que depende su resultado
+_LOADERS = {
+    ".pdf": ("PyPDFLoader", "pypdf"),
+    ".txt": ("TextLoader", None)
+}
+
+# ==============================================================================
+# FUNCIONES AUXILIARES
+# ==============================================================================
+
+def _package_version(package):
+    """Versión instalada de un paquete ('?' si no está instalado)."""
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return "?"
+
+
+def loader_version(file_path):
+    """
+    Identifica el lector que se usaría para un archivo y su versión.
+
+    Args:
+        file_path (str): Ruta al archivo
+
+    Returns:
+        str | None: Ej. "PyPDFLoader;langchain-community=0.4.2;pypdf=6.1.0;v1",
+            o None si la extensión no tiene lector
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in _LOADERS:
+        return None
+    name, package = _LOADERS[extension]
+    parts = [name, f"langchain-community={_package_version('langchain-community')}"]
+    if package:
+        parts.append(f"{package}={_package_version(package)}")
+    parts.append(f"v{CACHE_FORMAT}")
+    return ";".join(parts)
+
+
+def hash_file(file_path, block_size=1024 * 1024):
+    """Huella SHA-256 del contenido de un archivo (leído por bloques)."""
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+# ==============================================================================
+# CLASE: TextCache
+# ==============================================================================
+
+class TextCache:
+    """
+    Caché en disco del texto extraído de cada archivo, página a página.
+
+    Atributos:
+        directory: Carpeta donde se guardan las entradas
+        max_bytes: Tamaño máximo del caché en disco
+        hits: Archivos encontrados en el caché (en este proceso)
+        misses: Archivos que hubo que leer (en este proceso)
+        seconds_saved: Tiempo de lectura ahorrado (en este proceso)
+    """
+
+    def __init__(self, directory, max_bytes=500 * 1024 * 1024):
+        """
+        Abre (o crea) el caché.
+
+        Args:
+            directory (str): Carpeta del caché
+            max_bytes (int): Tamaño máximo en disco (0 = sin límite)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def key_for(self, file_path):
+        """
+        Calcula la clave de un archivo: (huella, versión del lector).
+
+        Args:
+            file_path (str): Ruta al archivo
+
+        Returns:
+            tuple | None: (huella, versión), o None si el archivo no se
+                puede guardar en el caché (extensión sin lector)
+        """
+        version = loader_version(file_path)
+        if version is None:
+            return None
+        return hash_file(file_path), version
+
+    def _entry_path(self, key):
+        """Archivo de una entrada: <carpeta>/<ab>/<huella>-<versión>.jsonl.gz"""
+        file_hash, version = key
+        version_hash = hashlib.sha256(version.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.directory, file_hash[:2],
+                            f"{file_hash}-{version_hash}.jsonl.gz")
+
+    def _open(self, key, record):
+        """
+        Abre una entrada y comprueba su cabecera.
+
+        Returns:
+            file | None: Archivo abierto (después de la cabecera), o None
+                si la entrada no existe o es de otro lector
+        """
+        path = self._entry_path(key)
+        try:
+            f = gzip.open(path, "rt", encoding="utf-8")
+            header = json.loads(f.readline())
+        except (OSError, EOFError, ValueError):
+            # No existe (o quedó dañada): hay que leer el archivo
+            if record:
+                self.misses += 1
+            return None
+        if header.get('loader') != key[1]:
+            f.close()
+            if record:
+                self.misses += 1
+            return None
+
+        # Marcar la entrada como usada recientemente (para el LRU)
+        os.utime(path)
+        return f
+
+    def _read_pages(self, f, file_path, info):
+        """
+        Genera las páginas de una entrada abierta, de a una.
+
+        Al terminar deja en info['seconds'] el tiempo de lectura guardado.
+        Una entrada sin la línea final está dañada: se borra y se lanza
+        ValueError (la próxima vez se vuelve a leer el archivo).
+        """
+        try:
+            with f:
+                for line in f:
+                    item = json.loads(line)
+                    if 'page_content' not in item:
+                        info['seconds'] = item['seconds']
+                        return
+                    yield Document(page_content=item['page_content'],
+                                   metadata={**item['metadata'], 'source': file_path})
+            raise ValueError("entrada del caché de texto incompleta")
+        except (OSError, EOFError, ValueError):
+            if os.path.exists(f.name):
+                os.remove(f.name)
+            raise
+
+    def get(self, key, file_path, record=True):
+        """
+        Busca el texto extraído de un archivo (todas sus páginas).
+
+        Args:
+            key (tuple): Clave devuelta por key_for
+            file_path (str): Ruta actual del archivo (se pone en el
+                metadato 'source', como haría el lector)
+            record (bool): Contar la búsqueda en hits/misses/seconds_saved
+
+        Returns:
+            tuple | None: (documentos, segundos_ahorrados), o None si no está
+        """
+        f = self._open(key, record)
+        if f is None:
+            return None
+
+        info = {}
+        try:
+            documents = list(self._read_pages(f, file_path, info))
+        except (OSError, EOFError, ValueError):
+            if record:
+                self.misses += 1
+            return None
+
+        if record:
+            self.hits += 1
+            self.seconds_saved += info['seconds']
+        return documents, info['seconds']
+
+    def iter_pages(self, key, file_path, record=True):
+        """
+        Como get(), pero genera las páginas de a una.
+
+        Returns:
+            generator | None: Páginas del archivo, o None si no está.
+                Si la entrada resulta dañada a mitad de lectura, el
+                generador lanza ValueError
+        """
+        f = self._open(key, record)
+        if f is None:
+            return None
+        return self._iter_hit(f, file_path, record)
+
+    def _iter_hit(self, f, file_path, record):
+        """Genera las páginas y cuenta el acierto al terminar."""
+        info = {}
+        yield from self._read_pages(f, file_path, info)
+        if record:
+            self.hits += 1
+            self.seconds_saved += info['seconds']
+
+    def writer(self, key):
+        """
+        Empieza a guardar una entrada, página a página.
+
+        Args:
+            key (tuple): Clave devuelta por key_for
+
+        Returns:
+            EntryWriter: Con add(página) y commit(segundos); usarlo con
+                'with' para que una entrada sin terminar se descarte
+
+        Ejemplo:
+            >>> with cache.writer(key) as writer:
+            ...     for page in loader.lazy_load():
+            ...         writer.add(page)
+            ...     writer.commit(seconds)
+        """
+        return EntryWriter(self, key)
+
+    def put(self, key, documents, seconds):
+        """
+        Guarda el texto extraído de un archivo.
+
+        Args:
+            key (tuple): Clave devuelta por key_for
+            documents (list): Páginas leídas por el lector
+            seconds (float): Cuánto tardó la lectura (el tiempo que se
+                ahorrará cada vez que se use esta entrada)
+        """
+        with self.writer(key) as writer:
+            for document in documents:
+                writer.add(document)
+            writer.commit(seconds)
+
+    def _evict(self):
+        """Borra las entradas menos usadas hasta volver a max_bytes."""
+        if not self.max_bytes:
+            return
+        entries = []
+        for folder in os.scandir(self.directory):
+            if folder.is_dir():
+                for entry in os.scandir(folder.path):
+                    if entry.name.endswith(".jsonl.gz"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def stats(self):
+        """
+        Aciertos del caché en este proceso.
+
+        Returns:
+            dict: {'hits', 'misses', 'seconds_saved'}
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'seconds_saved': self.seconds_saved
+        }
+
+# ==============================================================================
+# CLASE: EntryWriter
+# ==============================================================================
+
+class EntryWriter:
+    """
+    Escribe una entrada del caché de a una página (ver TextCache.writer).
+
+    Las páginas se comprimen a medida que llegan en un archivo temporal;
+    commit() lo renombra al nombre definitivo (os.replace), así que otro
+    proceso nunca ve una entrada a medio escribir. Si no se llega a
+    llamar a commit() (error, lectura interrumpida), el temporal se borra.
+    """
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.path = cache._entry_path(key)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._file = gzip.open(self._tmp_path, "wt", encoding="utf-8")
+        self._write({'loader': key[1], 'created_at': time.time()})
+
+    def _write(self, item):
+        self._file.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+
+    def add(self, document):
+        """Añade una página."""
+        self._write({'page_content': document.page_content, 'metadata': document.metadata})
+
+    def commit(self, seconds):
+        """Cierra la entrada (con el tiempo total de lectura) y la publica."""
+        self._write({'seconds': seconds})
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.path)
+        self.cache._evict()
+
+    def close(self):
+        """Descarta la entrada si no se publicó."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. CACHÉ DIRECCIONADO POR CONTENIDO:
+   - La clave es la huella del CONTENIDO del archivo, no su nombre ni su
+     carpeta: el mismo PDF subido desde otra carpeta se reconoce igual
+   - Si el archivo cambia un solo byte, la huella cambia y se vuelve a leer
+
+2. LA VERSIÓN DEL LECTOR TAMBIÉN ES PARTE DE LA CLAVE:
+   - Otra versión de pypdf puede extraer el texto de forma distinta
+   - Así nunca se mezclan textos extraídos con versiones diferentes
+
+3. COMPRESIÓN:
+   - El texto se comprime muy bien (gzip suele dejarlo en 1/3 o menos)
+   - gzip comprime "en streaming": se puede escribir y leer línea a línea
+
+💡 EXPERIMENTO SUGERIDO:
+   Cambia CHUNK_SIZE en config.py, limpia la base y vuelve a cargar el
+   mismo PDF: la lectura es casi instantánea y el mensaje indica cuántos
+   segundos se ahorraron.
+"""
@@ -0,0 +1,375 @@
+"""
+tracing.py - Trazas y Métricas del Pipeline RAG
+===============================================
+
+Los print() con emojis cuentan QUÉ pasa, pero no DÓNDE se va el tiempo.
+Si una respuesta tarda 6 segundos, ¿fue el embedding de la pregunta, la
+búsqueda, el armado del prompt o Gemini? Este módulo mide cada etapa:
+
+- load / split: lectura y división de archivos
+- embed: cálculo de embeddings (de fragmentos o de la pregunta)
+- upsert: escritura en la base vectorial
+- retrieve / prompt / llm: las etapas de cada pregunta
+
+Cada medición es un "span" (tramo): etapa, duración y datos como el número
+de fragmentos o de tokens. Los spans de una misma pregunta comparten un
+trace_id, y cada uno sabe cuál es su span "padre". Se pueden ver:
+
+1. En un archivo JSONL (una línea JSON por span) para analizarlos después
+2. En http://localhost:METRICS_PORT/metrics, en el formato de texto de
+   Prometheus (la herramienta de métricas más usada)
+3. En la pestaña "ℹ️ Información" de la app (p50/p95 recientes por etapa)
+
+Solo usa la librería estándar: importarlo es instantáneo (ver FAST_START).
+
+Uso:
+    >>> from tracing import tracer
+    >>> with tracer.span("retrieve", k=5) as span:
+    ...     docs = retriever.invoke(pregunta)
+    ...     span.set(documents=len(docs))
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import TRACING_ENABLED, TRACE_FILE, TRACE_WINDOW
+
+# Span activo en este hilo / tarea de asyncio (para enlazar padres e hijos)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# Orden en que se muestran las etapas conocidas
+STAGES = ["load", "split", "embed", "upsert", "query", "retrieve", "prompt", "llm"]
+
+# ==============================================================================
+# FUNCIÓN: percentile
+# ==============================================================================
+
+def percentile(samples, q):
+    """
+    Percentil q (0 a 100) de una lista de números, por el método del
+    rango más cercano.
+
+    Ejemplo:
+        >>> percentile([1, 2, 3, 4], 50)
+        2
+    """
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+# ==============================================================================
+# CLASE: Span
+# ==============================================================================
+
+class Span:
+    """
+    Un tramo medido: etapa, duración y atributos.
+
+    Atributos:
+        stage: Nombre de la etapa ("retrieve", "llm"...)
+        trace_id: Identificador compartido por los spans de una petición
+        span_id: Identificador de este span
+        parent_id: span_id del span padre (None si es el primero)
+        attributes: Datos del tramo (fragmentos, tokens...)
+    """
+
+    def __init__(self, stage, parent=None, attributes=None):
+        self.stage = stage
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.duration = 0.0
+        self.error = None
+
+    def set(self, **attributes):
+        """Añade o cambia atributos del span (ej: span.set(tokens=120))."""
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        """Representación del span como diccionario (una línea del JSONL)."""
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'stage': self.stage,
+            'start': round(self.start, 6),
+            'duration_ms': round(self.duration * 1000, 3),
+            'error': self.error,
+            **self.attributes
+        }
+
+# ==============================================================================
+# CLASE: Tracer
+# ==============================================================================
+
+class Tracer:
+    """
+    Registra spans, los exporta a JSONL y calcula métricas por etapa.
+
+    Atributos:
+        enabled: False = los spans no se registran (el código sigue igual)
+        path: Archivo JSONL de exportación (None = sin archivo)
+        window: Spans recientes por etapa usados para los percentiles
+    """
+
+    def __init__(self, path=None, window=500, enabled=True):
+        """
+        Args:
+            path (str): Archivo JSONL (None = no exportar)
+            window (int): Spans recientes por etapa para p50/p95
+            enabled (bool): Activar el registro
+        """
+        self.enabled = enabled
+        self.path = path
+        self.window = window
+
+        self._recent = {}    # etapa → deque de duraciones (segundos)
+        self._totals = {}    # etapa → {'count', 'seconds', 'errors', atributos numéricos}
+        self._file = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        """
+        Mide el bloque 'with' como un span de la etapa indicada.
+
+        Si el bloque lanza una excepción, el span se guarda con el error
+        y la excepción sigue su curso.
+
+        Args:
+            stage (str): Nombre de la etapa
+            **attributes: Atributos iniciales del span
+
+        Yields:
+            Span: El span, para añadirle atributos con span.set()
+        """
+        parent = _current_span.get()
+        span = Span(stage, parent, attributes)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.error = e.__class__.__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Un generador cerrado desde otro contexto: nada que restaurar
+                pass
+            self._finish(span)
+
+    def record(self, stage, seconds, error=None, **attributes):
+        """
+        Registra un span ya medido (útil cuando la etapa no es un bloque
+        continuo, como leer páginas intercaladas con su división).
+
+        Args:
+            stage (str): Nombre de la etapa
+            seconds (float): Duración total
+            error (str): Error de la etapa, si lo hubo
+            **attributes: Atributos del span
+        """
+        span = Span(stage, _current_span.get(), attributes)
+        span.start = time.time() - seconds
+        span.duration = seconds
+        span.error = error
+        self._finish(span)
+
+    def _finish(self, span):
+        """Guarda un span terminado: métricas en memoria y línea JSONL."""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            recent = self._recent.get(span.stage)
+            if recent is None:
+                recent = self._recent[span.stage] = deque(maxlen=self.window)
+            recent.append(span.duration)
+
+            totals = self._totals.setdefault(span.stage, {'count': 0, 'seconds': 0.0, 'errors': 0})
+            totals['count'] += 1
+            totals['seconds'] += span.duration
+            totals['errors'] += span.error is not None
+            for name, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[name] = totals.get(name, 0) + value
+
+            if self.path:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    # buffering=1: cada línea se escribe en cuanto termina
+                    self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._file.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+    def _ordered_stages(self):
+        """Etapas con datos, en el orden de STAGES y luego las demás."""
+        known = [stage for stage in STAGES if stage in self._totals]
+        return known + sorted(stage for stage in self._totals if stage not in STAGES)
+
+    def stage_stats(self):
+        """
+        Obtiene las métricas de cada etapa.
+
+        Returns:
+            dict: {etapa: {'count', 'p50_ms', 'p95_ms', 'total_seconds', 'errors'}}
+                p50/p95 se calculan con los últimos 'window' spans
+        """
+        with self._lock:
+            return {
+                stage: {
+                    'count': self._totals[stage]['count'],
+                    'p50_ms': percentile(self._recent[stage], 50) * 1000,
+                    'p95_ms': percentile(self._recent[stage], 95) * 1000,
+                    'total_seconds': self._totals[stage]['seconds'],
+                    'errors': self._totals[stage]['errors']
+                }
+                for stage in self._ordered_stages()
+            }
+
+    def stats_message(self):
+        """
+        Tabla Markdown con p50/p95 recientes por etapa (para la interfaz).
+
+        Returns:
+            str: Texto en Markdown
+        """
+        stats = self.stage_stats()
+        if not stats:
+            return "Todavía no hay mediciones: carga un documento o haz una pregunta."
+        lines = [
+            f"Últimos {self.window} spans de cada etapa\n",
+            "| Etapa | Spans | p50 (ms) | p95 (ms) | Errores |",
+            "|---|---|---|---|---|"
+        ]
+        for stage, values in stats.items():
+            lines.append(
+                f"| {stage} | {values['count']:,} | {values['p50_ms']:,.1f} | "
+                f"{values['p95_ms']:,.1f} | {values['errors']} |"
+            )
+        return "\n".join(lines)
+
+    def prometheus_text(self):
+        """
+        Métricas en el formato de texto de Prometheus.
+
+        - rag_stage_duration_seconds: resumen con p50/p95 recientes,
+          suma y número de spans de cada etapa
+        - rag_stage_errors_total: spans terminados con error
+        - rag_stage_<atributo>_total: suma de cada atributo numérico
+          (fragmentos, tokens...)
+
+        Returns:
+            str: Texto listo para servir en /metrics
+        """
+        with self._lock:
+            lines = [
+                "# HELP rag_stage_duration_seconds Duración de cada etapa del pipeline RAG",
+                "# TYPE rag_stage_duration_seconds summary"
+            ]
+            counters = {}
+            for stage in self._ordered_stages():
+                totals = self._totals[stage]
+                recent = self._recent[stage]
+                label = f'stage="{stage}"'
+                for q in (0.5, 0.95):
+                    lines.append(f'rag_stage_duration_seconds{{{label},quantile="{q}"}} '
+                                 f'{percentile(recent, q * 100):.6f}')
+                lines.append(f"rag_stage_duration_seconds_sum{{{label}}} {totals['seconds']:.6f}")
+                lines.append(f"rag_stage_duration_seconds_count{{{label}}} {totals['count']}")
+                for name, value in totals.items():
+                    if name not in ('count', 'seconds'):
+                        counters.setdefault(name, []).append((label, value))
+
+        for name, values in sorted(counters.items()):
+            metric = f"rag_stage_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f"{metric}{{{label}}} {value:g}" for label, value in values)
+        return "\n".join(lines) + "\n"
+
+# ==============================================================================
+# FUNCIÓN: start_metrics_server
+# ==============================================================================
+
+def start_metrics_server(tracer, port, host="127.0.0.1"):
+    """
+    Sirve las métricas en http://host:port/metrics (en un hilo aparte).
+
+    Usa solo la librería estándar (http.server): no hace falta instalar
+    nada. Prometheus puede leer esta dirección cada pocos segundos.
+
+    Args:
+        tracer (Tracer): Origen de las métricas
+        port (int): Puerto
+        host (str): Interfaz de red ("0.0.0.0" = accesible desde otras máquinas)
+
+    Returns:
+        ThreadingHTTPServer: El servidor (server.shutdown() lo detiene)
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Sin una línea en la consola por cada lectura de Prometheus
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Métricas disponibles en http://{host}:{port}/metrics")
+    return server
+
+# Tracer compartido por todos los módulos de la aplicación
+tracer = Tracer(path=TRACE_FILE, window=TRACE_WINDOW, enabled=TRACING_ENABLED)
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. TRAZA Y SPAN:
+   - Una traza es todo lo que pasó en una petición (una pregunta)
+   - Un span es un tramo de la traza; los spans se anidan (padre/hijo)
+
+2. PERCENTILES (p50 / p95):
+   - p50: la mitad de las peticiones tardan menos que esto
+   - p95: solo 1 de cada 20 tarda más; es lo que sufren los usuarios "con mala suerte"
+   - El promedio esconde los casos lentos; los percentiles no
+
+3. contextvars:
+   - Cada hilo y cada tarea de asyncio tiene su propio "span activo",
+     así las preguntas simultáneas no mezclan sus spans
+
+4. PROMETHEUS:
+   - Un formato de texto simple: nombre{etiquetas} valor
+   - Herramientas como Grafana lo leen y dibujan gráficas
+
+💡 EXPERIMENTO SUGERIDO:
+   Haz varias preguntas y abre http://localhost:9464/metrics. Luego
+   busca en el archivo JSONL los spans de una misma pregunta (mismo
+   trace_id) y suma sus duraciones.
+"""
@@ -0,0 +1,980 @@
+"""
+vector_store.py - Almacén Vectorial con NumPy (memory-mapped)
+=============================================================
+
+Este módulo implementa una base de datos vectorial alternativa a ChromaDB,
+construida directamente con NumPy. Se activa con VECTOR_BACKEND = "numpy"
+en config.py.
+
+¿CÓMO GUARDA LOS DATOS?
+- embeddings.npy: una matriz contigua (filas = fragmentos, columnas =
+  dimensiones del embedding) en float32 o float16
+- chunks.sqlite3: tabla lateral con el texto y los metadatos de cada fila
+
+La matriz se abre con "memory mapping" (np.memmap): el sistema operativo
+carga en memoria solo las partes que se leen. Abrir la base es instantáneo
+aunque tenga cientos de miles de fragmentos.
+
+¿CÓMO BUSCA?
+- Los vectores se guardan normalizados (longitud 1), así la similitud
+  coseno es un simple producto escalar
+- Se multiplica la matriz por el vector de la pregunta, por bloques
+- np.argpartition elige los k mejores sin ordenar toda la lista
+
+¿Y CON CUANTIZACIÓN? (VECTOR_QUANTIZATION en config.py)
+- Además de la matriz completa se guarda una copia comprimida (int8 o
+  binaria, ver quantization.py) que es la única que se recorre entera
+- Solo los mejores candidatos se vuelven a puntuar con la matriz completa
+
+Autor: Clase 24 - IA Python para Principiantes
+Fecha: 2025
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from ann_index import IVFIndex
+from quantization import create_quantizer
+
+# Filas que se multiplican de una vez durante la búsqueda
+# (limita la memoria temporal usada por cada consulta)
+SEARCH_BLOCK_ROWS = 65_536
+
+# Filas por bloque en la búsqueda sobre códigos int8 (hay que convertirlos
+# a float32 para multiplicarlos, así que se usan bloques más pequeños)
+CODE_BLOCK_ROWS = 16_384
+
+# Capacidad inicial de la matriz (crece al doble cuando se llena)
+INITIAL_CAPACITY = 1_024
+
+# ==============================================================================
+# FUNCIONES AUXILIARES
+# ==============================================================================
+
+def _normalize(matrix):
+    """
+    Normaliza cada fila a longitud 1 (para usar similitud coseno).
+
+    Args:
+        matrix (np.ndarray): Matriz (n, dim) de vectores
+
+    Returns:
+        np.ndarray: Matriz float32 con filas de norma 1
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def matches_filter(metadata, where):
+    """
+    Comprueba si unos metadatos cumplen un filtro estilo ChromaDB.
+
+    Soporta:
+        {"campo": valor}                      igualdad
+        {"campo": {"$eq"|"$ne": valor}}
+        {"campo": {"$in"|"$nin": [valores]}}
+        {"campo": {"$gt"|"$gte"|"$lt"|"$lte": valor}}
+        {"$and": [filtros]}, {"$or": [filtros]}
+
+    Args:
+        metadata (dict): Metadatos de un fragmento
+        where (dict): Filtro (None = todo cumple)
+
+    Returns:
+        bool: True si cumple el filtro
+    """
+    if not where:
+        return True
+
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        for operator, expected in condition.items():
+            if operator == "$eq" and value != expected:
+                return False
+            if operator == "$ne" and value == expected:
+                return False
+            if operator == "$in" and value not in expected:
+                return False
+            if operator == "$nin" and value in expected:
+                return False
+            if operator in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if operator == "$gt" and not value > expected:
+                    return False
+                if operator == "$gte" and not value >= expected:
+                    return False
+                if operator == "$lt" and not value < expected:
+                    return False
+                if operator == "$lte" and not value <= expected:
+                    return False
+    return True
+
+# ==============================================================================
+# CLASE: NumpyVectorStore
+# ==============================================================================
+
+class NumpyVectorStore(VectorStore):
+    """
+    Base de datos vectorial sobre una matriz NumPy en disco.
+
+    Implementa la interfaz VectorStore de LangChain (similarity_search,
+    as_retriever, add_documents...) y además un pequeño subconjunto de la
+    API de colecciones de ChromaDB (get, update, delete, count), para que
+    DatabaseManager pueda usar cualquiera de los dos sin cambios.
+
+    Los fragmentos eliminados no se borran de la matriz: se marcan como
+    eliminados y se ignoran en las búsquedas.
+
+    Con index="ivf" las búsquedas usan un índice aproximado (ver ann_index.py)
+    en cuanto hay suficientes vectores para entrenarlo; mientras tanto la
+    búsqueda es exacta.
+
+    Con quantization="int8" o "binary" la primera etapa de cada búsqueda
+    recorre los códigos comprimidos, y solo k * rerank_factor candidatos
+    se vuelven a puntuar con los vectores completos del disco.
+
+    Atributos:
+        directory: Carpeta donde se guardan los archivos
+        embedding_function: Modelo de embeddings
+        dtype: Tipo de dato de la matriz ('float32' o 'float16')
+        index: Índice IVF (None = búsqueda exacta)
+        quantizer: Cuantizador de la primera etapa (None = sin cuantización)
+        rerank_factor: Candidatos re-puntuados por cada resultado pedido
+    """
+
+    def __init__(self, directory, embedding_function, dtype="float32",
+                 index="flat", nlist=256, nprobe=8, quantization="none", rerank_factor=10):
+        """
+        Abre (o crea) el almacén en la carpeta indicada.
+
+        Args:
+            directory (str): Carpeta de datos
+            embedding_function (Embeddings): Modelo de embeddings
+            dtype (str): 'float32' (precisión completa) o 'float16' (mitad de espacio)
+            index (str): "flat" (búsqueda exacta) o "ivf" (aproximada)
+            nlist (int): Grupos del índice IVF
+            nprobe (int): Grupos visitados por búsqueda en el índice IVF
+            quantization (str): "none", "int8" (4x menos memoria) o "binary" (32x menos)
+            rerank_factor (int): Candidatos re-puntuados = k * rerank_factor
+        """
+        self.directory = directory
+        self.embedding_function = embedding_function
+        self.dtype = np.dtype(dtype)
+        self.index = IVFIndex(nlist=nlist, nprobe=nprobe) if index == "ivf" else None
+        self.quantizer = create_quantizer(quantization)
+        self.rerank_factor = max(1, rerank_factor)
+        self._codes = None
+
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._matrix_path = os.path.join(directory, "embeddings.npy")
+        self._db_path = os.path.join(directory, "chunks.sqlite3")
+        self._index_path = os.path.join(directory, "ivf_centroids.npy")
+        if self.quantizer is not None:
+            self._codes_path = os.path.join(directory, f"codes_{self.quantizer.name}.npy")
+            self._quantizer_path = os.path.join(directory, f"quantizer_{self.quantizer.name}.npy")
+
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_chunks_id ON chunks (id)")
+
+        # Grupo IVF de cada fila (columna añadida después: migrar bases viejas)
+        columns = [info[1] for info in connection.execute("PRAGMA table_info(chunks)")]
+        if "ivf_list" not in columns:
+            connection.execute("ALTER TABLE chunks ADD COLUMN ivf_list INTEGER")
+        connection.commit()
+
+        self._load()
+
+    # --------------------------------------------------------------------------
+    # Apertura y persistencia
+    # --------------------------------------------------------------------------
+
+    def _connect(self):
+        """Obtiene la conexión SQLite del hilo actual."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def _load(self):
+        """
+        Carga el estado en memoria: IDs, filas vivas y la matriz (mapeada).
+
+        Solo los IDs y una máscara de filas vivas se leen realmente;
+        los vectores quedan en disco hasta que se necesitan.
+        """
+        rows = self._connect().execute(
+            "SELECT row, id, deleted FROM chunks ORDER BY row"
+        ).fetchall()
+
+        self._count = len(rows)
+        self._ids = [chunk_id for _, chunk_id, _ in rows]
+        self._alive = np.array([not deleted for _, _, deleted in rows], dtype=bool)
+        self._id_to_row = {
+            chunk_id: row for row, chunk_id, deleted in rows if not deleted
+        }
+
+        if os.path.exists(self._matrix_path):
+            self._matrix = np.load(self._matrix_path, mmap_mode="r+")
+        else:
+            self._matrix = None
+
+        if self.quantizer is not None and self._matrix is not None:
+            codes_ok = (
+                os.path.exists(self._codes_path)
+                and self.quantizer.load(self._quantizer_path)
+            )
+            if codes_ok:
+                self._codes = np.load(self._codes_path, mmap_mode="r+")
+                codes_ok = self._codes.shape[0] == self._matrix.shape[0]
+            if not codes_ok:
+                # Cuantización recién activada (o archivos incompletos)
+                self.rebuild_codes()
+
+        if self.index is not None and self.index.load(self._index_path):
+            # Reconstruir las listas del índice a partir de la tabla
+            assigned = self._connect().execute(
+                "SELECT row, ivf_list FROM chunks WHERE deleted = 0 AND ivf_list IS NOT NULL"
+            ).fetchall()
+            self.index.add([row for row, _ in assigned], [label for _, label in assigned])
+            if len(assigned) < self.count():
+                # Filas sin grupo (índice de otra configuración): reentrenar
+                self.rebuild_index()
+        elif self.index is not None:
+            self._maybe_train_index()
+
+    def _ensure_capacity(self, extra_rows, dim):
+        """
+        Garantiza que la matriz tenga sitio para extra_rows filas nuevas.
+
+        Si no hay sitio, crea una matriz del doble de tamaño y copia los
+        datos. Duplicar (en lugar de crecer de a poco) hace que el costo
+        de las copias sea pequeño en promedio.
+        """
+        needed = self._count + extra_rows
+
+        if self._matrix is not None:
+            if self._matrix.shape[1] != dim:
+                raise ValueError(
+                    f"Dimensión incorrecta: el almacén usa {self._matrix.shape[1]}, "
+                    f"se recibió {dim}"
+                )
+            if needed <= self._matrix.shape[0]:
+                return
+
+        capacity = INITIAL_CAPACITY
+        if self._matrix is not None:
+            capacity = max(capacity, self._matrix.shape[0] * 2)
+        while capacity < needed:
+            capacity *= 2
+
+        self._resize_file("_matrix", self._matrix_path, capacity, dim, self.dtype)
+        if self.quantizer is not None:
+            # Los códigos crecen a la par que la matriz (misma fila = mismo fragmento)
+            self._resize_file("_codes", self._codes_path, capacity,
+                              self.quantizer.code_size(dim), self.quantizer.dtype)
+
+    def _resize_file(self, attribute, path, capacity, columns, dtype):
+        """
+        Crea un archivo .npy de 'capacity' filas, copia las filas usadas del
+        array guardado en el atributo indicado y lo reemplaza.
+        """
+        old = getattr(self, attribute)
+        tmp_path = path + ".tmp.npy"
+        new_array = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=dtype, shape=(capacity, columns)
+        )
+        if old is not None and self._count:
+            new_array[:self._count] = old[:self._count]
+        new_array.flush()
+
+        # Cerrar el array viejo antes de reemplazar el archivo
+        setattr(self, attribute, None)
+        del old, new_array
+        os.replace(tmp_path, path)
+        setattr(self, attribute, np.load(path, mmap_mode="r+"))
+
+    # --------------------------------------------------------------------------
+    # Escritura
+    # --------------------------------------------------------------------------
+
+    @property
+    def embeddings(self):
+        """Modelo de embeddings (requerido por LangChain)."""
+        return self.embedding_function
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """
+        Calcula los embeddings de los textos y los guarda.
+
+        Args:
+            texts (list): Textos a guardar
+            metadatas (list): Metadatos de cada texto (opcional)
+            ids (list): IDs de cada texto (opcional, se generan si faltan)
+
+        Returns:
+            list: IDs de los textos guardados (sin repetir)
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = self.embedding_function.embed_documents(texts)
+        return self.add_embeddings(texts, vectors, metadatas=metadatas, ids=ids)
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        """
+        Guarda textos cuyos embeddings ya están calculados.
+
+        Si un ID ya existe, la versión anterior se marca como eliminada
+        (es decir, funciona como "upsert"). Si un ID se repite dentro del
+        lote, se guarda solo su última aparición.
+
+        Args:
+            texts (list): Textos
+            embeddings (list | np.ndarray): Un vector por texto
+            metadatas (list): Metadatos de cada texto (opcional)
+            ids (list): IDs de cada texto (opcional)
+
+        Returns:
+            list: IDs de los textos guardados (sin repetir)
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        vectors = _normalize(embeddings)
+
+        if len(set(ids)) < len(ids):
+            # Un ID repetido dentro del mismo lote: como en un upsert,
+            # gana la última aparición (si no, quedarían dos filas vivas)
+            last = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            keep = sorted(last.values())
+            texts = [texts[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep]
+            ids = [ids[i] for i in keep]
+            vectors = vectors[keep]
+
+        with self._lock:
+            # Upsert: marcar como eliminadas las versiones anteriores
+            self._tombstone([chunk_id for chunk_id in ids if chunk_id in self._id_to_row])
+
+            self._ensure_capacity(len(texts), vectors.shape[1])
+            start = self._count
+            end = start + len(texts)
+            self._matrix[start:end] = vectors.astype(self.dtype)
+            self._matrix.flush()
+
+            if self.quantizer is not None:
+                if not self.quantizer.is_trained:
+                    # Las escalas int8 se calculan con el primer lote
+                    self.quantizer.train(vectors)
+                    self.quantizer.save(self._quantizer_path)
+                self._codes[start:end] = self.quantizer.encode(vectors)
+                self._codes.flush()
+
+            # Si el índice IVF está entrenado, los vectores nuevos se asignan
+            # a su grupo ahora mismo (sin volver a calcular embeddings)
+            if self.index is not None and self.index.is_trained:
+                labels = [int(label) for label in self.index.assign(vectors)]
+            else:
+                labels = [None] * len(texts)
+
+            connection = self._connect()
+            connection.executemany(
+                "INSERT INTO chunks (row, id, text, metadata, ivf_list) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (start + i, chunk_id, text, json.dumps(metadata, ensure_ascii=False), label)
+                    for i, (chunk_id, text, metadata, label)
+                    in enumerate(zip(ids, texts, metadatas, labels))
+                ]
+            )
+            connection.commit()
+
+            self._count = end
+            self._ids.extend(ids)
+            self._alive = np.concatenate([self._alive, np.ones(len(texts), dtype=bool)])
+            for i, chunk_id in enumerate(ids):
+                self._id_to_row[chunk_id] = start + i
+
+            if self.index is not None:
+                if self.index.is_trained:
+                    self.index.add(range(start, end), labels)
+                else:
+                    self._maybe_train_index()
+
+        return ids
+
+    # --------------------------------------------------------------------------
+    # Índice aproximado (IVF)
+    # --------------------------------------------------------------------------
+
+    def _maybe_train_index(self):
+        """Entrena el índice IVF en cuanto hay suficientes vectores."""
+        if self.index is not None and not self.index.is_trained \
+                and self.index.can_train(self.count()):
+            self.rebuild_index()
+
+    def rebuild_index(self):
+        """
+        Entrena el índice IVF desde cero y asigna todas las filas.
+
+        Útil después de cargar muchos documentos nuevos: los centroides
+        entrenados con pocos datos pueden quedar desequilibrados.
+        """
+        if self.index is None or self._matrix is None:
+            return
+
+        with self._lock:
+            alive_rows = np.flatnonzero(self._alive[:self._count])
+            print(f"🧭 Entrenando índice IVF ({self.index.nlist} grupos, "
+                  f"{len(alive_rows):,} vectores)...")
+
+            rng = np.random.default_rng(0)
+            sample_size = min(len(alive_rows), self.index.nlist * 256)
+            sample_rows = np.sort(rng.choice(alive_rows, size=sample_size, replace=False))
+            self.index.train(self.get_vectors(sample_rows))
+
+            # Asignar todas las filas por bloques y guardar su grupo
+            connection = self._connect()
+            for block_rows, block in self._iter_blocks(alive_rows):
+                labels = self.index.assign(np.asarray(block, dtype=np.float32))
+                self.index.add(block_rows, labels)
+                connection.executemany(
+                    "UPDATE chunks SET ivf_list = ? WHERE row = ?",
+                    [(int(label), int(row)) for row, label in zip(block_rows, labels)]
+                )
+            connection.commit()
+            self.index.save(self._index_path)
+
+    # --------------------------------------------------------------------------
+    # Cuantización
+    # --------------------------------------------------------------------------
+
+    def rebuild_codes(self):
+        """
+        Recalcula los códigos cuantizados de todas las filas.
+
+        Se llama sola al activar la cuantización en una base existente.
+        También conviene llamarla tras cargar muchos documentos nuevos: las
+        escalas int8 se calcularon con el primer lote.
+        """
+        if self.quantizer is None or self._matrix is None:
+            return
+
+        with self._lock:
+            alive_rows = np.flatnonzero(self._alive[:self._count])
+            print(f"🗜️ Cuantizando {len(alive_rows):,} vectores ({self.quantizer.name})...")
+
+            if len(alive_rows):
+                rng = np.random.default_rng(0)
+                sample_size = min(len(alive_rows), SEARCH_BLOCK_ROWS)
+                sample_rows = np.sort(rng.choice(alive_rows, size=sample_size, replace=False))
+                self.quantizer.train(self.get_vectors(sample_rows))
+                self.quantizer.save(self._quantizer_path)
+
+            capacity, dim = self._matrix.shape
+            self._codes = None
+            tmp_path = self._codes_path + ".tmp.npy"
+            codes = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=self.quantizer.dtype,
+                shape=(capacity, self.quantizer.code_size(dim))
+            )
+            if self.quantizer.is_trained:
+                for block_rows, block in self._iter_blocks():
+                    codes[block_rows[0]:block_rows[-1] + 1] = self.quantizer.encode(
+                        np.asarray(block, dtype=np.float32))
+            codes.flush()
+            del codes
+            os.replace(tmp_path, self._codes_path)
+            self._codes = np.load(self._codes_path, mmap_mode="r+")
+
+    def _tombstone(self, ids):
+        """Marca como eliminados los fragmentos con esos IDs."""
+        rows = [self._id_to_row.pop(chunk_id) for chunk_id in ids if chunk_id in self._id_to_row]
+        if not rows:
+            return 0
+
+        self._alive[rows] = False
+        connection = self._connect()
+        connection.executemany(
+            "UPDATE chunks SET deleted = 1 WHERE row = ?", [(row,) for row in rows]
+        )
+        connection.commit()
+        return len(rows)
+
+    def delete(self, ids=None, **kwargs):
+        """
+        Elimina fragmentos por ID.
+
+        Args:
+            ids (list): IDs a eliminar
+
+        Returns:
+            bool: True si se eliminó algo
+        """
+        with self._lock:
+            return self._tombstone(list(ids or [])) > 0
+
+    def reset(self):
+        """
+        Vacía el almacén por completo.
+
+        En lugar de marcar cada fila como eliminada, se borran los archivos
+        y se vacía la tabla de una vez: el costo no depende del número de
+        fragmentos guardados.
+        """
+        with self._lock:
+            # Soltar los arrays mapeados antes de borrar sus archivos
+            self._matrix = None
+            self._codes = None
+            paths = [self._matrix_path, self._index_path]
+            if self.quantizer is not None:
+                paths += [self._codes_path, self._quantizer_path]
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+            # DELETE sin WHERE: SQLite vacía la tabla sin recorrer las filas
+            connection = self._connect()
+            connection.execute("DELETE FROM chunks")
+            connection.commit()
+
+            # Centroides y escalas se vuelven a entrenar con los datos nuevos
+            if self.index is not None:
+                self.index = IVFIndex(nlist=self.index.nlist, nprobe=self.index.nprobe,
+                                      iterations=self.index.iterations)
+            if self.quantizer is not None:
+                self.quantizer = create_quantizer(self.quantizer.name)
+
+            self._load()
+
+    def update(self, ids, metadatas):
+        """
+        Actualiza los metadatos de fragmentos existentes (sin tocar los vectores).
+
+        Args:
+            ids (list): IDs a actualizar
+            metadatas (list): Nuevos metadatos de cada ID
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "UPDATE chunks SET metadata = ? WHERE row = ?",
+                [
+                    (json.dumps(metadata, ensure_ascii=False), self._id_to_row[chunk_id])
+                    for chunk_id, metadata in zip(ids, metadatas)
+                    if chunk_id in self._id_to_row
+                ]
+            )
+            connection.commit()
+
+    # --------------------------------------------------------------------------
+    # Lectura (API compatible con las colecciones de ChromaDB)
+    # --------------------------------------------------------------------------
+
+    def count(self):
+        """
+        Número de fragmentos guardados (sin contar los eliminados).
+
+        Returns:
+            int: Total de fragmentos
+        """
+        return len(self._id_to_row)
+
+    def rows_for_ids(self, ids):
+        """
+        Números de fila de los IDs dados (ordenados, sin leer SQLite).
+
+        Args:
+            ids (list): IDs de fragmentos (los desconocidos se ignoran)
+
+        Returns:
+            np.ndarray: Filas en orden creciente (lectura secuencial)
+        """
+        with self._lock:
+            rows = [self._id_to_row[chunk_id] for chunk_id in ids if chunk_id in self._id_to_row]
+        return np.sort(np.asarray(rows, dtype=np.int64))
+
+    def get(self, ids=None, where=None, include=("metadatas", "documents")):
+        """
+        Obtiene fragmentos por ID y/o por filtro de metadatos.
+
+        Args:
+            ids (list): IDs a obtener (None = todos)
+            where (dict): Filtro de metadatos (ver matches_filter)
+            include (list): Qué devolver: "metadatas", "documents", "embeddings"
+
+        Returns:
+            dict: {'ids': [...], 'metadatas': [...], 'documents': [...],
+                   'embeddings': np.ndarray} (solo las claves pedidas)
+        """
+        with self._lock:
+            if ids is not None:
+                rows = [self._id_to_row[chunk_id] for chunk_id in ids if chunk_id in self._id_to_row]
+            else:
+                rows = [int(row) for row in np.flatnonzero(self._alive[:self._count])]
+            return self.get_rows(rows, where=where, include=include)
+
+    def get_rows(self, rows, where=None, include=("metadatas", "documents")):
+        """
+        Obtiene fragmentos por número de fila (mismo formato que get()).
+
+        Las filas que ya no existen (el almacén se vació entre la búsqueda
+        y esta lectura) se omiten.
+        """
+        include = set(include or ())
+        result_rows, metadatas, documents = [], [], []
+
+        with self._lock:
+            connection = self._connect()
+            for i in range(0, len(rows), 500):
+                batch = [int(row) for row in rows[i:i + 500]]
+                placeholders = ",".join("?" * len(batch))
+                fetched = connection.execute(
+                    f"SELECT row, text, metadata FROM chunks WHERE row IN ({placeholders})",
+                    batch
+                ).fetchall()
+                by_row = {row: (text, metadata) for row, text, metadata in fetched}
+
+                for row in batch:
+                    if row not in by_row:
+                        continue
+                    text, metadata_json = by_row[row]
+                    metadata = json.loads(metadata_json)
+                    if not matches_filter(metadata, where):
+                        continue
+                    result_rows.append(row)
+                    metadatas.append(metadata)
+                    documents.append(text)
+
+            result = {'ids': [self._ids[row] for row in result_rows], 'rows': result_rows}
+            if "metadatas" in include:
+                result['metadatas'] = metadatas
+            if "documents" in include:
+                result['documents'] = documents
+            if "embeddings" in include:
+                result['embeddings'] = self.get_vectors(result_rows)
+        return result
+
+    def get_vectors(self, rows):
+        """
+        Lee los vectores (normalizados, en float32) de las filas indicadas.
+
+        Args:
+            rows (list): Números de fila
+
+        Returns:
+            np.ndarray: Matriz (len(rows), dim)
+        """
+        with self._lock:
+            if self._matrix is None or not len(rows):
+                return np.zeros((0, 0), dtype=np.float32)
+            return np.asarray(self._matrix[np.asarray(rows)], dtype=np.float32)
+
+    # --------------------------------------------------------------------------
+    # Búsqueda
+    # --------------------------------------------------------------------------
+
+    def search_by_vectors(self, queries, k=4, rows=None, nprobe=None, exact=False):
+        """
+        Busca los k vecinos más cercanos de varias preguntas a la vez.
+
+        Multiplica la matriz de embeddings por la matriz de preguntas,
+        bloque a bloque, y se queda con los k mejores con argpartition.
+        Si hay un índice IVF entrenado, cada pregunta solo se compara con
+        las filas de sus nprobe grupos más cercanos.
+
+        La búsqueda toma el candado del almacén: una escritura a la vez
+        cambia la matriz, el contador de filas y la máscara de filas vivas,
+        y leerlos a medio actualizar daría filas fuera de rango.
+
+        Args:
+            queries (np.ndarray): Matriz (n_preguntas, dim) de vectores
+            k (int): Resultados por pregunta
+            rows (np.ndarray): Buscar solo en estas filas (None = todas)
+            nprobe (int): Grupos IVF a visitar (None = el configurado)
+            exact (bool): Ignorar el índice IVF y buscar en todo
+
+        Returns:
+            list: Por cada pregunta, lista de (fila, similitud) ordenada
+        """
+        queries = _normalize(queries)
+        n_queries = queries.shape[0]
+
+        with self._lock:
+            if self._matrix is None or self._count == 0 or k <= 0:
+                return [[] for _ in range(n_queries)]
+
+            if rows is not None:
+                # Filas obtenidas antes de un reset() ya no existen
+                rows = np.asarray(rows, dtype=np.int64)
+                rows = rows[rows < self._count]
+
+            use_index = (rows is None and not exact
+                         and self.index is not None and self.index.is_trained)
+            if use_index:
+                # Con el índice, cada pregunta tiene su propio conjunto de candidatos
+                return [
+                    self._search_rows(query[None, :], k, self.index.candidates(query, nprobe))[0]
+                    for query in queries
+                ]
+
+            return self._search_rows(queries, k, rows)
+
+    def _search_rows(self, queries, k, rows):
+        """
+        Búsqueda de varias preguntas (ya normalizadas) en las filas dadas.
+
+        Sin cuantización es una búsqueda exacta. Con cuantización se hace
+        en dos etapas: los códigos comprimidos eligen k * rerank_factor
+        candidatos y estos se re-puntúan con los vectores completos.
+        """
+        n_candidates = k * self.rerank_factor
+        n_rows = self._count if rows is None else len(rows)
+        if self.quantizer is None or self._codes is None or n_rows <= n_candidates:
+            return self._exact_search(queries, k, rows)
+
+        # Etapa 1: similitud aproximada sobre los códigos (en memoria)
+        _, candidates = self._block_top_k(
+            queries, n_candidates, rows, self._codes, self.quantizer.scores, CODE_BLOCK_ROWS
+        )
+
+        # Etapa 2: re-ranking exacto de los candidatos (ordenados, para leer
+        # el archivo de vectores en orden)
+        return [
+            self._exact_search(query[None, :], k, np.sort(query_candidates))[0]
+            for query, query_candidates in zip(queries, candidates)
+        ]
+
+    def _exact_search(self, queries, k, rows):
+        """
+        Búsqueda exacta con los vectores completos.
+
+        Returns:
+            list: Por cada pregunta, lista de (fila, similitud) ordenada
+        """
+        n_queries = queries.shape[0]
+        best_scores, best_rows = self._block_top_k(
+            queries, k, rows, self._matrix,
+            lambda block_queries, block: block_queries @ np.asarray(block, dtype=np.float32).T
+        )
+
+        # Descartar huecos (filas eliminadas que llenaron el top-k)
+        valid = np.isfinite(best_scores)
+        order = np.argsort(-best_scores, axis=1)
+        results = []
+        for i in range(n_queries):
+            results.append([
+                (int(best_rows[i, j]), float(best_scores[i, j]))
+                for j in order[i] if valid[i, j]
+            ])
+        return results
+
+    def _block_top_k(self, queries, k, rows, source, score_fn, block_size=SEARCH_BLOCK_ROWS):
+        """
+        Recorre 'source' (matriz o códigos) por bloques y se queda con los k
+        mejores de cada pregunta según score_fn(preguntas, bloque).
+
+        Returns:
+            tuple: (puntuaciones, filas), matrices (n_preguntas, k) sin ordenar
+        """
+        n_queries = queries.shape[0]
+
+        best_scores = np.empty((n_queries, 0), dtype=np.float32)
+        best_rows = np.empty((n_queries, 0), dtype=np.int64)
+
+        for block_rows, block in self._iter_blocks(rows, source, block_size):
+            scores = score_fn(queries, block)
+
+            # Las filas eliminadas nunca deben aparecer en los resultados
+            dead = ~self._alive[block_rows]
+            if dead.any():
+                scores[:, dead] = -np.inf
+
+            # Primero los k mejores del bloque, luego se combinan con los globales
+            top = _top_k_indices(scores, k)
+            best_scores, best_rows = _merge_top_k(
+                best_scores, best_rows,
+                np.take_along_axis(scores, top, axis=1), block_rows[top], k
+            )
+
+        return best_scores, best_rows
+
+    def _iter_blocks(self, rows=None, source=None, block_size=SEARCH_BLOCK_ROWS):
+        """
+        Recorre la matriz (o los códigos) por bloques de block_size filas.
+
+        Sin 'rows' se leen rebanadas contiguas (lectura secuencial, la más
+        rápida con memory mapping); con 'rows' solo las filas indicadas.
+
+        Yields:
+            tuple: (números_de_fila, bloque_de_vectores)
+        """
+        source = self._matrix if source is None else source
+        if rows is None:
+            for start in range(0, self._count, block_size):
+                end = min(start + block_size, self._count)
+                yield np.arange(start, end), source[start:end]
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            for start in range(0, len(rows), block_size):
+                block_rows = rows[start:start + block_size]
+                yield block_rows, source[block_rows]
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        """
+        Busca los k fragmentos más similares a un vector.
+
+        Args:
+            embedding (list): Vector de la pregunta
+            k (int): Número de resultados
+            filter (dict): Filtro de metadatos (opcional)
+
+        Returns:
+            list: Lista de (Document, similitud)
+        """
+        with self._lock:
+            rows = None
+            if filter:
+                rows = self.get(where=filter, include=())['rows']
+            hits = self.search_by_vectors(np.asarray([embedding]), k=k, rows=rows)[0]
+            return self._rows_to_documents(hits)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        """Igual que similarity_search_with_score_by_vector, sin las puntuaciones."""
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(
+            embedding, k=k, filter=filter)]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        """Busca por texto y devuelve (Document, similitud)."""
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        """
+        Busca los k fragmentos más similares a una pregunta.
+
+        Args:
+            query (str): Texto de la pregunta
+            k (int): Número de resultados
+            filter (dict): Filtro de metadatos (opcional)
+
+        Returns:
+            list: Lista de Document
+        """
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        """La similitud coseno (-1 a 1) se pasa a relevancia (0 a 1)."""
+        return lambda score: (score + 1.0) / 2.0
+
+    def _rows_to_documents(self, hits):
+        """Convierte [(fila, similitud)] en [(Document, similitud)]."""
+        if not hits:
+            return []
+        data = self.get_rows([row for row, _ in hits])
+        by_row = {
+            row: Document(id=chunk_id, page_content=text, metadata=metadata)
+            for row, chunk_id, text, metadata in zip(
+                data['rows'], data['ids'], data['documents'], data['metadatas'])
+        }
+        return [(by_row[row], score) for row, score in hits if row in by_row]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None,
+                   directory="db_numpy", dtype="float32", **kwargs):
+        """
+        Crea un almacén y guarda los textos (requerido por LangChain).
+        """
+        store = cls(directory, embedding, dtype=dtype)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+def _top_k_indices(scores, k):
+    """
+    Índices (sin ordenar) de los k mayores valores de cada fila.
+
+    np.argpartition encuentra los k mayores en tiempo lineal, sin
+    ordenar todos los elementos.
+    """
+    if scores.shape[1] <= k:
+        return np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def _merge_top_k(best_scores, best_rows, scores, rows, k):
+    """
+    Combina los k mejores actuales con los k mejores de un bloque nuevo.
+    """
+    all_scores = np.concatenate([best_scores, scores], axis=1)
+    all_rows = np.concatenate([best_rows, rows], axis=1)
+
+    if all_scores.shape[1] <= k:
+        return all_scores, all_rows
+
+    top = _top_k_indices(all_scores, k)
+    return (
+        np.take_along_axis(all_scores, top, axis=1),
+        np.take_along_axis(all_rows, top, axis=1)
+    )
+
+# ==============================================================================
+# NOTAS PARA ESTUDIANTES
+# ==============================================================================
+"""
+📚 CONCEPTOS IMPORTANTES:
+
+1. MEMORY MAPPING (np.memmap / mmap_mode):
+   - El archivo en disco se "ve" como si fuera un array en memoria
+   - Solo se leen las partes que se usan
+
+2. SIMILITUD COSENO = PRODUCTO ESCALAR:
+   - Si todos los vectores tienen longitud 1, cos(a, b) = a · b
+   - Buscar en toda la base es una sola multiplicación de matrices
+
+3. ARGPARTITION:
+   - Encuentra los k mayores sin ordenar todo: O(n) en lugar de O(n log n)
+
+💡 EXPERIMENTO SUGERIDO:
+   Ejecuta "python benchmark.py vector-store" para comparar este almacén
+   con ChromaDB en tu computadora.
+"""